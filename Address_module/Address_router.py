@@ -9,7 +9,7 @@ from Cart_module.Cart_model import CartItem
 from Login_module.Utils.auth_user import get_current_user
 from Login_module.Utils.datetime_utils import to_ist_isoformat
 from Login_module.Utils.rate_limiter import get_client_ip
-from deps import get_db
+from deps import get_db, get_read_db
 from .Address_crud import delete_address, get_addresses_by_user, save_address
 from .Address_schema import (
     AddressListResponse,
@@ -160,7 +160,7 @@ def edit_address_api(
 # Get all addresses of user
 @router.get("/list", response_model=AddressListResponse)
 def get_address_list(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     user = Depends(get_current_user)
 ):
     addresses = get_addresses_by_user(db, user)
@@ -1,5 +1,26 @@
-from typing import Optional, Set
+"""
+Serviceable city / pincode validation.
+
+The normalized city set (serviceable_locations) and pincode set
+(service_locations) are loaded into an in-process snapshot together with a
+trigram index used for "similar city" suggestions, so a validation is a set
+lookup instead of a table scan.
+
+Caching and invalidation:
+- Redis holds a version counter (serviceable_locations:version) and the sets
+  for that version, shared by all workers.
+- A worker re-checks the version at most every LOCAL_CHECK_SECONDS; if it
+  changed, the snapshot is rebuilt from Redis (or the DB on a Redis miss).
+- invalidate_serviceable_locations() bumps the version; call it after the
+  tables change (seed_serviceable_locations_from_xlsx.py does).
+- Without Redis each worker reloads from the DB every LOCAL_TTL_SECONDS.
+"""
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, List, Optional, Set
+import json
 import logging
+import threading
+import time
 
 from sqlalchemy.orm import Session
 
@@ -7,22 +28,175 @@ from .Address_model import ServiceableLocation, ServiceLocation
 
 logger = logging.getLogger(__name__)
 
+VERSION_KEY = "serviceable_locations:version"
+DATA_KEY_PREFIX = "serviceable_locations:data:"
+DATA_TTL_SECONDS = 86400
+LOCAL_CHECK_SECONDS = 30  # How often a worker asks Redis whether the version changed
+LOCAL_TTL_SECONDS = 300  # Reload interval when Redis is unavailable
+SIMILARITY_THRESHOLD = 0.3
 
-def _load_serviceable_locations_from_db(db: Session) -> Set[str]:
-    """Load allowed locations (cities/localities) from serviceable_locations table."""
-    allowed: Set[str] = set()
+
+@dataclass
+class LocationSnapshot:
+    version: Optional[int]
+    cities: FrozenSet[str]
+    pincodes: FrozenSet[str]
+    trigrams: Dict[str, List[str]] = field(default_factory=dict)
+    loaded_at: float = 0.0
+    checked_at: float = 0.0
+
+
+_lock = threading.Lock()
+_snapshot: Optional[LocationSnapshot] = None
+
+
+def _get_redis_client():
+    """Lazy import to avoid circular dependency (shares the OTP Redis client)."""
+    from Login_module.OTP import otp_manager
+    client = otp_manager._get_redis_client()
+    return client if otp_manager._redis_available else None
+
+
+def normalize(value: Optional[str]) -> Optional[str]:
+    if not value or not isinstance(value, str):
+        return None
+    normalized = value.strip().lower()
+    return normalized if normalized else None
+
+
+def _trigrams(value: str) -> Set[str]:
+    padded = f"  {value} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _build_trigram_index(cities: FrozenSet[str]) -> Dict[str, List[str]]:
+    index: Dict[str, List[str]] = {}
+    for city in cities:
+        for gram in _trigrams(city):
+            index.setdefault(gram, []).append(city)
+    return index
+
+
+def _make_snapshot(version: Optional[int], cities, pincodes) -> LocationSnapshot:
+    cities = frozenset(cities)
+    now = time.monotonic()
+    return LocationSnapshot(
+        version=version,
+        cities=cities,
+        pincodes=frozenset(pincodes),
+        trigrams=_build_trigram_index(cities),
+        loaded_at=now,
+        checked_at=now,
+    )
+
+
+def _load_from_db(db: Session):
+    """Load normalized cities and pincodes from the database."""
+    cities: Set[str] = set()
+    for (value,) in db.query(ServiceableLocation.location).all():
+        normalized = normalize(str(value)) if value else None
+        if normalized:
+            cities.add(normalized)
+    pincodes: Set[str] = set()
+    for (value,) in db.query(ServiceLocation.pincode).filter(ServiceLocation.pincode.isnot(None)).all():
+        value = str(value).strip()
+        if value:
+            pincodes.add(value)
+    logger.info("Loaded %d serviceable locations and %d pincodes from database", len(cities), len(pincodes))
+    return cities, pincodes
+
+
+def _redis_version(client) -> int:
+    raw = client.get(VERSION_KEY)
+    return int(raw) if raw else 0
+
+
+def _load_snapshot(db: Session) -> LocationSnapshot:
+    client = None
+    version = None
     try:
-        rows = db.query(ServiceableLocation.location).all()
-        for (value,) in rows:
-            if value:
-                normalized = str(value).strip().lower()
-                if normalized:
-                    allowed.add(normalized)
+        client = _get_redis_client()
+        if client is not None:
+            version = _redis_version(client)
+            raw = client.get(f"{DATA_KEY_PREFIX}{version}")
+            if raw:
+                data = json.loads(raw)
+                return _make_snapshot(version, data["cities"], data["pincodes"])
     except Exception as exc:
-        logger.error("Failed to read serviceable_locations table: %s", exc)
-        return allowed
-    logger.info("Loaded %d serviceable locations from database", len(allowed))
-    return allowed
+        logger.warning("Serviceable location cache read failed, loading from DB: %s", exc)
+        client = None
+        version = None
+
+    cities, pincodes = _load_from_db(db)
+    if client is not None:
+        try:
+            payload = json.dumps({"cities": sorted(cities), "pincodes": sorted(pincodes)})
+            client.set(f"{DATA_KEY_PREFIX}{version}", payload, ex=DATA_TTL_SECONDS)
+        except Exception as exc:
+            logger.warning("Serviceable location cache write failed: %s", exc)
+    return _make_snapshot(version, cities, pincodes)
+
+
+def get_location_snapshot(db: Session) -> LocationSnapshot:
+    """Current snapshot; reloads only when the shared version changed or the local TTL expired."""
+    global _snapshot
+    snapshot = _snapshot
+    now = time.monotonic()
+
+    if snapshot is not None:
+        if snapshot.version is None:
+            if now - snapshot.loaded_at < LOCAL_TTL_SECONDS:
+                return snapshot
+        elif now - snapshot.checked_at < LOCAL_CHECK_SECONDS:
+            return snapshot
+        else:
+            try:
+                client = _get_redis_client()
+                if client is not None and _redis_version(client) == snapshot.version:
+                    snapshot.checked_at = now
+                    return snapshot
+            except Exception as exc:
+                logger.warning("Serviceable location version check failed: %s", exc)
+
+    with _lock:
+        if _snapshot is not None and _snapshot is not snapshot:
+            return _snapshot  # Another thread reloaded while we waited
+        _snapshot = _load_snapshot(db)
+        return _snapshot
+
+
+def invalidate_serviceable_locations() -> None:
+    """Bump the shared version and drop this worker's snapshot. Call after the tables change."""
+    global _snapshot
+    with _lock:
+        _snapshot = None
+    try:
+        client = _get_redis_client()
+        if client is not None:
+            client.incr(VERSION_KEY)
+    except Exception as exc:
+        logger.warning("Serviceable location cache invalidation failed: %s", exc)
+
+
+def suggest_similar_locations(city: Optional[str], db: Session, limit: int = 5) -> List[str]:
+    """Serviceable cities most similar to `city`, ranked by trigram overlap."""
+    normalized_city = normalize(city)
+    if not normalized_city:
+        return []
+    snapshot = get_location_snapshot(db)
+    query = _trigrams(normalized_city)
+    shared: Dict[str, int] = {}
+    for gram in query:
+        for candidate in snapshot.trigrams.get(gram, ()):
+            shared[candidate] = shared.get(candidate, 0) + 1
+
+    scored = []
+    for candidate, count in shared.items():
+        score = count / (len(query) + len(_trigrams(candidate)) - count)
+        if score >= SIMILARITY_THRESHOLD:
+            scored.append((score, candidate))
+    scored.sort(key=lambda item: (-item[0], item[1]))
+    return [candidate for _, candidate in scored[:limit]]
 
 
 def is_serviceable_location(city: Optional[str], locality: Optional[str], db: Session) -> bool:
@@ -30,32 +204,25 @@ def is_serviceable_location(city: Optional[str], locality: Optional[str], db: Se
     Return True if city name is present in the serviceable_locations table.
     Only city name is validated.
     """
-    allowed = _load_serviceable_locations_from_db(db)
-    if not allowed:
+    try:
+        snapshot = get_location_snapshot(db)
+    except Exception as exc:
+        logger.error("Failed to read serviceable_locations table: %s", exc)
+        return False
+    if not snapshot.cities:
         logger.warning("Serviceable locations table is empty. Rejecting all locations.")
         return False
 
-    def normalize(value: Optional[str]) -> Optional[str]:
-        if not value:
-            return None
-        if not isinstance(value, str):
-            return None
-        normalized = value.strip().lower()
-        return normalized if normalized else None
-
     normalized_city = normalize(city)
 
-    logger.info("Validating city name - City: '%s' (normalized: '%s')", city, normalized_city)
-    logger.info("Total serviceable locations loaded: %d", len(allowed))
-
     if normalized_city:
-        if normalized_city in allowed:
+        if normalized_city in snapshot.cities:
             logger.info("City '%s' (normalized: '%s') found in serviceable locations.", city, normalized_city)
             return True
         logger.warning("City '%s' (normalized: '%s') NOT found in serviceable locations.", city, normalized_city)
-        similar = [loc for loc in allowed if normalized_city in loc or loc in normalized_city]
+        similar = suggest_similar_locations(normalized_city, db)
         if similar:
-            logger.info("Similar city names found in serviceable locations: %s", similar[:5])
+            logger.info("Similar city names found in serviceable locations: %s", similar)
 
     logger.warning("Location validation failed - City: '%s' (normalized: '%s')", city, normalized_city)
     return False
@@ -73,12 +240,7 @@ def is_serviceable_pincode(pincode: Optional[str], db: Session) -> bool:
     normalized = str(pincode).strip()
 
     try:
-        exists = (
-            db.query(ServiceLocation)
-            .filter(ServiceLocation.pincode == normalized)
-            .first()
-        )
-        if exists:
+        if normalized in get_location_snapshot(db).pincodes:
             logger.info("Pincode '%s' found in service_locations.", normalized)
             return True
         logger.warning("Pincode '%s' NOT found in service_locations.", normalized)
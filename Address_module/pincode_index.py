@@ -0,0 +1,170 @@
+"""
+Local pincode index.
+
+A read-only SQLite file (PINCODE_INDEX_PATH) built from the India Post
+pincode directory (CSV or XLSX) by build_pincode_index.py. pincode_service
+consults it before any network call; each lookup is one indexed query.
+
+If the file does not exist every lookup is a miss and callers fall back to
+the postalpincode.in APIs. The index is replaced atomically when rebuilt;
+running workers pick up the new file on restart.
+"""
+import csv
+import logging
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+PINCODE_INDEX_PATH = os.getenv("PINCODE_INDEX_PATH", str(PROJECT_ROOT / "pincode_index.sqlite"))
+
+# Source column -> accepted header names (lowercased, spaces/underscores removed)
+_COLUMN_ALIASES = {
+    "pincode": ("pincode", "pin", "postalcode"),
+    "name": ("officename", "name", "postoffice", "office"),
+    "branch_type": ("officetype", "branchtype", "officetyp"),
+    "delivery_status": ("deliverystatus", "delivery"),
+    "district": ("district", "districtname"),
+    "state": ("statename", "state"),
+}
+
+_local = threading.local()
+
+
+def _connection() -> Optional[sqlite3.Connection]:
+    """Per-thread read-only connection; None if the index file is missing."""
+    conn = getattr(_local, "conn", None)
+    if conn is not None and getattr(_local, "path", None) == PINCODE_INDEX_PATH:
+        return conn
+    if not os.path.exists(PINCODE_INDEX_PATH):
+        return None
+    conn = sqlite3.connect(f"file:{PINCODE_INDEX_PATH}?mode=ro", uri=True, check_same_thread=False)
+    _local.conn, _local.path = conn, PINCODE_INDEX_PATH
+    return conn
+
+
+def lookup_post_offices(pincode: str) -> Optional[List[Dict[str, Any]]]:
+    """
+    Post offices for a pincode in the same shape as the postalpincode.in
+    "PostOffice" entries, [] if the pincode is not in the index, or None if
+    no index is available.
+    """
+    try:
+        conn = _connection()
+        if conn is None:
+            return None
+        rows = conn.execute(
+            "SELECT name, branch_type, delivery_status, district, state FROM pincodes WHERE pincode = ?",
+            (pincode,),
+        ).fetchall()
+    except sqlite3.Error as e:
+        logger.warning(f"Pincode index lookup failed for {pincode}: {e}")
+        return None
+    return [
+        {
+            "Name": name,
+            "BranchType": branch_type,
+            "DeliveryStatus": delivery_status,
+            "District": district,
+            "State": state,
+            "Pincode": pincode,
+        }
+        for name, branch_type, delivery_status, district, state in rows
+    ]
+
+
+# ---------------------------------------------------------------------------
+# Building
+# ---------------------------------------------------------------------------
+
+def _header_map(headers: Iterable[Any]) -> Dict[str, int]:
+    normalized = [str(h or "").strip().lower().replace(" ", "").replace("_", "") for h in headers]
+    mapping: Dict[str, int] = {}
+    for field, aliases in _COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in normalized:
+                mapping[field] = normalized.index(alias)
+                break
+    missing = {"pincode", "name", "district", "state"} - set(mapping)
+    if missing:
+        raise ValueError(f"Pincode file is missing columns: {sorted(missing)}. Headers: {list(headers)}")
+    return mapping
+
+
+def _read_rows(path: Path) -> Iterator[List[Any]]:
+    if path.suffix.lower() in (".xlsx", ".xlsm"):
+        from openpyxl import load_workbook
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            for row in workbook.active.iter_rows(values_only=True):
+                yield list(row)
+        finally:
+            workbook.close()
+    else:
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            yield from csv.reader(f)
+
+
+def _clean(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    value = str(value).strip()
+    return "" if value.upper() == "NA" else value
+
+
+def _display_case(value: str) -> str:
+    # The directory is ALL CAPS; match the API's "Bengaluru Urban" style
+    return value.title() if value.isupper() else value
+
+
+def build_pincode_index(source: Path, output: Optional[str] = None) -> int:
+    """
+    Build the SQLite index from a CSV/XLSX pincode directory.
+    Written to a temp file and swapped in atomically. Returns the row count.
+    """
+    output = output or PINCODE_INDEX_PATH
+    rows = _read_rows(Path(source))
+    mapping = _header_map(next(rows))
+
+    tmp_path = f"{output}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    count = 0
+    try:
+        conn.execute(
+            "CREATE TABLE pincodes (pincode TEXT NOT NULL, name TEXT, branch_type TEXT, "
+            "delivery_status TEXT, district TEXT, state TEXT)"
+        )
+
+        def records():
+            nonlocal count
+            for row in rows:
+                if not row:
+                    continue
+                values = {field: _clean(row[idx]) if idx < len(row) else "" for field, idx in mapping.items()}
+                pincode = values["pincode"].replace(" ", "")
+                if len(pincode) != 6 or not pincode.isdigit():
+                    continue
+                count += 1
+                yield (
+                    pincode, _display_case(values.get("name", "")), values.get("branch_type", ""),
+                    values.get("delivery_status", ""), _display_case(values.get("district", "")),
+                    _display_case(values.get("state", "")),
+                )
+
+        conn.executemany("INSERT INTO pincodes VALUES (?, ?, ?, ?, ?, ?)", records())
+        conn.execute("CREATE INDEX ix_pincodes_pincode ON pincodes (pincode)")
+        conn.commit()
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+    os.replace(tmp_path, output)
+    logger.info(f"Built pincode index at {output} with {count} post offices")
+    return count
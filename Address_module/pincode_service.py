@@ -1,15 +1,27 @@
 """
 Pincode service for auto-generating city and state from pincode.
-Uses free postalpincode.in API with Redis caching for performance.
+
+Lookup order:
+1. Local pincode index (pincode_index, built from the India Post directory)
+2. Redis cache of earlier API results (positive and negative)
+3. postalpincode.in APIs (primary, then fallback) over a shared pooled session
+
+Pincodes the APIs cannot resolve are negatively cached for
+PINCODE_NEGATIVE_CACHE_TTL so invalid input does not hit the network each time.
 """
 import json
 import logging
 import os
+import threading
+import time
 from typing import Any, Dict, List, Optional, Tuple
 
 import requests
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 
+from .pincode_index import lookup_post_offices
+
 load_dotenv()
 
 logger = logging.getLogger(__name__)
@@ -18,6 +30,9 @@ logger = logging.getLogger(__name__)
 PINCODE_API_URL = "https://api.postalpincode.in/pincode"
 PINCODE_FALLBACK_API_URL = "https://postalpincode.in/api/pincode"
 CACHE_TTL_SECONDS = int(os.getenv("PINCODE_CACHE_TTL", 86400))  # 24 hours default
+NEGATIVE_CACHE_TTL_SECONDS = int(os.getenv("PINCODE_NEGATIVE_CACHE_TTL", 600))  # Pincode not found
+ERROR_CACHE_TTL_SECONDS = 60  # All sources failed (timeout/network) - retry soon
+PINCODE_REQUEST_TIMEOUT = (3, 6)  # (connect, read) seconds
 PINCODE_REQUEST_HEADERS = {
     "User-Agent": os.getenv("PINCODE_USER_AGENT", "NucleotidePincodeService/1.0"),
     "Accept": "application/json",
@@ -27,19 +42,58 @@ PINCODE_SOURCES = (
     ("fallback", PINCODE_FALLBACK_API_URL),
 )
 
-# Try to get Redis client (if available)
-_redis_client = None
-try:
-    from Login_module.OTP import otp_manager
-    _redis_client = otp_manager._redis_client
-    logger.info("Redis available for pincode caching")
-except Exception as e:
-    logger.warning(f"Redis not available for pincode caching: {e}")
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+_metrics_lock = threading.Lock()
+_metrics = {
+    "lookups": 0,
+    "local_index_hits": 0,
+    "cache_hits": 0,
+    "negative_cache_hits": 0,
+    "api_hits": 0,
+    "api_not_found": 0,
+    "api_errors": 0,
+    "api_seconds_total": 0.0,
+    "lookup_seconds_total": 0.0,
+}
+
+
+def _record(name: str, amount=1) -> None:
+    with _metrics_lock:
+        _metrics[name] += amount
+
+
+def _get_redis_client():
+    """Lazy import to avoid circular dependency (shares the OTP Redis client)."""
+    try:
+        from Login_module.OTP import otp_manager
+        client = otp_manager._get_redis_client()
+        return client if otp_manager._redis_available else None
+    except Exception as e:
+        logger.debug(f"Redis not available for pincode caching: {e}")
+        return None
+
+
+def _get_session() -> requests.Session:
+    """Shared HTTP session so API calls reuse pooled keep-alive connections."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=2, pool_maxsize=20)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers.update(PINCODE_REQUEST_HEADERS)
+                _session = session
+    return _session
 
 
 def _get_from_cache(pincode: str) -> Optional[Dict[str, Any]]:
     """Get city/state/localities from Redis cache"""
-    if not _redis_client:
+    _redis_client = _get_redis_client()
+    if _redis_client is None:
         return None
     
     try:
@@ -68,7 +122,8 @@ def _get_from_cache(pincode: str) -> Optional[Dict[str, Any]]:
 
 def _save_to_cache(pincode: str, city: str, state: str, localities: List[Dict[str, Any]]):
     """Save city/state/localities to Redis cache"""
-    if not _redis_client:
+    _redis_client = _get_redis_client()
+    if _redis_client is None:
         return
     
     try:
@@ -84,14 +139,38 @@ def _save_to_cache(pincode: str, city: str, state: str, localities: List[Dict[st
         logger.warning(f"Error saving to cache: {e}")
 
 
+def _is_negatively_cached(pincode: str) -> bool:
+    _redis_client = _get_redis_client()
+    if _redis_client is None:
+        return False
+    try:
+        return bool(_redis_client.exists(f"pincode:miss:{pincode}"))
+    except Exception as e:
+        logger.warning(f"Error reading negative pincode cache: {e}")
+        return False
+
+
+def _save_negative(pincode: str, ttl_seconds: int) -> None:
+    _redis_client = _get_redis_client()
+    if _redis_client is None:
+        return
+    try:
+        _redis_client.set(f"pincode:miss:{pincode}", 1, ex=ttl_seconds)
+    except Exception as e:
+        logger.warning(f"Error saving negative pincode cache: {e}")
+
+
 def _fetch_pincode_payload(base_url: str, pincode: str) -> Any:
-    response = requests.get(
-        f"{base_url}/{pincode}",
-        timeout=6,
-        headers=PINCODE_REQUEST_HEADERS,
-    )
-    response.raise_for_status()
-    return response.json()
+    started = time.monotonic()
+    try:
+        response = _get_session().get(
+            f"{base_url}/{pincode}",
+            timeout=PINCODE_REQUEST_TIMEOUT,
+        )
+        response.raise_for_status()
+        return response.json()
+    finally:
+        _record("api_seconds_total", time.monotonic() - started)
 
 
 def _extract_city_state_from_post_office(post_office: Dict[str, Any]) -> Tuple[Optional[str], Optional[str]]:
@@ -158,10 +237,19 @@ def _parse_pincode_response(payload: Any) -> Tuple[Optional[str], Optional[str],
 
 def get_pincode_details(pincode: str) -> Tuple[Optional[str], Optional[str], List[Dict[str, Any]]]:
     """
-    Get city, state, and locality list for a pincode using postalpincode APIs.
+    Get city, state, and locality list for a pincode (local index, cache, then postalpincode APIs).
     """
     if not pincode:
         return None, None, []
+    started = time.monotonic()
+    try:
+        return _get_pincode_details(pincode)
+    finally:
+        _record("lookups")
+        _record("lookup_seconds_total", time.monotonic() - started)
+
+
+def _get_pincode_details(pincode: str) -> Tuple[Optional[str], Optional[str], List[Dict[str, Any]]]:
     
     # Clean pincode (remove spaces, ensure 6 digits)
     pincode = pincode.strip().replace(" ", "")
@@ -170,14 +258,28 @@ def get_pincode_details(pincode: str) -> Tuple[Optional[str], Optional[str], Lis
         logger.warning(f"Invalid pincode format: {pincode}")
         return None, None, []
     
-    # Check cache first
+    # Local index first - no network, no Redis
+    post_offices = lookup_post_offices(pincode)
+    if post_offices:
+        city, state, localities = _parse_pincode_response(
+            [{"Status": "Success", "PostOffice": post_offices}]
+        )
+        if city and state:
+            _record("local_index_hits")
+            return city, state, localities
+
+    # Check cache
     cached_result = _get_from_cache(pincode)
     if cached_result and cached_result.get("localities"):
+        _record("cache_hits")
         return (
             cached_result.get("city"),
             cached_result.get("state"),
             cached_result.get("localities", [])
         )
+    if _is_negatively_cached(pincode):
+        _record("negative_cache_hits")
+        return None, None, []
     
     # Call API(s)
     last_error = None
@@ -187,6 +289,7 @@ def get_pincode_details(pincode: str) -> Tuple[Optional[str], Optional[str], Lis
             city, state, localities = _parse_pincode_response(payload)
             if city and state:
                 _save_to_cache(pincode, city, state, localities)
+                _record("api_hits")
                 logger.info(f"Pincode {pincode} resolved via {source_name}: {city}, {state}")
                 return city, state, localities
             logger.warning(
@@ -204,11 +307,31 @@ def get_pincode_details(pincode: str) -> Tuple[Optional[str], Optional[str], Lis
     
     if last_error:
         logger.error(f"All pincode lookups failed for {pincode}. Last error: {last_error}")
+        _record("api_errors")
+        _save_negative(pincode, ERROR_CACHE_TTL_SECONDS)
+    else:
+        _record("api_not_found")
+        _save_negative(pincode, NEGATIVE_CACHE_TTL_SECONDS)
     
     # Return None if API call failed
     return None, None, []
 
 
+def get_pincode_metrics() -> dict:
+    """Hit-rate and latency counters for pincode lookups (per worker)."""
+    with _metrics_lock:
+        metrics = dict(_metrics)
+    lookups = metrics["lookups"]
+    served_locally = metrics["local_index_hits"] + metrics["cache_hits"] + metrics["negative_cache_hits"]
+    api_calls = metrics["api_hits"] + metrics["api_not_found"] + metrics["api_errors"]
+    metrics["hit_rate"] = round(served_locally / lookups, 4) if lookups else 0.0
+    metrics["avg_lookup_ms"] = round(metrics["lookup_seconds_total"] * 1000 / lookups, 3) if lookups else 0.0
+    metrics["avg_api_ms"] = round(metrics["api_seconds_total"] * 1000 / api_calls, 3) if api_calls else 0.0
+    metrics["lookup_seconds_total"] = round(metrics["lookup_seconds_total"], 3)
+    metrics["api_seconds_total"] = round(metrics["api_seconds_total"], 3)
+    return metrics
+
+
 def get_city_state_from_pincode(pincode: str) -> Tuple[Optional[str], Optional[str]]:
     """Backward-compatible helper to fetch only city/state."""
     city, state, _ = get_pincode_details(pincode)
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Request, status, UploadFile, File
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, or_
 from typing import Optional, List
@@ -19,6 +19,7 @@ from .Banner_schema import (
 from .Banner_s3_service import get_banner_image_s3_service
 from deps import get_db
 from Login_module.Utils.datetime_utils import to_ist_isoformat
+from Product_module.catalog_cache import cached_response, invalidate_catalog, serialize, BANNERS, DEFAULT_TTL_SECONDS
 
 logger = logging.getLogger(__name__)
 
@@ -27,6 +28,8 @@ router = APIRouter(prefix="/banners", tags=["Banners"])
 # Allowed image file extensions
 ALLOWED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+# Active banners depend on start/end dates, so cached lists expire quickly even without writes
+ACTIVE_BANNERS_CACHE_TTL_SECONDS = 60
 
 # Content type mapping for banner images
 CONTENT_TYPE_MAP = {
@@ -66,6 +69,7 @@ def format_banner_response(banner: Banner) -> BannerResponse:
 
 @router.get("", response_model=BannerListResponse)
 def get_banners(
+    request: Request,
     active_only: bool = True,
     db: Session = Depends(get_db)
 ):
@@ -73,7 +77,18 @@ def get_banners(
     Get list of banners.
     By default, returns only active banners that are within their date range.
     Set active_only=false to get all banners (including inactive).
+    Served from the catalog cache (ETag / If-None-Match supported).
     """
+    return cached_response(
+        request,
+        BANNERS,
+        f"list:active_only={active_only}",
+        lambda: serialize(BannerListResponse, _list_banners(db, active_only)),
+        ttl_seconds=ACTIVE_BANNERS_CACHE_TTL_SECONDS if active_only else DEFAULT_TTL_SECONDS,
+    )
+
+
+def _list_banners(db: Session, active_only: bool) -> BannerListResponse:
     query = db.query(Banner).filter(Banner.is_deleted == False)
     
     if active_only:
@@ -167,6 +182,7 @@ def create_banner(
     db.add(new_banner)
     db.commit()
     db.refresh(new_banner)
+    invalidate_catalog(BANNERS)
     
     return BannerSingleResponse(
         status="success",
@@ -266,6 +282,7 @@ async def upload_banner_image(
             banner.image_url = image_url
             db.commit()
             db.refresh(banner)
+            invalidate_catalog(BANNERS)
             
             return BannerSingleResponse(
                 status="success",
@@ -296,6 +313,7 @@ async def upload_banner_image(
             db.add(new_banner)
             db.commit()
             db.refresh(new_banner)
+            invalidate_catalog(BANNERS)
             
             # Update S3 key with actual banner ID (re-upload with correct key)
             # This is optional - you can keep the original key or re-upload
@@ -389,6 +407,7 @@ def update_banner(
     
     db.commit()
     db.refresh(banner)
+    invalidate_catalog(BANNERS)
     
     return BannerSingleResponse(
         status="success",
@@ -434,6 +453,7 @@ def delete_banner(
     banner.deleted_at = now_ist()
     
     db.commit()
+    invalidate_catalog(BANNERS)
     
     return {
         "status": "success",
@@ -1,6 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, Request, Query
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func
 from typing import Optional, List
 import uuid
 import logging
@@ -26,9 +25,12 @@ from .coupon_service import (
     validate_and_calculate_discount,
     is_coupon_usage_limit_reached,
     get_coupon_usage_count,
+    invalidate_coupon_definitions,
     is_user_allowed_for_coupon
 )
-from .Coupon_model import Coupon, CouponType, CouponStatus
+from .Coupon_model import Coupon, CouponType, CouponStatus, normalize_coupon_code
+from .cart_pricing import cart_group_key, price_cart_items
+from .cart_cache import get_cached_cart_view, store_cart_view
 
 router = APIRouter(prefix="/cart", tags=["Cart"])
 
@@ -672,27 +674,21 @@ def view_cart(
     All items for a user share the same cart_id.
     Returns cart items with product_id, address_id, cart_id, member_id.
     Groups items by group_id for couple/family products.
+    Served from the versioned cart view cache when the cart is unchanged (see cart_cache).
     """
-    try:
-        from Orders_module.Order_model import Order, OrderStatus, PaymentStatus
-        from Orders_module.Order_crud import finalize_verified_processing_order
-
-        processing_orders = db.query(Order).filter(
-            Order.user_id == current_user.id,
-            Order.order_status == OrderStatus.PROCESSING,
-            Order.payment_status == PaymentStatus.PROCESSING,
-        ).order_by(Order.created_at.desc()).all()
-
-        for order in processing_orders:
-            finalize_verified_processing_order(db, order)
-    except Exception as repair_error:
-        logger.error(
-            "Error repairing verified processing order before cart view for user %s: %s",
-            current_user.id,
-            repair_error,
-            exc_info=True,
-        )
-
+    cached, cache_key = get_cached_cart_view(current_user.id)
+    if cached is not None:
+        return cached
+    # get_current_user already opened a transaction; end it so the render reads a
+    # snapshot at least as new as the cart version the response is cached under
+    db.rollback()
+    response = _render_cart_view(request, current_user, db)
+    store_cart_view(cache_key, response)
+    return response
+
+
+def _render_cart_view(request: Request, current_user: User, db: Session) -> dict:
+    """Build the /cart/view response from the database (cache miss)."""
     # Get user's active cart (or create if doesn't exist and has items)
     cart = db.query(Cart).filter(
         Cart.user_id == current_user.id,
@@ -764,31 +760,25 @@ def view_cart(
             }
         }
 
-    subtotal_amount = 0
     delivery_charge = 0
     cart_item_details = []
     
     # Group items by group_id to show couple/family products together
     grouped_items = {}
     for item in cart_items:
-        group_key = item.group_id or f"single_{item.id}"
-        if group_key not in grouped_items:
-            grouped_items[group_key] = []
-        grouped_items[group_key].append(item)
-
-    for group_key, items in grouped_items.items():
-        # Skip if group is empty (should not happen, but safety check)
-        if not items:
-            continue
+        grouped_items.setdefault(cart_group_key(item.group_id, item.id), []).append(item)
+
+    priced_cart = price_cart_items(cart_items)
+    subtotal_amount = priced_cart.subtotal
+
+    # Groups whose product is deleted or missing are not in priced_cart
+    for priced_group in priced_cart.groups:
+        items = grouped_items[priced_group.group_key]
             
         # Use first item as representative (all items in group have same product, quantity)
         # Note: addresses may differ per member
         item = items[0]
         product = item.product
-        
-        # Skip if product is deleted or missing
-        if not product:
-            continue
             
         member_ids = [i.member_id for i in items]
         
@@ -828,17 +818,10 @@ def view_cart(
         # Get unique address IDs (may be 1 or multiple)
         address_ids = list(set(i.address_id for i in items))
         
-        # Calculate total (quantity * price) - price is already for the plan, not per member
-        total = item.quantity * product.SpecialPrice
-        subtotal_amount += total
-        
-        # Calculate discount per item (difference between price and special_price)
-        discount_per_item = product.Price - product.SpecialPrice
-
         cart_item_details.append({
             "product_type": "genetic",
             "cart_id": item.cart_id,
-            "cart_item_ids": [i.id for i in items],
+            "cart_item_ids": list(priced_group.cart_item_ids),
             "product_id": product.ProductId,
             "address_ids": address_ids,  # List of unique address IDs used
             "member_ids": member_ids,
@@ -846,12 +829,13 @@ def view_cart(
             "product_name": product.Name,
             "product_images": product.Images,
             "plan_type": product.plan_type.value if hasattr(product.plan_type, 'value') else str(product.plan_type),
-            "price": product.Price,
-            "special_price": product.SpecialPrice,
-            "quantity": item.quantity,
+            "price": priced_group.price,
+            "special_price": priced_group.special_price,
+            "quantity": priced_group.quantity,
             "members_count": len(items),  # 1 for single, 2 for couple, 3-4 for family
-            "discount_per_item": discount_per_item,
-            "total_amount": total,
+            "discount_per_item": priced_group.discount_per_item,
+            # quantity * SpecialPrice - price is already for the plan, not per member
+            "total_amount": priced_group.total_amount,
             "group_id": item.group_id
         })
 
@@ -909,8 +893,7 @@ def view_cart(
     
     # Calculate grand total
     # subtotal_amount uses SpecialPrice, so we only subtract coupon_amount
-    grand_total = subtotal_amount + delivery_charge - coupon_amount
-    grand_total = max(0.0, grand_total)
+    grand_total = priced_cart.grand_total(coupon_amount, delivery_charge)
 
     # you_save = coupon discount only
     # MRP discount is already reflected in subtotal (SpecialPrice), so we don't double-count it
@@ -1020,37 +1003,13 @@ def apply_coupon(
         
         cart_id = cart.id if cart else None
         
-        # Calculate subtotal
-        subtotal_amount = 0.0
-        grouped_items = {}
-        for item in cart_items:
-            group_key = item.group_id or f"single_{item.id}"
-            if group_key not in grouped_items:
-                grouped_items[group_key] = []
-            grouped_items[group_key].append(item)
-        
-        for group_key, items in grouped_items.items():
-            if not items:
-                continue
-            item = items[0]
-            if str(getattr(item, 'product_type', 'genetic')).lower() == 'blood_test':
-                continue
-            product = item.product
-            if not product:
-                continue
-            subtotal_amount += item.quantity * product.SpecialPrice
-        
-        # Calculate product discount (informational only)
-        total_product_discount = 0.0
-        processed_groups = set()
-        for item in cart_items:
-            if not item.product:
-                continue
-            group_key = item.group_id or f"single_{item.id}"
-            if group_key not in processed_groups:
-                discount_per_item = item.product.Price - item.product.SpecialPrice
-                total_product_discount += discount_per_item * item.quantity
-                processed_groups.add(group_key)
+        # Calculate subtotal and product discount (informational only); blood tests are priced separately
+        priced_cart = price_cart_items(
+            item for item in cart_items
+            if str(getattr(item, 'product_type', 'genetic')).lower() != 'blood_test'
+        )
+        subtotal_amount = priced_cart.subtotal
+        total_product_discount = priced_cart.product_discount
         
         # Remove any previously applied coupon
         remove_coupon_from_cart(db, current_user.id)
@@ -1068,8 +1027,7 @@ def apply_coupon(
         
         # Calculate delivery charge and grand total
         delivery_charge = 0.0
-        grand_total = subtotal_amount + delivery_charge - coupon_discount_amount
-        grand_total = max(0.0, grand_total)
+        grand_total = priced_cart.grand_total(coupon_discount_amount, delivery_charge)
 
         # you_save = coupon discount only
         # MRP discount is already reflected in subtotal (SpecialPrice), so we don't double-count it
@@ -1281,7 +1239,7 @@ def create_coupon(
     try:
         # Check if coupon code already exists
         existing_coupon = db.query(Coupon).filter(
-            func.upper(Coupon.coupon_code) == coupon_data.coupon_code.upper()
+            Coupon.coupon_code_normalized == normalize_coupon_code(coupon_data.coupon_code)
         ).first()
         
         if existing_coupon:
@@ -1309,6 +1267,7 @@ def create_coupon(
         db.add(new_coupon)
         db.commit()
         db.refresh(new_coupon)
+        invalidate_coupon_definitions()
         
         return {
             "status": "success",
@@ -1349,7 +1308,7 @@ def add_coupon_allowlist(
     from sqlalchemy.exc import IntegrityError
 
     coupon = db.query(Coupon).filter(
-        func.upper(Coupon.coupon_code) == request_data.coupon_code.upper().strip()
+        Coupon.coupon_code_normalized == normalize_coupon_code(request_data.coupon_code)
     ).first()
     if not coupon:
         raise HTTPException(status_code=404, detail=f"Coupon '{request_data.coupon_code}' not found.")
@@ -1377,6 +1336,8 @@ def add_coupon_allowlist(
         except IntegrityError:
             db.rollback()
     db.commit()
+    if added:
+        invalidate_coupon_definitions()
     for e in added_entries:
         db.refresh(e)
     return {
@@ -1395,7 +1356,7 @@ def remove_coupon_allowlist(
     from .Coupon_model import CouponAllowedUser
 
     coupon = db.query(Coupon).filter(
-        func.upper(Coupon.coupon_code) == request_data.coupon_code.upper().strip()
+        Coupon.coupon_code_normalized == normalize_coupon_code(request_data.coupon_code)
     ).first()
     if not coupon:
         raise HTTPException(status_code=404, detail=f"Coupon '{request_data.coupon_code}' not found.")
@@ -1416,6 +1377,8 @@ def remove_coupon_allowlist(
             db.delete(result)
             removed += 1
     db.commit()
+    if removed:
+        invalidate_coupon_definitions()
     return {"status": "success", "removed": removed}
 
 
@@ -1428,7 +1391,7 @@ def get_coupon_allowlist(
     from .Coupon_model import CouponAllowedUser
 
     coupon = db.query(Coupon).filter(
-        func.upper(Coupon.coupon_code) == coupon_code.upper().strip()
+        Coupon.coupon_code_normalized == normalize_coupon_code(coupon_code)
     ).first()
     if not coupon:
         raise HTTPException(status_code=404, detail=f"Coupon '{coupon_code}' not found.")
@@ -1,7 +1,7 @@
 """
 Coupon model for managing discount coupons.
 """
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, func, Enum, ForeignKey, UniqueConstraint, CheckConstraint
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, func, Enum, ForeignKey, UniqueConstraint, CheckConstraint, event
 from sqlalchemy.orm import relationship
 from database import Base
 from Login_module.Utils.datetime_utils import now_ist
@@ -29,6 +29,8 @@ class Coupon(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     coupon_code = Column(String(50), unique=True, nullable=False, index=True)
+    # UPPER(TRIM(coupon_code)), kept in sync by the listener below; unique so lookups are one index probe
+    coupon_code_normalized = Column(String(50), unique=True, nullable=False, index=True)
     description = Column(String(500), nullable=True)
 
     # Discount details
@@ -66,6 +68,16 @@ class Coupon(Base):
     allowed_users = relationship("CouponAllowedUser", back_populates="coupon", cascade="all, delete-orphan")
 
 
+def normalize_coupon_code(code: str) -> str:
+    return (code or "").strip().upper()
+
+
+@event.listens_for(Coupon, "before_insert")
+@event.listens_for(Coupon, "before_update")
+def _sync_normalized_code(mapper, connection, target):
+    target.coupon_code_normalized = normalize_coupon_code(target.coupon_code)
+
+
 class CartCoupon(Base):
     """
     Tracks coupon applications to carts (temporary — removed after order confirm).
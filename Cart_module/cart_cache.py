@@ -0,0 +1,168 @@
+"""
+Versioned cache of rendered /cart/view responses.
+
+Each user's cart has a version counter in Redis (cart:version:{user_id}).
+The rendered view is stored under
+
+    cart:view:{user_id}:{cart version}:{coupon definitions version}:{product catalog version}
+
+so a repeat view is two Redis round-trips (MGET of the versions, GET of the
+body) and no MySQL. Nothing is deleted on writes: bumping a version makes the
+old entry unreachable and it expires after CART_VIEW_CACHE_TTL_SECONDS, which
+also bounds staleness for time-based coupon rules (expiry, usage limits).
+
+Versions are bumped automatically: a Session listener collects the user_id of
+every flushed cart, cart item, applied coupon, coupon usage, member and
+address row, and bumps those users' versions after the commit (nothing is
+bumped on rollback). That covers the cart endpoints, coupon apply/remove,
+member/address edits and order confirmation clearing the cart without each
+caller having to remember it. A missing counter is initialised from the clock
+so a lost key never reuses an old version.
+"""
+import json
+import logging
+import threading
+import time
+from itertools import chain
+from typing import Iterable, Optional, Tuple
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY_PREFIX = "cart:version:"
+VIEW_KEY_PREFIX = "cart:view:"
+VERSION_TTL_SECONDS = 7 * 86400
+COUPON_VERSION_KEY = "coupon_definitions:version"
+PRODUCTS_VERSION_KEY = "catalog_cache:version:products"
+
+# Tables whose rows carry the user_id of the cart they affect
+TRACKED_TABLES = frozenset({"carts", "cart_items", "cart_coupons", "coupon_usages", "members", "addresses"})
+_SESSION_INFO_KEY = "cart_versions_dirty"
+
+# Increment the counter, starting from ARGV[1] (clock) when the key is missing
+_BUMP = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    redis.call('SET', KEYS[1], ARGV[1])
+end
+local value = redis.call('INCR', KEYS[1])
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return value
+"""
+
+_metrics_lock = threading.Lock()
+_metrics = {"hits": 0, "misses": 0, "bypassed": 0, "bumps": 0, "errors": 0}
+
+
+def _bump(name: str, amount: int = 1) -> None:
+    with _metrics_lock:
+        _metrics[name] += amount
+
+
+def _get_redis_client():
+    """Lazy import to avoid circular dependency (shares the OTP Redis client)."""
+    from Login_module.OTP import otp_manager
+    client = otp_manager._get_redis_client()
+    return client if otp_manager._redis_available else None
+
+
+def _clock_version() -> int:
+    return int(time.time() * 1000)
+
+
+def get_cached_cart_view(user_id: int) -> Tuple[Optional[dict], Optional[str]]:
+    """
+    Return (cached response, cache key). The key is for store_cart_view() after a
+    miss; it is None when the cache is disabled or Redis is unavailable.
+    """
+    if settings.CART_VIEW_CACHE_TTL_SECONDS <= 0:
+        return None, None
+    try:
+        client = _get_redis_client()
+        if client is None:
+            _bump("bypassed")
+            return None, None
+        version_key = f"{VERSION_KEY_PREFIX}{user_id}"
+        cart_version, coupon_version, products_version = client.mget(
+            [version_key, COUPON_VERSION_KEY, PRODUCTS_VERSION_KEY]
+        )
+        if cart_version is None:
+            client.set(version_key, _clock_version(), ex=VERSION_TTL_SECONDS, nx=True)
+            cart_version = client.get(version_key)
+        key = f"{VIEW_KEY_PREFIX}{user_id}:{cart_version}:{coupon_version or 0}:{products_version or 0}"
+        raw = client.get(key)
+        if raw is not None:
+            _bump("hits")
+            return json.loads(raw), key
+        _bump("misses")
+        return None, key
+    except Exception as e:
+        _bump("errors")
+        logger.warning(f"Cart view cache read failed | User: {user_id} | Error: {e}")
+        return None, None
+
+
+def store_cart_view(key: Optional[str], response: dict) -> None:
+    """Cache a rendered view under the key returned by get_cached_cart_view()."""
+    if not key:
+        return
+    try:
+        client = _get_redis_client()
+        if client is not None:
+            client.set(key, json.dumps(jsonable_encoder(response)), ex=settings.CART_VIEW_CACHE_TTL_SECONDS)
+    except Exception as e:
+        _bump("errors")
+        logger.warning(f"Cart view cache write failed | Key: {key} | Error: {e}")
+
+
+def bump_cart_versions(user_ids: Iterable[int]) -> None:
+    """Invalidate the cached views of these users (one pipeline)."""
+    user_ids = [user_id for user_id in set(user_ids) if user_id is not None]
+    if not user_ids:
+        return
+    try:
+        client = _get_redis_client()
+        if client is None:
+            return
+        pipe = client.pipeline(transaction=False)
+        for user_id in user_ids:
+            pipe.eval(_BUMP, 1, f"{VERSION_KEY_PREFIX}{user_id}", _clock_version(), VERSION_TTL_SECONDS)
+        pipe.execute()
+        _bump("bumps", len(user_ids))
+    except Exception as e:
+        # Entries still expire after the TTL; nothing else to do
+        _bump("errors")
+        logger.warning(f"Cart version bump failed | Users: {len(user_ids)} | Error: {e}")
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_carts(session, flush_context):
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if getattr(obj, "__tablename__", None) in TRACKED_TABLES:
+            user_id = getattr(obj, "user_id", None)
+            if user_id is not None:
+                session.info.setdefault(_SESSION_INFO_KEY, set()).add(user_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_committed_carts(session):
+    user_ids = session.info.pop(_SESSION_INFO_KEY, None)
+    if user_ids:
+        bump_cart_versions(user_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_carts(session):
+    session.info.pop(_SESSION_INFO_KEY, None)
+
+
+def get_cart_view_cache_metrics() -> dict:
+    with _metrics_lock:
+        metrics = dict(_metrics)
+    lookups = metrics["hits"] + metrics["misses"]
+    metrics["hit_rate"] = round(metrics["hits"] / lookups, 4) if lookups else 0.0
+    return metrics
@@ -0,0 +1,159 @@
+"""
+Cart pricing engine shared by /cart/view, /cart/apply-coupon and order creation.
+
+Pricing works on plain, hashable rows (PricingLine) instead of ORM objects:
+
+- Rows are grouped by group_id (couple/family products have one cart row per
+  member but are priced once per group) in a single pass.
+- Each group is priced from its first row: quantity * SpecialPrice. MRP
+  savings (Price - SpecialPrice) are informational and never subtracted.
+- The coupon discount is computed from a validated CouponDefinition by
+  coupon_discount_amount(); validity checks stay in coupon_service.
+
+price_cart() is memoized on the tuple of rows, which changes whenever the
+cart does (quantities, prices, group membership), so repeated views of an
+unchanged cart are a dictionary lookup.
+"""
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from .Coupon_model import CouponType
+
+PRICING_CACHE_SIZE = 4096
+
+
+@dataclass(frozen=True)
+class PricingLine:
+    """One cart_items row with the product fields pricing needs."""
+    cart_item_id: int
+    group_id: Optional[str]
+    quantity: int
+    product_id: Optional[int]  # None when the product was deleted
+    price: float
+    special_price: float
+    plan_type: Optional[str]
+
+
+@dataclass(frozen=True)
+class PricedGroup:
+    group_key: str
+    cart_item_ids: Tuple[int, ...]
+    product_id: int
+    quantity: int
+    price: float
+    special_price: float
+    plan_type: Optional[str]
+    discount_per_item: float
+    total_amount: float
+
+
+@dataclass(frozen=True)
+class PricedCart:
+    groups: Tuple[PricedGroup, ...]
+    subtotal: float
+    product_discount: float
+    plan_types: FrozenSet[str]
+
+    def grand_total(self, coupon_discount: float = 0.0, delivery_charge: float = 0.0) -> float:
+        """subtotal already uses SpecialPrice, so only the coupon is subtracted."""
+        return max(0.0, self.subtotal + delivery_charge - coupon_discount)
+
+
+def cart_group_key(group_id: Optional[str], cart_item_id: int) -> str:
+    return group_id or f"single_{cart_item_id}"
+
+
+def _plan_type_value(plan_type) -> Optional[str]:
+    if plan_type is None:
+        return None
+    return str(plan_type.value if hasattr(plan_type, "value") else plan_type).lower()
+
+
+def lines_from_cart_items(cart_items: Iterable) -> Tuple[PricingLine, ...]:
+    """Convert CartItem rows (product loaded) into pricing rows."""
+    lines = []
+    for item in cart_items:
+        product = item.product
+        lines.append(PricingLine(
+            cart_item_id=item.id,
+            group_id=item.group_id,
+            quantity=item.quantity,
+            product_id=product.ProductId if product else None,
+            price=product.Price if product else 0.0,
+            special_price=product.SpecialPrice if product else 0.0,
+            plan_type=_plan_type_value(product.plan_type) if product else None,
+        ))
+    return tuple(lines)
+
+
+@lru_cache(maxsize=PRICING_CACHE_SIZE)
+def price_cart(lines: Tuple[PricingLine, ...]) -> PricedCart:
+    """Price a cart; groups keep the order in which they first appear in `lines`."""
+    members: Dict[str, List[int]] = {}
+    heads: Dict[str, PricingLine] = {}
+    for line in lines:
+        key = cart_group_key(line.group_id, line.cart_item_id)
+        if key in heads:
+            members[key].append(line.cart_item_id)
+        else:
+            heads[key] = line
+            members[key] = [line.cart_item_id]
+
+    groups = []
+    subtotal = product_discount = 0.0
+    for key, head in heads.items():
+        # Skip groups whose product is deleted or missing
+        if head.product_id is None:
+            continue
+        total = head.quantity * head.special_price
+        discount_per_item = head.price - head.special_price
+        subtotal += total
+        product_discount += discount_per_item * head.quantity
+        groups.append(PricedGroup(
+            group_key=key,
+            cart_item_ids=tuple(members[key]),
+            product_id=head.product_id,
+            quantity=head.quantity,
+            price=head.price,
+            special_price=head.special_price,
+            plan_type=head.plan_type,
+            discount_per_item=discount_per_item,
+            total_amount=total,
+        ))
+
+    return PricedCart(
+        groups=tuple(groups),
+        subtotal=subtotal,
+        product_discount=product_discount,
+        plan_types=frozenset(group.plan_type for group in groups if group.plan_type),
+    )
+
+
+def price_cart_items(cart_items: Iterable) -> PricedCart:
+    return price_cart(lines_from_cart_items(cart_items))
+
+
+def coupon_discount_amount(coupon, subtotal_amount: float) -> float:
+    """Discount a (validated) coupon gives on the subtotal."""
+    discount_amount = 0.0
+    if coupon.discount_type == CouponType.PERCENTAGE:
+        discount_amount = (subtotal_amount * coupon.discount_value) / 100.0
+        if coupon.max_discount_amount is not None:
+            discount_amount = min(discount_amount, coupon.max_discount_amount)
+    elif coupon.discount_type == CouponType.FIXED:
+        discount_amount = min(coupon.discount_value, subtotal_amount)
+        if coupon.max_discount_amount is not None:
+            discount_amount = min(discount_amount, coupon.max_discount_amount)
+    return discount_amount
+
+
+def get_pricing_metrics() -> dict:
+    info = price_cart.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        "hits": info.hits,
+        "misses": info.misses,
+        "cached_carts": info.currsize,
+        "hit_rate": round(info.hits / lookups, 4) if lookups else 0.0,
+    }
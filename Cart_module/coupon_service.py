@@ -1,24 +1,195 @@
 """
 Coupon service for validating and applying coupons.
+
+Coupon definitions are served from an in-process map keyed by normalized code
+(see CouponDefinition), so validating a code never scans the coupons table.
+The map is reloaded with one query when its TTL expires or when another
+worker bumps the shared Redis version (invalidate_coupon_definitions(), called
+after coupon and allowlist writes). Usage counters and allowlist membership
+are read in a single batched query per validation. Discount math and cart
+plan types come from cart_pricing.
 """
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, func
+from sqlalchemy import and_, func, or_, select, exists
+from dataclasses import dataclass
 from datetime import datetime
-from typing import Optional, Tuple
+from typing import Dict, Optional, Tuple
 import logging
-from .Coupon_model import Coupon, CartCoupon, CouponUsage, CouponType, CouponStatus
+import threading
+import time
+from .Coupon_model import (
+    Coupon, CartCoupon, CouponUsage, CouponAllowedUser, CouponType, CouponStatus, normalize_coupon_code,
+)
+from .cart_pricing import coupon_discount_amount, price_cart_items
 from Login_module.Utils.datetime_utils import now_ist
 
 logger = logging.getLogger(__name__)
 
+DEFINITIONS_TTL_SECONDS = 60
+VERSION_CHECK_SECONDS = 2
+VERSION_KEY = "coupon_definitions:version"
+
+
+@dataclass(frozen=True)
+class CouponDefinition:
+    """Immutable snapshot of a coupon row (same attribute names as Coupon)."""
+    id: int
+    coupon_code: str
+    description: Optional[str]
+    discount_type: CouponType
+    discount_value: float
+    min_order_amount: float
+    max_discount_amount: Optional[float]
+    max_uses: Optional[int]
+    max_uses_per_user: Optional[int]
+    valid_from: datetime
+    valid_until: datetime
+    status: CouponStatus
+    allowed_plan_types: Optional[str]
+    has_allowlist: bool
+
+
+@dataclass
+class _DefinitionMap:
+    by_code: Dict[str, CouponDefinition]
+    version: Optional[int]
+    loaded_at: float
+    checked_at: float
+
+
+_lock = threading.Lock()
+_definitions: Optional[_DefinitionMap] = None
+_metrics = {"hits": 0, "reloads": 0, "unknown_codes": 0, "invalidations": 0}
+
+
+def _get_redis_client():
+    """Lazy import to avoid circular dependency (shares the OTP Redis client)."""
+    from Login_module.OTP import otp_manager
+    client = otp_manager._get_redis_client()
+    return client if otp_manager._redis_available else None
+
+
+def _shared_version() -> Optional[int]:
+    try:
+        client = _get_redis_client()
+        if client is not None:
+            raw = client.get(VERSION_KEY)
+            return int(raw) if raw else 0
+    except Exception as e:
+        logger.warning(f"Coupon definition version read failed | Error: {e}")
+    return None
+
+
+def _load_definitions(db: Session) -> Dict[str, CouponDefinition]:
+    """All coupons plus an allowlist flag in one query."""
+    has_allowlist = exists().where(CouponAllowedUser.coupon_id == Coupon.id)
+    rows = db.execute(select(Coupon, has_allowlist.label("has_allowlist"))).all()
+    definitions = {}
+    for coupon, restricted in rows:
+        definitions[normalize_coupon_code(coupon.coupon_code)] = CouponDefinition(
+            id=coupon.id,
+            coupon_code=coupon.coupon_code,
+            description=coupon.description,
+            discount_type=coupon.discount_type,
+            discount_value=coupon.discount_value,
+            min_order_amount=coupon.min_order_amount,
+            max_discount_amount=coupon.max_discount_amount,
+            max_uses=coupon.max_uses,
+            max_uses_per_user=coupon.max_uses_per_user,
+            valid_from=coupon.valid_from,
+            valid_until=coupon.valid_until,
+            status=coupon.status,
+            allowed_plan_types=coupon.allowed_plan_types,
+            has_allowlist=bool(restricted),
+        )
+    return definitions
+
+
+def get_coupon_definitions(db: Session) -> Dict[str, CouponDefinition]:
+    """Normalized code -> CouponDefinition; reloads on TTL expiry or a shared version bump."""
+    global _definitions
+    current = _definitions
+    now = time.monotonic()
+
+    if current is not None and now - current.loaded_at < DEFINITIONS_TTL_SECONDS:
+        if now - current.checked_at < VERSION_CHECK_SECONDS:
+            return current.by_code
+        if _shared_version() == current.version:
+            current.checked_at = now
+            return current.by_code
+
+    with _lock:
+        if _definitions is not None and _definitions is not current:
+            return _definitions.by_code  # Another thread reloaded while we waited
+        # Read the version before loading so a concurrent invalidation is never masked
+        version = _shared_version()
+        _definitions = _DefinitionMap(
+            by_code=_load_definitions(db), version=version, loaded_at=now, checked_at=now
+        )
+        _metrics["reloads"] += 1
+        return _definitions.by_code
+
+
+def invalidate_coupon_definitions() -> None:
+    """Drop the definition map in every worker. Call after coupon or allowlist writes commit."""
+    global _definitions
+    with _lock:
+        _definitions = None
+        _metrics["invalidations"] += 1
+    try:
+        client = _get_redis_client()
+        if client is not None:
+            client.incr(VERSION_KEY)
+    except Exception as e:
+        logger.warning(f"Coupon definition invalidation failed | Error: {e}")
+
+
+def get_coupon_definition(db: Session, coupon_code: str) -> Optional[CouponDefinition]:
+    definition = get_coupon_definitions(db).get(normalize_coupon_code(coupon_code))
+    with _lock:
+        _metrics["hits" if definition else "unknown_codes"] += 1
+    return definition
+
+
+def _usage_and_allowlist(db: Session, definition: CouponDefinition, user_id: int) -> Tuple[int, int, bool]:
+    """
+    (total confirmed uses, this user's uses, user is allowlisted) in one round-trip.
+    Unrestricted coupons skip the allowlist probe and always report True.
+    """
+    from Login_module.User.user_model import User as _User
+    total_uses = select(func.count(CouponUsage.id)).where(
+        CouponUsage.coupon_id == definition.id
+    ).scalar_subquery()
+    user_uses = select(func.count(CouponUsage.id)).where(
+        CouponUsage.coupon_id == definition.id,
+        CouponUsage.user_id == user_id,
+    ).scalar_subquery()
+    columns = [total_uses, user_uses]
+    if definition.has_allowlist:
+        user_mobile = select(_User.mobile).where(_User.id == user_id).scalar_subquery()
+        columns.append(
+            exists().where(
+                CouponAllowedUser.coupon_id == definition.id,
+                or_(CouponAllowedUser.user_id == user_id, CouponAllowedUser.mobile == user_mobile),
+            )
+        )
+    row = db.execute(select(*columns)).one()
+    allowed = bool(row[2]) if definition.has_allowlist else True
+    return row[0] or 0, row[1] or 0, allowed
+
+
+def get_coupon_metrics() -> dict:
+    with _lock:
+        metrics = dict(_metrics)
+        metrics["definitions"] = len(_definitions.by_code) if _definitions else 0
+    return metrics
+
 
 def is_user_allowed_for_coupon(db: Session, coupon, user_id: int, mobile: str) -> bool:
     """
     Returns True if the coupon is unrestricted OR the user is on the allowlist.
     A coupon is unrestricted when it has zero coupon_allowed_users rows.
     """
-    from .Coupon_model import CouponAllowedUser
-    from sqlalchemy import or_
     count = db.query(func.count(CouponAllowedUser.id)).filter(
         CouponAllowedUser.coupon_id == coupon.id
     ).scalar() or 0
@@ -40,40 +211,29 @@ def validate_and_calculate_discount(
     user_id: int,
     subtotal_amount: float,
     cart_items: Optional[list] = None
-) -> Tuple[Optional[Coupon], float, str]:
+) -> Tuple[Optional[CouponDefinition], float, str]:
     """
     Validate coupon and calculate discount amount.
     Usage count is based on confirmed orders (coupon_usages table).
+    Returns the cached CouponDefinition (not an ORM row) on success.
     """
     if not coupon_code:
         return None, 0.0, ""
 
-    normalized_code = coupon_code.upper().strip()
+    normalized_code = normalize_coupon_code(coupon_code)
     logger.info(f"Validating coupon code: '{coupon_code}' (normalized: '{normalized_code}')")
 
-    coupon = db.query(Coupon).filter(
-        func.upper(Coupon.coupon_code) == normalized_code
-    ).first()
-
+    coupon = get_coupon_definition(db, normalized_code)
     if not coupon:
-        all_coupons = db.query(Coupon).all()
-        for c in all_coupons:
-            if c.coupon_code and c.coupon_code.upper().strip() == normalized_code:
-                coupon = c
-                break
-
-    if not coupon:
-        total_coupons = db.query(Coupon).count()
-        logger.warning(f"Coupon '{normalized_code}' not found. Total coupons in database: {total_coupons}")
+        logger.warning(f"Coupon '{normalized_code}' not found.")
         return None, 0.0, "Invalid coupon code."
 
     logger.info(f"Found coupon: {coupon.coupon_code} (ID: {coupon.id}, Status: {coupon.status})")
 
+    confirmed_uses, user_uses, allowed = _usage_and_allowlist(db, coupon, user_id)
+
     # Check user allowlist restriction
-    from Login_module.User.user_model import User as _User
-    _user = db.query(_User).filter(_User.id == user_id).first()
-    _mobile = _user.mobile if _user else ""
-    if not is_user_allowed_for_coupon(db, coupon, user_id, _mobile or ""):
+    if not allowed:
         return None, 0.0, "Invalid coupon code."
 
     # Check active status
@@ -100,107 +260,54 @@ def validate_and_calculate_discount(
         )
 
     # Check total usage limit against confirmed orders (coupon_usages table)
-    if coupon.max_uses is not None:
-        confirmed_uses = db.query(func.count(CouponUsage.id)).filter(
-            CouponUsage.coupon_id == coupon.id
-        ).scalar() or 0
-
-        if confirmed_uses >= coupon.max_uses:
-            logger.warning(f"Coupon '{coupon.coupon_code}' usage limit reached. Used: {confirmed_uses}/{coupon.max_uses}")
-            return None, 0.0, "Sorry, this coupon is no longer available."
+    if coupon.max_uses is not None and confirmed_uses >= coupon.max_uses:
+        logger.warning(f"Coupon '{coupon.coupon_code}' usage limit reached. Used: {confirmed_uses}/{coupon.max_uses}")
+        return None, 0.0, "Sorry, this coupon is no longer available."
 
     # Check per-user usage limit
     max_per_user = coupon.max_uses_per_user if coupon.max_uses_per_user is not None else 1
-    user_uses = db.query(func.count(CouponUsage.id)).filter(
-        CouponUsage.coupon_id == coupon.id,
-        CouponUsage.user_id == user_id
-    ).scalar() or 0
-
     if user_uses >= max_per_user:
         logger.warning(f"Coupon '{coupon.coupon_code}' per-user limit reached for user {user_id}. Used: {user_uses}/{max_per_user}")
         return None, 0.0, "You have already used this coupon on a previous order."
 
+    # Plan-type restrictions need the cart's plan types
+    legacy_family_couple = normalized_code == "FAMILYCOUPLE30"
+    cart_plan_types = frozenset()
+    if coupon.allowed_plan_types or legacy_family_couple:
+        # Resolve cart items if not provided
+        if cart_items is None:
+            from .Cart_model import CartItem
+            from sqlalchemy.orm import joinedload
+            cart_items = db.query(CartItem).options(
+                joinedload(CartItem.product)
+            ).filter(
+                CartItem.user_id == user_id,
+                CartItem.is_deleted == False
+            ).all()
+        cart_plan_types = price_cart_items(cart_items or []).plan_types
+
     # Check allowed plan types restriction
     if coupon.allowed_plan_types:
         allowed = [p.strip().lower() for p in coupon.allowed_plan_types.split(",") if p.strip()]
         if allowed:
-            # Resolve cart items if not provided
-            if cart_items is None:
-                from .Cart_model import CartItem
-                from sqlalchemy.orm import joinedload
-                cart_items = db.query(CartItem).options(
-                    joinedload(CartItem.product)
-                ).filter(
-                    CartItem.user_id == user_id,
-                    CartItem.is_deleted == False
-                ).all()
-
             if not cart_items:
                 return None, 0.0, "Your cart is empty. Add eligible products to use this coupon."
 
-            # Collect unique plan types in cart
-            cart_plan_types = set()
-            for item in cart_items:
-                if item.product and item.product.plan_type:
-                    pt = item.product.plan_type
-                    if hasattr(pt, 'value'):
-                        pt = pt.value
-                    cart_plan_types.add(str(pt).lower())
-
             # Check if any cart item matches an allowed plan type
             if not cart_plan_types.intersection(allowed):
                 readable = ", ".join(p.capitalize() for p in allowed)
                 return None, 0.0, f"This coupon is only valid for {readable} plan(s). Please add an eligible product to your cart."
 
-            logger.info(f"Plan type check passed for coupon '{normalized_code}': cart={cart_plan_types}, allowed={allowed}")
+            logger.info(f"Plan type check passed for coupon '{normalized_code}': cart={set(cart_plan_types)}, allowed={allowed}")
 
     # Legacy hardcoded check for FAMILYCOUPLE30
-    if normalized_code == "FAMILYCOUPLE30":
-        if cart_items is None:
-            from .Cart_model import CartItem
-            from sqlalchemy.orm import joinedload
-            cart_items = db.query(CartItem).options(
-                joinedload(CartItem.product)
-            ).filter(
-                CartItem.user_id == user_id,
-                CartItem.is_deleted == False
-            ).all()
-
-        from collections import defaultdict
-        grouped_items = defaultdict(list)
-        for item in (cart_items or []):
-            group_key = item.group_id or f"single_{item.id}"
-            grouped_items[group_key].append(item)
-
-        has_family_plan = False
-        has_couple_plan = False
-        for group_key, items in grouped_items.items():
-            if items and items[0].product:
-                pt = items[0].product.plan_type
-                if hasattr(pt, 'value'):
-                    pt = pt.value
-                pt = str(pt).lower()
-                if pt == "family":
-                    has_family_plan = True
-                elif pt == "couple":
-                    has_couple_plan = True
-
-        if not has_family_plan:
+    if legacy_family_couple:
+        if "family" not in cart_plan_types:
             return None, 0.0, "This coupon requires at least one Family plan in your cart."
-        if not has_couple_plan:
+        if "couple" not in cart_plan_types:
             return None, 0.0, "This coupon requires at least one Couple plan in your cart."
 
-    # Calculate discount
-    discount_amount = 0.0
-    if coupon.discount_type == CouponType.PERCENTAGE:
-        discount_amount = (subtotal_amount * coupon.discount_value) / 100.0
-        if coupon.max_discount_amount is not None:
-            discount_amount = min(discount_amount, coupon.max_discount_amount)
-    elif coupon.discount_type == CouponType.FIXED:
-        discount_amount = min(coupon.discount_value, subtotal_amount)
-        if coupon.max_discount_amount is not None:
-            discount_amount = min(discount_amount, coupon.max_discount_amount)
-
+    discount_amount = coupon_discount_amount(coupon, subtotal_amount)
     return coupon, discount_amount, ""
 
 
@@ -220,7 +327,7 @@ def record_coupon_usage(
         return
 
     coupon = db.query(Coupon).filter(
-        func.upper(Coupon.coupon_code) == coupon_code.upper().strip()
+        Coupon.coupon_code_normalized == normalize_coupon_code(coupon_code)
     ).first()
 
     if not coupon:
@@ -257,7 +364,7 @@ def apply_coupon_to_cart(
     coupon_code: str,
     subtotal_amount: float,
     cart_items: Optional[list] = None
-) -> Tuple[bool, float, str, Optional[Coupon]]:
+) -> Tuple[bool, float, str, Optional[CouponDefinition]]:
     """Apply coupon to cart and record the application."""
     coupon, discount_amount, error_message = validate_and_calculate_discount(
         db, coupon_code, user_id, subtotal_amount, cart_items
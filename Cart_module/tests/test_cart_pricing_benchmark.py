@@ -0,0 +1,80 @@
+"""
+Cart pricing engine microbenchmark.
+
+Prices 10k synthetic carts (single/couple/family groups) cold, then again from
+the memo, and checks the totals against the per-group reference formula.
+
+Run with -s to see the numbers:
+    python -m pytest -s Cart_module/tests/test_cart_pricing_benchmark.py
+"""
+import random
+import sys
+import os
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../..'))
+
+from Cart_module.Coupon_model import CouponType
+from Cart_module.cart_pricing import PricingLine, PRICING_CACHE_SIZE, price_cart, coupon_discount_amount
+
+BENCH_CARTS = 10_000
+PLANS = (("single", 1), ("couple", 2), ("family", 4))
+
+
+def _synthetic_cart(rng, cart_no):
+    lines = []
+    item_id = cart_no * 100
+    for group_no in range(rng.randint(1, 5)):
+        plan_type, members = rng.choice(PLANS)
+        price = float(rng.randrange(5000, 40000, 500))
+        special_price = price - rng.randrange(0, 4000, 500)
+        quantity = rng.randint(1, 2)
+        product_id = None if rng.random() < 0.02 else rng.randint(1, 50)
+        for _ in range(members):
+            item_id += 1
+            lines.append(PricingLine(item_id, f"g{cart_no}_{group_no}", quantity, product_id,
+                                     price, special_price, plan_type))
+    return tuple(lines)
+
+
+def _reference_subtotal(lines):
+    seen = {}
+    for line in lines:
+        seen.setdefault(line.group_id, line)
+    return sum(l.quantity * l.special_price for l in seen.values() if l.product_id is not None)
+
+
+def test_price_10k_carts():
+    rng = random.Random(42)
+    carts = [_synthetic_cart(rng, i) for i in range(BENCH_CARTS)]
+    price_cart.cache_clear()
+
+    started = time.perf_counter()
+    priced = [price_cart(lines) for lines in carts]
+    cold = time.perf_counter() - started
+
+    # Re-price the carts still in the memo (the most recent PRICING_CACHE_SIZE)
+    recent = carts[-PRICING_CACHE_SIZE:]
+    hits_before = price_cart.cache_info().hits
+    started = time.perf_counter()
+    for lines in recent:
+        price_cart(lines)
+    warm = time.perf_counter() - started
+
+    for lines, result in zip(carts[:500], priced):
+        assert abs(result.subtotal - _reference_subtotal(lines)) < 1e-6
+        assert result.grand_total(result.subtotal + 1) == 0.0
+    assert price_cart.cache_info().hits - hits_before == len(recent)
+    print(
+        f"\nCart pricing: {BENCH_CARTS} carts cold in {cold * 1000:.0f}ms "
+        f"({BENCH_CARTS / cold:,.0f} carts/s); {len(recent)} memoized in {warm * 1000:.1f}ms"
+    )
+
+
+def test_coupon_discount_amount():
+    percentage = SimpleNamespace(discount_type=CouponType.PERCENTAGE, discount_value=10.0, max_discount_amount=500.0)
+    fixed = SimpleNamespace(discount_type=CouponType.FIXED, discount_value=800.0, max_discount_amount=None)
+    assert coupon_discount_amount(percentage, 3000.0) == 300.0
+    assert coupon_discount_amount(percentage, 9000.0) == 500.0
+    assert coupon_discount_amount(fixed, 600.0) == 600.0
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Request, status
 from sqlalchemy.orm import Session
 
 from Category_module.Category_schema import (
@@ -8,19 +8,23 @@ from Category_module.Category_schema import (
 )
 from Product_module.Product_model import Category
 from Product_module.category_service import create_category
+from Product_module.catalog_cache import cached_response, invalidate_catalog, serialize, CATEGORIES, PRODUCTS
 from deps import get_db
 
 router = APIRouter(prefix="/categories", tags=["Categories"])
 
 
 @router.get("/", response_model=CategoryListResponse)
-def list_categories(db: Session = Depends(get_db)):
-    categories = db.query(Category).order_by(Category.name.asc()).all()
-    return {
-        "status": "success",
-        "message": "Category list fetched successfully.",
-        "data": categories,
-    }
+def list_categories(request: Request, db: Session = Depends(get_db)):
+    def build() -> bytes:
+        categories = db.query(Category).order_by(Category.name.asc()).all()
+        return serialize(CategoryListResponse, {
+            "status": "success",
+            "message": "Category list fetched successfully.",
+            "data": categories,
+        })
+
+    return cached_response(request, CATEGORIES, "list", build)
 
 
 @router.post(
@@ -30,6 +34,8 @@ def list_categories(db: Session = Depends(get_db)):
 )
 def add_category(payload: CategoryCreate, db: Session = Depends(get_db)):
     category = create_category(db, payload.name)
+    # Product responses embed their category
+    invalidate_catalog(CATEGORIES, PRODUCTS)
     return {
         "status": "success",
         "message": "Category created successfully.",
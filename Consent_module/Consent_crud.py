@@ -4,7 +4,8 @@ from typing import List, Optional
 from fastapi import HTTPException
 import logging
 
-from .Consent_model import UserConsent, ConsentProduct
+from .Consent_model import UserConsent
+from .consent_cache import get_consent_products, get_member_consent_map
 
 logger = logging.getLogger(__name__)
 
@@ -56,9 +57,8 @@ def create_consent(
     status: str = "yes"
 ) -> UserConsent:
     """Create a new consent record"""
-    # Get product name from consent_products table
-    consent_product = db.query(ConsentProduct).filter(ConsentProduct.id == product_id).first()
-    product_name = consent_product.name if consent_product else None
+    # Get product name from consent_products (cached reference data)
+    product_name = get_consent_products(db).get(product_id)
     
     # Store phone number as plain text
     consent = UserConsent(
@@ -109,8 +109,8 @@ def record_consent(
     - If 'no': Updates existing record to 'no' (if exists), or returns None (no record created)
     """
     # Validate consent product exists
-    consent_product = db.query(ConsentProduct).filter(ConsentProduct.id == product_id).first()
-    if not consent_product:
+    product_name = get_consent_products(db).get(product_id)
+    if product_name is None:
         logger.warning(
             f"Consent record failed - Product not found | "
             f"Product ID: {product_id} | User ID: {user_id} | Member ID: {member_id}"
@@ -126,7 +126,7 @@ def record_consent(
             # Update existing record
             # Ensure product name is populated if missing
             if not existing_consent.product:
-                existing_consent.product = consent_product.name
+                existing_consent.product = product_name
             
             if existing_consent.status == "no":
                 # Reactivating consent
@@ -217,8 +217,7 @@ def update_manage_consent(
             continue
         
         # Validate consent product exists
-        consent_product = db.query(ConsentProduct).filter(ConsentProduct.id == product_id).first()
-        if not consent_product:
+        if product_id not in get_consent_products(db):
             logger.warning(f"Consent product {product_id} not found, skipping")
             continue
         
@@ -249,58 +248,25 @@ def get_manage_consent_page_data(db: Session, member_id: int) -> List[dict]:
     """
     Get all consent products with their consent status for manage consent page.
     Returns list of consent products with consent status.
-    For Product 11, queries partner_consents table instead of user_consents.
+    For Product 11, the status comes from partner_consents instead of user_consents.
+    Served from the consent read model (see consent_cache); no DB access when cached.
     """
-    from .Partner_consent_crud import get_partner_consent_status_by_member
-    
-    # Get all consent products
-    all_consent_products = db.query(ConsentProduct).all()
-    
-    # Get member's existing consents (for regular products)
-    member_consents = get_member_consents(db, member_id)
-    consent_map = {consent.product_id: consent for consent in member_consents}
-    
-    # Get partner consent status for product_id 11 (if exists)
-    from .Partner_consent_crud import get_partner_consent_status_by_member
-    partner_consent_status = get_partner_consent_status_by_member(db, member_id, product_id=11)
-    
+    consent_products = get_consent_products(db)
+    consent_map = get_member_consent_map(db, member_id)
+
     result = []
-    for consent_product in all_consent_products:
-        # Special handling for Product 11 (partner consent)
-        if consent_product.id == 11:
-            # Use partner_consent_status already fetched above
-            if partner_consent_status and partner_consent_status.get("has_consent"):
-                has_consent = True
-                consent_status = "yes"
-                created_at = partner_consent_status.get("created_at")
-                updated_at = partner_consent_status.get("updated_at")
-                # For product 11, use the member_id passed to the function
-                member_id_value = member_id
-            else:
-                has_consent = False
-                consent_status = "no"
-                created_at = None
-                updated_at = None
-                member_id_value = None
-        else:
-            # Regular products (1-10, 12-17)
-            consent = consent_map.get(consent_product.id)
-            has_consent = consent is not None and consent.status == "yes"
-            consent_status = consent.status if consent else "no"
-            created_at = consent.created_at if consent else None
-            updated_at = consent.updated_at if consent else None
-            member_id_value = consent.member_id if consent else None
-        
+    for product_id, product_name in consent_products.items():
+        consent = consent_map.get(str(product_id))
         result.append({
-            "product_id": consent_product.id,
-            "product_name": consent_product.name,
-            "member_id": member_id_value,
-            "has_consent": has_consent,
-            "consent_status": consent_status,
-            "created_at": created_at,
-            "updated_at": updated_at
+            "product_id": product_id,
+            "product_name": product_name,
+            "member_id": consent["member_id"] if consent else None,
+            "has_consent": consent is not None and consent["status"] == "yes",
+            "consent_status": consent["status"] if consent else "no",
+            "created_at": consent["created_at"] if consent else None,
+            "updated_at": consent["updated_at"] if consent else None
         })
-    
+
     return result
 
 
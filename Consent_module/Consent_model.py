@@ -1,7 +1,8 @@
 from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, func, Index, Text
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, validates
 from database import Base
 from Login_module.Utils.datetime_utils import now_ist
+from Login_module.Utils.phone_encryption import phone_blind_index
 
 
 class ConsentProduct(Base):
@@ -65,6 +66,7 @@ class PartnerConsent(Base):
     partner_member_id = Column(Integer, ForeignKey("members.id", ondelete="SET NULL"), nullable=True, index=True)  # Partner's member_id if exists
     partner_name = Column(String(100), nullable=True)  # Partner's name
     partner_mobile = Column(String(100), nullable=False, index=True)  # Partner's mobile (required for OTP) - Increased to 100 for encrypted phone numbers
+    partner_mobile_hash = Column(String(64), nullable=True, index=True)  # Blind index of partner_mobile (phone_blind_index), for lookups
     partner_consent = Column(String(10), nullable=False, default="no")  # "yes" or "no"
     
     # Final consent status (only "yes" if both user and partner consented)
@@ -108,3 +110,8 @@ class PartnerConsent(Base):
     __table_args__ = (
         Index('idx_user_member_product', 'user_member_id', 'product_id', unique=True),
     )
+
+    @validates("partner_mobile")
+    def _index_partner_mobile(self, key, value):
+        self.partner_mobile_hash = phone_blind_index(value)
+        return value
@@ -12,7 +12,7 @@ from Login_module.Utils.auth_user import get_current_user, get_current_member
 from Login_module.Utils.phone_encryption import decrypt_phone
 from Login_module.User.user_model import User
 from Member_module.Member_model import Member
-from .Consent_model import ConsentProduct
+from .consent_cache import get_consent_products
 from config import settings
 
 from .Consent_schema import (
@@ -241,8 +241,7 @@ def update_manage_consent(
                 continue
             
             # Validate consent product exists
-            consent_product = db.query(ConsentProduct).filter(ConsentProduct.id == product_id).first()
-            if not consent_product:
+            if product_id not in get_consent_products(db):
                 continue
             
             product_consents.append({
@@ -11,8 +11,9 @@ import logging
 import uuid
 from datetime import datetime, timedelta
 from Login_module.OTP import otp_manager
+from Login_module.Utils.rate_limiter import hit_rate_limit
 from Login_module.Utils.datetime_utils import now_ist, to_ist, IST
-from Login_module.Utils.phone_encryption import decrypt_phone
+from Login_module.Utils.phone_encryption import decrypt_phone, encrypt_phone, phone_blind_index
 
 from .Consent_model import PartnerConsent, ConsentProduct
 from Login_module.User.user_model import User
@@ -80,7 +81,7 @@ def find_partner_member_under_same_user(db: Session, user_id: int, partner_mobil
     member = db.query(Member).filter(
         and_(
             Member.user_id == user_id,
-            Member.mobile == partner_mobile,
+            Member.mobile_hash == phone_blind_index(partner_mobile),
             Member.is_deleted == False
         )
     ).first()
@@ -258,23 +259,29 @@ def check_cooldown_period(
     return now_ist() >= cooldown_end
 
 
+def _partner_daily_limit_key(user_member_id: int, product_id: int) -> str:
+    """Generate Redis key for the partner consent daily request counter"""
+    return f"partner_consent_daily:{user_member_id}:{product_id}"
+
+
 def check_daily_attempt_limit(
     db: Session,
     user_member_id: int,
     product_id: int = 11
 ) -> bool:
-    """Check if daily attempt limit reached (10 requests per 24 hours)"""
-    twenty_four_hours_ago = now_ist() - timedelta(hours=24)
-    
-    count = db.query(PartnerConsent).filter(
-        and_(
-            PartnerConsent.user_member_id == user_member_id,
-            PartnerConsent.product_id == product_id,
-            PartnerConsent.created_at >= twenty_four_hours_ago
-        )
-    ).count()
-    
-    return count < MAX_DAILY_ATTEMPTS
+    """
+    Check (and count) a new request against the daily limit (10 requests per 24 hours).
+    The counter lives in Redis because a member only ever has one PartnerConsent row per
+    product, so counting rows could not enforce the limit.
+    """
+    try:
+        return hit_rate_limit(
+            _partner_daily_limit_key(user_member_id, product_id), MAX_DAILY_ATTEMPTS, 24 * 3600
+        ).allowed
+    except Exception as e:
+        logger.error(f"Redis error checking partner consent daily limit: {e}")
+        # Fail closed - partner OTPs are stored in Redis anyway
+        return False
 
 
 def create_partner_consent_request(
@@ -620,13 +627,10 @@ def revoke_partner_consent(
     if not otp:
         raise HTTPException(status_code=400, detail="OTP is required for revoking consent")
     
-    # Encrypt partner_mobile before querying
-    encrypted_partner_mobile = encrypt_phone(partner_mobile)
-    
-    # Find consent record by partner_mobile and status CONSENT_GIVEN
+    # Find consent record by partner_mobile (blind index) and status CONSENT_GIVEN
     consent = db.query(PartnerConsent).filter(
         and_(
-            PartnerConsent.partner_mobile == encrypted_partner_mobile,
+            PartnerConsent.partner_mobile_hash == phone_blind_index(partner_mobile),
             PartnerConsent.request_status == "CONSENT_GIVEN"
         )
     ).first()
@@ -0,0 +1,248 @@
+"""
+Consent read model for /consent/manage.
+
+- Consent products are static reference data (seeded by migrations). They are
+  cached per process as {product_id: name}. Any committed change to
+  consent_products bumps a Redis version, and other workers reload when
+  they see it (checked at most every VERSION_CHECK_SECONDS).
+- Each member's consent map (status and timestamps per product, with the
+  partner consent for PARTNER_PRODUCT_ID taken from partner_consents) is
+  cached in Redis under consent:map:{member_id}. It is loaded with a single
+  UNION query and stamped with the member's version from
+  consent:version:{member_id}, and it is used only while the stamp matches.
+
+Writes never have to remember the cache. A Session listener collects the
+member ids of every flushed user_consents / partner_consents row and bumps
+their versions after the commit. That covers record_consent,
+update_manage_consent and the partner request/verify/revoke/expiry flows.
+Reading the version before the DB load means a concurrent write is never
+masked by a stale map.
+"""
+import json
+import logging
+import threading
+import time
+from datetime import datetime
+from itertools import chain
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import event, literal, select, union_all
+from sqlalchemy.orm import Session
+
+from .Consent_model import ConsentProduct, PartnerConsent, UserConsent
+
+logger = logging.getLogger(__name__)
+
+PARTNER_PRODUCT_ID = 11
+MAP_KEY_PREFIX = "consent:map:"
+VERSION_KEY_PREFIX = "consent:version:"
+PRODUCTS_VERSION_KEY = "consent_products:version"
+MAP_TTL_SECONDS = 24 * 3600
+VERSION_TTL_SECONDS = 7 * 24 * 3600
+PRODUCTS_TTL_SECONDS = 3600
+VERSION_CHECK_SECONDS = 5
+
+_SESSION_INFO_KEY = "consent_members_dirty"
+_PRODUCTS_INFO_KEY = "consent_products_dirty"
+
+_lock = threading.Lock()
+_products: Optional[Dict[int, str]] = None
+_products_version: Optional[str] = None
+_products_loaded_at = 0.0
+_products_checked_at = 0.0
+_metrics = {"map_hits": 0, "map_misses": 0, "bypassed": 0, "product_loads": 0, "invalidations": 0, "errors": 0}
+
+
+def _bump(name: str, amount: int = 1) -> None:
+    with _lock:
+        _metrics[name] += amount
+
+
+def _get_redis_client():
+    """Lazy import to avoid circular dependency (shares the OTP Redis client)."""
+    from Login_module.OTP import otp_manager
+    client = otp_manager._get_redis_client()
+    return client if otp_manager._redis_available else None
+
+
+def _products_version_now() -> Optional[str]:
+    try:
+        client = _get_redis_client()
+        return client.get(PRODUCTS_VERSION_KEY) if client is not None else None
+    except Exception as e:
+        logger.warning(f"Consent products version read failed | Error: {e}")
+        return None
+
+
+def get_consent_products(db: Session) -> Dict[int, str]:
+    """{product_id: name} for every consent product, ordered by id (cached per process)."""
+    global _products, _products_version, _products_loaded_at, _products_checked_at
+    now = time.monotonic()
+    products = _products
+    if products is not None and now - _products_loaded_at < PRODUCTS_TTL_SECONDS:
+        if now - _products_checked_at < VERSION_CHECK_SECONDS:
+            return products
+        if _products_version_now() == _products_version:
+            _products_checked_at = now
+            return products
+
+    version = _products_version_now()
+    rows = db.execute(select(ConsentProduct.id, ConsentProduct.name).order_by(ConsentProduct.id)).all()
+    products = {product_id: name for product_id, name in rows}
+    with _lock:
+        _products, _products_version = products, version
+        _products_loaded_at = _products_checked_at = now
+        _metrics["product_loads"] += 1
+    return products
+
+
+def invalidate_consent_products() -> None:
+    """Reload consent products in every worker. Call after commit."""
+    global _products
+    with _lock:
+        _products = None
+        _metrics["invalidations"] += 1
+    try:
+        client = _get_redis_client()
+        if client is not None:
+            client.incr(PRODUCTS_VERSION_KEY)
+    except Exception as e:
+        logger.warning(f"Consent products invalidation failed | Error: {e}")
+
+
+def _load_member_consents(db: Session, member_id: int) -> Dict[str, dict]:
+    """product_id (str) -> status/member_id/timestamps, from one UNION query."""
+    own = select(
+        UserConsent.product_id,
+        UserConsent.status,
+        UserConsent.member_id,
+        UserConsent.created_at,
+        UserConsent.updated_at,
+        literal(False).label("is_partner"),
+    ).where(UserConsent.member_id == member_id, UserConsent.product_id != PARTNER_PRODUCT_ID)
+    partner = select(
+        PartnerConsent.product_id,
+        PartnerConsent.final_status,
+        PartnerConsent.user_member_id,
+        PartnerConsent.created_at,
+        PartnerConsent.updated_at,
+        literal(True).label("is_partner"),
+    ).where(PartnerConsent.user_member_id == member_id, PartnerConsent.product_id == PARTNER_PRODUCT_ID)
+
+    consents = {}
+    for product_id, status, row_member_id, created_at, updated_at, is_partner in db.execute(union_all(own, partner)):
+        if is_partner and status != "yes":
+            # The page shows a partner request as unchecked until both sides consented
+            continue
+        consents[str(product_id)] = {
+            "status": status,
+            "member_id": row_member_id,
+            "created_at": _isoformat(created_at),
+            "updated_at": _isoformat(updated_at),
+        }
+    return consents
+
+
+def _isoformat(value) -> Optional[str]:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def get_member_consent_map(db: Session, member_id: int) -> Dict[str, dict]:
+    """The member's consent map from Redis, loading it from the DB on a miss."""
+    client = None
+    version = None
+    try:
+        client = _get_redis_client()
+        if client is not None:
+            version_key = f"{VERSION_KEY_PREFIX}{member_id}"
+            version, raw = client.mget([version_key, f"{MAP_KEY_PREFIX}{member_id}"])
+            if version is None:
+                client.set(version_key, int(time.time() * 1000), ex=VERSION_TTL_SECONDS, nx=True)
+                version, raw = client.get(version_key), None
+            if raw is not None:
+                cached = json.loads(raw)
+                if cached.get("v") == version:
+                    _bump("map_hits")
+                    return cached["consents"]
+    except Exception as e:
+        _bump("errors")
+        logger.warning(f"Consent map read failed | Member ID: {member_id} | Error: {e}")
+        client = None
+
+    consents = _load_member_consents(db, member_id)
+    if client is None:
+        _bump("bypassed")
+        return consents
+    _bump("map_misses")
+    try:
+        client.set(
+            f"{MAP_KEY_PREFIX}{member_id}",
+            json.dumps({"v": version, "consents": consents}),
+            ex=MAP_TTL_SECONDS,
+        )
+    except Exception as e:
+        _bump("errors")
+        logger.warning(f"Consent map write failed | Member ID: {member_id} | Error: {e}")
+    return consents
+
+
+def bump_member_consent_versions(member_ids: Iterable[int]) -> None:
+    """Invalidate the cached consent maps of these members (one pipeline)."""
+    member_ids = [member_id for member_id in set(member_ids) if member_id is not None]
+    if not member_ids:
+        return
+    try:
+        client = _get_redis_client()
+        if client is None:
+            return
+        pipe = client.pipeline(transaction=False)
+        clock = int(time.time() * 1000)
+        for member_id in member_ids:
+            key = f"{VERSION_KEY_PREFIX}{member_id}"
+            # Start a missing counter from the clock so a lost key never reuses an old version
+            pipe.set(key, clock, ex=VERSION_TTL_SECONDS, nx=True)
+            pipe.incr(key)
+            pipe.expire(key, VERSION_TTL_SECONDS)
+        pipe.execute()
+        _bump("invalidations", len(member_ids))
+    except Exception as e:
+        # Maps still expire after MAP_TTL_SECONDS
+        _bump("errors")
+        logger.warning(f"Consent map invalidation failed | Members: {len(member_ids)} | Error: {e}")
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_consents(session, flush_context):
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, UserConsent):
+            session.info.setdefault(_SESSION_INFO_KEY, set()).add(obj.member_id)
+        elif isinstance(obj, PartnerConsent):
+            session.info.setdefault(_SESSION_INFO_KEY, set()).add(obj.user_member_id)
+        elif isinstance(obj, ConsentProduct):
+            session.info[_PRODUCTS_INFO_KEY] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_consents(session):
+    member_ids = session.info.pop(_SESSION_INFO_KEY, None)
+    if member_ids:
+        bump_member_consent_versions(member_ids)
+    if session.info.pop(_PRODUCTS_INFO_KEY, None):
+        invalidate_consent_products()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_consents(session):
+    session.info.pop(_SESSION_INFO_KEY, None)
+    session.info.pop(_PRODUCTS_INFO_KEY, None)
+
+
+def get_consent_cache_metrics() -> dict:
+    with _lock:
+        metrics = dict(_metrics)
+        metrics["products_cached"] = len(_products) if _products is not None else 0
+    lookups = metrics["map_hits"] + metrics["map_misses"]
+    metrics["hit_rate"] = round(metrics["map_hits"] / lookups, 4) if lookups else 0.0
+    return metrics
@@ -43,3 +43,24 @@ class GeneticTestParticipant(Base):
     product = relationship("Product", foreign_keys=[product_id])
     order = relationship("Order", foreign_keys=[order_id])
 
+
+
+class MemberOrderSummary(Base):
+    """
+    Per-member projection of the latest order and latest report-ready order,
+    read by the member switcher/list. Maintained in the same transaction as the
+    order and item changes that affect it (see member_order_summary.py).
+    """
+    __tablename__ = "member_order_summaries"
+
+    member_id = Column(Integer, ForeignKey("members.id", ondelete="CASCADE"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+
+    latest_order_id = Column(Integer, nullable=True)
+    latest_order_number = Column(String(50), nullable=True)
+    latest_order_status = Column(String(50), nullable=True)
+
+    report_order_id = Column(Integer, nullable=True)
+    report_order_number = Column(String(50), nullable=True)
+
+    updated_at = Column(DateTime(timezone=True), default=now_ist, onupdate=now_ist, nullable=True)
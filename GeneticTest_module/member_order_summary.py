@@ -0,0 +1,199 @@
+"""
+Member order summary: latest order, latest report-ready order and the
+genetic-test flag for a set of members, in a fixed number of queries.
+
+The member list/switcher used to run three queries per member. Reads now
+come from the member_order_summaries projection (one row per member that has
+order items) plus one participant query, whatever the family size.
+
+The projection is kept current by Session listeners rather than by each
+caller: after a flush, orders whose status/number changed and order items
+whose status/member changed are collected, and before the commit the rows of
+the affected members are recomputed in the same transaction. That covers
+update_order_status, webhook confirmation, order creation and the repair
+job. compute_member_order_summaries() is the batched source of truth (one
+window-function query per kind) and is also what rebuilds rows.
+"""
+import logging
+from itertools import chain
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import delete, event, func, inspect, insert, select
+from sqlalchemy.orm import Session
+
+from .GeneticTest_model import GeneticTestParticipant, MemberOrderSummary
+
+logger = logging.getLogger(__name__)
+
+_SESSION_INFO_KEY = "member_order_summary_dirty"
+_ORDER_FIELDS = ("order_status", "order_number")
+_ITEM_FIELDS = ("order_status", "member_id", "order_id")
+
+EMPTY_SUMMARY = {
+    "has_taken_genetic_test": False,
+    "latest_order_no": None,
+    "latest_order_status": None,
+    "gene_report_order_no": None,
+    "gene_report_status": None,
+}
+
+
+def _status_value(status) -> Optional[str]:
+    if status is None:
+        return None
+    return status.value if hasattr(status, "value") else str(status)
+
+
+def _latest_orders(db: Session, member_ids: List[int], report_ready_only: bool) -> Dict[int, tuple]:
+    """member_id -> (order_id, order_number, order_status, user_id) of the member's most recent order."""
+    from Orders_module.Order_model import Order, OrderItem, OrderStatus
+
+    conditions = [OrderItem.member_id.in_(member_ids)]
+    if report_ready_only:
+        # Item status, not order status: one member's report can be ready before the others'
+        conditions.append(OrderItem.order_status.in_([OrderStatus.REPORT_READY, OrderStatus.COMPLETED]))
+    ranked = (
+        select(
+            OrderItem.member_id.label("member_id"),
+            Order.id.label("order_id"),
+            Order.order_number.label("order_number"),
+            Order.order_status.label("order_status"),
+            Order.user_id.label("user_id"),
+            func.row_number().over(
+                partition_by=OrderItem.member_id,
+                order_by=(Order.created_at.desc(), Order.id.desc()),
+            ).label("rn"),
+        )
+        .join(Order, Order.id == OrderItem.order_id)
+        .where(*conditions)
+        .subquery()
+    )
+    rows = db.execute(
+        select(ranked.c.member_id, ranked.c.order_id, ranked.c.order_number, ranked.c.order_status, ranked.c.user_id)
+        .where(ranked.c.rn == 1)
+    ).all()
+    return {row[0]: tuple(row[1:]) for row in rows}
+
+
+def compute_member_order_summaries(db: Session, member_ids: Iterable[int]) -> Dict[int, dict]:
+    """Projection rows (as dicts) for these members, computed from orders. Members without orders are omitted."""
+    member_ids = sorted({member_id for member_id in member_ids if member_id is not None})
+    if not member_ids:
+        return {}
+    latest = _latest_orders(db, member_ids, report_ready_only=False)
+    reports = _latest_orders(db, member_ids, report_ready_only=True)
+    summaries = {}
+    for member_id, (order_id, order_number, order_status, user_id) in latest.items():
+        report = reports.get(member_id)
+        summaries[member_id] = {
+            "member_id": member_id,
+            "user_id": user_id,
+            "latest_order_id": order_id,
+            "latest_order_number": order_number,
+            "latest_order_status": _status_value(order_status),
+            "report_order_id": report[0] if report else None,
+            "report_order_number": report[1] if report else None,
+        }
+    return summaries
+
+
+def refresh_member_order_summaries(db: Session, member_ids: Iterable[int]) -> int:
+    """Recompute the projection rows of these members in the current transaction (caller commits)."""
+    member_ids = sorted({member_id for member_id in member_ids if member_id is not None})
+    if not member_ids:
+        return 0
+    summaries = compute_member_order_summaries(db, member_ids)
+    db.execute(delete(MemberOrderSummary).where(MemberOrderSummary.member_id.in_(member_ids)))
+    if summaries:
+        db.execute(insert(MemberOrderSummary), list(summaries.values()))
+    return len(summaries)
+
+
+def get_member_order_summaries(db: Session, member_ids: Iterable[int]) -> Dict[int, dict]:
+    """
+    member_id -> has_taken_genetic_test, latest_order_no/status and
+    gene_report_order_no/status for every requested member (two queries).
+    """
+    from Orders_module.Order_model import OrderStatus
+
+    member_ids = sorted({member_id for member_id in member_ids if member_id is not None})
+    result = {member_id: dict(EMPTY_SUMMARY) for member_id in member_ids}
+    if not member_ids:
+        return result
+
+    for row in db.execute(
+        select(
+            MemberOrderSummary.member_id,
+            MemberOrderSummary.latest_order_number,
+            MemberOrderSummary.latest_order_status,
+            MemberOrderSummary.report_order_number,
+        ).where(MemberOrderSummary.member_id.in_(member_ids))
+    ):
+        summary = result[row.member_id]
+        summary["latest_order_no"] = row.latest_order_number
+        summary["latest_order_status"] = row.latest_order_status
+        if row.report_order_number:
+            summary["gene_report_order_no"] = row.report_order_number
+            summary["gene_report_status"] = OrderStatus.REPORT_READY.value
+
+    for member_id, has_taken in db.execute(
+        select(GeneticTestParticipant.member_id, GeneticTestParticipant.has_taken_genetic_test)
+        .where(GeneticTestParticipant.member_id.in_(member_ids))
+    ):
+        if has_taken:
+            result[member_id]["has_taken_genetic_test"] = True
+    return result
+
+
+def _changed(obj, fields) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[field].history.has_changes() for field in fields)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_orders(session, flush_context):
+    from Orders_module.Order_model import Order, OrderItem
+
+    order_ids: Set[int] = set()
+    member_ids: Set[int] = set()
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, Order):
+            if obj in session.new or obj in session.deleted or _changed(obj, _ORDER_FIELDS):
+                order_ids.add(obj.id)
+        elif isinstance(obj, OrderItem):
+            if obj in session.new or obj in session.deleted or _changed(obj, _ITEM_FIELDS):
+                # Old and new member_id, so a reassigned item refreshes both members
+                member_ids.update(m for m in inspect(obj).attrs.member_id.history.sum() if m is not None)
+    if order_ids or member_ids:
+        dirty = session.info.setdefault(_SESSION_INFO_KEY, {"orders": set(), "members": set()})
+        dirty["orders"].update(order_ids)
+        dirty["members"].update(member_ids)
+
+
+@event.listens_for(Session, "before_commit")
+def _refresh_changed_members(session):
+    if session.new or session.dirty or session.deleted:
+        session.flush()  # Runs before commit's own flush; collect its changes too
+    dirty = session.info.pop(_SESSION_INFO_KEY, None)
+    if not dirty:
+        return
+    from Orders_module.Order_model import OrderItem
+
+    member_ids = set(dirty["members"])
+    if dirty["orders"]:
+        member_ids.update(session.execute(
+            select(OrderItem.member_id).distinct().where(
+                OrderItem.order_id.in_(dirty["orders"]), OrderItem.member_id.isnot(None)
+            )
+        ).scalars())
+    try:
+        with session.begin_nested():
+            refresh_member_order_summaries(session, member_ids)
+    except Exception as e:
+        # Never fail the order change itself; the rows are rebuilt on the next change
+        logger.error(f"Member order summary refresh failed | Members: {sorted(member_ids)} | Error: {e}")
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_orders(session):
+    session.info.pop(_SESSION_INFO_KEY, None)
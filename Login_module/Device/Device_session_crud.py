@@ -1,12 +1,13 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import func
-from datetime import datetime, timedelta
+from datetime import datetime
 from Login_module.Utils.datetime_utils import now_ist
 import secrets
 from typing import Optional
 import logging
 from .Device_session_model import DeviceSession
 from .Device_session_audit_crud import create_session_audit_log
+from .session_cache import invalidate_session, invalidate_sessions
 
 logger = logging.getLogger(__name__)
 
@@ -43,6 +44,7 @@ def create_device_session(
             for old_session in sessions_to_delete:
                 db.delete(old_session)
             db.flush()
+            invalidate_sessions([old.id for old in sessions_to_delete])
 
         # Generate unique session token
         session_token = secrets.token_urlsafe(32)
@@ -166,6 +168,7 @@ def deactivate_session(
         session_data.is_active = False
         session_data.event_on_logout = now_ist()
         db.commit()
+        invalidate_session(session_id)
 
         try:
             create_session_audit_log(
@@ -194,6 +197,7 @@ def deactivate_session_by_token(db: Session, session_token: str, reason: Optiona
         session_data.is_active = False
         session_data.event_on_logout = now_ist()
         db.commit()
+        invalidate_session(session_data.id)
         return True
     return False
 
@@ -233,25 +237,6 @@ def get_user_active_sessions_count(db: Session, user_id: int, max_sessions: int
 
 
 def cleanup_inactive_sessions(db: Session, hours_inactive: int = 24) -> int:
-    cutoff = now_ist() - timedelta(hours=hours_inactive)
-
-    deleted_count = (
-        db.query(DeviceSession)
-        .filter(
-            DeviceSession.is_active == False,
-            DeviceSession.event_on_logout < cutoff
-        )
-        .delete()
-    )
-
-    stale_count = (
-        db.query(DeviceSession)
-        .filter(
-            DeviceSession.last_active < cutoff,
-            DeviceSession.is_active == True
-        )
-        .delete()
-    )
-
-    db.commit()
-    return deleted_count + stale_count
+    """Delete logged-out and stale sessions in bounded batches (see retention.py)."""
+    from .retention import session_policies, delete_in_batches
+    return sum(delete_in_batches(db, policy) for policy in session_policies(hours_inactive))
@@ -0,0 +1,138 @@
+"""
+Redis leader lock for jobs that must run on one instance only.
+
+When several App Runner instances are up, every instance runs the scheduler.
+Jobs that do cluster-wide work (retention deletes, reconciliation) take
+leader:{name} with SET NX EX before running; the other instances skip that
+run. The lock is released with a compare-and-delete so an instance never
+releases a lock that expired and was taken by someone else.
+
+Without Redis the lock is granted: the guarded jobs are idempotent, so the
+fallback costs duplicate work, not wrong results. On MySQL, db_named_lock()
+(GET_LOCK) can be used as a second line so runs still don't overlap.
+"""
+import logging
+import socket
+import uuid
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "leader:"
+
+_RELEASE_IF_OWNER = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+_EXTEND_IF_OWNER = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+INSTANCE_ID = f"{socket.gethostname()}:{uuid.uuid4().hex[:8]}"
+
+
+def _get_redis_client():
+    """Lazy import to avoid circular dependency (shares the OTP Redis client)."""
+    from Login_module.OTP import otp_manager
+    client = otp_manager._get_redis_client()
+    return client if otp_manager._redis_available else None
+
+
+def acquire_leader_lock(name: str, ttl_seconds: int) -> Optional[str]:
+    """
+    Try to become leader for `name`. Returns an ownership token, "" when Redis is
+    unavailable (lock granted without coordination), or None if another instance holds it.
+    """
+    client = _get_redis_client()
+    if client is None:
+        return ""
+    token = f"{INSTANCE_ID}:{uuid.uuid4().hex[:8]}"
+    try:
+        if client.set(f"{KEY_PREFIX}{name}", token, nx=True, ex=ttl_seconds):
+            return token
+        return None
+    except Exception as e:
+        logger.warning(f"Leader lock acquire failed, running without it | Lock: {name} | Error: {e}")
+        return ""
+
+
+def extend_leader_lock(name: str, token: str, ttl_seconds: int) -> bool:
+    """Push the expiry out while a long job is still running. False if the lock was lost."""
+    if not token:
+        return True
+    try:
+        client = _get_redis_client()
+        if client is None:
+            return True
+        return bool(client.eval(_EXTEND_IF_OWNER, 1, f"{KEY_PREFIX}{name}", token, ttl_seconds))
+    except Exception as e:
+        logger.warning(f"Leader lock extend failed | Lock: {name} | Error: {e}")
+        return True
+
+
+def release_leader_lock(name: str, token: Optional[str]) -> None:
+    if not token:
+        return
+    try:
+        client = _get_redis_client()
+        if client is not None:
+            client.eval(_RELEASE_IF_OWNER, 1, f"{KEY_PREFIX}{name}", token)
+    except Exception as e:
+        logger.warning(f"Leader lock release failed | Lock: {name} | Error: {e}")
+
+
+@contextmanager
+def leader_lock(name: str, ttl_seconds: int) -> Iterator[Optional[str]]:
+    """
+    with leader_lock("retention", 1800) as token:
+        if token is None:
+            return  # another instance is running it
+    """
+    token = acquire_leader_lock(name, ttl_seconds)
+    try:
+        yield token
+    finally:
+        release_leader_lock(name, token)
+
+
+@contextmanager
+def db_named_lock(name: str) -> Iterator[Optional[bool]]:
+    """
+    MySQL GET_LOCK(name, 0) held on a dedicated connection for the block.
+    Yields True (acquired), False (held by another connection) or None
+    (not MySQL / lock unavailable: caller runs uncoordinated).
+    """
+    from sqlalchemy import text
+    from database import engine
+
+    if engine.dialect.name != "mysql":
+        yield None
+        return
+    lock_name = f"{KEY_PREFIX}{name}"[:64]
+    try:
+        conn = engine.connect()
+    except Exception as e:
+        logger.warning(f"DB named lock unavailable | Lock: {name} | Error: {e}")
+        yield None
+        return
+    acquired = None
+    try:
+        try:
+            acquired = conn.execute(text("SELECT GET_LOCK(:name, 0)"), {"name": lock_name}).scalar() == 1
+        except Exception as e:
+            logger.warning(f"DB named lock acquire failed | Lock: {name} | Error: {e}")
+        yield acquired
+    finally:
+        try:
+            if acquired:
+                conn.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": lock_name})
+        except Exception as e:
+            logger.warning(f"DB named lock release failed | Lock: {name} | Error: {e}")
+        conn.close()
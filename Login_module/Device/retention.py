@@ -0,0 +1,210 @@
+"""
+Data retention engine.
+
+Each RetentionPolicy names a table and the condition for rows that may be
+deleted. Rows are deleted in bounded primary-key batches:
+
+    SELECT id FROM t WHERE <condition> ORDER BY id LIMIT batch_size
+    DELETE FROM t WHERE id IN (...) AND <condition>
+    COMMIT; sleep
+
+so each transaction holds locks only for one batch and the undo log stays
+small, with RETENTION_BATCH_SLEEP_SECONDS between batches to let normal
+traffic through. A run deletes at most RETENTION_MAX_BATCHES_PER_TABLE batches
+per table; the rest waits for the next run.
+
+Runs are guarded by the "retention" leader lock so only one instance deletes
+at a time. Scheduler entry point: run_retention() via cleanup_sessions_job.
+"""
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import and_
+from sqlalchemy.orm import Session
+
+from config import settings
+from database import SessionLocal
+from Login_module.Utils.datetime_utils import now_ist
+from .leader_lock import leader_lock, extend_leader_lock
+
+logger = logging.getLogger(__name__)
+
+RETENTION_LOCK_NAME = "retention"
+RETENTION_LOCK_TTL_SECONDS = 1800
+
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    name: str
+    model: Any
+    condition: Callable[[datetime], Any]  # now -> SQLAlchemy criterion selecting expired rows
+
+
+_metrics_lock = threading.Lock()
+_metrics: Dict[str, Any] = {
+    "runs": 0,
+    "skipped_not_leader": 0,
+    "errors": 0,
+    "last_run_at": None,
+    "last_duration_seconds": None,
+    "last_deleted": {},
+    "deleted_total": {},
+}
+
+
+def session_policies(hours: Optional[int] = None) -> List[RetentionPolicy]:
+    """Logged-out sessions and active sessions idle for `hours` (RETENTION_SESSION_INACTIVE_HOURS)."""
+    from .Device_session_model import DeviceSession
+    hours = hours or settings.RETENTION_SESSION_INACTIVE_HOURS
+    return [
+        RetentionPolicy(
+            "device_sessions_logged_out",
+            DeviceSession,
+            lambda now: and_(
+                DeviceSession.is_active == False,
+                DeviceSession.event_on_logout < now - timedelta(hours=hours),
+            ),
+        ),
+        RetentionPolicy(
+            "device_sessions_stale",
+            DeviceSession,
+            lambda now: and_(
+                DeviceSession.is_active == True,
+                DeviceSession.last_active < now - timedelta(hours=hours),
+            ),
+        ),
+    ]
+
+
+def retention_policies() -> List[RetentionPolicy]:
+    """All policies, in run order (refresh tokens before the sessions they cascade from)."""
+    from Login_module.Token.Refresh_token_model import RefreshToken
+    from Login_module.OTP.OTP_Log_Model import OTPAuditLog
+    from .Device_session_audit_model import SessionAuditLog
+    from Cart_module.Cart_audit_model import AuditLog
+    from Orders_module.Order_model import WebhookLog
+
+    return [
+        RetentionPolicy(
+            "refresh_tokens",
+            RefreshToken,
+            lambda now: RefreshToken.expires_at < now - timedelta(days=settings.RETENTION_REFRESH_TOKEN_DAYS),
+        ),
+        *session_policies(),
+        RetentionPolicy(
+            "otp_audit_logs",
+            OTPAuditLog,
+            lambda now: OTPAuditLog.timestamp < now - timedelta(days=settings.RETENTION_OTP_AUDIT_DAYS),
+        ),
+        RetentionPolicy(
+            "session_audit_logs",
+            SessionAuditLog,
+            lambda now: SessionAuditLog.timestamp < now - timedelta(days=settings.RETENTION_SESSION_AUDIT_DAYS),
+        ),
+        RetentionPolicy(
+            "cart_audit_logs",
+            AuditLog,
+            lambda now: AuditLog.created_at < now - timedelta(days=settings.RETENTION_CART_AUDIT_DAYS),
+        ),
+        RetentionPolicy(
+            # Only processed webhooks; pending/failed ones stay for the sweep and for debugging
+            "webhook_logs",
+            WebhookLog,
+            lambda now: and_(
+                WebhookLog.processed == True,
+                WebhookLog.created_at < now - timedelta(days=settings.RETENTION_WEBHOOK_LOG_DAYS),
+            ),
+        ),
+    ]
+
+
+def delete_in_batches(
+    db: Session,
+    policy: RetentionPolicy,
+    now: Optional[datetime] = None,
+    batch_size: Optional[int] = None,
+    max_batches: Optional[int] = None,
+    sleep_seconds: Optional[float] = None,
+    lock_token: Optional[str] = None,
+) -> int:
+    """Delete the policy's expired rows in primary-key batches, one commit per batch."""
+    now = now or now_ist()
+    batch_size = batch_size or settings.RETENTION_BATCH_SIZE
+    max_batches = max_batches or settings.RETENTION_MAX_BATCHES_PER_TABLE
+    sleep_seconds = settings.RETENTION_BATCH_SLEEP_SECONDS if sleep_seconds is None else sleep_seconds
+    pk = policy.model.__mapper__.primary_key[0]
+    condition = policy.condition(now)
+
+    deleted = 0
+    for batch in range(max_batches):
+        ids = [row_id for (row_id,) in db.query(pk).filter(condition).order_by(pk).limit(batch_size).all()]
+        if not ids:
+            break
+        # Re-check the condition: a row may have changed (e.g. session reactivated) since the SELECT
+        deleted += db.query(policy.model).filter(pk.in_(ids), condition).delete(synchronize_session=False)
+        db.commit()
+        if len(ids) < batch_size:
+            break
+        if lock_token and not extend_leader_lock(RETENTION_LOCK_NAME, lock_token, RETENTION_LOCK_TTL_SECONDS):
+            logger.warning(f"Retention lost the leader lock, stopping | Policy: {policy.name}")
+            break
+        if sleep_seconds:
+            time.sleep(sleep_seconds)
+    return deleted
+
+
+def run_retention(db: Optional[Session] = None) -> Dict[str, int]:
+    """
+    Apply every policy once if this instance holds the leader lock. Returns rows
+    deleted per policy; raises RuntimeError after the run if any policy failed.
+    """
+    with leader_lock(RETENTION_LOCK_NAME, RETENTION_LOCK_TTL_SECONDS) as token:
+        if token is None:
+            with _metrics_lock:
+                _metrics["skipped_not_leader"] += 1
+            logger.info("Retention run skipped: another instance holds the lock")
+            return {}
+
+        own_session = db is None
+        db = db or SessionLocal()
+        started = time.monotonic()
+        deleted: Dict[str, int] = {}
+        failed: List[str] = []
+        try:
+            for policy in retention_policies():
+                try:
+                    deleted[policy.name] = delete_in_batches(db, policy, lock_token=token)
+                except Exception as e:
+                    db.rollback()
+                    failed.append(policy.name)
+                    logger.error(f"Retention failed | Policy: {policy.name} | Error: {e}")
+        finally:
+            if own_session:
+                db.close()
+
+    duration = round(time.monotonic() - started, 3)
+    with _metrics_lock:
+        _metrics["runs"] += 1
+        _metrics["errors"] += len(failed)
+        _metrics["last_run_at"] = now_ist().isoformat()
+        _metrics["last_duration_seconds"] = duration
+        _metrics["last_deleted"] = dict(deleted)
+        for name, count in deleted.items():
+            _metrics["deleted_total"][name] = _metrics["deleted_total"].get(name, 0) + count
+    logger.info(f"Retention run completed in {duration}s | Deleted: {deleted}")
+    if failed:
+        # The other policies still ran; fail the run so the scheduler records it
+        raise RuntimeError(f"Retention failed for policies: {', '.join(failed)}")
+    return deleted
+
+
+def get_retention_metrics() -> dict:
+    with _metrics_lock:
+        metrics = dict(_metrics)
+        metrics["last_deleted"] = dict(_metrics["last_deleted"])
+        metrics["deleted_total"] = dict(_metrics["deleted_total"])
+    return metrics
@@ -1,45 +1,251 @@
 """
 Scheduler setup for background tasks.
-Uses APScheduler to run periodic cleanup jobs.
+Uses APScheduler to run periodic jobs.
+
+Every worker process of every instance runs a BackgroundScheduler, so jobs
+are registered through register_job() and wrapped with fleet coordination:
+
+- leader_only jobs (cluster-wide work: retention, sweeps, reconciliation)
+  take the Redis lock leader:job:{id} for ~90% of their interval before
+  running. Instances whose timer fires inside that window skip the run, so
+  the job runs once per interval across the fleet. The lock is renewed while
+  a long run is in progress. Without Redis, MySQL GET_LOCK keeps runs from
+  overlapping; elsewhere (local SQLite) the job simply runs.
+- per-process jobs (e.g. flushing this process's buffered session touches)
+  run everywhere.
+
+Each run is recorded in a per-process history with its duration and outcome;
+see get_scheduler_metrics().
 """
 import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, Iterator, Optional
+
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.interval import IntervalTrigger
+from Login_module.Utils.datetime_utils import now_ist
+from .leader_lock import (
+    INSTANCE_ID,
+    acquire_leader_lock,
+    extend_leader_lock,
+    release_leader_lock,
+    db_named_lock,
+)
 from .session_cleanup import cleanup_sessions_job
+from .session_activity import flush_session_touches_job, flush_session_touches, SESSION_TOUCH_FLUSH_SECONDS
 
 logger = logging.getLogger(__name__)
 
+JOB_LOCK_PREFIX = "job:"
+JOB_HISTORY_SIZE = 20
+
+
+@dataclass
+class ScheduledJob:
+    id: str
+    func: Callable[[], Any]
+    interval_seconds: int
+    name: str
+    leader_only: bool = True
+    runs: int = 0
+    failures: int = 0
+    skipped: int = 0
+    total_duration: float = 0.0
+    max_duration: float = 0.0
+    history: Deque[dict] = field(default_factory=lambda: deque(maxlen=JOB_HISTORY_SIZE))
+
 
 # Global scheduler instance
 scheduler = None
 
+_registry: Dict[str, ScheduledJob] = {}
+_registry_lock = threading.Lock()
+
+
+def register_job(
+    job_id: str,
+    func: Callable[[], Any],
+    interval_seconds: int,
+    name: Optional[str] = None,
+    leader_only: bool = True,
+) -> ScheduledJob:
+    """
+    Register a periodic job. leader_only=True runs it on one instance per
+    interval; False runs it in every process. Jobs registered after
+    start_scheduler() are scheduled immediately.
+    """
+    job = ScheduledJob(id=job_id, func=func, interval_seconds=int(interval_seconds),
+                       name=name or job_id, leader_only=leader_only)
+    with _registry_lock:
+        _registry[job_id] = job
+    if scheduler is not None:
+        _schedule(job)
+    return job
+
+
+def _schedule(job: ScheduledJob) -> None:
+    scheduler.add_job(
+        run_registered_job,
+        args=[job.id],
+        trigger=IntervalTrigger(seconds=job.interval_seconds),
+        id=job.id,
+        name=job.name,
+        replace_existing=True,
+        max_instances=1,
+        coalesce=True
+    )
+
+
+@contextmanager
+def _job_lease(job: ScheduledJob) -> Iterator[bool]:
+    """Yield True if this instance should run the job now."""
+    if not job.leader_only:
+        yield True
+        return
+
+    lock_name = f"{JOB_LOCK_PREFIX}{job.id}"
+    ttl = max(int(job.interval_seconds * 0.9), 1)
+    token = acquire_leader_lock(lock_name, ttl)
+    if token is None:
+        yield False
+        return
+    if token == "":
+        with db_named_lock(lock_name) as acquired:
+            yield acquired is not False
+        return
+
+    started = time.monotonic()
+    done = threading.Event()
+
+    def renew():
+        while not done.wait(max(ttl / 3, 1)):
+            if not extend_leader_lock(lock_name, token, ttl):
+                logger.warning(f"Scheduler lost the lock while running | Job: {job.id}")
+                return
+
+    renewer = threading.Thread(target=renew, name=f"job-lease-{job.id}", daemon=True)
+    renewer.start()
+    try:
+        yield True
+    finally:
+        done.set()
+        renewer.join(timeout=5)
+        # Keep the lock until `ttl` after the start so other instances skip this interval
+        remaining = int(ttl - (time.monotonic() - started))
+        if remaining >= 1:
+            extend_leader_lock(lock_name, token, remaining)
+        else:
+            release_leader_lock(lock_name, token)
+
+
+def run_registered_job(job_id: str) -> None:
+    """APScheduler entry point for registered jobs."""
+    job = _registry.get(job_id)
+    if job is None:
+        logger.warning(f"Scheduler job not registered: {job_id}")
+        return
+    with _job_lease(job) as should_run:
+        if not should_run:
+            with _registry_lock:
+                job.skipped += 1
+            return
+        started_at = now_ist()
+        started = time.monotonic()
+        status, error = "success", None
+        try:
+            job.func()
+        except Exception as e:
+            status, error = "failed", str(e)[:500]
+            logger.error(f"Scheduler job failed | Job: {job.id} | Error: {e}", exc_info=True)
+        duration = round(time.monotonic() - started, 3)
+
+    with _registry_lock:
+        job.runs += 1
+        if status == "failed":
+            job.failures += 1
+        job.total_duration += duration
+        job.max_duration = max(job.max_duration, duration)
+        job.history.append({
+            "started_at": started_at.isoformat(),
+            "duration_seconds": duration,
+            "status": status,
+            "error": error,
+        })
+
+
+def _register_builtin_jobs() -> None:
+    # Session cleanup / data retention every 90 minutes (1.5 hours, between 1-2 hours as specified)
+    register_job('session_cleanup', cleanup_sessions_job, 90 * 60, name='Cleanup inactive sessions')
+
+    # Flush buffered session last_active updates (write-behind, per process)
+    register_job('session_touch_flush', flush_session_touches_job, SESSION_TOUCH_FLUSH_SECONDS,
+                 name='Flush session last_active updates', leader_only=False)
+
+    # Re-enqueue webhooks that are unprocessed (crash, failed attempt due for retry)
+    from Orders_module.webhook_queue import sweep_pending_webhooks
+    register_job('webhook_sweep', sweep_pending_webhooks, 60, name='Re-enqueue pending Razorpay webhooks')
+
+    # Order repair queue: flag stuck/inconsistent orders, then repair flagged ones in batches
+    from Orders_module.order_repair import (
+        flag_orders_needing_repair, repair_flagged_orders, REPAIR_INTERVAL_SECONDS, SCAN_INTERVAL_SECONDS,
+    )
+    register_job('order_repair_scan', flag_orders_needing_repair, SCAN_INTERVAL_SECONDS,
+                 name='Flag orders needing repair')
+    register_job('order_repair', repair_flagged_orders, REPAIR_INTERVAL_SECONDS, name='Repair flagged orders')
+
+    # Repair drift in the Redis unread-notification counters
+    from Notification_module.unread_counter import reconcile_unread_counters
+    register_job('unread_counter_reconcile', reconcile_unread_counters, 30 * 60,
+                 name='Reconcile unread notification counters')
+
+    # Evict old invoice PDFs from this host's store
+    from Orders_module.invoice_service import prune_invoice_cache
+    register_job('invoice_cache_prune', prune_invoice_cache, 60 * 60, name='Prune invoice PDF cache',
+                 leader_only=False)
+
+    # Aggregate tracking_records into hourly/daily rollups; export closed days to Parquet
+    from config import settings
+    from Tracking_module.tracking_rollup import run_tracking_rollups, run_tracking_export
+    register_job('tracking_rollup', run_tracking_rollups, settings.TRACKING_ROLLUP_INTERVAL_SECONDS,
+                 name='Aggregate tracking rollups')
+    register_job('tracking_export', run_tracking_export, 60 * 60, name='Export tracking records')
+
 
 def start_scheduler():
     """
     Start the background scheduler for periodic tasks.
-    - Session cleanup: runs every 90 minutes (1.5 hours)
+    - Session cleanup / retention: runs every 90 minutes (1.5 hours)
+    - Session last_active flush: runs every SESSION_TOUCH_FLUSH_SECONDS (every process)
+    - Pending Razorpay webhook sweep: runs every minute
+    - Unread notification counter reconciliation: runs every 30 minutes
+    - Order repair: flag scan every 30 minutes, repair queue every minute
+    - Tracking rollups: every TRACKING_ROLLUP_INTERVAL_SECONDS; raw export: hourly
+    Plus any job registered with register_job().
     """
     global scheduler
-    
+
     if scheduler is not None:
         logger.warning("Scheduler is already running")
         return scheduler
-    
+
+    _register_builtin_jobs()
     scheduler = BackgroundScheduler()
-    
-    # Schedule session cleanup every 90 minutes (1.5 hours, between 1-2 hours as specified)
-    scheduler.add_job(
-        cleanup_sessions_job,
-        trigger=IntervalTrigger(minutes=90),
-        id='session_cleanup',
-        name='Cleanup inactive sessions',
-        replace_existing=True
+    with _registry_lock:
+        jobs = list(_registry.values())
+    for job in jobs:
+        _schedule(job)
+
+    logger.info(
+        f"Background scheduler started on {INSTANCE_ID} with {len(jobs)} job(s): "
+        f"{', '.join(job.id for job in jobs)}"
     )
-    
-    logger.info("Background scheduler started. Session cleanup every 90 minutes.")
-    
+
     scheduler.start()
-    
+
     return scheduler
 
 
@@ -48,12 +254,30 @@ def shutdown_scheduler():
     Shutdown the background scheduler.
     """
     global scheduler
-    
+
     if scheduler is not None:
         scheduler.shutdown()
         scheduler = None
         logger.info("Background scheduler stopped.")
 
+    # Don't lose buffered last_active updates on shutdown
+    flush_session_touches()
 
 
-
+def get_scheduler_metrics() -> dict:
+    with _registry_lock:
+        jobs = {
+            job.id: {
+                "interval_seconds": job.interval_seconds,
+                "leader_only": job.leader_only,
+                "runs": job.runs,
+                "failures": job.failures,
+                "skipped_not_leader": job.skipped,
+                "avg_duration_seconds": round(job.total_duration / job.runs, 3) if job.runs else None,
+                "max_duration_seconds": job.max_duration,
+                "last_run": job.history[-1] if job.history else None,
+                "history": list(job.history),
+            }
+            for job in _registry.values()
+        }
+    return {"instance_id": INSTANCE_ID, "running": scheduler is not None, "jobs": jobs}
@@ -0,0 +1,152 @@
+"""
+Write-behind buffer for DeviceSession.last_active.
+
+get_current_user records a "touch" here instead of committing an UPDATE on the
+request path. The scheduler flushes pending touches every
+SESSION_TOUCH_FLUSH_SECONDS as a single bulk UPDATE ... CASE statement.
+
+The buffer is per process (each worker flushes its own touches), so a flush job
+must run in every worker. Call flush_session_touches() before reading
+last_active for decisions that matter (e.g. cleanup_sessions_job).
+"""
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+from sqlalchemy import case
+from sqlalchemy.orm import Session
+
+from config import settings
+from database import SessionLocal
+from .Device_session_model import DeviceSession
+
+logger = logging.getLogger(__name__)
+
+SESSION_TOUCH_FLUSH_SECONDS = settings.SESSION_TOUCH_FLUSH_SECONDS
+# Cap rows per UPDATE so one flush never builds an unbounded CASE expression
+SESSION_TOUCH_MAX_BATCH = 1000
+
+_lock = threading.Lock()
+_pending: Dict[int, datetime] = {}
+_oldest_pending_at: Optional[float] = None
+
+_metrics = {
+    "flush_count": 0,
+    "flush_failures": 0,
+    "sessions_flushed_total": 0,
+    "last_batch_size": 0,
+    "max_batch_size": 0,
+    "last_flush_lag_seconds": 0.0,
+    "max_flush_lag_seconds": 0.0,
+    "last_flush_duration_seconds": 0.0,
+    "last_flush_at": None,
+}
+
+
+def record_session_touch(session_id: int, last_active: datetime) -> None:
+    """Buffer a last_active update; the newest timestamp per session wins."""
+    global _oldest_pending_at
+    with _lock:
+        current = _pending.get(session_id)
+        if current is None or last_active > current:
+            _pending[session_id] = last_active
+        if _oldest_pending_at is None:
+            _oldest_pending_at = time.monotonic()
+
+
+def _drain() -> tuple[Dict[int, datetime], Optional[float]]:
+    global _pending, _oldest_pending_at
+    with _lock:
+        batch, oldest = _pending, _oldest_pending_at
+        _pending, _oldest_pending_at = {}, None
+    return batch, oldest
+
+
+def _requeue(batch: Dict[int, datetime], oldest: Optional[float]) -> None:
+    """Put a failed batch back without overwriting newer touches."""
+    global _oldest_pending_at
+    with _lock:
+        for session_id, ts in batch.items():
+            current = _pending.get(session_id)
+            if current is None or ts > current:
+                _pending[session_id] = ts
+        if oldest is not None and (_oldest_pending_at is None or oldest < _oldest_pending_at):
+            _oldest_pending_at = oldest
+
+
+def _apply_batch(db: Session, batch: Dict[int, datetime]) -> int:
+    items = list(batch.items())
+    updated = 0
+    for start in range(0, len(items), SESSION_TOUCH_MAX_BATCH):
+        chunk = dict(items[start:start + SESSION_TOUCH_MAX_BATCH])
+        result = (
+            db.query(DeviceSession)
+            .filter(DeviceSession.id.in_(list(chunk.keys())))
+            .update(
+                {DeviceSession.last_active: case(chunk, value=DeviceSession.id)},
+                synchronize_session=False,
+            )
+        )
+        updated += result or 0
+    db.commit()
+    return updated
+
+
+def flush_session_touches(db: Optional[Session] = None) -> int:
+    """
+    Write all buffered touches to device_sessions.
+    Returns the number of sessions in the flushed batch (0 if nothing was pending).
+    """
+    batch, oldest = _drain()
+    if not batch:
+        return 0
+
+    owns_session = db is None
+    db = db or SessionLocal()
+    started = time.monotonic()
+    try:
+        _apply_batch(db, batch)
+    except Exception as e:
+        db.rollback()
+        _requeue(batch, oldest)
+        with _lock:
+            _metrics["flush_failures"] += 1
+        logger.error(f"Session last_active flush failed | Batch size: {len(batch)} | Error: {e}")
+        return 0
+    finally:
+        if owns_session:
+            db.close()
+
+    finished = time.monotonic()
+    lag = finished - oldest if oldest is not None else 0.0
+    with _lock:
+        _metrics["flush_count"] += 1
+        _metrics["sessions_flushed_total"] += len(batch)
+        _metrics["last_batch_size"] = len(batch)
+        _metrics["max_batch_size"] = max(_metrics["max_batch_size"], len(batch))
+        _metrics["last_flush_lag_seconds"] = round(lag, 3)
+        _metrics["max_flush_lag_seconds"] = max(_metrics["max_flush_lag_seconds"], round(lag, 3))
+        _metrics["last_flush_duration_seconds"] = round(finished - started, 3)
+        _metrics["last_flush_at"] = time.time()
+
+    logger.debug(f"Flushed session last_active | Batch size: {len(batch)} | Lag: {lag:.2f}s")
+    return len(batch)
+
+
+def flush_session_touches_job():
+    """Scheduler entry point."""
+    flush_session_touches()
+
+
+def get_session_touch_metrics() -> dict:
+    """Flush-lag and batch-size metrics for the write-behind buffer."""
+    with _lock:
+        metrics = dict(_metrics)
+        metrics["pending"] = len(_pending)
+        metrics["pending_age_seconds"] = (
+            round(time.monotonic() - _oldest_pending_at, 3) if _oldest_pending_at is not None else 0.0
+        )
+    metrics["flush_interval_seconds"] = SESSION_TOUCH_FLUSH_SECONDS
+    return metrics
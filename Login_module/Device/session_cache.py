@@ -0,0 +1,125 @@
+"""
+Redis-backed cache of device session validity.
+
+get_current_user runs on every authenticated request. Instead of reading
+device_sessions from MySQL each time, the fields it checks (is_active, user_id,
+last_active) are cached in Redis keyed by session_id.
+
+Revocation:
+- deactivate_session (used by /auth/logout, /auth/logout-all, /sessions/revoke*)
+  deletes the cached entry after commit, so logouts take effect immediately.
+- Entries also expire after SESSION_CACHE_TTL_SECONDS, which bounds how long any
+  change made outside those paths (cleanup job, manual DB edits) can go unseen.
+
+If Redis is unavailable every function degrades to a no-op / cache miss and the
+caller falls back to the database.
+"""
+import json
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterable, Optional
+
+from config import settings
+from Login_module.Utils.datetime_utils import to_ist
+
+logger = logging.getLogger(__name__)
+
+SESSION_CACHE_TTL_SECONDS = settings.SESSION_CACHE_TTL_SECONDS
+
+
+@dataclass
+class CachedSession:
+    """Subset of DeviceSession needed to authenticate a request."""
+    id: int
+    user_id: int
+    is_active: bool
+    last_active: Optional[datetime] = None
+    event_on_logout: Optional[datetime] = None
+
+
+def _get_redis_client():
+    """
+    Lazy import to avoid circular dependency (shares the OTP Redis client).
+    Returns None while Redis is marked unavailable so auth never waits on reconnects.
+    """
+    from Login_module.OTP import otp_manager
+    client = otp_manager._get_redis_client()
+    return client if otp_manager._redis_available else None
+
+
+def _session_cache_key(session_id: int) -> str:
+    return f"session_cache:{session_id}"
+
+
+def _serialize_dt(dt: Optional[datetime]) -> Optional[str]:
+    dt = to_ist(dt)
+    return dt.isoformat() if dt else None
+
+
+def _parse_dt(value: Optional[str]) -> Optional[datetime]:
+    return to_ist(datetime.fromisoformat(value)) if value else None
+
+
+def get_cached_session(session_id: int) -> Optional[CachedSession]:
+    """Return the cached session, or None on cache miss / Redis error."""
+    if SESSION_CACHE_TTL_SECONDS <= 0:
+        return None
+    try:
+        client = _get_redis_client()
+        if client is None:
+            return None
+        raw = client.get(_session_cache_key(session_id))
+        if not raw:
+            return None
+        data = json.loads(raw)
+        return CachedSession(
+            id=int(session_id),
+            user_id=int(data["user_id"]),
+            is_active=bool(data["is_active"]),
+            last_active=_parse_dt(data.get("last_active")),
+            event_on_logout=_parse_dt(data.get("event_on_logout")),
+        )
+    except Exception as e:
+        logger.debug(f"Session cache read failed | Session ID: {session_id} | Error: {e}")
+        return None
+
+
+def cache_session(session, last_active: Optional[datetime] = None) -> None:
+    """
+    Store a DeviceSession (or CachedSession) in the cache.
+    last_active overrides the value on the object (used after touching the session).
+    """
+    if SESSION_CACHE_TTL_SECONDS <= 0 or session is None:
+        return
+    try:
+        client = _get_redis_client()
+        if client is None:
+            return
+        payload = {
+            "user_id": session.user_id,
+            "is_active": bool(session.is_active),
+            "last_active": _serialize_dt(last_active or session.last_active),
+            "event_on_logout": _serialize_dt(session.event_on_logout),
+        }
+        client.set(_session_cache_key(session.id), json.dumps(payload), ex=SESSION_CACHE_TTL_SECONDS)
+    except Exception as e:
+        logger.debug(f"Session cache write failed | Session ID: {getattr(session, 'id', None)} | Error: {e}")
+
+
+def invalidate_session(session_id: int) -> None:
+    """Drop a session from the cache (call after it is deactivated or deleted)."""
+    invalidate_sessions([session_id])
+
+
+def invalidate_sessions(session_ids: Iterable[int]) -> None:
+    """Drop several sessions from the cache in one round-trip."""
+    keys = [_session_cache_key(sid) for sid in session_ids if sid]
+    if not keys:
+        return
+    try:
+        client = _get_redis_client()
+        if client is not None:
+            client.delete(*keys)
+    except Exception as e:
+        logger.warning(f"Session cache invalidation failed | Keys: {len(keys)} | Error: {e}")
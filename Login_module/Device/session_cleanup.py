@@ -1,32 +1,32 @@
 """
-Session cleanup cron job.
-Deletes inactive or deleted sessions every 1-2 hours.
+Session cleanup / data retention cron job.
+Runs every 90 minutes; deletes expired sessions, tokens and audit rows in
+bounded batches (see retention.py). Only the instance holding the retention
+leader lock deletes.
 """
 import logging
-from datetime import datetime
 from sqlalchemy.orm import Session
 from database import SessionLocal
-from Login_module.Utils.datetime_utils import now_ist
-from .Device_session_crud import cleanup_inactive_sessions
+from .retention import run_retention
+from .session_activity import flush_session_touches
 
 logger = logging.getLogger(__name__)
 
 
 def cleanup_sessions_job():
     """
-    Cron job function to cleanup inactive sessions.
-    Runs every 1-2 hours to delete old inactive sessions.
+    Cron job function to cleanup inactive sessions and expired audit data.
+    Errors are re-raised so the scheduler records the run as failed.
     """
     db: Session = SessionLocal()
     try:
-        # Cleanup sessions that have been inactive for 24 hours
-        deleted_count = cleanup_inactive_sessions(db, hours_inactive=24)
-        logger.info(f"Session cleanup completed at {now_ist()}. Deleted {deleted_count} inactive sessions.")
+        # Write buffered last_active updates first so active sessions aren't seen as stale
+        flush_session_touches(db)
+        deleted = run_retention(db)
+        if deleted:
+            logger.info(f"Session cleanup completed. Deleted {sum(deleted.values())} rows: {deleted}")
     except Exception as e:
         logger.error(f"Error during session cleanup: {str(e)}")
+        raise
     finally:
         db.close()
-
-
-
-
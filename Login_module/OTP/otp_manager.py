@@ -5,6 +5,7 @@ import os
 import redis
 import logging
 from config import settings
+from Login_module.Utils.rate_limiter import hit_rate_limit
 
 # Load .env file (for Redis config and other non-settings variables)
 load_dotenv()
@@ -161,16 +162,7 @@ def can_request_otp(country_code: str, mobile: str) -> bool:
     For security operations, we fail closed if Redis is down.
     """
     try:
-        req_key = _otp_req_key(country_code, mobile)
-        cnt = _redis_client.get(req_key)
-        if cnt is None:
-            # seed counter with expiry 3600
-            _redis_client.set(req_key, 1, ex=3600)
-            return True
-        if int(cnt) >= OTP_MAX_REQUESTS_PER_HOUR:
-            return False
-        _redis_client.incr(req_key)
-        return True
+        return hit_rate_limit(_otp_req_key(country_code, mobile), OTP_MAX_REQUESTS_PER_HOUR, 3600).allowed
     except redis.RedisError as e:
         logger.error(f"Redis error checking OTP request limit: {e}")
         # Fail closed for security - deny if Redis is down
@@ -218,20 +210,13 @@ def record_failed_attempt(country_code: str, mobile: str) -> int:
     """
     try:
         failed_key = _otp_failed_key(country_code, mobile)
-        failed_count = _redis_client.get(failed_key)
-        
-        if failed_count is None:
-            # First failed attempt, set with 1 hour expiry
-            _redis_client.set(failed_key, 1, ex=3600)
-            failed_count = 1
-        else:
-            failed_count = int(failed_count) + 1
-            _redis_client.set(failed_key, failed_count, ex=3600)
+        # Atomic increment with 1 hour window
+        failed_count = hit_rate_limit(failed_key, OTP_MAX_FAILED_ATTEMPTS, 3600).count
         
         # Block user if threshold reached
         if failed_count >= OTP_MAX_FAILED_ATTEMPTS:
             block_key = _otp_blocked_key(country_code, mobile)
-            _redis_client.set(block_key, True, ex=OTP_BLOCK_DURATION_SECONDS)
+            _redis_client.set(block_key, 1, ex=OTP_BLOCK_DURATION_SECONDS)
             # Reset failed count after blocking
             _redis_client.delete(failed_key)
         
@@ -6,7 +6,7 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from typing import Optional, List
 from datetime import datetime, timedelta
-from deps import get_db
+from deps import get_read_db
 from Login_module.Utils.auth_user import get_current_user
 from Login_module.Utils.datetime_utils import to_ist_isoformat
 from Login_module.User.user_model import User
@@ -31,7 +31,7 @@ def get_otp_audit_logs(
     start_date: Optional[datetime] = Query(None, description="Start date (ISO format)"),
     end_date: Optional[datetime] = Query(None, description="End date (ISO format)"),
     limit: int = Query(100, ge=1, le=1000, description="Limit results"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """Get OTP audit logs. Admin only or own logs."""
@@ -86,7 +86,7 @@ def get_cart_audit_logs(
     start_date: Optional[datetime] = Query(None, description="Start date"),
     end_date: Optional[datetime] = Query(None, description="End date"),
     limit: int = Query(100, ge=1, le=1000),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """Get cart audit logs."""
@@ -138,7 +138,7 @@ def get_session_audit_logs(
     event_type: Optional[str] = Query(None),
     correlation_id: Optional[str] = Query(None),
     limit: int = Query(100, ge=1, le=1000),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """Get session audit logs."""
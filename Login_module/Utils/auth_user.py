@@ -11,6 +11,8 @@ from deps import get_db
 from Login_module.User.user_session_crud import get_user_by_id
 from Login_module.Device.Device_session_crud import get_device_session
 from Login_module.Device.Device_session_model import DeviceSession
+from Login_module.Device.session_cache import get_cached_session, cache_session
+from Login_module.Device.session_activity import record_session_touch
 from Login_module.Utils.datetime_utils import now_ist, to_ist
 from Member_module.Member_model import Member
 
@@ -175,19 +177,23 @@ def get_current_user(
                 detail={"error_code": "INVALID_TOKEN", "detail": "Invalid session information. Please log in again."}
             )
         
-        # Query database for session
-        try:
-            session = get_device_session(db, session_id_int)
-        except Exception as db_error:
-            logger.error(
-                f"Authentication failed - Database error while fetching session | "
-                f"User ID: {user_id} | Session ID: {session_id_int} | IP: {client_ip} | Error: {str(db_error)}",
-                exc_info=True
-            )
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail={"error_code": "DATABASE_ERROR", "detail": "Database error while verifying your session. Please try again."}
-            )
+        # Check the Redis session cache first; fall back to the database on a miss
+        session = get_cached_session(session_id_int)
+        if session is None:
+            try:
+                session = get_device_session(db, session_id_int)
+            except Exception as db_error:
+                logger.error(
+                    f"Authentication failed - Database error while fetching session | "
+                    f"User ID: {user_id} | Session ID: {session_id_int} | IP: {client_ip} | Error: {str(db_error)}",
+                    exc_info=True
+                )
+                raise HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail={"error_code": "DATABASE_ERROR", "detail": "Database error while verifying your session. Please try again."}
+                )
+            if session:
+                cache_session(session)
         
         if not session:
             # Session doesn't exist in database
@@ -238,44 +244,21 @@ def get_current_user(
             # Only update if last_active is None or if it's older than 1 minute
             # Both datetimes are now timezone-aware in IST, so comparison should work
             if not session_last_active_ist or session_last_active_ist < last_active_threshold:
-                session.last_active = now_ist()
-                db.commit()
-                db.refresh(session)
+                new_last_active = now_ist()
+                # Write-behind: buffered and flushed in bulk by the scheduler
+                record_session_touch(session_id_int, new_last_active)
+                cache_session(session, last_active=new_last_active)
                 logger.debug(
-                    f"Updated session last_active | Session ID: {session_id_int} | "
-                    f"Previous: {session_last_active_ist} | New: {session.last_active}"
+                    f"Buffered session last_active | Session ID: {session_id_int} | "
+                    f"Previous: {session_last_active_ist} | New: {new_last_active}"
                 )
-        except TypeError as tz_error:
-            # Handle timezone comparison errors - log and continue (don't fail authentication)
-            logger.warning(
-                f"Timezone comparison error while updating session last_active | "
-                f"Session ID: {session_id_int} | Error: {str(tz_error)} | "
-                f"Session last_active type: {type(session.last_active)} | "
-                f"Session last_active value: {session.last_active} | "
-                f"Will attempt to update with new timestamp"
-            )
-            # Try to update anyway with a new timestamp (force update to fix timezone issue)
-            try:
-                session.last_active = now_ist()
-                db.commit()
-                db.refresh(session)
-                logger.info(
-                    f"Fixed timezone issue by updating session last_active | Session ID: {session_id_int}"
-                )
-            except Exception as update_error:
-                logger.warning(
-                    f"Failed to update session last_active after timezone error | "
-                    f"Session ID: {session_id_int} | Error: {str(update_error)}"
-                )
-                db.rollback()
-        except Exception as commit_error:
+        except Exception as touch_error:
             logger.warning(
                 f"Failed to update session last_active | "
-                f"Session ID: {session_id_int} | Error: {str(commit_error)} | "
-                f"Error type: {type(commit_error).__name__}"
+                f"Session ID: {session_id_int} | Error: {str(touch_error)} | "
+                f"Error type: {type(touch_error).__name__}"
             )
             # Don't fail authentication if last_active update fails
-            db.rollback()
     except HTTPException:
         raise
     except Exception as e:
@@ -343,6 +326,11 @@ def get_current_user(
         request.state.token_valid = True
         request.state.token_invalid = False
 
+    # Read-replica routing: read sessions check request.state.user_id, and commits
+    # on this (primary) session pin the user to the primary for a short window
+    request.state.user_id = user.id
+    db.info["user_id"] = user.id
+
     return user
 
 
@@ -8,7 +8,11 @@ from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+import hmac
+import hashlib
+import logging
 import secrets
+from typing import Iterable, List, Optional
 from dotenv import load_dotenv
 
 # Load environment variables from .env file if it exists
@@ -68,6 +72,19 @@ if len(ENCRYPTION_KEY) != 32:
     key_material = ENCRYPTION_KEY if isinstance(ENCRYPTION_KEY, bytes) else ENCRYPTION_KEY.encode()
     ENCRYPTION_KEY = kdf.derive(key_material)
 
+# One cipher context for every call (AESGCM is stateless and thread-safe)
+_AESGCM = AESGCM(ENCRYPTION_KEY)
+
+# Blind index key: PHONE_INDEX_KEY (hex) if set, else derived from the encryption key.
+# Changing it requires recomputing members.mobile_hash / partner_consents.partner_mobile_hash.
+_index_key_hex = os.getenv("PHONE_INDEX_KEY")
+PHONE_INDEX_KEY = (
+    bytes.fromhex(_index_key_hex) if _index_key_hex
+    else hmac.new(ENCRYPTION_KEY, b"phone-blind-index-v1", hashlib.sha256).digest()
+)
+
+logger = logging.getLogger(__name__)
+
 
 def encrypt_phone(phone_number: str) -> str:
     """
@@ -97,12 +114,9 @@ def encrypt_phone(phone_number: str) -> str:
     # Use first 12 bytes of hash as nonce (GCM requires 12 bytes)
     nonce = phone_hash[:12]
     
-    # Create AESGCM cipher
-    aesgcm = AESGCM(ENCRYPTION_KEY)
-    
     # Encrypt the phone number
     phone_bytes = phone_number.encode('utf-8')
-    ciphertext = aesgcm.encrypt(nonce, phone_bytes, None)
+    ciphertext = _AESGCM.encrypt(nonce, phone_bytes, None)
     
     # Combine nonce and ciphertext, then base64 encode
     encrypted_data = nonce + ciphertext
@@ -137,21 +151,54 @@ def decrypt_phone(encrypted_phone: str) -> str:
         nonce = encrypted_data[:12]
         ciphertext = encrypted_data[12:]
         
-        # Create AESGCM cipher
-        aesgcm = AESGCM(ENCRYPTION_KEY)
-        
         # Decrypt the phone number
-        phone_bytes = aesgcm.decrypt(nonce, ciphertext, None)
+        phone_bytes = _AESGCM.decrypt(nonce, ciphertext, None)
         phone_number = phone_bytes.decode('utf-8')
         
         return phone_number
     except Exception as e:
         # If decryption fails, assume it's plain text and return as-is
         # This allows for backward compatibility with unencrypted phone numbers
-        import logging
-        logger = logging.getLogger(__name__)
         # Only log if it doesn't look like plain text (to reduce noise)
         if not (encrypted_phone.isdigit() and len(encrypted_phone) == 10):
             logger.debug(f"Failed to decrypt phone number (assuming plain text): {e}")
         return encrypted_phone
 
+
+def encrypt_many(phone_numbers: Iterable[Optional[str]]) -> List[Optional[str]]:
+    """Encrypt several phone numbers (same output as encrypt_phone, in order)."""
+    return [encrypt_phone(phone) for phone in phone_numbers]
+
+
+def decrypt_many(encrypted_phones: Iterable[Optional[str]]) -> List[Optional[str]]:
+    """
+    Decrypt several phone numbers (same output as decrypt_phone, in order).
+    Repeated values are decrypted once, which helps lists where several
+    members share a number.
+    """
+    encrypted_phones = list(encrypted_phones)
+    decrypted = {}
+    for value in encrypted_phones:
+        if value not in decrypted:
+            decrypted[value] = decrypt_phone(value)
+    return [decrypted[value] for value in encrypted_phones]
+
+
+def normalize_phone(phone_number: str) -> str:
+    """Digits only, last 10 digits (drops a country code), matching how member mobiles are stored."""
+    digits = "".join(ch for ch in phone_number if ch.isdigit())
+    return digits[-10:] if len(digits) > 10 else digits
+
+
+def phone_blind_index(phone_number: Optional[str]) -> Optional[str]:
+    """
+    Keyed HMAC-SHA256 of the normalized plain phone number (hex, 64 chars).
+    Stored next to the phone column so equality searches are indexed lookups,
+    whether the column holds plain text or ciphertext. Accepts either form.
+    """
+    if not phone_number:
+        return None
+    normalized = normalize_phone(decrypt_phone(phone_number))
+    if not normalized:
+        return None
+    return hmac.new(PHONE_INDEX_KEY, normalized.encode("utf-8"), hashlib.sha256).hexdigest()
@@ -1,24 +1,88 @@
 """
-IP-based rate limiting for OTP verification endpoint.
-Prevents brute force attacks from the same IP address.
+Redis rate limiting.
+
+hit_rate_limit() is the generic fixed-window limiter used by every limit in the app
+(OTP verification per IP, refresh per session, OTP send/failed attempts, phone change,
+partner consent). The check-and-increment runs in a server-side Lua script, so each
+check is one atomic Redis round-trip and concurrent bursts cannot overshoot the limit.
 """
 import redis
 import logging
-from typing import Optional
+from typing import NamedTuple, Optional
 from config import settings
 
 logger = logging.getLogger(__name__)
 
-# Import will be done after otp_manager is initialized
-_redis_client = None
 
 def _get_redis_client():
     """Lazy import to avoid circular dependency"""
-    global _redis_client
-    if _redis_client is None:
-        from Login_module.OTP import otp_manager
-        _redis_client = otp_manager._redis_client
-    return _redis_client
+    from Login_module.OTP import otp_manager
+    return otp_manager._get_redis_client()
+
+
+# KEYS[1] = counter key, ARGV[1] = limit, ARGV[2] = window seconds, ARGV[3] = cost
+# Returns {allowed (1/0), count after this call, ttl seconds}
+# A rejected hit is not counted, so the counter never exceeds the limit.
+_FIXED_WINDOW_LUA = """
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+local allowed = 0
+if current + cost <= limit then
+    current = redis.call('INCRBY', KEYS[1], cost)
+    allowed = 1
+end
+local ttl = redis.call('TTL', KEYS[1])
+if current > 0 and ttl < 0 then
+    redis.call('EXPIRE', KEYS[1], window)
+    ttl = window
+end
+return {allowed, current, ttl}
+"""
+
+_rate_limit_script = None
+_rate_limit_script_client = None
+
+
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    remaining: int
+    count: int
+    retry_after: int  # seconds until the window resets
+
+
+def _get_rate_limit_script(client):
+    """Register the Lua script once per client (redis-py uses EVALSHA with EVAL fallback)."""
+    global _rate_limit_script, _rate_limit_script_client
+    if _rate_limit_script is None or _rate_limit_script_client is not client:
+        _rate_limit_script = client.register_script(_FIXED_WINDOW_LUA)
+        _rate_limit_script_client = client
+    return _rate_limit_script
+
+
+def hit_rate_limit(key: str, limit: int, window_seconds: int, cost: int = 1) -> RateLimitResult:
+    """
+    Atomically count a hit against `key` and report whether it is within `limit`
+    for the current `window_seconds` window.
+
+    Raises redis.RedisError (or ConnectionError if Redis isn't configured); callers
+    decide whether to fail open or closed.
+    """
+    client = _get_redis_client()
+    if client is None:
+        raise redis.ConnectionError("Redis is not available")
+    allowed, count, ttl = _get_rate_limit_script(client)(
+        keys=[key], args=[limit, window_seconds, cost]
+    )
+    count = int(count)
+    return RateLimitResult(
+        allowed=bool(int(allowed)),
+        remaining=max(0, limit - count),
+        count=count,
+        retry_after=max(0, int(ttl)),
+    )
+
 
 # Rate limiting configuration - use settings directly (loaded from .env via Pydantic)
 VERIFY_OTP_MAX_ATTEMPTS_PER_IP = settings.VERIFY_OTP_MAX_ATTEMPTS_PER_IP
@@ -39,23 +103,10 @@ def check_ip_rate_limit(ip: str) -> tuple[bool, int]:
         return True, VERIFY_OTP_MAX_ATTEMPTS_PER_IP
     
     try:
-        redis_client = _get_redis_client()
-        key = _ip_rate_limit_key(ip)
-        attempts = redis_client.get(key)
-        
-        if attempts is None:
-            # First attempt, set counter with expiry
-            redis_client.set(key, 1, ex=VERIFY_OTP_WINDOW_SECONDS)
-            return True, VERIFY_OTP_MAX_ATTEMPTS_PER_IP - 1
-        
-        attempts = int(attempts)
-        if attempts >= VERIFY_OTP_MAX_ATTEMPTS_PER_IP:
-            return False, 0
-        
-        # Increment counter
-        redis_client.incr(key)
-        remaining = VERIFY_OTP_MAX_ATTEMPTS_PER_IP - attempts - 1
-        return True, max(0, remaining)
+        result = hit_rate_limit(
+            _ip_rate_limit_key(ip), VERIFY_OTP_MAX_ATTEMPTS_PER_IP, VERIFY_OTP_WINDOW_SECONDS
+        )
+        return result.allowed, result.remaining
     except Exception as e:
         logger.error(f"Redis error checking IP rate limit: {e}")
         # Fail closed for security - deny if Redis is down
@@ -106,23 +157,10 @@ def check_refresh_rate_limit(session_id: int) -> tuple[bool, int]:
         return False, 0
     
     try:
-        redis_client = _get_redis_client()
-        key = _refresh_rate_limit_key(session_id)
-        attempts = redis_client.get(key)
-        
-        if attempts is None:
-            # First attempt, set counter with expiry
-            redis_client.set(key, 1, ex=REFRESH_TOKEN_WINDOW_SECONDS)
-            return True, REFRESH_TOKEN_MAX_ATTEMPTS_PER_SESSION - 1
-        
-        attempts = int(attempts)
-        if attempts >= REFRESH_TOKEN_MAX_ATTEMPTS_PER_SESSION:
-            return False, 0
-        
-        # Increment counter
-        redis_client.incr(key)
-        remaining = REFRESH_TOKEN_MAX_ATTEMPTS_PER_SESSION - attempts - 1
-        return True, max(0, remaining)
+        result = hit_rate_limit(
+            _refresh_rate_limit_key(session_id), REFRESH_TOKEN_MAX_ATTEMPTS_PER_SESSION, REFRESH_TOKEN_WINDOW_SECONDS
+        )
+        return result.allowed, result.remaining
     except Exception as e:
         logger.error(f"Redis error checking refresh rate limit: {e}")
         # Fail closed for security - deny if Redis is down
@@ -138,13 +176,9 @@ def record_failed_refresh_attempt(session_id: int) -> bool:
         return False
     
     try:
-        redis_client = _get_redis_client()
-        key = _refresh_failed_attempts_key(session_id)
-        attempts = redis_client.incr(key)
-        
-        # Set expiry if this is the first attempt
-        if attempts == 1:
-            redis_client.expire(key, REFRESH_TOKEN_WINDOW_SECONDS)
+        attempts = hit_rate_limit(
+            _refresh_failed_attempts_key(session_id), REFRESH_TOKEN_MAX_FAILED_ATTEMPTS, REFRESH_TOKEN_WINDOW_SECONDS
+        ).count
         
         # Check if max failures reached
         if attempts >= REFRESH_TOKEN_MAX_FAILED_ATTEMPTS:
@@ -1,6 +1,8 @@
 from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, func, Date, Integer as IntCol, Boolean
+from sqlalchemy.orm import validates
 from database import Base
 from Login_module.Utils.datetime_utils import now_ist
+from Login_module.Utils.phone_encryption import phone_blind_index
 
 
 class Member(Base):
@@ -17,6 +19,7 @@ class Member(Base):
     gender = Column(String(20), nullable=False)  # M, F, Other
     dob = Column(Date, nullable=False)
     mobile = Column(String(100), nullable=False)  # Increased to 100 for encrypted phone numbers
+    mobile_hash = Column(String(64), nullable=True, index=True)  # Blind index of mobile (phone_blind_index), for lookups
     email = Column(String(255), nullable=True)  # Optional email address
     
     is_deleted = Column(Boolean, nullable=False, default=False, index=True)
@@ -29,3 +32,8 @@ class Member(Base):
 
     created_at = Column(DateTime(timezone=True), default=now_ist)
     updated_at = Column(DateTime(timezone=True), onupdate=now_ist)
+
+    @validates("mobile")
+    def _index_mobile(self, key, value):
+        self.mobile_hash = phone_blind_index(value)
+        return value
@@ -8,7 +8,7 @@ from pathlib import Path
 import os
 import logging
 
-from deps import get_db
+from deps import get_db, get_read_db
 
 logger = logging.getLogger(__name__)
 from .Member_schema import (
@@ -22,7 +22,7 @@ from .Member_s3_service import get_member_photo_s3_service
 from Login_module.Utils.auth_user import get_current_user, get_current_member
 from Login_module.Utils import security
 from Login_module.Utils.datetime_utils import to_ist_isoformat
-from Login_module.Utils.phone_encryption import decrypt_phone
+from Login_module.Utils.phone_encryption import decrypt_phone, decrypt_many
 from Login_module.Device.Device_session_crud import get_device_session
 from config import settings
 
@@ -34,41 +34,24 @@ security_scheme = HTTPBearer(auto_error=False)
 
 
 def _member_order_and_flag_fields(db: Session, member_id: int) -> dict:
-    """Return has_taken_genetic_test, latest_order_*, and gene_report_* for member profile. Two queries: latest order (any status) and latest Report Ready order."""
-    defaults = {
-        "has_taken_genetic_test": False,
-        "latest_order_no": None,
-        "latest_order_status": None,
-        "gene_report_order_no": None,
-        "gene_report_status": None,
-    }
+    """Return has_taken_genetic_test, latest_order_*, and gene_report_* for member profile."""
+    return _member_order_and_flag_fields_many(db, [member_id])[member_id]
+
+
+def _member_order_and_flag_fields_many(db: Session, member_ids: List[int]) -> dict:
+    """member_id -> order/flag fields for several members in a fixed number of queries (see member_order_summary)."""
+    from GeneticTest_module.member_order_summary import EMPTY_SUMMARY, get_member_order_summaries
 
     try:
-        from GeneticTest_module.GeneticTest_crud import (
-            get_participant_by_member_id,
-            get_latest_order_for_member,
-            get_latest_report_ready_order_for_member,
-        )
-        participant = get_participant_by_member_id(db, member_id)
-        has_taken_genetic_test = participant.has_taken_genetic_test if participant else False
-        latest = get_latest_order_for_member(db, member_id)
-        gene_report = get_latest_report_ready_order_for_member(db, member_id)
+        return get_member_order_summaries(db, member_ids)
     except Exception as exc:
         db.rollback()
         logger.warning(
-            "Member order summary lookup failed for member %s: %s",
-            member_id,
+            "Member order summary lookup failed for members %s: %s",
+            member_ids,
             exc,
         )
-        return defaults
-
-    return {
-        "has_taken_genetic_test": has_taken_genetic_test,
-        "latest_order_no": latest["order_number"] if latest else None,
-        "latest_order_status": latest["order_status"] if latest else None,
-        "gene_report_order_no": gene_report["order_number"] if gene_report else None,
-        "gene_report_status": gene_report["order_status"] if gene_report else None,
-    }
+        return {member_id: dict(EMPTY_SUMMARY) for member_id in member_ids}
 
 
 # Helper function to generate new token with selected_member_id
@@ -475,15 +458,16 @@ def edit_member_api(
 @router.get("/list", response_model=MemberListResponse)
 def get_member_list(
     plan_type: Optional[str] = Query(None, description="Deprecated; ignored because members no longer store plan association"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     user = Depends(get_current_user)
 ):
     members = get_members_by_user(db, user, plan_type=plan_type)
+    fields_by_member = _member_order_and_flag_fields_many(db, [m.id for m in members])
+    mobiles = [mobile or None for mobile in decrypt_many(m.mobile for m in members)]
     data = []
-    for m in members:
+    for m, decrypted_mobile in zip(members, mobiles):
         relation_value = str(m.relation) if m.relation is not None else ""
-        fields = _member_order_and_flag_fields(db, m.id)
-        decrypted_mobile = decrypt_phone(m.mobile) if m.mobile else None
+        fields = fields_by_member[m.id]
         data.append({
             "member_id": m.id,
             "name": m.name,
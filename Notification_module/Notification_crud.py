@@ -1,10 +1,13 @@
+import base64
 import logging
 from datetime import datetime, timezone
+from sqlalchemy import and_, or_, update
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
-from typing import Optional
+from typing import Optional, Tuple
 
 from .Notification_model import Notification, UserDeviceToken
+from . import unread_counter
 from Login_module.User.user_model import User
 
 logger = logging.getLogger(__name__)
@@ -58,20 +61,50 @@ def create_notification(
     db.add(row)
     db.commit()
     db.refresh(row)
+    unread_counter.adjust_unread([user_id], 1)
+    from .event_stream import publish_user_event, EVENT_NOTIFICATION
+    publish_user_event(user_id, EVENT_NOTIFICATION, {"id": row.id, "title": row.title, "type": row.type})
     return row
 
 
+def encode_notification_cursor(row: Notification) -> str:
+    """Opaque keyset cursor pointing just after `row` in newest-first order."""
+    raw = f"{row.created_at.isoformat()}|{row.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_notification_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Inverse of encode_notification_cursor. Raises ValueError if the cursor is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, row_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
 def list_notifications(
     db: Session,
     user_id: int,
     limit: Optional[int] = None,
     unread_only: bool = False,
+    cursor: Optional[str] = None,
 ) -> list[Notification]:
-    """List notifications for user, newest first. Optional limit and is_read filter."""
+    """
+    List notifications for user, newest first. Optional limit and is_read filter.
+    With a cursor (from encode_notification_cursor) only older rows are returned,
+    using the (user_id, created_at, id) index instead of an OFFSET scan.
+    """
     q = db.query(Notification).filter(Notification.user_id == user_id)
     if unread_only:
         q = q.filter(Notification.is_read == False)
-    q = q.order_by(Notification.created_at.desc())
+    if cursor:
+        created_at, row_id = decode_notification_cursor(cursor)
+        q = q.filter(or_(
+            Notification.created_at < created_at,
+            and_(Notification.created_at == created_at, Notification.id < row_id),
+        ))
+    q = q.order_by(Notification.created_at.desc(), Notification.id.desc())
     if limit is not None:
         q = q.limit(limit)
     return list(q.all())
@@ -94,24 +127,40 @@ def delete_device_tokens_by_value(db: Session, tokens: list[str]) -> int:
 
 def mark_notification_read(db: Session, notification_id: int, user_id: int) -> Optional[Notification]:
     """Mark a notification as read if it belongs to the user. Return the notification or None."""
-    row = db.query(Notification).filter(
+    # Conditional UPDATE so only a real unread -> read transition decrements the counter
+    result = db.execute(
+        update(Notification)
+        .where(
+            Notification.id == notification_id,
+            Notification.user_id == user_id,
+            Notification.is_read == False,
+        )
+        .values(is_read=True)
+    )
+    db.commit()
+    if result.rowcount:
+        unread_counter.adjust_unread([user_id], -1)
+    return db.query(Notification).filter(
         Notification.id == notification_id,
         Notification.user_id == user_id,
     ).first()
-    if not row:
-        return None
-    row.is_read = True
+
+
+def mark_all_notifications_read(db: Session, user_id: int) -> int:
+    """Mark every unread notification of the user as read in one UPDATE. Returns rows updated."""
+    result = db.execute(
+        update(Notification)
+        .where(Notification.user_id == user_id, Notification.is_read == False)
+        .values(is_read=True)
+    )
     db.commit()
-    db.refresh(row)
-    return row
+    unread_counter.reset_unread(user_id)
+    return result.rowcount
 
 
 def get_unread_count(db: Session, user_id: int) -> int:
-    """Return count of unread notifications for the user."""
-    return db.query(Notification).filter(
-        Notification.user_id == user_id,
-        Notification.is_read == False,
-    ).count()
+    """Return count of unread notifications for the user (cached, see unread_counter)."""
+    return unread_counter.get_unread_count(db, user_id)
 
 
 def send_notification_to_user(
@@ -122,47 +171,24 @@ def send_notification_to_user(
     type: Optional[str] = None,
 ) -> None:
     """
-    Create a notification in DB and send push via FCM to the user's devices.
+    Create a notification in DB and queue a push via FCM to the user's devices.
+    Delivery happens on the push dispatcher's worker threads (see push_dispatcher).
     Skips FCM send if user has notifications_enabled=False. Does not raise; logs errors.
     """
-    print(f"[FCM DEBUG] send_notification_to_user ENTRY: user_id={user_id} title={title!r}", flush=True)
     try:
         notification = create_notification(db, user_id=user_id, title=title, message=message, type=type)
         user = db.query(User).filter(User.id == user_id).first()
         notifications_enabled_val = getattr(user, "notifications_enabled", True)
-        print(f"[FCM DEBUG] send_notification_to_user called: user_id={user_id} notifications_enabled={notifications_enabled_val!r} pytype={notifications_enabled_val.__class__.__name__}", flush=True)
-        logger.info(
-            "send_notification_to_user: user_id=%s notifications_enabled=%r (pytype=%s)",
-            user_id, notifications_enabled_val, notifications_enabled_val.__class__.__name__
-        )
         if user and not notifications_enabled_val:
-            print(f"[FCM DEBUG] Skipping FCM: notifications_enabled is falsy for user_id={user_id}", flush=True)
             logger.info("Skipping FCM: notifications_enabled is falsy for user_id=%s", user_id)
             return
-        from . import firebase_service
         tokens = get_device_tokens_for_user(db, user_id)
-        firebase_service.init_firebase()
-        print(f"[FCM DEBUG] tokens={tokens} firebase_initialized={firebase_service.firebase_initialized}", flush=True)
         if not tokens:
-            print(f"[FCM DEBUG] Skipping FCM: no device tokens for user_id={user_id}", flush=True)
             logger.error("Skipping FCM: no device tokens for user_id=%s", user_id)
-        elif not firebase_service.firebase_initialized:
-            print(f"[FCM DEBUG] Skipping FCM: Firebase not initialized for user_id={user_id}", flush=True)
-            logger.error("Skipping FCM: Firebase not initialized")
-        else:
-            data = {"notification_id": str(notification.id), "type": type or ""}
-            invalid_tokens, success_count = firebase_service.send_fcm_to_tokens(tokens=tokens, title=title, body=message, data=data)
-            if success_count is not None:
-                if success_count > 0:
-                    logger.info("FCM send attempted for user_id=%s, delivered to %s device(s)", user_id, success_count)
-                else:
-                    logger.warning("FCM send attempted for user_id=%s, delivered to 0 device(s)", user_id)
-            if invalid_tokens:
-                from config import settings
-                if settings.REMOVE_INVALID_FCM_TOKENS:
-                    removed = delete_device_tokens_by_value(db, invalid_tokens)
-                    logger.info("Removed %s invalid FCM token(s) for user_id=%s", removed, user_id)
-                else:
-                    logger.debug("Invalid FCM token(s) for user_id=%s not removed (REMOVE_INVALID_FCM_TOKENS=false)", user_id)
+            return
+        from .push_dispatcher import enqueue_push
+        data = {"notification_id": str(notification.id), "type": type or ""}
+        if enqueue_push(tokens, title=title, body=message, data=data):
+            logger.info("FCM push queued for user_id=%s, %s device(s)", user_id, len(tokens))
     except Exception as e:
         logger.error("send_notification_to_user failed (user_id=%s): %s", user_id, e, exc_info=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, func
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, Index, func
 from database import Base
 from Login_module.Utils.datetime_utils import now_ist
 
@@ -14,6 +14,11 @@ class Notification(Base):
     is_read = Column(Boolean, default=False, nullable=False)
     created_at = Column(DateTime(timezone=True), default=now_ist)
 
+    __table_args__ = (
+        Index("ix_notifications_user_read", "user_id", "is_read"),  # Unread counts
+        Index("ix_notifications_user_created_id", "user_id", "created_at", "id"),  # Keyset pagination
+    )
+
 
 class UserDeviceToken(Base):
     __tablename__ = "user_device_tokens"
@@ -23,3 +28,28 @@ class UserDeviceToken(Base):
     device_token = Column(String(255), unique=True, nullable=False)
     created_at = Column(DateTime(timezone=True), default=now_ist)
     updated_at = Column(DateTime(timezone=True), default=now_ist, onupdate=now_ist)
+
+
+class NotificationBroadcastJob(Base):
+    """
+    Admin broadcast to a user segment. Progress is tracked here while the job runs
+    in the background; last_user_id is the keyset cursor so an interrupted job resumes.
+    """
+    __tablename__ = "notification_broadcast_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    segment = Column(String(30), nullable=False)  # all, order_status, newsletter, city
+    segment_value = Column(String(255), nullable=True)  # e.g. REPORT_READY or a city name
+    title = Column(String(255), nullable=False)
+    message = Column(Text, nullable=False)
+    type = Column(String(50), nullable=True)
+    status = Column(String(20), nullable=False, default="pending", index=True)  # pending, running, completed, failed
+    total_users = Column(Integer, nullable=True)  # Matching users counted when the job starts
+    processed_users = Column(Integer, nullable=False, default=0)
+    push_tokens = Column(Integer, nullable=False, default=0)
+    last_user_id = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), default=now_ist)
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
@@ -1,10 +1,11 @@
 import logging
 from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
-from deps import get_db
+from deps import check_admin_key, get_db, get_read_db
 from Login_module.Utils.auth_user import get_current_user
 from Login_module.User.user_model import User
 
@@ -14,16 +15,22 @@ from .Notification_schema import (
     UnreadCountResponse,
     NotificationSettingsResponse,
     NotificationSettingsUpdate,
+    BroadcastNotificationRequest,
+    BroadcastJobResponse,
 )
 from .Notification_crud import (
     create_notification,
     list_notifications,
     get_device_tokens_for_user,
-    delete_device_tokens_by_value,
     mark_notification_read,
+    mark_all_notifications_read,
     get_unread_count,
+    encode_notification_cursor,
 )
-from . import firebase_service
+from .push_dispatcher import enqueue_push
+from .Notification_model import NotificationBroadcastJob
+from .broadcast_service import create_broadcast_job, start_broadcast_job
+from .event_stream import sse_events, wait_for_user_event, LONG_POLL_MAX_SECONDS
 from Login_module.Utils.datetime_utils import to_ist_isoformat
 
 logger = logging.getLogger(__name__)
@@ -37,8 +44,7 @@ def post_notifications_send(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    """Create a notification in DB and send push via FCM to the user's devices. Requires auth."""
-    print(f"[FCM DEBUG] POST /notifications/send called: user_id={body.user_id}", flush=True)
+    """Create a notification in DB and queue a push via FCM to the user's devices. Requires auth."""
     if body.user_id != current_user.id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -52,48 +58,41 @@ def post_notifications_send(
         type=body.type,
     )
     tokens = get_device_tokens_for_user(db, body.user_id)
-    firebase_service.init_firebase()
     if not tokens:
         logger.error("Skipping FCM: no device tokens for user_id=%s", body.user_id)
-    elif not firebase_service.firebase_initialized:
-        logger.error("Skipping FCM: Firebase not initialized")
     else:
         data = {"notification_id": str(notification.id), "type": body.type or ""}
-        invalid_tokens, success_count = firebase_service.send_fcm_to_tokens(
-            tokens=tokens,
-            title=body.title,
-            body=body.message,
-            data=data,
-        )
-        if success_count is not None:
-            if success_count > 0:
-                logger.info("FCM send attempted for user_id=%s, delivered to %s device(s)", body.user_id, success_count)
-            else:
-                logger.warning("FCM send attempted for user_id=%s, delivered to 0 device(s)", body.user_id)
-        if invalid_tokens:
-            from config import settings
-            if settings.REMOVE_INVALID_FCM_TOKENS:
-                removed = delete_device_tokens_by_value(db, invalid_tokens)
-                logger.info("Removed %s invalid FCM token(s) for user_id=%s", removed, body.user_id)
-            else:
-                logger.debug("Invalid FCM token(s) for user_id=%s not removed (REMOVE_INVALID_FCM_TOKENS=false)", body.user_id)
+        if enqueue_push(tokens, title=body.title, body=body.message, data=data):
+            logger.info("FCM push queued for user_id=%s, %s device(s)", body.user_id, len(tokens))
     return {"status": "success", "message": "Notification created and sent"}
 
 
 @router.get("/notifications", response_model=list[NotificationItem])
 def get_notifications(
+    response: Response,
     limit: Optional[int] = None,
     unread_only: bool = False,
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user),
 ):
-    """List notifications for the authenticated user. Optional limit and unread_only filter. Timestamps in IST."""
-    items = list_notifications(
-        db,
-        user_id=current_user.id,
-        limit=limit,
-        unread_only=unread_only,
-    )
+    """
+    List notifications for the authenticated user. Optional limit and unread_only filter. Timestamps in IST.
+    Keyset pagination: when a full page is returned with a limit, the X-Next-Cursor header holds the
+    cursor for the next (older) page; pass it back as ?cursor=.
+    """
+    try:
+        items = list_notifications(
+            db,
+            user_id=current_user.id,
+            limit=limit,
+            unread_only=unread_only,
+            cursor=cursor,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if limit and len(items) == limit:
+        response.headers["X-Next-Cursor"] = encode_notification_cursor(items[-1])
     return [
         NotificationItem(
             id=n.id,
@@ -107,6 +106,16 @@ def get_notifications(
     ]
 
 
+@router.put("/notifications/read-all")
+def put_notifications_read_all(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Mark all of the authenticated user's notifications as read in one bulk update."""
+    updated = mark_all_notifications_read(db, user_id=current_user.id)
+    return {"status": "success", "updated": updated}
+
+
 @router.put("/notifications/{notification_id}/read", response_model=NotificationItem)
 def put_notification_read(
     notification_id: int,
@@ -160,3 +169,105 @@ def patch_notification_settings(
     db.commit()
     db.refresh(current_user)
     return NotificationSettingsResponse(notifications_enabled=current_user.notifications_enabled)
+
+
+@router.get("/events/stream")
+async def get_events_stream(
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Server-Sent Events stream of the authenticated user's order status changes and new
+    notifications (events: order_status, notification). Replaces polling order tracking,
+    order list and unread-count.
+    """
+    user_id = current_user.id
+    db.close()  # Don't hold a pooled DB connection for the lifetime of the stream
+    return StreamingResponse(
+        sse_events(user_id, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/events/poll")
+async def get_events_poll(
+    timeout: int = Query(LONG_POLL_MAX_SECONDS, ge=1, le=LONG_POLL_MAX_SECONDS),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Long-poll fallback for clients without SSE: the next event, or 204 after `timeout` seconds."""
+    user_id = current_user.id
+    db.close()
+    message = await wait_for_user_event(user_id, timeout)
+    if message is None:
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
+    return message
+
+
+def verify_broadcast_admin_key(
+    x_admin_key: Optional[str] = Header(None, alias="X-Admin-Key")
+) -> None:
+    """Require settings.NOTIFICATION_BROADCAST_KEY in X-Admin-Key; broadcasts are disabled while it is empty."""
+    from config import settings
+    check_admin_key(x_admin_key, settings.NOTIFICATION_BROADCAST_KEY)
+
+
+def _broadcast_job_response(job: NotificationBroadcastJob) -> BroadcastJobResponse:
+    return BroadcastJobResponse(
+        job_id=job.id,
+        status=job.status,
+        segment=job.segment,
+        value=job.segment_value,
+        total_users=job.total_users,
+        processed_users=job.processed_users,
+        push_tokens=job.push_tokens,
+        error=job.error,
+        created_at=to_ist_isoformat(job.created_at),
+        started_at=to_ist_isoformat(job.started_at),
+        finished_at=to_ist_isoformat(job.finished_at),
+    )
+
+
+@router.post(
+    "/admin/notifications/broadcast",
+    response_model=BroadcastJobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+def post_notifications_broadcast(
+    body: BroadcastNotificationRequest,
+    db: Session = Depends(get_db),
+    _: None = Depends(verify_broadcast_admin_key),
+):
+    """
+    Notify every user in a segment (admin). Returns a job immediately; poll
+    GET /api/admin/notifications/broadcast/{job_id} for progress.
+    """
+    try:
+        job = create_broadcast_job(
+            db,
+            segment=body.segment,
+            segment_value=body.value,
+            title=body.title,
+            message=body.message,
+            type=body.type,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    start_broadcast_job(job.id)
+    logger.info("Broadcast job %s queued: segment=%s value=%s", job.id, job.segment, job.segment_value)
+    return _broadcast_job_response(job)
+
+
+@router.get("/admin/notifications/broadcast/{job_id}", response_model=BroadcastJobResponse)
+def get_notifications_broadcast(
+    job_id: int,
+    db: Session = Depends(get_db),
+    _: None = Depends(verify_broadcast_admin_key),
+):
+    """Progress of a broadcast job (admin)."""
+    job = db.get(NotificationBroadcastJob, job_id)
+    if not job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Broadcast job not found")
+    return _broadcast_job_response(job)
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional
+from typing import Literal, Optional
 from pydantic import BaseModel, Field
 
 
@@ -37,3 +37,29 @@ class NotificationSettingsResponse(BaseModel):
 class NotificationSettingsUpdate(BaseModel):
     """Body for PATCH /api/notifications/settings"""
     enabled: bool = Field(..., description="Enable or disable push notifications")
+
+
+class BroadcastNotificationRequest(BaseModel):
+    """Body for POST /api/admin/notifications/broadcast"""
+    segment: Literal["all", "order_status", "newsletter", "city"] = Field(
+        ..., description="all, order_status (value = order status, e.g. REPORT_READY), newsletter, city (value = city name)"
+    )
+    value: Optional[str] = Field(None, max_length=255, description="Segment value for order_status / city")
+    title: str = Field(..., min_length=1, max_length=255)
+    message: str = Field(..., min_length=1)
+    type: Optional[str] = Field(None, max_length=50, description="e.g. info, promo")
+
+
+class BroadcastJobResponse(BaseModel):
+    """Broadcast job progress. Timestamps are IST ISO strings."""
+    job_id: int
+    status: str
+    segment: str
+    value: Optional[str] = None
+    total_users: Optional[int] = None
+    processed_users: int
+    push_tokens: int
+    error: Optional[str] = None
+    created_at: Optional[str] = None
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
@@ -0,0 +1,256 @@
+"""
+Broadcast / segment notification jobs.
+
+An admin request creates a NotificationBroadcastJob and returns immediately;
+the job runs on a background thread:
+
+- Matching users are read in keyset chunks (users.id > last_user_id ORDER BY
+  id LIMIT BROADCAST_CHUNK_SIZE), each an indexed range scan.
+- Each chunk is one transaction: a multi-row INSERT into notifications, one
+  token query for users with notifications enabled, and the job's progress
+  counters and cursor.
+- Tokens are handed to push_dispatcher with the same payload, so they go out
+  as 500-token multicasts.
+
+A 100k-user campaign is about 100 transactions instead of 100k. Jobs are
+claimed with a conditional UPDATE and keep a heartbeat, so one interrupted by
+a restart is resumed (resume_broadcast_jobs) from its cursor by one worker.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Optional
+
+from sqlalchemy import and_, func, insert, or_, select, true, update
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from Login_module.User.user_model import User
+from Login_module.Utils.datetime_utils import now_ist
+from .Notification_model import Notification, NotificationBroadcastJob, UserDeviceToken
+from .unread_counter import adjust_unread
+from .event_stream import publish_user_events, EVENT_NOTIFICATION
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_ALL = "all"
+SEGMENT_ORDER_STATUS = "order_status"
+SEGMENT_NEWSLETTER = "newsletter"
+SEGMENT_CITY = "city"
+SEGMENTS = (SEGMENT_ALL, SEGMENT_ORDER_STATUS, SEGMENT_NEWSLETTER, SEGMENT_CITY)
+
+BROADCAST_CHUNK_SIZE = 1000
+BROADCAST_LEASE_SECONDS = 300  # A running job without a heartbeat for this long can be taken over
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def segment_filter(segment: str, value: Optional[str]):
+    """SQL condition on User selecting the segment's active members."""
+    return and_(User.is_active == True, _segment_condition(segment, value))
+
+
+def _segment_condition(segment: str, value: Optional[str]):
+    if segment == SEGMENT_ALL:
+        return true()
+    if segment == SEGMENT_ORDER_STATUS:
+        from Orders_module.Order_model import Order, OrderItem, OrderStatus
+        order_status = OrderStatus(value)
+        return or_(
+            User.id.in_(select(Order.user_id).where(Order.order_status == order_status)),
+            User.id.in_(select(OrderItem.user_id).where(OrderItem.order_status == order_status)),
+        )
+    if segment == SEGMENT_NEWSLETTER:
+        from Newsletter_module.Newsletter_model import NewsletterSubscription
+        return User.id.in_(
+            select(NewsletterSubscription.user_id).where(
+                NewsletterSubscription.is_active == True,
+                NewsletterSubscription.user_id.isnot(None),
+            )
+        )
+    if segment == SEGMENT_CITY:
+        from Address_module.Address_model import Address
+        return User.id.in_(
+            select(Address.user_id).where(
+                func.lower(func.trim(Address.city)) == (value or "").strip().lower(),
+                Address.is_deleted == False,
+            )
+        )
+    raise ValueError(f"Unknown segment '{segment}'. Expected one of: {', '.join(SEGMENTS)}")
+
+
+def create_broadcast_job(
+    db: Session,
+    segment: str,
+    segment_value: Optional[str],
+    title: str,
+    message: str,
+    type: Optional[str] = None,
+) -> NotificationBroadcastJob:
+    """Validate the segment and store a pending job. Raises ValueError for a bad segment/value."""
+    if segment in (SEGMENT_ORDER_STATUS, SEGMENT_CITY) and not (segment_value or "").strip():
+        raise ValueError(f"Segment '{segment}' requires a value")
+    segment_filter(segment, segment_value)
+    job = NotificationBroadcastJob(
+        segment=segment,
+        segment_value=segment_value.strip() if segment_value else None,
+        title=title,
+        message=message,
+        type=type,
+        status="pending",
+        processed_users=0,
+        push_tokens=0,
+        last_user_id=0,
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def _claim(db: Session, job_id: int) -> bool:
+    """Take the job if it is pending or its runner stopped heartbeating."""
+    now = now_ist()
+    result = db.execute(
+        update(NotificationBroadcastJob)
+        .where(
+            NotificationBroadcastJob.id == job_id,
+            or_(
+                NotificationBroadcastJob.status == "pending",
+                (NotificationBroadcastJob.status == "running")
+                & (NotificationBroadcastJob.heartbeat_at < now - timedelta(seconds=BROADCAST_LEASE_SECONDS)),
+            ),
+        )
+        .values(status="running", heartbeat_at=now)
+    )
+    db.commit()
+    return result.rowcount == 1
+
+
+def _process_chunk(db: Session, job: NotificationBroadcastJob, rows) -> list:
+    """Insert the chunk's notifications and return the push tokens (caller commits)."""
+    now = now_ist()
+    db.execute(
+        insert(Notification),
+        [
+            {"user_id": user_id, "title": job.title, "message": job.message, "type": job.type,
+             "is_read": False, "created_at": now}
+            for user_id, _ in rows
+        ],
+    )
+    enabled = [user_id for user_id, notifications_enabled in rows if notifications_enabled]
+    tokens = []
+    if enabled:
+        tokens = [
+            token for (token,) in
+            db.query(UserDeviceToken.device_token).filter(UserDeviceToken.user_id.in_(enabled)).all()
+        ]
+    job.processed_users += len(rows)
+    job.push_tokens += len(tokens)
+    job.last_user_id = rows[-1][0]
+    job.heartbeat_at = now
+    return tokens
+
+
+def run_broadcast_job(job_id: int) -> None:
+    """Run (or resume) a broadcast job to completion on the calling thread."""
+    from .push_dispatcher import enqueue_push
+
+    db = SessionLocal()
+    try:
+        if not _claim(db, job_id):
+            logger.info(f"Broadcast job {job_id} already running or finished, skipping")
+            return
+        job = db.get(NotificationBroadcastJob, job_id)
+        condition = segment_filter(job.segment, job.segment_value)
+        if job.started_at is None:
+            job.started_at = now_ist()
+            job.total_users = db.query(func.count(User.id)).filter(condition).scalar() or 0
+            db.commit()
+        logger.info(f"Broadcast job {job_id} running | Segment: {job.segment}={job.segment_value} | Users: {job.total_users}")
+
+        data = {"type": job.type or "", "broadcast_job_id": str(job.id)}
+        while True:
+            rows = db.execute(
+                select(User.id, User.notifications_enabled)
+                .where(condition, User.id > job.last_user_id)
+                .order_by(User.id)
+                .limit(BROADCAST_CHUNK_SIZE)
+            ).all()
+            if not rows:
+                break
+            tokens = _process_chunk(db, job, rows)
+            db.commit()
+            user_ids = [user_id for user_id, _ in rows]
+            adjust_unread(user_ids, 1)
+            publish_user_events(user_ids, EVENT_NOTIFICATION, {"title": job.title, "type": job.type, "broadcast_job_id": job.id})
+            if tokens:
+                enqueue_push(tokens, title=job.title, body=job.message, data=data)
+
+        job.status = "completed"
+        job.finished_at = now_ist()
+        db.commit()
+        logger.info(f"Broadcast job {job_id} completed | Users: {job.processed_users} | Push tokens: {job.push_tokens}")
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Broadcast job {job_id} failed: {e}", exc_info=True)
+        try:
+            db.execute(
+                update(NotificationBroadcastJob)
+                .where(NotificationBroadcastJob.id == job_id)
+                .values(status="failed", error=str(e)[:2000], finished_at=now_ist())
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+    finally:
+        db.close()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="notification-broadcast")
+        return _executor
+
+
+def start_broadcast_job(job_id: int) -> None:
+    """Run the job in the background (one job at a time per worker process)."""
+    _get_executor().submit(run_broadcast_job, job_id)
+
+
+def resume_broadcast_jobs() -> int:
+    """Queue pending jobs and running jobs whose heartbeat expired (e.g. after a restart)."""
+    db = SessionLocal()
+    try:
+        stale_before = now_ist() - timedelta(seconds=BROADCAST_LEASE_SECONDS)
+        job_ids = [
+            job_id for (job_id,) in db.query(NotificationBroadcastJob.id).filter(
+                or_(
+                    NotificationBroadcastJob.status == "pending",
+                    (NotificationBroadcastJob.status == "running")
+                    & (NotificationBroadcastJob.heartbeat_at < stale_before),
+                )
+            ).order_by(NotificationBroadcastJob.id).all()
+        ]
+    except Exception as e:
+        logger.error(f"Error looking up broadcast jobs to resume: {e}")
+        return 0
+    finally:
+        db.close()
+    for job_id in job_ids:
+        start_broadcast_job(job_id)
+    if job_ids:
+        logger.info(f"Resuming {len(job_ids)} broadcast job(s)")
+    return len(job_ids)
+
+
+def shutdown_broadcast_executor() -> None:
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
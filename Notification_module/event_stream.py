@@ -0,0 +1,242 @@
+"""
+Per-user event stream (Server-Sent Events / long-poll) over Redis pub/sub.
+
+Writers call publish_user_event(user_id, event, data) after their commit
+(order status updates, webhook order confirmation, new notifications). The
+message is published on user_events:{user_id}.
+
+Each worker process runs one listener thread with a pattern subscription
+(user_events:*) and fans messages out to the asyncio queues of the clients
+connected to that process. That is one Redis connection per process, not one
+per client. Without Redis, events only reach clients connected to the
+publishing process.
+
+Events are change signals ("order 262700... is now REPORT_READY"), not a
+durable log. A client that reconnects should refetch its state once.
+"""
+import asyncio
+import json
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, List, Optional, Set
+
+from Login_module.Utils.datetime_utils import now_ist
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = "user_events:"
+SSE_HEARTBEAT_SECONDS = 15
+SSE_RETRY_MILLISECONDS = 5000
+SUBSCRIBER_QUEUE_SIZE = 100
+LONG_POLL_MAX_SECONDS = 25
+
+EVENT_ORDER_STATUS = "order_status"
+EVENT_NOTIFICATION = "notification"
+
+
+@dataclass(eq=False)
+class Subscription:
+    user_id: int
+    loop: asyncio.AbstractEventLoop
+    queue: asyncio.Queue = field(default_factory=lambda: asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE))
+
+
+_lock = threading.Lock()
+_subscriptions: Dict[int, Set[Subscription]] = {}
+_listener: Optional[threading.Thread] = None
+_stop = threading.Event()
+_metrics = {"published": 0, "delivered": 0, "dropped": 0, "publish_errors": 0}
+
+
+def _bump(name: str, amount: int = 1) -> None:
+    with _lock:
+        _metrics[name] += amount
+
+
+def _get_redis_client():
+    """Lazy import to avoid circular dependency (shares the OTP Redis client)."""
+    from Login_module.OTP import otp_manager
+    client = otp_manager._get_redis_client()
+    return client if otp_manager._redis_available else None
+
+
+# ---------------------------------------------------------------------------
+# Publishing
+# ---------------------------------------------------------------------------
+
+def publish_user_event(user_id: int, event: str, data: dict) -> None:
+    """Send an event to the user's connected clients. Never raises; call after commit."""
+    message = {"event": event, "data": data, "ts": now_ist().isoformat()}
+    try:
+        client = _get_redis_client()
+        if client is not None:
+            client.publish(f"{CHANNEL_PREFIX}{user_id}", json.dumps(message, default=str))
+            _bump("published")
+            return
+    except Exception as e:
+        _bump("publish_errors")
+        logger.warning(f"User event publish failed, delivering locally | User: {user_id} | Event: {event} | Error: {e}")
+    _bump("published")
+    _deliver_local(user_id, message)
+
+
+def publish_user_events(user_ids: List[int], event: str, data: dict) -> None:
+    """publish_user_event for many users with one pipelined round-trip (broadcasts)."""
+    if not user_ids:
+        return
+    message = {"event": event, "data": data, "ts": now_ist().isoformat()}
+    try:
+        client = _get_redis_client()
+        if client is not None:
+            payload = json.dumps(message, default=str)
+            pipe = client.pipeline(transaction=False)
+            for user_id in user_ids:
+                pipe.publish(f"{CHANNEL_PREFIX}{user_id}", payload)
+            pipe.execute()
+            _bump("published", len(user_ids))
+            return
+    except Exception as e:
+        _bump("publish_errors")
+        logger.warning(f"User event publish failed, delivering locally | Users: {len(user_ids)} | Event: {event} | Error: {e}")
+    _bump("published", len(user_ids))
+    for user_id in user_ids:
+        _deliver_local(user_id, message)
+
+
+def _offer(queue: asyncio.Queue, message: dict) -> None:
+    """Runs on the subscriber's event loop. A slow client loses its oldest event, not the newest."""
+    if queue.full():
+        try:
+            queue.get_nowait()
+            _bump("dropped")
+        except asyncio.QueueEmpty:
+            pass
+    queue.put_nowait(message)
+
+
+def _deliver_local(user_id: int, message: dict) -> None:
+    with _lock:
+        subscriptions = list(_subscriptions.get(user_id, ()))
+    for subscription in subscriptions:
+        try:
+            subscription.loop.call_soon_threadsafe(_offer, subscription.queue, message)
+            _bump("delivered")
+        except RuntimeError:
+            pass  # Loop closed; the subscription is being torn down
+
+
+# ---------------------------------------------------------------------------
+# Listener
+# ---------------------------------------------------------------------------
+
+def _listen_forever() -> None:
+    while not _stop.is_set():
+        client = _get_redis_client()
+        if client is None:
+            _stop.wait(5)
+            continue
+        pubsub = None
+        try:
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            pubsub.psubscribe(f"{CHANNEL_PREFIX}*")
+            while not _stop.is_set():
+                raw = pubsub.get_message(timeout=1.0)
+                if not raw:
+                    continue
+                channel = raw["channel"]
+                channel = channel.decode() if isinstance(channel, bytes) else channel
+                user_id = channel[len(CHANNEL_PREFIX):]
+                if user_id.isdigit():
+                    _deliver_local(int(user_id), json.loads(raw["data"]))
+        except Exception as e:
+            logger.warning(f"User event listener error, reconnecting: {e}")
+            _stop.wait(1)
+        finally:
+            if pubsub is not None:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+
+
+def _ensure_listener() -> None:
+    global _listener
+    with _lock:
+        if _listener is not None and _listener.is_alive():
+            return
+        _stop.clear()
+        _listener = threading.Thread(target=_listen_forever, name="user-event-listener", daemon=True)
+        _listener.start()
+
+
+def stop_event_listener(timeout: float = 5.0) -> None:
+    global _listener
+    _stop.set()
+    listener, _listener = _listener, None
+    if listener is not None:
+        listener.join(timeout=timeout)
+
+
+# ---------------------------------------------------------------------------
+# Subscribing (SSE / long-poll)
+# ---------------------------------------------------------------------------
+
+def subscribe(user_id: int) -> Subscription:
+    """Register a client on the running event loop."""
+    _ensure_listener()
+    subscription = Subscription(user_id=user_id, loop=asyncio.get_running_loop())
+    with _lock:
+        _subscriptions.setdefault(user_id, set()).add(subscription)
+    return subscription
+
+
+def unsubscribe(subscription: Subscription) -> None:
+    with _lock:
+        subscriptions = _subscriptions.get(subscription.user_id)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del _subscriptions[subscription.user_id]
+
+
+def _format_sse(message: dict) -> str:
+    return f"event: {message['event']}\ndata: {json.dumps(message, default=str)}\n\n"
+
+
+async def sse_events(user_id: int, is_disconnected) -> AsyncIterator[str]:
+    """SSE body for one client: events as they arrive, a comment heartbeat when idle."""
+    subscription = subscribe(user_id)
+    try:
+        yield f"retry: {SSE_RETRY_MILLISECONDS}\n\n"
+        while True:
+            if await is_disconnected():
+                break
+            try:
+                message = await asyncio.wait_for(subscription.queue.get(), timeout=SSE_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            yield _format_sse(message)
+    finally:
+        unsubscribe(subscription)
+
+
+async def wait_for_user_event(user_id: int, timeout: float) -> Optional[dict]:
+    """Long-poll: the next event for the user, or None after `timeout` seconds."""
+    subscription = subscribe(user_id)
+    try:
+        return await asyncio.wait_for(subscription.queue.get(), timeout=min(timeout, LONG_POLL_MAX_SECONDS))
+    except asyncio.TimeoutError:
+        return None
+    finally:
+        unsubscribe(subscription)
+
+
+def get_event_stream_metrics() -> dict:
+    with _lock:
+        metrics = dict(_metrics)
+        metrics["connected_users"] = len(_subscriptions)
+        metrics["connections"] = sum(len(s) for s in _subscriptions.values())
+    metrics["listener_alive"] = bool(_listener and _listener.is_alive())
+    return metrics
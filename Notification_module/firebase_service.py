@@ -80,6 +80,48 @@ def _is_invalid_or_unregistered_token(exc: Optional[Exception]) -> bool:
     return False
 
 
+def _is_transient_error(exc: Optional[Exception]) -> bool:
+    """Return True if the FCM error is worth retrying (server unavailable/internal, quota, timeouts)."""
+    if exc is None:
+        return False
+    name = type(exc).__name__
+    if name in ("UnavailableError", "InternalError", "QuotaExceededError", "DeadlineExceededError"):
+        return True
+    msg = (getattr(exc, "message", None) or str(exc)).lower()
+    return any(word in msg for word in ("unavailable", "internal error", "quota", "timed out", "timeout", "deadline"))
+
+
+def send_multicast(
+    tokens: list[str],
+    title: str,
+    body: str,
+    data: Optional[dict[str, str]] = None,
+) -> list[Optional[Exception]]:
+    """
+    One send_each_for_multicast call (at most 500 tokens).
+    Returns one entry per token: None on success, else the FCM exception.
+    Raises if the whole batch failed or Firebase is not available.
+    """
+    init_firebase()
+    if not firebase_initialized:
+        raise RuntimeError("Firebase not initialized")
+    from firebase_admin import messaging
+
+    message = messaging.MulticastMessage(
+        notification=messaging.Notification(title=title, body=body),
+        data=data,
+        tokens=tokens,
+    )
+    batch = messaging.send_each_for_multicast(message)
+    logger.info(
+        "FCM batch: success_count=%s failure_count=%s total=%s",
+        batch.success_count,
+        batch.failure_count,
+        len(tokens),
+    )
+    return [None if r.success else getattr(r, "exception", None) or RuntimeError("FCM send failed") for r in batch.responses]
+
+
 def send_fcm_to_tokens(
     tokens: list[str],
     title: str,
@@ -87,10 +129,11 @@ def send_fcm_to_tokens(
     data: Optional[dict] = None,
 ) -> Tuple[list[str], Optional[int]]:
     """
-    Send FCM notification to the given device tokens.
+    Send FCM notification to the given device tokens (synchronously, on the calling thread).
     Does not raise; logs errors so API responses are not tied to FCM failures.
     Returns (invalid_tokens, success_count): list of token strings that are invalid/unregistered
     and should be removed from DB, and the number of successful deliveries (None if batch failed).
+    Request handlers should use push_dispatcher.enqueue_push instead.
     """
     invalid_tokens: list[str] = []
     if not tokens:
@@ -99,57 +142,21 @@ def send_fcm_to_tokens(
     if not firebase_initialized:
         return (invalid_tokens, None)
 
-    try:
-        import firebase_admin
-        from firebase_admin import messaging
-    except ImportError:
-        logger.warning("firebase-admin not available; skipping FCM send.")
-        return (invalid_tokens, None)
-
-    if not firebase_admin._apps:
-        logger.warning("Firebase not initialized; skipping FCM send.")
-        return (invalid_tokens, None)
-
-    logger.debug(
-        "FCM send: token_count=%s first_token_prefix=%s",
-        len(tokens),
-        (tokens[0][:20] + "..." if len(tokens[0]) > 20 else tokens[0]) if tokens else "",
-    )
-
     # data must be string key -> string value for FCM
     data_dict: Optional[dict[str, str]] = None
     if data:
         data_dict = {k: str(v) for k, v in data.items()}
 
-    message = messaging.MulticastMessage(
-        notification=messaging.Notification(title=title, body=body),
-        data=data_dict,
-        tokens=tokens,
-    )
     try:
-        batch = messaging.send_each_for_multicast(message)
-        print(f"[FCM DEBUG] batch result: success={batch.success_count} failure={batch.failure_count} total={len(tokens)}", flush=True)
-        logger.info(
-            "FCM batch: success_count=%s failure_count=%s total=%s",
-            batch.success_count,
-            batch.failure_count,
-            len(tokens),
-        )
-        if batch.failure_count > 0:
-            failed_indices = [i for i, r in enumerate(batch.responses) if not r.success]
-            logger.warning("FCM failed token indices: %s", failed_indices)
-            for i, send_response in enumerate(batch.responses):
-                if not send_response.success:
-                    exc = getattr(send_response, "exception", None)
-                    print(f"[FCM DEBUG] token[{i}] failed: {getattr(exc, 'message', exc)}", flush=True)
-                    logger.warning(
-                        "FCM send failed for token index %s: %s",
-                        i,
-                        getattr(exc, "message", exc),
-                    )
-                    if i < len(tokens) and _is_invalid_or_unregistered_token(exc):
-                        invalid_tokens.append(tokens[i])
-        return (invalid_tokens, batch.success_count)
+        results = send_multicast(tokens, title, body, data_dict)
     except Exception as e:
         logger.error("FCM send failed (batch exception): %s", e, exc_info=True)
         return (invalid_tokens, None)
+
+    for i, exc in enumerate(results):
+        if exc is None:
+            continue
+        logger.warning("FCM send failed for token index %s: %s", i, getattr(exc, "message", exc))
+        if _is_invalid_or_unregistered_token(exc):
+            invalid_tokens.append(tokens[i])
+    return (invalid_tokens, sum(1 for exc in results if exc is None))
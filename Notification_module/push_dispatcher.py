@@ -0,0 +1,358 @@
+"""
+Asynchronous FCM push dispatcher.
+
+Request handlers (and order-status notifications) store the Notification row
+and call enqueue_push(); delivery happens on background worker threads so no
+request waits on Google's API.
+
+- Coalescing: a worker collects queued messages for up to
+  PUSH_COALESCE_WINDOW_SECONDS and merges those with the same payload
+  (title, body, data) into one token list, de-duplicating tokens.
+- Batching: each payload is sent with send_each_for_multicast in chunks of at
+  most FCM_MULTICAST_LIMIT (500) tokens.
+- Retries: tokens that failed with a transient error (unavailable, internal,
+  quota, timeout), or whose whole chunk failed, are re-queued with exponential
+  backoff up to PUSH_MAX_ATTEMPTS.
+- Pruning: invalid/unregistered tokens from a cycle are deleted with one
+  bulk DELETE (when REMOVE_INVALID_FCM_TOKENS is on).
+
+The transport is pluggable: FirebaseTransport in production, FakeTransport
+(settings.PUSH_TRANSPORT = "fake", or set_push_transport()) for offline load
+tests. The queue is in-process and not durable: the Notification row is the
+record, push is best effort.
+"""
+import logging
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from database import SessionLocal
+from . import firebase_service
+from .firebase_service import _is_invalid_or_unregistered_token, _is_transient_error
+
+logger = logging.getLogger(__name__)
+
+FCM_MULTICAST_LIMIT = 500
+PUSH_WORKER_THREADS = 4
+PUSH_QUEUE_MAXSIZE = 50000
+PUSH_COALESCE_WINDOW_SECONDS = 0.05
+PUSH_COALESCE_MAX_MESSAGES = 1000
+PUSH_MAX_ATTEMPTS = 4
+PUSH_RETRY_BASE_SECONDS = 1.0  # 1s, 2s, 4s, ... capped at 30s
+PUSH_RETRY_MAX_SECONDS = 30.0
+
+
+@dataclass
+class PushMessage:
+    tokens: List[str]
+    title: str
+    body: str
+    data: Dict[str, str] = field(default_factory=dict)
+    attempt: int = 0
+
+    def payload_key(self):
+        return (self.title, self.body, tuple(sorted(self.data.items())))
+
+
+_queue: "queue.Queue[Optional[PushMessage]]" = queue.Queue(maxsize=PUSH_QUEUE_MAXSIZE)
+_workers: list = []
+_workers_lock = threading.Lock()
+_transport = None
+
+_metrics_lock = threading.Lock()
+_metrics = {
+    "enqueued": 0,
+    "dropped": 0,
+    "batches": 0,
+    "delivered": 0,
+    "failed": 0,
+    "retried": 0,
+    "gave_up": 0,
+    "pruned": 0,
+}
+
+
+def _bump(name: str, amount: int = 1) -> None:
+    with _metrics_lock:
+        _metrics[name] += amount
+
+
+# ---------------------------------------------------------------------------
+# Transports
+# ---------------------------------------------------------------------------
+
+class FirebaseTransport:
+    """Sends through firebase-admin (send_each_for_multicast)."""
+    name = "firebase"
+
+    def available(self) -> bool:
+        return firebase_service.init_firebase()
+
+    def send_multicast(self, tokens: List[str], title: str, body: str, data: Dict[str, str]) -> List[Optional[Exception]]:
+        return firebase_service.send_multicast(tokens, title, body, data or None)
+
+
+class UnregisteredError(Exception):
+    """Fake-transport counterpart of firebase_admin.messaging.UnregisteredError."""
+
+
+class UnavailableError(Exception):
+    """Fake-transport counterpart of firebase_admin.exceptions.UnavailableError."""
+
+
+class FakeTransport:
+    """
+    In-memory transport for tests and offline load tests. Records every batch;
+    tokens in `invalid_tokens` fail as unregistered, and the first
+    `transient_failures` calls fail as a whole with UnavailableError.
+    """
+    name = "fake"
+
+    def __init__(self, latency_seconds: float = 0.0, invalid_tokens=(), transient_failures: int = 0):
+        self.latency_seconds = latency_seconds
+        self.invalid_tokens = set(invalid_tokens)
+        self.transient_failures = transient_failures
+        self.batches: List[PushMessage] = []
+        self._lock = threading.Lock()
+
+    def available(self) -> bool:
+        return True
+
+    def send_multicast(self, tokens: List[str], title: str, body: str, data: Dict[str, str]) -> List[Optional[Exception]]:
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        with self._lock:
+            if self.transient_failures > 0:
+                self.transient_failures -= 1
+                raise UnavailableError("The service is currently unavailable")
+            self.batches.append(PushMessage(list(tokens), title, body, dict(data)))
+        return [UnregisteredError("Requested entity was not found") if t in self.invalid_tokens else None for t in tokens]
+
+    @property
+    def sent_tokens(self) -> int:
+        with self._lock:
+            return sum(len(batch.tokens) for batch in self.batches)
+
+
+def get_push_transport():
+    global _transport
+    if _transport is None:
+        from config import settings
+        _transport = FakeTransport() if settings.PUSH_TRANSPORT.strip().lower() == "fake" else FirebaseTransport()
+    return _transport
+
+
+def set_push_transport(transport) -> None:
+    """Swap the transport (tests / load tests). None restores the configured one."""
+    global _transport
+    _transport = transport
+
+
+# ---------------------------------------------------------------------------
+# Dispatch
+# ---------------------------------------------------------------------------
+
+def _coalesce(messages: List[PushMessage]) -> List[PushMessage]:
+    grouped: Dict[tuple, PushMessage] = {}
+    for message in messages:
+        key = message.payload_key()
+        target = grouped.get(key)
+        if target is None:
+            grouped[key] = PushMessage(list(dict.fromkeys(message.tokens)), message.title, message.body,
+                                       dict(message.data), message.attempt)
+            continue
+        seen = set(target.tokens)
+        target.tokens.extend(t for t in message.tokens if t not in seen)
+        target.attempt = max(target.attempt, message.attempt)
+    return list(grouped.values())
+
+
+def _retry_delay_seconds(attempt: int) -> float:
+    return min(PUSH_RETRY_BASE_SECONDS * (2 ** attempt), PUSH_RETRY_MAX_SECONDS)
+
+
+def _requeue(message: PushMessage) -> None:
+    try:
+        _queue.put_nowait(message)
+    except queue.Full:
+        _bump("dropped", len(message.tokens))
+        logger.warning(f"Push queue full, dropping retry | Tokens: {len(message.tokens)}")
+
+
+def _schedule_retry(message: PushMessage, tokens: List[str]) -> None:
+    attempt = message.attempt + 1
+    if attempt >= PUSH_MAX_ATTEMPTS:
+        _bump("gave_up", len(tokens))
+        logger.warning(f"Giving up on push after {attempt} attempts | Tokens: {len(tokens)} | Title: {message.title!r}")
+        return
+    _bump("retried", len(tokens))
+    retry = PushMessage(tokens, message.title, message.body, message.data, attempt)
+    timer = threading.Timer(_retry_delay_seconds(message.attempt), _requeue, args=(retry,))
+    timer.daemon = True
+    timer.start()
+
+
+def _send_chunk(transport, message: PushMessage, tokens: List[str], invalid: List[str]) -> None:
+    try:
+        results = transport.send_multicast(tokens, message.title, message.body, message.data)
+    except Exception as e:
+        if isinstance(e, (ConnectionError, TimeoutError, OSError)) or _is_transient_error(e):
+            logger.warning(f"FCM batch failed, will retry | Tokens: {len(tokens)} | Error: {e}")
+            _schedule_retry(message, tokens)
+        else:
+            _bump("failed", len(tokens))
+            logger.error(f"FCM batch failed | Tokens: {len(tokens)} | Error: {e}")
+        return
+    finally:
+        _bump("batches")
+
+    retry: List[str] = []
+    delivered = 0
+    for token, exc in zip(tokens, results):
+        if exc is None:
+            delivered += 1
+        elif _is_invalid_or_unregistered_token(exc):
+            invalid.append(token)
+        elif _is_transient_error(exc):
+            retry.append(token)
+        else:
+            _bump("failed")
+            logger.warning(f"FCM send failed for token | Error: {getattr(exc, 'message', exc)}")
+    _bump("delivered", delivered)
+    if invalid:
+        _bump("failed", len(invalid))
+    if retry:
+        _schedule_retry(message, retry)
+
+
+def _prune_invalid_tokens(tokens: List[str]) -> None:
+    from config import settings
+    if not tokens:
+        return
+    if not settings.REMOVE_INVALID_FCM_TOKENS:
+        logger.debug("Invalid FCM token(s) not removed (REMOVE_INVALID_FCM_TOKENS=false): %s", len(tokens))
+        return
+    from .Notification_crud import delete_device_tokens_by_value
+    db = SessionLocal()
+    try:
+        removed = 0
+        for i in range(0, len(tokens), FCM_MULTICAST_LIMIT):
+            removed += delete_device_tokens_by_value(db, tokens[i:i + FCM_MULTICAST_LIMIT])
+        _bump("pruned", removed)
+        logger.info(f"Removed {removed} invalid FCM token(s)")
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Failed to prune invalid FCM tokens: {e}")
+    finally:
+        db.close()
+
+
+def dispatch_messages(messages: List[PushMessage]) -> None:
+    """Coalesce, send in multicast chunks, schedule retries and prune invalid tokens."""
+    transport = get_push_transport()
+    invalid: List[str] = []
+    for message in _coalesce(messages):
+        for i in range(0, len(message.tokens), FCM_MULTICAST_LIMIT):
+            _send_chunk(transport, message, message.tokens[i:i + FCM_MULTICAST_LIMIT], invalid)
+    _prune_invalid_tokens(list(dict.fromkeys(invalid)))
+
+
+def _worker_loop():
+    while True:
+        first = _queue.get()
+        if first is None:
+            _queue.task_done()
+            return
+        messages = [first]
+        stop = False
+        deadline = time.monotonic() + PUSH_COALESCE_WINDOW_SECONDS
+        while len(messages) < PUSH_COALESCE_MAX_MESSAGES:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = _queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                stop = True
+                _queue.task_done()
+                break
+            messages.append(item)
+        try:
+            dispatch_messages(messages)
+        except Exception as e:
+            logger.error(f"Push dispatch failed: {e}", exc_info=True)
+        finally:
+            for _ in messages:
+                _queue.task_done()
+        if stop:
+            return
+
+
+def start_push_workers(threads: int = PUSH_WORKER_THREADS) -> None:
+    """Start the background worker threads (idempotent)."""
+    with _workers_lock:
+        _workers[:] = [t for t in _workers if t.is_alive()]
+        for i in range(len(_workers), threads):
+            t = threading.Thread(target=_worker_loop, name=f"push-worker-{i}", daemon=True)
+            t.start()
+            _workers.append(t)
+
+
+def stop_push_workers(timeout: float = 10.0) -> None:
+    """Ask workers to send what is queued and exit."""
+    with _workers_lock:
+        workers = list(_workers)
+        for _ in workers:
+            _queue.put(None)
+        for t in workers:
+            t.join(timeout=timeout)
+        _workers.clear()
+
+
+def enqueue_push(tokens: List[str], title: str, body: str, data: Optional[dict] = None) -> bool:
+    """Queue a push to the given device tokens. Returns False if it was not queued. Does not start workers."""
+    if not tokens:
+        return False
+    if not get_push_transport().available():
+        logger.error("Skipping FCM: Firebase not initialized")
+        return False
+    # data must be string key -> string value for FCM
+    message = PushMessage(list(tokens), title, body, {k: str(v) for k, v in (data or {}).items()})
+    # Workers are started by the app lifespan (main.py); without them, drain_push_queue() sends
+    try:
+        _queue.put_nowait(message)
+    except queue.Full:
+        _bump("dropped", len(tokens))
+        logger.warning(f"Push queue full, dropping push | Tokens: {len(tokens)} | Title: {title!r}")
+        return False
+    _bump("enqueued")
+    return True
+
+
+def drain_push_queue() -> int:
+    """Send everything queued on the calling thread (tests / no-worker mode)."""
+    messages = []
+    while True:
+        try:
+            item = _queue.get_nowait()
+        except queue.Empty:
+            break
+        _queue.task_done()
+        if item is not None:
+            messages.append(item)
+    if messages:
+        dispatch_messages(messages)
+    return len(messages)
+
+
+def get_push_dispatch_metrics() -> dict:
+    with _metrics_lock:
+        metrics = dict(_metrics)
+    metrics["queue_depth"] = _queue.qsize()
+    metrics["workers"] = sum(1 for t in _workers if t.is_alive())
+    metrics["transport"] = getattr(_transport, "name", None)
+    return metrics
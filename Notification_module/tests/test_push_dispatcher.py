@@ -0,0 +1,110 @@
+"""
+Push dispatcher tests and offline load test against the fake transport.
+
+Run with -s to see the throughput numbers:
+    python -m pytest -s Notification_module/tests/test_push_dispatcher.py
+"""
+import sys
+import os
+import time
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../..'))
+
+from database import Base
+import Login_module.User.user_model  # noqa: F401  (FK target for user_device_tokens)
+from Notification_module.Notification_model import UserDeviceToken
+from Notification_module import push_dispatcher
+from Notification_module.push_dispatcher import FakeTransport, FCM_MULTICAST_LIMIT
+
+LOAD_USERS = 20000
+LOAD_TOKENS_PER_USER = 2
+
+
+@pytest.fixture
+def transport(monkeypatch):
+    fake = FakeTransport()
+    # Tests that need workers start them; the rest drain the queue themselves
+    push_dispatcher.stop_push_workers()
+    push_dispatcher.set_push_transport(fake)
+    monkeypatch.setattr(push_dispatcher, "PUSH_RETRY_BASE_SECONDS", 0.01)
+    yield fake
+    push_dispatcher.stop_push_workers()
+    push_dispatcher.drain_push_queue()
+    push_dispatcher.set_push_transport(None)
+
+
+@pytest.fixture
+def token_db(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'push.db'}")
+    # user_device_tokens only; SQLite does not enforce the users FK
+    Base.metadata.create_all(engine, tables=[UserDeviceToken.__table__])
+    Session = sessionmaker(bind=engine)
+    monkeypatch.setattr(push_dispatcher, "SessionLocal", Session)
+    yield Session
+    engine.dispose()
+
+
+def _wait_for(predicate, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+def test_same_payload_is_coalesced_and_chunked(transport):
+    tokens = [f"tok-{i}" for i in range(1200)]
+    for i in range(0, len(tokens), 100):
+        push_dispatcher.enqueue_push(tokens[i:i + 100] + tokens[:5], "Sale", "20% off", {"type": "promo"})
+    push_dispatcher.drain_push_queue()
+
+    sizes = [len(batch.tokens) for batch in transport.batches]
+    assert sizes == [FCM_MULTICAST_LIMIT, FCM_MULTICAST_LIMIT, 200]
+    assert transport.sent_tokens == len(tokens)  # duplicates removed
+
+
+def test_invalid_tokens_are_pruned_in_bulk(transport, token_db):
+    with token_db() as db:
+        db.add_all([UserDeviceToken(user_id=1, device_token=f"tok-{i}") for i in range(10)])
+        db.commit()
+    transport.invalid_tokens = {"tok-3", "tok-7"}
+
+    push_dispatcher.enqueue_push([f"tok-{i}" for i in range(10)], "Hi", "There")
+    push_dispatcher.drain_push_queue()
+
+    with token_db() as db:
+        remaining = {t for (t,) in db.query(UserDeviceToken.device_token).all()}
+    assert remaining == {f"tok-{i}" for i in range(10)} - {"tok-3", "tok-7"}
+
+
+def test_transient_batch_failure_is_retried(transport):
+    transport.transient_failures = 2
+    push_dispatcher.start_push_workers()
+    push_dispatcher.enqueue_push(["a", "b"], "Order shipped", "On its way")
+
+    assert _wait_for(lambda: transport.sent_tokens == 2)
+    assert push_dispatcher.get_push_dispatch_metrics()["retried"] >= 4
+
+
+def test_dispatch_throughput_with_fake_transport(transport):
+    transport.latency_seconds = 0.02  # Round-trip per multicast call
+    push_dispatcher.start_push_workers()
+
+    started = time.perf_counter()
+    for user_id in range(LOAD_USERS):
+        tokens = [f"user-{user_id}-dev-{d}" for d in range(LOAD_TOKENS_PER_USER)]
+        push_dispatcher.enqueue_push(tokens, "Flash sale", "Ends tonight", {"type": "promo"})
+    enqueue_elapsed = time.perf_counter() - started
+
+    total = LOAD_USERS * LOAD_TOKENS_PER_USER
+    assert _wait_for(lambda: transport.sent_tokens == total, timeout=60)
+    elapsed = time.perf_counter() - started
+    print(
+        f"\nPush dispatch: {LOAD_USERS} enqueues in {enqueue_elapsed:.2f}s, {total} tokens delivered in "
+        f"{elapsed:.2f}s = {total / elapsed:.0f} tokens/s over {len(transport.batches)} multicast calls"
+    )
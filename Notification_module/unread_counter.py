@@ -0,0 +1,199 @@
+"""
+Per-user unread notification counters in Redis.
+
+GET /api/notifications/unread-count is polled constantly by the app, so the
+count is kept in notifications:unread:{user_id} instead of running COUNT(*)
+on every poll:
+
+- A miss loads the count from the DB once (an index-only count on
+  ix_notifications_user_read) and caches it for COUNTER_TTL_SECONDS.
+- create_notification / broadcasts increment, mark-read decrements and
+  mark-all-read resets the counter. Increments and decrements only touch
+  counters that already exist (Lua), so a missing key is always recomputed
+  from the DB rather than started from a wrong value.
+- reconcile_unread_counters() (scheduler) recomputes cached counters in
+  batches with one GROUP BY per batch to repair any drift.
+
+Without Redis every call falls back to the indexed COUNT.
+"""
+import logging
+import threading
+from typing import Iterable, List
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from .Notification_model import Notification
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "notifications:unread:"
+COUNTER_TTL_SECONDS = 86400
+RECONCILE_BATCH_SIZE = 500
+
+# Adjust a counter only if it is cached; never below zero. Returns the new value or nil.
+_ADJUST_IF_EXISTS = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    local value = redis.call('INCRBY', KEYS[1], ARGV[1])
+    if value < 0 then
+        redis.call('SET', KEYS[1], 0, 'KEEPTTL')
+        return 0
+    end
+    return value
+end
+return nil
+"""
+
+_metrics_lock = threading.Lock()
+_metrics = {"hits": 0, "misses": 0, "db_fallbacks": 0, "reconciled": 0, "corrected": 0}
+
+
+def _bump(name: str, amount: int = 1) -> None:
+    with _metrics_lock:
+        _metrics[name] += amount
+
+
+def _get_redis_client():
+    """Lazy import to avoid circular dependency (shares the OTP Redis client)."""
+    from Login_module.OTP import otp_manager
+    client = otp_manager._get_redis_client()
+    return client if otp_manager._redis_available else None
+
+
+def _key(user_id: int) -> str:
+    return f"{KEY_PREFIX}{user_id}"
+
+
+def count_unread_from_db(db: Session, user_id: int) -> int:
+    return db.query(func.count(Notification.id)).filter(
+        Notification.user_id == user_id,
+        Notification.is_read == False,
+    ).scalar() or 0
+
+
+def get_unread_count(db: Session, user_id: int) -> int:
+    """Cached unread count for the user; loads it from the DB on a miss."""
+    client = None
+    try:
+        client = _get_redis_client()
+        if client is not None:
+            raw = client.get(_key(user_id))
+            if raw is not None:
+                _bump("hits")
+                return max(int(raw), 0)
+    except Exception as e:
+        logger.warning(f"Unread counter read failed | User: {user_id} | Error: {e}")
+        client = None
+
+    count = count_unread_from_db(db, user_id)
+    if client is None:
+        _bump("db_fallbacks")
+        return count
+    _bump("misses")
+    try:
+        # NX: don't overwrite a value another worker adjusted meanwhile
+        client.set(_key(user_id), count, ex=COUNTER_TTL_SECONDS, nx=True)
+    except Exception as e:
+        logger.warning(f"Unread counter write failed | User: {user_id} | Error: {e}")
+    return count
+
+
+def adjust_unread(user_ids: Iterable[int], delta: int) -> None:
+    """Add delta to each user's cached counter (one pipeline). Call after the DB commit."""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    try:
+        client = _get_redis_client()
+        if client is None:
+            return
+        pipe = client.pipeline(transaction=False)
+        for user_id in user_ids:
+            pipe.eval(_ADJUST_IF_EXISTS, 1, _key(user_id), delta)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Unread counter update failed, dropping counters | Users: {len(user_ids)} | Error: {e}")
+        invalidate_unread(user_ids)
+
+
+def reset_unread(user_id: int) -> None:
+    """Everything is read: the count is known to be zero."""
+    try:
+        client = _get_redis_client()
+        if client is not None:
+            client.set(_key(user_id), 0, ex=COUNTER_TTL_SECONDS)
+    except Exception as e:
+        logger.warning(f"Unread counter reset failed | User: {user_id} | Error: {e}")
+        invalidate_unread([user_id])
+
+
+def invalidate_unread(user_ids: List[int]) -> None:
+    """Drop cached counters so the next read recomputes them from the DB."""
+    try:
+        client = _get_redis_client()
+        if client is not None and user_ids:
+            client.delete(*[_key(user_id) for user_id in user_ids])
+    except Exception as e:
+        logger.warning(f"Unread counter invalidation failed | Users: {len(user_ids)} | Error: {e}")
+
+
+def reconcile_unread_counters() -> int:
+    """Recompute every cached counter from the DB in batches. Scheduler entry point."""
+    client = _get_redis_client()
+    if client is None:
+        return 0
+    reconciled = corrected = 0
+    db = SessionLocal()
+    try:
+        batch: List[int] = []
+        for key in client.scan_iter(match=f"{KEY_PREFIX}*", count=RECONCILE_BATCH_SIZE):
+            key = key.decode() if isinstance(key, bytes) else key
+            suffix = key[len(KEY_PREFIX):]
+            if suffix.isdigit():
+                batch.append(int(suffix))
+            if len(batch) >= RECONCILE_BATCH_SIZE:
+                fixed = _reconcile_batch(db, client, batch)
+                reconciled, corrected = reconciled + len(batch), corrected + fixed
+                batch = []
+        if batch:
+            corrected += _reconcile_batch(db, client, batch)
+            reconciled += len(batch)
+    except Exception as e:
+        logger.error(f"Unread counter reconciliation failed: {e}")
+    finally:
+        db.close()
+    _bump("reconciled", reconciled)
+    _bump("corrected", corrected)
+    if corrected:
+        logger.info(f"Reconciled {reconciled} unread counter(s), corrected {corrected}")
+    return corrected
+
+
+def _reconcile_batch(db: Session, client, user_ids: List[int]) -> int:
+    rows = db.query(Notification.user_id, func.count(Notification.id)).filter(
+        Notification.user_id.in_(user_ids),
+        Notification.is_read == False,
+    ).group_by(Notification.user_id).all()
+    db.rollback()  # End the read transaction so the next batch sees fresh data
+    actual = {user_id: 0 for user_id in user_ids}
+    actual.update({user_id: count for user_id, count in rows})
+
+    cached = client.mget([_key(user_id) for user_id in user_ids])
+    pipe = client.pipeline(transaction=False)
+    fixed = 0
+    for user_id, raw in zip(user_ids, cached):
+        if raw is not None and int(raw) != actual[user_id]:
+            pipe.set(_key(user_id), actual[user_id], ex=COUNTER_TTL_SECONDS, xx=True)
+            fixed += 1
+    if fixed:
+        pipe.execute()
+    return fixed
+
+
+def get_unread_counter_metrics() -> dict:
+    with _metrics_lock:
+        metrics = dict(_metrics)
+    lookups = metrics["hits"] + metrics["misses"]
+    metrics["hit_rate"] = round(metrics["hits"] / lookups, 4) if lookups else 0.0
+    return metrics
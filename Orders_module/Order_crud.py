@@ -13,9 +13,11 @@ from .Order_model import (
 )
 from Cart_module.Cart_model import CartItem
 from Cart_module.coupon_service import get_applied_coupon, validate_and_calculate_discount
+from Cart_module.cart_pricing import price_cart_items
 from Product_module.Product_model import Product
 from Member_module.Member_model import Member
 from Address_module.Address_model import Address
+from GeneticTest_module import member_order_summary  # noqa: F401 - keeps member_order_summaries current on commit
 from config import settings
 import logging
 
@@ -30,6 +32,21 @@ def _send_order_notification(db: Session, order: Order, title: str, message: str
         logger.warning("Order notification failed (order %s): %s", order.order_number, e)
 
 
+def _publish_order_status_event(order: Order, order_item_id: Optional[int] = None) -> None:
+    """Tell the user's connected clients (SSE) that the order changed. Call after commit."""
+    try:
+        from Notification_module.event_stream import publish_user_event, EVENT_ORDER_STATUS
+        publish_user_event(order.user_id, EVENT_ORDER_STATUS, {
+            "order_id": order.id,
+            "order_number": order.order_number,
+            "order_item_id": order_item_id,
+            "order_status": order.order_status.value if order.order_status else None,
+            "payment_status": order.payment_status.value if order.payment_status else None,
+        })
+    except Exception as e:
+        logger.warning("Order status event failed (order %s): %s", order.order_number, e)
+
+
 def _get_slot_time(slot: str) -> time:
     """
     Map a slot label to a representative time of day.
@@ -348,25 +365,11 @@ def generate_order_number(db: Session) -> str:
     """Generate the next sequential numeric order number.
 
     Format: 2627001001, 2627001002, ...
-    Existing random ORD-prefixed order numbers are ignored.
+    Allocated from the order_number_sequences counter (see order_number.py),
+    so this is constant time and safe under concurrent checkouts.
     """
-    prefix = "262700"
-    starting_number = 2627001000
-
-    order_numbers = (
-        db.query(Order.order_number)
-        .filter(Order.order_number.like(f"{prefix}%"))
-        .all()
-    )
-
-    numeric_order_numbers = [
-        int(order_number)
-        for (order_number,) in order_numbers
-        if order_number and order_number.isdigit()
-    ]
-
-    next_number = (max(numeric_order_numbers) if numeric_order_numbers else starting_number) + 1
-    return str(next_number)
+    from .order_number import allocate_order_number
+    return allocate_order_number(db)
 
 
 def find_existing_order_for_retry(
@@ -529,31 +532,10 @@ def create_order_from_cart(
     coupon_discount = 0.0
     coupon_code = None
     
-    # Group cart items by group_id to calculate totals correctly
-    grouped_items = {}
-    for item in cart_items:
-        group_key = item.group_id or f"single_{item.id}"
-        if group_key not in grouped_items:
-            grouped_items[group_key] = []
-        grouped_items[group_key].append(item)
-    
-    # Calculate subtotal and discount (price is per product, not per member)
-    # For couple/family products, there are multiple cart item rows but discount applies once per product
-    # This matches the cart calculation logic exactly
-    for group_key, items in grouped_items.items():
-        # Skip if group is empty (should not happen, but safety check)
-        if not items:
-            continue
-            
-        item = items[0]  # Use first item as representative
-        product = item.product
-        
-        # Skip if product is deleted or missing
-        if not product:
-            continue
-            
-        # Only count once per product group
-        subtotal += item.quantity * product.SpecialPrice
+    # Price per product group, not per cart item row (couple/family products have one row per member).
+    # Same engine as the cart view, so the order total matches what the user saw.
+    priced_cart = price_cart_items(cart_items)
+    subtotal = priced_cart.subtotal
         
     # Use pre-validated coupon from router if provided (avoids double-validation
     # which can falsely reject coupons due to usage already recorded from prior orders).
@@ -581,10 +563,8 @@ def create_order_from_cart(
     # Calculate total amount
     # Note: subtotal already uses SpecialPrice (product discount is already applied)
     # So we only subtract coupon_discount, not discount
-    # Delivery is always free; subtotal already uses SpecialPrice.
-    total_amount = subtotal - coupon_discount
-    # Ensure total is not negative
-    total_amount = max(0.0, total_amount)
+    # Delivery is always free; never negative.
+    total_amount = priced_cart.grand_total(coupon_discount)
     
     # Create order (without payment fields - payment is in separate table)
     order = Order(
@@ -898,6 +878,8 @@ def verify_payment_frontend(
     # Update order (denormalized payment_status) while confirmation completes.
     order.payment_status = PaymentStatus.PROCESSING
     order.order_status = OrderStatus.PROCESSING
+    # Queue for the repair job in case confirmation below doesn't complete
+    order.needs_repair = True
     order.status_updated_at = now_ist()
     
     # Sync all order item statuses with order status
@@ -974,10 +956,39 @@ def confirm_order_from_webhook(
     payment_method_metadata: Optional[dict] = None
 ) -> Order:
     """
-    Confirm order from webhook (payment.captured event).
-    This is the ONLY place where order confirmation happens.
+    Confirm order from webhook (payment.captured event) and, if this call
+    confirmed it, send the invoice and confirmation emails after the commit.
     Idempotent - can be called multiple times safely.
     """
+    order, newly_confirmed = confirm_order_payment(
+        db=db,
+        order_id=order_id,
+        razorpay_order_id=razorpay_order_id,
+        razorpay_payment_id=razorpay_payment_id,
+        webhook_log_id=webhook_log_id,
+        payment_method_details=payment_method_details,
+        payment_method_metadata=payment_method_metadata
+    )
+    if newly_confirmed:
+        send_order_confirmation_emails(db, order)
+    return order
+
+
+def confirm_order_payment(
+    db: Session,
+    order_id: int,
+    razorpay_order_id: str,
+    razorpay_payment_id: str,
+    webhook_log_id: Optional[int] = None,
+    payment_method_details: Optional[str] = None,
+    payment_method_metadata: Optional[dict] = None
+) -> Tuple[Order, bool]:
+    """
+    Confirm the order and commit. This is the ONLY place where order confirmation happens.
+    Returns (order, newly_confirmed); newly_confirmed is False if it was already confirmed.
+    Emails are not sent here (see send_order_confirmation_emails), so the order row
+    lock is not held while the invoice is rendered and mailed.
+    """
     # Load order with items using row-level locking to prevent race conditions
     from sqlalchemy import select
     from sqlalchemy.orm import joinedload
@@ -1033,7 +1044,7 @@ def confirm_order_from_webhook(
     # This protects against late failure events and ensures idempotency
     if order.order_status == OrderStatus.CONFIRMED:
         logger.info(f"Order {order.order_number} already confirmed. Webhook event ignored (idempotent).")
-        return order
+        return order, False
     
     # Update payment status atomically
     previous_payment_status = payment.payment_status
@@ -1065,6 +1076,7 @@ def confirm_order_from_webhook(
     # Update order (denormalized payment_status)
     order.payment_status = PaymentStatus.COMPLETED
     order.order_status = OrderStatus.CONFIRMED
+    order.needs_repair = False
     order.status_updated_at = now_ist()
     
     # Update all order items - sync with order status
@@ -1239,20 +1251,26 @@ def confirm_order_from_webhook(
             exc_info=True
         )
     
+    db.commit()
+    db.refresh(order)
+    _publish_order_status_event(order)
+    
+    _send_order_notification(
+        db, order,
+        "Order confirmed",
+        f"Your order {order.order_number} has been confirmed.",
+        type="success"
+    )
+    logger.info(f"Order {order.order_number} confirmed by webhook. Payment status: COMPLETED, Order status: CONFIRMED")
+    
+    return order, True
+
+
+def send_order_confirmation_emails(db: Session, order: Order) -> None:
+    """Send the PDF invoice and the order confirmation email. Errors are logged, never raised."""
     # ── CUSTOM PDF INVOICE GENERATION & EMAIL SENDING ─────
     try:
-        import sys
-        import os
-        from pathlib import Path
-        
-        # Ensure the 'invoice generation' folder is in the system path for imports
-        # We use absolute path to be safe
-        project_root = Path(__file__).parent.parent
-        invoice_gen_path = project_root / "invoice generation"
-        if str(invoice_gen_path) not in sys.path:
-            sys.path.append(str(invoice_gen_path))
-            
-        from nucleotide_invoice_sender_wo_file import generate_and_send_invoice, build_email_body
+        from .invoice_service import send_invoice_email, build_invoice_email_body, resolve_logo_path
         
         # Prepare invoice data mapping
         # We use the primary address from the order
@@ -1266,8 +1284,11 @@ def confirm_order_from_webhook(
             customer_address_str = ", ".join(addr_parts)
         
         invoice_items = build_invoice_items_for_order(db, order)
-            
-        # Prepare payment info
+
+        # Prepare payment info from the order's latest payment
+        payment = db.query(Payment).filter(
+            Payment.order_id == order.id
+        ).order_by(Payment.created_at.desc()).first()
         payment_info = []
         if payment:
             mode = "Razorpay"
@@ -1313,26 +1334,18 @@ def confirm_order_from_webhook(
         }
         
         # Build plain-text and HTML email bodies
-        plain_body, html_body = build_email_body(invoice_data)
+        plain_body, html_body = build_invoice_email_body(invoice_data)
         
-        # Resolve logo path (relative to root)
-        logo_path = str(project_root / settings.INVOICE_LOGO_PATH)
-        if not os.path.exists(logo_path):
-            logger.warning(f"Invoice logo not found at {logo_path}. Falling back to text logo.")
-            logo_path = None
-            
-        # Send the invoice email
+        # Render in the invoice pool (or reuse the stored PDF) and send
         invoice_bcc = [e.strip() for e in settings.INVOICE_BCC_EMAILS.split(",") if e.strip()] or None
-        generate_and_send_invoice(
+        send_invoice_email(
             invoice_data=invoice_data,
-            logo_path=logo_path,
+            logo_path=resolve_logo_path(),
             to=order.user.email,
             subject=f"Order Confirmation & Invoice – {order.order_number}",
             body=plain_body,
             html_body=html_body,
             pdf_filename=f"Invoice-{order.order_number}.pdf",
-            service_account_file=str(project_root / settings.INVOICE_SERVICE_ACCOUNT_PATH),
-            sender_email=settings.INVOICE_SENDER_EMAIL,
             bcc=invoice_bcc
         )
         logger.info(f"Custom branded PDF invoice sent to {order.user.email} for order {order.order_number}")
@@ -1387,19 +1400,6 @@ def confirm_order_from_webhook(
             exc_info=True
         )
 
-    db.commit()
-    db.refresh(order)
-    
-    _send_order_notification(
-        db, order,
-        "Order confirmed",
-        f"Your order {order.order_number} has been confirmed.",
-        type="success"
-    )
-    logger.info(f"Order {order.order_number} confirmed by webhook. Payment status: COMPLETED, Order status: CONFIRMED")
-    
-    return order
-
 
 # Legacy function - kept for backward compatibility, but deprecated
 def verify_and_complete_payment(
@@ -1800,6 +1800,7 @@ def update_order_status(
     
     db.commit()
     db.refresh(order)
+    _publish_order_status_event(order, order_item_id)
     
     return (order, notif_payload)
 
@@ -3,7 +3,7 @@ Order model - stores order information and payment details.
 No COD option, no refund policy.
 All timestamps stored in IST (Indian Standard Time).
 """
-from sqlalchemy import Column, Integer, String, Float, DateTime, Enum, ForeignKey, Text, JSON, Boolean
+from sqlalchemy import Column, Integer, BigInteger, String, Float, DateTime, Enum, ForeignKey, Text, JSON, Boolean
 from sqlalchemy.orm import relationship
 from database import Base
 from Login_module.Utils.datetime_utils import now_ist
@@ -69,6 +69,10 @@ class Order(Base):
     
     # Additional notes
     notes = Column(Text, nullable=True)
+
+    # Repair queue: set when the order may be stuck (verified payment not yet confirmed,
+    # items behind the order status); cleared by Orders_module.order_repair
+    needs_repair = Column(Boolean, nullable=False, default=False, server_default="0", index=True)
     
     # Timestamps
     created_at = Column(DateTime(timezone=True), default=now_ist, nullable=False, index=True)
@@ -236,6 +240,8 @@ class WebhookLog(Base):
     # Processing status
     processed = Column(Boolean, default=False, nullable=False, index=True)  # Whether webhook was processed successfully
     processing_error = Column(Text, nullable=True)  # Error message if processing failed
+    attempts = Column(Integer, default=0, server_default="0", nullable=False)  # Worker processing attempts
+    next_attempt_at = Column(DateTime(timezone=True), nullable=True, index=True)  # Lease / retry backoff deadline
     
     # Signature verification
     signature_valid = Column(Boolean, nullable=True)  # Whether signature was valid
@@ -286,3 +292,14 @@ class PaymentTransition(Base):
     webhook_log = relationship("WebhookLog", backref="payment_transitions")
 
 
+class OrderNumberSequence(Base):
+    """
+    Counter rows for sequential numbers (one row per sequence name).
+    Allocation increments last_value under the row lock in its own short
+    transaction - see order_number.allocate_order_number.
+    """
+    __tablename__ = "order_number_sequences"
+
+    name = Column(String(50), primary_key=True)
+    last_value = Column(BigInteger, nullable=False)
+    updated_at = Column(DateTime(timezone=True), default=now_ist, onupdate=now_ist)
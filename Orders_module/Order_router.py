@@ -4,6 +4,8 @@ Order router - handles order creation, payment, and tracking.
 from fastapi import APIRouter, Depends, Header, HTTPException, status, Request
 from sqlalchemy.orm import Session
 from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
 from typing import List, Optional
 from collections import defaultdict
 import uuid
@@ -11,7 +13,7 @@ import logging
 import json
 
 from config import settings
-from deps import get_db
+from deps import get_db, get_read_db
 from Login_module.Utils.auth_user import get_current_user, get_current_member
 from Login_module.Utils.datetime_utils import now_ist, to_ist_isoformat
 from Login_module.User.user_model import User
@@ -32,15 +34,11 @@ from .Order_schema import (
 from .Order_crud import (
     create_order_from_cart,
     verify_payment_frontend,
-    confirm_order_from_webhook,
     update_order_status,
     get_order_by_id,
     get_order_by_number,
     get_user_orders,
-    mark_payment_failed_or_cancelled,
-    repair_confirmed_order_item_statuses,
     build_invoice_items_for_order,
-    finalize_verified_processing_order,
 )
 from .razorpay_service import (
     create_razorpay_order,
@@ -49,7 +47,9 @@ from .razorpay_service import (
     get_razorpay_public_config,
 )
 from .Order_model import OrderStatus, PaymentStatus, PaymentMethod, Order, OrderItem, Payment, PaymentTransition, WebhookLog
+from .webhook_queue import enqueue_webhook
 from Cart_module.Cart_model import CartItem, Cart
+from Cart_module.cart_pricing import price_cart_items
 from Notification_module.Notification_crud import send_notification_to_user
 
 # Fixed password for PUT order status endpoint (admin/lab use)
@@ -280,28 +280,8 @@ def create_order(
         
         # Calculate total amount (will be recalculated in create_order_from_cart with coupon)
         # This is just for Razorpay order creation - actual order will have correct totals
-        subtotal = 0.0
-        grouped_items = {}
-        
-        for item in cart_items:
-            group_key = item.group_id or f"single_{item.id}"
-            if group_key not in grouped_items:
-                grouped_items[group_key] = []
-            grouped_items[group_key].append(item)
-        
-        for group_key, items in grouped_items.items():
-            # Skip if group is empty (should not happen, but safety check)
-            if not items:
-                continue
-                
-            item = items[0]
-            product = item.product
-            
-            # Skip if product is deleted or missing
-            if not product:
-                continue
-                
-            subtotal += item.quantity * product.SpecialPrice
+        priced_cart = price_cart_items(cart_items)
+        subtotal = priced_cart.subtotal
         
         # Get coupon discount for Razorpay order amount
         # Recalculate using the same logic as order creation to keep amounts in sync
@@ -323,26 +303,11 @@ def create_order(
                 # If coupon is no longer valid, treat as no coupon for Razorpay amount
                 coupon_discount = 0.0
         
-        # Calculate product discount (per product group, not per cart item row)
-        processed_groups = set()
-        product_discount = 0.0
-        for item in cart_items:
-            # Skip if product is deleted or missing
-            if not item.product:
-                continue
-                
-            group_key = item.group_id or f"single_{item.id}"
-            if group_key not in processed_groups:
-                discount_per_item = item.product.Price - item.product.SpecialPrice
-                product_discount += discount_per_item * item.quantity
-                processed_groups.add(group_key)
-        
         # Calculate total amount
         # Note: subtotal already uses SpecialPrice (product discount is already applied)
         # So we only subtract coupon_discount, not product_discount
         # Delivery is always free; subtotal already uses SpecialPrice.
-        total_amount = subtotal - coupon_discount
-        total_amount = max(0.0, total_amount)  # Ensure not negative
+        total_amount = priced_cart.grand_total(coupon_discount)  # Never negative
 
         # Get all cart item IDs
         cart_item_ids = [item.id for item in cart_items]
@@ -651,6 +616,82 @@ def verify_payment(
         )
 
 
+def _ingest_webhook(db: Session, body_str: str, webhook_signature: Optional[str], header_event_id: Optional[str]):
+    """
+    Verify and persist a webhook event. Returns (webhook_log_id or None, message).
+    webhook_log_id is None when there is nothing new to process (duplicate delivery).
+    """
+    if not webhook_signature:
+        logger.error("Missing X-Razorpay-Signature header in webhook request")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Missing webhook signature"
+        )
+
+    # Parse webhook payload first (before signature verification for logging)
+    try:
+        webhook_data = json.loads(body_str)
+    except json.JSONDecodeError as e:
+        logger.error(f"Invalid JSON in webhook payload: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid webhook payload"
+        )
+
+    event_type = webhook_data.get("event")
+    event_id = webhook_data.get("id") or header_event_id  # Razorpay event ID
+
+    if not event_type:
+        logger.error("Missing event type in webhook payload")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Missing event type"
+        )
+
+    from .razorpay_service import verify_webhook_signature
+    is_valid = verify_webhook_signature(body_str, webhook_signature)
+
+    # Redelivery of an event we already stored: never insert twice
+    if is_valid and event_id:
+        existing = db.query(WebhookLog).filter(WebhookLog.event_id == event_id).first()
+        if existing:
+            if existing.processed:
+                return None, f"Event {event_id} already processed"
+            if existing.signature_valid:
+                return existing.id, f"Event {event_id} already queued"
+
+    webhook_log = WebhookLog(
+        event_type=event_type,
+        event_id=event_id if is_valid else None,
+        payload=webhook_data,
+        signature_valid=is_valid,
+        signature_verification_error=None if is_valid else "Invalid webhook signature",
+        processed=False
+    )
+    if not is_valid:
+        webhook_log.processed = True
+        webhook_log.processing_error = "Invalid webhook signature"
+        webhook_log.processed_at = now_ist()
+    db.add(webhook_log)
+    try:
+        db.commit()
+    except IntegrityError:
+        # Concurrent delivery of the same event_id won the insert; that copy gets processed
+        db.rollback()
+        logger.info(f"Duplicate webhook delivery ignored (event_id: {event_id})")
+        return None, f"Event {event_id} already received"
+
+    if not is_valid:
+        logger.error("Invalid webhook signature")
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid webhook signature"
+        )
+
+    logger.info(f"Received webhook event: {event_type} (event_id: {event_id}, log_id: {webhook_log.id})")
+    return webhook_log.id, f"Event {event_type} accepted"
+
+
 @router.post("/webhook", response_model=WebhookResponse)
 async def razorpay_webhook(
     request: Request,
@@ -659,485 +700,54 @@ async def razorpay_webhook(
     """
     Razorpay webhook endpoint - final source of truth for payment verification.
     Handles payment.captured, payment.failed, and order.paid events.
-    Only this endpoint can confirm orders (order_status = CONFIRMED).
-    Only this endpoint clears carts (idempotent).
-    
+    Only webhook processing can confirm orders (order_status = CONFIRMED) and clear carts.
+
+    The request only verifies the signature, stores the event in webhook_logs and
+    acknowledges. Order confirmation, invoice/email and notifications run in the
+    background worker (see webhook_queue); webhook_logs is the durable queue, so
+    an event is never lost once this endpoint has returned 200.
+
     Security:
     - Verifies webhook signature
     - Validates event authenticity
-    - Handles race conditions with database locking
+    - Deduplicates on the Razorpay event ID
     """
     try:
         # Get raw request body for signature verification
         body_bytes = await request.body()
         body_str = body_bytes.decode('utf-8')
-        
-        # Get webhook signature from headers
-        webhook_signature = request.headers.get("X-Razorpay-Signature")
-        if not webhook_signature:
-            logger.error("Missing X-Razorpay-Signature header in webhook request")
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Missing webhook signature"
-            )
-        
-        # Parse webhook payload first (before signature verification for logging)
-        try:
-            webhook_data = json.loads(body_str)
-        except json.JSONDecodeError as e:
-            logger.error(f"Invalid JSON in webhook payload: {e}")
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid webhook payload"
-            )
-        
-        # Extract event type and payload
-        event_type = webhook_data.get("event")
-        event_id = webhook_data.get("id")  # Razorpay event ID
-        event_payload = webhook_data.get("payload", {}).get("payment", {})
-        entity = webhook_data.get("payload", {}).get("payment", {}).get("entity", {})
-        
-        if not event_type:
-            logger.error("Missing event type in webhook payload")
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Missing event type"
-            )
-        
-        # Verify webhook signature
-        from .razorpay_service import verify_webhook_signature
-        is_valid = verify_webhook_signature(body_str, webhook_signature)
-        
-        # Log webhook event (before processing)
-        webhook_log = WebhookLog(
-            event_type=event_type,
-            event_id=event_id,
-            payload=webhook_data,
-            signature_valid=is_valid,
-            signature_verification_error=None if is_valid else "Invalid webhook signature",
-            processed=False
+
+        # DB work is blocking - keep it off the event loop
+        webhook_log_id, message = await run_in_threadpool(
+            _ingest_webhook,
+            db,
+            body_str,
+            request.headers.get("X-Razorpay-Signature"),
+            request.headers.get("X-Razorpay-Event-Id"),
         )
-        db.add(webhook_log)
-        db.flush()  # Get webhook_log.id
-        
-        if not is_valid:
-            webhook_log.processed = True
-            webhook_log.processing_error = "Invalid webhook signature"
-            webhook_log.processed_at = now_ist()
-            db.commit()
-            logger.error("Invalid webhook signature")
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid webhook signature"
-            )
-        
-        logger.info(f"Received webhook event: {event_type} (event_id: {event_id})")
-        
-        # Handle different event types
-        if event_type == "payment.captured":
-            # Extract payment details
-            razorpay_payment_id = entity.get("id") or event_payload.get("id")
-            razorpay_order_id = entity.get("order_id") or event_payload.get("order_id")
-            
-            if not razorpay_payment_id or not razorpay_order_id:
-                logger.error(f"Missing payment_id or order_id in payment.captured webhook: {webhook_data}")
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Missing payment_id or order_id in webhook payload"
-                )
-            
-            # Extract payment method details from Razorpay payload
-            from .Order_crud import extract_payment_method_from_razorpay_payload
-            payment_method_details, payment_method_metadata = extract_payment_method_from_razorpay_payload(entity)
-            
-            # Find payment by razorpay_order_id
-            payment = db.query(Payment).filter(
-                Payment.razorpay_order_id == razorpay_order_id
-            ).order_by(Payment.created_at.desc()).first()
-            
-            if not payment:
-                logger.warning(f"Payment not found for Razorpay order ID: {razorpay_order_id}")
-                # Update webhook log
-                webhook_log.processed = True
-                webhook_log.processing_error = f"Payment not found for Razorpay order ID: {razorpay_order_id}"
-                webhook_log.processed_at = now_ist()
-                db.commit()
-                # Return 200 OK so Razorpay doesn't retry (payment doesn't exist)
-                return WebhookResponse(
-                    status="success",
-                    message=f"Payment not found for Razorpay order ID: {razorpay_order_id}"
-                )
-            
-            # Update webhook log with payment info
-            webhook_log.payment_id = payment.id
-            webhook_log.order_id = payment.order_id
-            webhook_log.razorpay_order_id = razorpay_order_id
-            webhook_log.razorpay_payment_id = razorpay_payment_id
-            
-            # Get order
-            order = db.query(Order).filter(Order.id == payment.order_id).first()
-            
-            if not order:
-                logger.warning(f"Order not found for payment ID: {payment.id}")
-                webhook_log.processed = True
-                webhook_log.processing_error = f"Order not found for payment ID: {payment.id}"
-                webhook_log.processed_at = now_ist()
-                db.commit()
-                return WebhookResponse(
-                    status="success",
-                    message=f"Order not found for payment ID: {payment.id}"
-                )
-            
-            # Confirm order from webhook (idempotent)
-            # Use savepoint to ensure we can rollback status changes on error
-            savepoint = db.begin_nested()
-            try:
-                order = confirm_order_from_webhook(
-                    db=db,
-                    order_id=order.id,
-                    razorpay_order_id=razorpay_order_id,
-                    razorpay_payment_id=razorpay_payment_id,
-                    webhook_log_id=webhook_log.id,
-                    payment_method_details=payment_method_details,
-                    payment_method_metadata=payment_method_metadata
-                )
-                
-                # Commit the savepoint (status changes are now permanent)
-                savepoint.commit()
-                
-                # Update webhook log as processed
-                webhook_log.processed = True
-                webhook_log.processed_at = now_ist()
-                db.commit()
-                
-                logger.info(f"Order {order.order_number} confirmed by webhook (payment.captured)")
-                
-                return WebhookResponse(
-                    status="success",
-                    message=f"Order {order.order_number} confirmed successfully"
-                )
-                
-            except ValueError as e:
-                # Order already confirmed or other validation error
-                # Rollback savepoint to undo any partial changes
-                savepoint.rollback()
-                logger.info(f"Webhook confirmation skipped: {str(e)}")
-                # Update webhook log as processed (idempotent)
-                webhook_log.processed = True
-                webhook_log.processing_error = str(e)
-                webhook_log.processed_at = now_ist()
-                db.commit()
-                # Return 200 OK (idempotent - already processed)
-                return WebhookResponse(
-                    status="success",
-                    message=str(e)
-                )
-            except Exception as e:
-                # Internal error - rollback savepoint to undo status changes
-                savepoint.rollback()
-                # Update webhook log with error (but no status changes were committed)
-                webhook_log.processed = False
-                webhook_log.processing_error = str(e)
-                webhook_log.processed_at = now_ist()
-                db.commit()
-                logger.error(f"Error confirming order from webhook: {e}", exc_info=True)
-                # Return 500 so Razorpay retries
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail=f"Error processing webhook: {str(e)}"
-                )
-        
-        elif event_type == "payment.failed":
-            # Extract payment details
-            razorpay_payment_id = entity.get("id") or event_payload.get("id")
-            razorpay_order_id = entity.get("order_id") or event_payload.get("order_id")
-            
-            if not razorpay_payment_id or not razorpay_order_id:
-                logger.error(f"Missing payment_id or order_id in payment.failed webhook: {webhook_data}")
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Missing payment_id or order_id in webhook payload"
-                )
-            
-            # Extract payment method details from Razorpay payload (for failed payments too)
-            from .Order_crud import extract_payment_method_from_razorpay_payload
-            payment_method_details, payment_method_metadata = extract_payment_method_from_razorpay_payload(entity)
-            
-            # Find payment by razorpay_order_id
-            payment = db.query(Payment).filter(
-                Payment.razorpay_order_id == razorpay_order_id
-            ).order_by(Payment.created_at.desc()).first()
-            
-            if not payment:
-                logger.warning(f"Payment not found for Razorpay order ID: {razorpay_order_id}")
-                webhook_log.processed = True
-                webhook_log.processing_error = f"Payment not found for Razorpay order ID: {razorpay_order_id}"
-                webhook_log.processed_at = now_ist()
-                db.commit()
-                return WebhookResponse(
-                    status="success",
-                    message=f"Payment not found for Razorpay order ID: {razorpay_order_id}"
-                )
-            
-            # Update webhook log with payment info
-            webhook_log.payment_id = payment.id
-            webhook_log.order_id = payment.order_id
-            webhook_log.razorpay_order_id = razorpay_order_id
-            webhook_log.razorpay_payment_id = razorpay_payment_id
-            
-            # Get order
-            order = db.query(Order).filter(Order.id == payment.order_id).first()
-            
-            if not order:
-                logger.warning(f"Order not found for payment ID: {payment.id}")
-                webhook_log.processed = True
-                webhook_log.processing_error = f"Order not found for payment ID: {payment.id}"
-                webhook_log.processed_at = now_ist()
-                db.commit()
-                return WebhookResponse(
-                    status="success",
-                    message=f"Order not found for payment ID: {payment.id}"
-                )
-            
-            # Only update if order is not already confirmed
-            # Never downgrade a confirmed order
-            if order.order_status == OrderStatus.CONFIRMED:
-                logger.warning(f"Received payment.failed webhook for confirmed order {order.order_number}. Ignoring (order already confirmed).")
-                webhook_log.processed = True
-                webhook_log.processing_error = f"Order {order.order_number} already confirmed. Payment failure event ignored."
-                webhook_log.processed_at = now_ist()
-                db.commit()
-                return WebhookResponse(
-                    status="success",
-                    message=f"Order {order.order_number} already confirmed. Payment failure event ignored."
-                )
-            
-            # Update payment status to failed using mark_payment_failed_or_cancelled
-            # Use savepoint to ensure we can rollback status changes on error
-            savepoint = db.begin_nested()
-            try:
-                order = mark_payment_failed_or_cancelled(
-                    db=db,
-                    order_id=order.id,
-                    payment_status=PaymentStatus.FAILED,
-                    reason=f"Payment failed (webhook event: payment.failed). Event ID: {event_id}",
-                    payment_method_details=payment_method_details,
-                    payment_method_metadata=payment_method_metadata
-                )
-                
-                # Commit the savepoint (status changes are now permanent)
-                savepoint.commit()
-                
-                # Update webhook log as processed
-                webhook_log.processed = True
-                webhook_log.processed_at = now_ist()
-                db.commit()
-                
-                # Send notification only after commit (avoid race: FCM after DB committed)
-                try:
-                    send_notification_to_user(
-                        db,
-                        order.user_id,
-                        "Payment failed",
-                        f"Payment for order {order.order_number} could not be completed. You can retry payment for this order.",
-                        type="warning",
-                    )
-                except Exception as notif_err:
-                    logger.warning("Payment failed notification send error (order %s): %s", order.order_number, notif_err)
-                
-                logger.info(f"Order {order.order_number} marked as failed by webhook")
-                
-                return WebhookResponse(
-                    status="success",
-                    message=f"Order {order.order_number} payment marked as failed"
-                )
-                
-            except Exception as e:
-                # Rollback savepoint to undo status changes
-                savepoint.rollback()
-                # Update webhook log with error (but no status changes were committed)
-                webhook_log.processed = False
-                webhook_log.processing_error = str(e)
-                webhook_log.processed_at = now_ist()
-                db.commit()
-                logger.error(f"Error processing payment.failed webhook: {e}", exc_info=True)
-                # Return 500 so Razorpay retries
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail=f"Error processing webhook: {str(e)}"
-                )
-        
-        elif event_type == "order.paid":
-            # Alternative event for successful payment (when order is paid)
-            order_entity = webhook_data.get("payload", {}).get("order", {}).get("entity", {})
-            razorpay_order_id = order_entity.get("id")
-            
-            if not razorpay_order_id:
-                logger.error(f"Missing order_id in order.paid webhook: {webhook_data}")
-                webhook_log.processed = True
-                webhook_log.processing_error = "Missing order_id in webhook payload"
-                webhook_log.processed_at = now_ist()
-                db.commit()
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Missing order_id in webhook payload"
-                )
-            
-            # Find payment by razorpay_order_id
-            payment = db.query(Payment).filter(
-                Payment.razorpay_order_id == razorpay_order_id
-            ).order_by(Payment.created_at.desc()).first()
-            
-            if not payment:
-                logger.warning(f"Payment not found for Razorpay order ID: {razorpay_order_id}")
-                webhook_log.processed = True
-                webhook_log.processing_error = f"Payment not found for Razorpay order ID: {razorpay_order_id}"
-                webhook_log.processed_at = now_ist()
-                db.commit()
-                return WebhookResponse(
-                    status="success",
-                    message=f"Payment not found for Razorpay order ID: {razorpay_order_id}"
-                )
-            
-            # Update webhook log with payment info
-            webhook_log.payment_id = payment.id
-            webhook_log.order_id = payment.order_id
-            webhook_log.razorpay_order_id = razorpay_order_id
-            
-            # Get order
-            order = db.query(Order).filter(Order.id == payment.order_id).first()
-            
-            if not order:
-                logger.warning(f"Order not found for payment ID: {payment.id}")
-                webhook_log.processed = True
-                webhook_log.processing_error = f"Order not found for payment ID: {payment.id}"
-                webhook_log.processed_at = now_ist()
-                db.commit()
-                return WebhookResponse(
-                    status="success",
-                    message=f"Order not found for payment ID: {payment.id}"
-                )
-            
-            # Get payment ID - use from database first (stored during frontend verification)
-            razorpay_payment_id = payment.razorpay_payment_id
-            
-            # Fallback: try to extract from webhook payload if not in database
-            if not razorpay_payment_id:
-                payments = order_entity.get("payments", [])
-                if payments:
-                    razorpay_payment_id = payments[0]  # Use first payment
-                    logger.info(f"Extracted razorpay_payment_id from webhook payload for order {order.order_number}")
-                else:
-                    logger.warning(f"No payment ID found in database or webhook for order {order.order_number}")
-                    webhook_log.processed = True
-                    webhook_log.processing_error = f"No payment ID found in database or webhook for order {order.order_number}"
-                    webhook_log.processed_at = now_ist()
-                    db.commit()
-                    return WebhookResponse(
-                        status="success",
-                        message=f"No payment ID found in database or webhook for order {order.order_number}"
-                    )
-            else:
-                logger.info(f"Using razorpay_payment_id from database for order {order.order_number}: {razorpay_payment_id}")
-            
-            webhook_log.razorpay_payment_id = razorpay_payment_id
-            
-            # Extract payment method details from Razorpay payload (if available in order.paid event)
-            # For order.paid, payment details might be in a different location - try to get from payment entity if available
-            payment_entity = webhook_data.get("payload", {}).get("payment", {}).get("entity", {})
-            from .Order_crud import extract_payment_method_from_razorpay_payload
-            payment_method_details, payment_method_metadata = extract_payment_method_from_razorpay_payload(payment_entity)
-            
-            # Confirm order from webhook (idempotent)
-            # Use savepoint to ensure we can rollback status changes on error
-            savepoint = db.begin_nested()
-            try:
-                order = confirm_order_from_webhook(
-                    db=db,
-                    order_id=order.id,
-                    razorpay_order_id=razorpay_order_id,
-                    razorpay_payment_id=razorpay_payment_id,
-                    webhook_log_id=webhook_log.id,
-                    payment_method_details=payment_method_details,
-                    payment_method_metadata=payment_method_metadata
-                )
-                
-                # Commit the savepoint (status changes are now permanent)
-                savepoint.commit()
-                
-                # Update webhook log as processed
-                webhook_log.processed = True
-                webhook_log.processed_at = now_ist()
-                db.commit()
-                
-                logger.info(f"Order {order.order_number} confirmed by webhook (order.paid)")
-                
-                return WebhookResponse(
-                    status="success",
-                    message=f"Order {order.order_number} confirmed successfully"
-                )
-                
-            except ValueError as e:
-                # Order already confirmed or other validation error
-                # Rollback savepoint to undo any partial changes
-                savepoint.rollback()
-                logger.info(f"Webhook confirmation skipped: {str(e)}")
-                # Update webhook log as processed (idempotent)
-                webhook_log.processed = True
-                webhook_log.processing_error = str(e)
-                webhook_log.processed_at = now_ist()
-                db.commit()
-                # Return 200 OK (idempotent - already processed)
-                return WebhookResponse(
-                    status="success",
-                    message=str(e)
-                )
-            except Exception as e:
-                # Internal error - rollback savepoint to undo status changes
-                savepoint.rollback()
-                # Update webhook log with error (but no status changes were committed)
-                webhook_log.processed = False
-                webhook_log.processing_error = str(e)
-                webhook_log.processed_at = now_ist()
-                db.commit()
-                logger.error(f"Error confirming order from webhook: {e}", exc_info=True)
-                # Return 500 so Razorpay retries
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail=f"Error processing webhook: {str(e)}"
-                )
-        
-        else:
-            # Unhandled event type - log and return success (don't retry)
-            logger.info(f"Unhandled webhook event type: {event_type}")
-            webhook_log.processed = True
-            webhook_log.processing_error = f"Event {event_type} received but not processed"
-            webhook_log.processed_at = now_ist()
-            db.commit()
-            return WebhookResponse(
-                status="success",
-                message=f"Event {event_type} received but not processed"
-            )
-    
     except HTTPException:
-        # Re-raise HTTP exceptions
         raise
     except Exception as e:
-        logger.error(f"Unexpected error processing webhook: {e}", exc_info=True)
+        logger.error(f"Unexpected error receiving webhook: {e}", exc_info=True)
         db.rollback()
-        # Return 500 so Razorpay retries on unexpected errors
+        # Return 500 so Razorpay retries - the event was not stored
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Internal server error processing webhook: {str(e)}"
         )
 
+    if webhook_log_id is not None:
+        enqueue_webhook(webhook_log_id)
+
+    return WebhookResponse(status="success", message=message)
+
 
 @router.get("/list")
 def get_orders(
     request: Request,
     current_user: User = Depends(get_current_user),
     current_member: Optional[Member] = Depends(get_current_member),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get all confirmed orders for current user (CONFIRMED status and later).
@@ -1150,15 +760,7 @@ def get_orders(
         Order.user_id == current_user.id
     ).order_by(Order.created_at.desc()).all()
 
-    repaired_processing_order = False
-    for order in all_orders:
-        if finalize_verified_processing_order(db, order):
-            repaired_processing_order = True
-
-    if repaired_processing_order:
-        all_orders = db.query(Order).options(joinedload(Order.payments)).filter(
-            Order.user_id == current_user.id
-        ).order_by(Order.created_at.desc()).all()
+    # Orders stuck in PROCESSING are finalized by the background repair job (order_repair)
     
     # Filter to only show CONFIRMED and later statuses
     POST_CONFIRMATION_STATUSES = {
@@ -1646,7 +1248,7 @@ def get_order(
     request: Request,
     current_user: User = Depends(get_current_user),
     current_member: Optional[Member] = Depends(get_current_member),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get order details by order number. If a member is selected, shows only order items for that member.
@@ -1952,7 +1554,7 @@ def get_order_tracking(
     request: Request,
     current_user: User = Depends(get_current_user),
     current_member: Optional[Member] = Depends(get_current_member),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get order tracking information for a specific order by order number.
@@ -2000,11 +1602,7 @@ def get_order_tracking(
             "payment_status": order.payment_status.value if hasattr(order.payment_status, 'value') else str(order.payment_status)
         }
 
-    if repair_confirmed_order_item_statuses(db, order):
-        db.commit()
-        db.refresh(order)
-        for item in order.items:
-            db.refresh(item)
+    # Items behind the order status are fixed by the background repair job (order_repair)
     
     # Filter order items by member if a member is selected
     # If member placed the order, show all items; otherwise show only items for that member
@@ -2217,7 +1815,7 @@ def get_order_item_tracking(
     request: Request,
     current_user: User = Depends(get_current_user),
     current_member: Optional[Member] = Depends(get_current_member),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get tracking information for a specific order item.
@@ -2880,7 +2478,7 @@ def schedule_order(
 
 
 @router.post("/test-invoice-email/{order_id}")
-async def test_invoice_email_generation(
+def test_invoice_email_generation(
     order_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -2924,18 +2522,7 @@ async def test_invoice_email_generation(
 
     # Extract the invoice generation logic from confirm_order_from_webhook
     try:
-        import sys
-        import os
-        from pathlib import Path
-        from config import settings
-
-        # Ensure the 'invoice generation' folder is in the system path for imports
-        project_root = Path(__file__).parent.parent
-        invoice_gen_path = project_root / "invoice generation"
-        if str(invoice_gen_path) not in sys.path:
-            sys.path.append(str(invoice_gen_path))
-
-        from nucleotide_invoice_sender_wo_file import generate_and_send_invoice, build_email_body
+        from .invoice_service import send_invoice_email, build_invoice_email_body, resolve_logo_path
 
         # Prepare invoice data mapping (same as webhook)
         customer_address_str = ""
@@ -3005,25 +2592,18 @@ async def test_invoice_email_generation(
         }
 
         # Build plain-text and HTML email bodies
-        plain_body, html_body = build_email_body(invoice_data)
-
-        # Resolve logo path (relative to root)
-        logo_path = str(project_root / settings.INVOICE_LOGO_PATH)
-        if not os.path.exists(logo_path):
-            logger.warning(f"TEST: Invoice logo not found at {logo_path}. Falling back to text logo.")
-            logo_path = None
+        plain_body, html_body = build_invoice_email_body(invoice_data)
 
-        # Send the invoice email
-        result = generate_and_send_invoice(
+        # Re-sends of an unchanged invoice reuse the stored PDF instead of re-rendering
+        logo_path = resolve_logo_path()
+        result = send_invoice_email(
             invoice_data=invoice_data,
             logo_path=logo_path,
             to=order.user.email,
             subject=f"Order Confirmation & Invoice – {order.order_number}",
             body=plain_body,
             html_body=html_body,
-            pdf_filename=f"Invoice-{order.order_number}.pdf",
-            service_account_file=str(project_root / settings.INVOICE_SERVICE_ACCOUNT_PATH),
-            sender_email=settings.INVOICE_SENDER_EMAIL
+            pdf_filename=f"Invoice-{order.order_number}.pdf"
         )
 
         logger.info(f"TEST: Custom branded PDF invoice sent to {order.user.email} for order {order.order_number}")
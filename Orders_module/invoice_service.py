@@ -0,0 +1,335 @@
+"""
+Invoice rendering and sending service.
+
+- PDFs are rendered by generate_invoice_bytes in a process pool, so ReportLab
+  never runs on a request/webhook thread's CPU. Each pool worker imports the
+  renderer once (fonts registered at import) and warms the paragraph styles and
+  logo bytes in its initializer.
+- Rendered PDFs are stored content-addressed: the key is a SHA-256 of the
+  canonical invoice data plus the logo, so re-sending the same invoice
+  (e.g. /orders/test-invoice-email/{order_id}) reuses the stored file.
+  The store is per host and pruned hourly by prune_invoice_cache(): PDFs not
+  used for INVOICE_PDF_CACHE_MAX_AGE_SECONDS are deleted, then the least
+  recently used ones beyond INVOICE_PDF_CACHE_MAX_FILES.
+  The PDFs hold customer details, so the store directory is private (0700,
+  owned by this user, else the store is not used) and files are written 0600.
+- One authenticated InvoiceSender (Gmail service) is built per
+  (service account, sender) and reused; sends are serialized because the
+  underlying HTTP client is not thread-safe.
+
+If the pool cannot be used (e.g. broken worker), rendering falls back to the
+calling process so an invoice is never skipped because of the pool.
+"""
+import hashlib
+import json
+import logging
+import os
+import stat
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Optional
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = Path(__file__).parent.parent
+INVOICE_GEN_PATH = PROJECT_ROOT / "invoice generation"
+INVOICE_RENDER_TIMEOUT_SECONDS = 60
+# Bump when the invoice layout changes so cached PDFs are not reused
+INVOICE_TEMPLATE_VERSION = "1"
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+_senders: dict = {}
+_senders_lock = threading.Lock()
+_send_lock = threading.Lock()
+
+_metrics_lock = threading.Lock()
+_metrics = {
+    "rendered": 0,
+    "cache_hits": 0,
+    "pool_fallbacks": 0,
+    "render_seconds_total": 0.0,
+    "sent": 0,
+    "cache_evictions": 0,
+}
+
+
+def _ensure_invoice_path() -> None:
+    # The 'invoice generation' folder is not a package; make its modules importable
+    if str(INVOICE_GEN_PATH) not in sys.path:
+        sys.path.append(str(INVOICE_GEN_PATH))
+
+
+def resolve_logo_path() -> Optional[str]:
+    """Absolute path of the invoice logo, or None (text fallback) if missing."""
+    logo_path = str(PROJECT_ROOT / settings.INVOICE_LOGO_PATH)
+    if not os.path.exists(logo_path):
+        logger.warning(f"Invoice logo not found at {logo_path}. Falling back to text logo.")
+        return None
+    return logo_path
+
+
+def _private_dir(path: Path) -> bool:
+    """Create path as 0700 if missing; True only if it is a real directory owned by this user and closed to others."""
+    try:
+        path.mkdir(mode=0o700, parents=True, exist_ok=True)
+        info = os.lstat(path)
+        if not stat.S_ISDIR(info.st_mode):
+            logger.error(f"Invoice PDF store {path} is not a directory; not storing invoices")
+            return False
+        if hasattr(os, "getuid"):
+            if info.st_uid != os.getuid():
+                logger.error(f"Invoice PDF store {path} is owned by another user; not storing invoices")
+                return False
+            if info.st_mode & 0o077:
+                os.chmod(path, 0o700)
+        return True
+    except OSError as e:
+        logger.error(f"Invoice PDF store {path} unavailable: {e}")
+        return False
+
+
+def _cache_dir() -> Optional[Path]:
+    """The PDF store directory, or None if it cannot be used safely."""
+    if settings.INVOICE_PDF_CACHE_DIR:
+        path = Path(settings.INVOICE_PDF_CACHE_DIR)
+    else:
+        # Per-user directory, so a shared temp dir never holds another user's store
+        owner = os.getuid() if hasattr(os, "getuid") else os.getpid()
+        path = Path(tempfile.gettempdir()) / f"nucleotide_invoices-{owner}"
+    return path if _private_dir(path) else None
+
+
+# ---------------------------------------------------------------------------
+# Process pool
+# ---------------------------------------------------------------------------
+
+def _init_render_worker(logo_path: Optional[str]) -> None:
+    """Pool initializer: import the renderer and warm fonts, styles and logo once per worker."""
+    _ensure_invoice_path()
+    import nucleotide_invoice  # registers fonts at import
+    nucleotide_invoice._get_styles()
+    if logo_path:
+        try:
+            nucleotide_invoice._load_logo_bytes(logo_path)
+        except OSError:
+            pass
+
+
+def _render_in_worker(invoice_data: dict, logo_path: Optional[str]) -> bytes:
+    _ensure_invoice_path()
+    from nucleotide_invoice_sender_wo_file import generate_invoice_bytes
+    return generate_invoice_bytes(invoice_data, logo_path=logo_path)
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=max(1, settings.INVOICE_RENDER_WORKERS),
+                initializer=_init_render_worker,
+                initargs=(resolve_logo_path(),),
+            )
+        return _pool
+
+
+def shutdown_invoice_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+# ---------------------------------------------------------------------------
+# Content-addressed PDF store
+# ---------------------------------------------------------------------------
+
+def invoice_cache_key(invoice_data: dict, logo_path: Optional[str]) -> str:
+    """SHA-256 over everything that affects the rendered PDF."""
+    h = hashlib.sha256()
+    h.update(INVOICE_TEMPLATE_VERSION.encode())
+    h.update(json.dumps(invoice_data, sort_keys=True, default=str).encode("utf-8"))
+    if logo_path:
+        try:
+            stat = os.stat(logo_path)
+            h.update(f"{logo_path}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+        except OSError:
+            pass
+    return h.hexdigest()
+
+
+def _cache_path(key: str) -> Optional[Path]:
+    directory = _cache_dir()
+    return directory / key[:2] / f"{key}.pdf" if directory is not None else None
+
+
+def _read_cached_pdf(key: str) -> Optional[bytes]:
+    path = _cache_path(key)
+    if path is None:
+        return None
+    try:
+        pdf_bytes = path.read_bytes()
+    except OSError:
+        return None
+    try:
+        os.utime(path)  # mtime is the last use, for eviction
+    except OSError:
+        pass
+    return pdf_bytes
+
+
+def _store_pdf(key: str, pdf_bytes: bytes) -> None:
+    path = _cache_path(key)
+    if path is None:
+        return
+    try:
+        path.parent.mkdir(mode=0o700, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_NOFOLLOW", 0), 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(pdf_bytes)
+        os.replace(tmp, path)  # atomic: readers never see a partial PDF
+    except OSError as e:
+        logger.warning(f"Could not store rendered invoice {key}: {e}")
+
+
+def prune_invoice_cache(now: Optional[float] = None) -> int:
+    """Delete stored PDFs past the max age, then the least recently used beyond the max count."""
+    now = now if now is not None else time.time()
+    max_age = settings.INVOICE_PDF_CACHE_MAX_AGE_SECONDS
+    directory = _cache_dir()
+    if directory is None:
+        return 0
+    files = []
+    for path in directory.glob("*/*"):
+        try:
+            files.append((path.stat().st_mtime, path))
+        except OSError:
+            continue  # Removed by another process
+    files.sort(reverse=True)
+
+    keep = max(0, settings.INVOICE_PDF_CACHE_MAX_FILES)
+    removed = 0
+    for index, (mtime, path) in enumerate(files):
+        # Leftover temp files from a crashed write only go by age
+        if now - mtime < max_age and (index < keep or path.suffix == ".tmp"):
+            continue
+        try:
+            path.unlink()
+            removed += 1
+        except OSError:
+            pass
+    if removed:
+        with _metrics_lock:
+            _metrics["cache_evictions"] += removed
+        logger.info(f"Invoice PDF cache: removed {removed} of {len(files)} file(s)")
+    return removed
+
+
+# ---------------------------------------------------------------------------
+# Public API
+# ---------------------------------------------------------------------------
+
+def render_invoice_pdf(invoice_data: dict, logo_path: Optional[str] = None, use_pool: bool = True) -> bytes:
+    """Return the invoice PDF, from the content-addressed store or freshly rendered."""
+    key = invoice_cache_key(invoice_data, logo_path)
+    cached = _read_cached_pdf(key)
+    if cached is not None:
+        with _metrics_lock:
+            _metrics["cache_hits"] += 1
+        return cached
+
+    started = time.monotonic()
+    pdf_bytes = None
+    if use_pool:
+        try:
+            pdf_bytes = _get_pool().submit(_render_in_worker, invoice_data, logo_path).result(
+                timeout=INVOICE_RENDER_TIMEOUT_SECONDS
+            )
+        except BrokenProcessPool as e:
+            logger.error(f"Invoice render pool broken, recreating: {e}")
+            shutdown_invoice_pool()
+        except Exception as e:
+            logger.error(f"Invoice render in pool failed, rendering in-process: {e}", exc_info=True)
+        if pdf_bytes is None:
+            with _metrics_lock:
+                _metrics["pool_fallbacks"] += 1
+    if pdf_bytes is None:
+        pdf_bytes = _render_in_worker(invoice_data, logo_path)
+
+    with _metrics_lock:
+        _metrics["rendered"] += 1
+        _metrics["render_seconds_total"] += time.monotonic() - started
+
+    _store_pdf(key, pdf_bytes)
+    return pdf_bytes
+
+
+def get_invoice_sender(service_account_file: str, sender_email: str):
+    """Authenticated InvoiceSender, built once per (service account, sender)."""
+    key = (service_account_file, sender_email)
+    with _senders_lock:
+        sender = _senders.get(key)
+        if sender is None:
+            _ensure_invoice_path()
+            from nucleotide_invoice_sender_wo_file import InvoiceSender
+            sender = InvoiceSender(service_account_file=service_account_file, sender_email=sender_email)
+            _senders[key] = sender
+        return sender
+
+
+def build_invoice_email_body(invoice_data: dict) -> tuple[str, str]:
+    _ensure_invoice_path()
+    from nucleotide_invoice_sender_wo_file import build_email_body
+    return build_email_body(invoice_data)
+
+
+def send_invoice_email(
+    invoice_data: dict,
+    logo_path: Optional[str],
+    to: str,
+    subject: str,
+    body: str,
+    html_body: Optional[str] = None,
+    pdf_filename: str = "invoice.pdf",
+    bcc=None,
+) -> dict:
+    """Render (or reuse) the invoice PDF and email it from the billing mailbox."""
+    pdf_bytes = render_invoice_pdf(invoice_data, logo_path)
+    sender = get_invoice_sender(
+        str(PROJECT_ROOT / settings.INVOICE_SERVICE_ACCOUNT_PATH),
+        settings.INVOICE_SENDER_EMAIL,
+    )
+    with _send_lock:
+        result = sender.send_invoice(
+            to=to,
+            subject=subject,
+            body=body,
+            pdf_bytes=pdf_bytes,
+            pdf_filename=pdf_filename,
+            bcc=bcc,
+            html_body=html_body,
+        )
+    with _metrics_lock:
+        _metrics["sent"] += 1
+    return result
+
+
+def get_invoice_render_metrics() -> dict:
+    with _metrics_lock:
+        metrics = dict(_metrics)
+    rendered = metrics["rendered"]
+    metrics["avg_render_seconds"] = round(metrics["render_seconds_total"] / rendered, 4) if rendered else 0.0
+    metrics["render_seconds_total"] = round(metrics["render_seconds_total"], 3)
+    metrics["pool_workers"] = settings.INVOICE_RENDER_WORKERS
+    return metrics
@@ -0,0 +1,88 @@
+"""
+Sequential order number allocator.
+
+Order numbers come from a counter row in order_number_sequences instead of
+scanning orders for the current max:
+
+    UPDATE order_number_sequences SET last_value = last_value + 1 WHERE name = ?
+    SELECT last_value FROM order_number_sequences WHERE name = ?
+
+Both statements run in their own short transaction on a separate connection.
+The UPDATE takes the row lock, so concurrent /orders/create calls are
+serialized only for those two statements (not for the whole checkout) and each
+caller reads back its own value. Allocation is O(1) and never hands out the
+same number twice. A checkout that fails after allocating leaves a gap, as
+with any database sequence.
+
+The counter row is seeded once (by migration 096, or lazily here) from the
+highest existing numeric order number.
+"""
+import logging
+
+from sqlalchemy import select, update, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from Login_module.Utils.datetime_utils import now_ist
+from .Order_model import Order, OrderNumberSequence
+
+logger = logging.getLogger(__name__)
+
+ORDER_NUMBER_SEQUENCE = "order_number"
+ORDER_NUMBER_PREFIX = "262700"
+ORDER_NUMBER_START = 2627001000  # First allocated number is START + 1
+
+_sequences = OrderNumberSequence.__table__
+
+
+def _current_max_order_number(conn) -> int:
+    """Highest numeric order number in orders (one-time scan used only for seeding)."""
+    orders = Order.__table__
+    rows = conn.execute(
+        select(orders.c.order_number).where(orders.c.order_number.like(f"{ORDER_NUMBER_PREFIX}%"))
+    )
+    numbers = [int(n) for (n,) in rows if n and n.isdigit()]
+    return max(numbers) if numbers else ORDER_NUMBER_START
+
+
+def seed_order_number_sequence(bind) -> None:
+    """Create the counter row from existing orders if it does not exist yet."""
+    with bind.connect() as conn:
+        with conn.begin():
+            exists = conn.execute(
+                select(_sequences.c.name).where(_sequences.c.name == ORDER_NUMBER_SEQUENCE)
+            ).first()
+            if exists:
+                return
+            start = _current_max_order_number(conn)
+        try:
+            with conn.begin():
+                conn.execute(
+                    insert(_sequences).values(
+                        name=ORDER_NUMBER_SEQUENCE, last_value=start, updated_at=now_ist()
+                    )
+                )
+            logger.info(f"Seeded order number sequence at {start}")
+        except IntegrityError:
+            # Another worker seeded it concurrently
+            pass
+
+
+def allocate_order_number(db: Session) -> str:
+    """Allocate the next order number (e.g. 2627001001, 2627001002, ...)."""
+    bind = db.get_bind()
+    for _ in range(2):
+        with bind.connect() as conn:
+            with conn.begin():
+                result = conn.execute(
+                    update(_sequences)
+                    .where(_sequences.c.name == ORDER_NUMBER_SEQUENCE)
+                    .values(last_value=_sequences.c.last_value + 1, updated_at=now_ist())
+                )
+                if result.rowcount == 1:
+                    value = conn.execute(
+                        select(_sequences.c.last_value).where(_sequences.c.name == ORDER_NUMBER_SEQUENCE)
+                    ).scalar_one()
+                    return str(value)
+        seed_order_number_sequence(bind)
+    raise RuntimeError("Order number sequence could not be initialized")
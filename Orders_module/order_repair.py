@@ -0,0 +1,165 @@
+"""
+Background order repair.
+
+GET endpoints used to repair orders while reading them (finalizing verified
+PROCESSING orders, syncing item statuses). That work now happens here, so the
+read endpoints stay pure queries:
+
+- flag_orders_needing_repair() finds orders that need work and sets
+  orders.needs_repair. The frontend verification path also sets the flag
+  itself when it moves an order to PROCESSING, and confirmation clears it.
+- repair_flagged_orders() reads the queue (needs_repair = true, indexed) in
+  id batches, runs finalize_verified_processing_order /
+  repair_confirmed_order_item_statuses on each order and clears the flag.
+  Each order is its own transaction; a failing order stays flagged and is
+  retried on the next run.
+
+Both are leader-only scheduler jobs (see Login_module/Device/scheduler.py).
+"""
+import logging
+import threading
+import time
+from typing import Dict
+
+from sqlalchemy import and_, exists, or_, select, update
+
+from database import SessionLocal
+from Login_module.Utils.datetime_utils import now_ist
+from .Order_model import Order, OrderItem, OrderStatus, Payment, PaymentStatus
+
+logger = logging.getLogger(__name__)
+
+REPAIR_BATCH_SIZE = 100
+REPAIR_INTERVAL_SECONDS = 60
+SCAN_INTERVAL_SECONDS = 30 * 60
+
+POST_CONFIRMATION_STATUSES = (
+    OrderStatus.CONFIRMED,
+    OrderStatus.SCHEDULED,
+    OrderStatus.SCHEDULE_CONFIRMED_BY_LAB,
+    OrderStatus.SAMPLE_COLLECTED,
+    OrderStatus.SAMPLE_RECEIVED_BY_LAB,
+    OrderStatus.TESTING_IN_PROGRESS,
+    OrderStatus.REPORT_READY,
+    OrderStatus.COMPLETED,
+)
+PRE_CONFIRMATION_ITEM_STATUSES = (
+    OrderStatus.PENDING,
+    OrderStatus.PENDING_PAYMENT,
+    OrderStatus.PROCESSING,
+)
+
+_metrics_lock = threading.Lock()
+_metrics = {"flagged": 0, "repaired": 0, "cleared": 0, "failed": 0, "last_run_at": None, "last_duration_seconds": None}
+
+
+def _needs_repair_condition():
+    """Orders stuck in PROCESSING with a signed payment, or confirmed with items behind."""
+    stuck_processing = and_(
+        Order.order_status == OrderStatus.PROCESSING,
+        Order.payment_status == PaymentStatus.PROCESSING,
+        exists().where(
+            Payment.order_id == Order.id,
+            Payment.payment_status == PaymentStatus.PROCESSING,
+            Payment.razorpay_payment_id.isnot(None),
+            Payment.razorpay_signature.isnot(None),
+        ),
+    )
+    items_behind = and_(
+        Order.order_status.in_(POST_CONFIRMATION_STATUSES),
+        exists().where(
+            OrderItem.order_id == Order.id,
+            OrderItem.order_status.in_(PRE_CONFIRMATION_ITEM_STATUSES),
+        ),
+    )
+    return or_(stuck_processing, items_behind)
+
+
+def flag_orders_needing_repair() -> int:
+    """Set needs_repair on every order that needs it. Scheduler entry point."""
+    db = SessionLocal()
+    try:
+        result = db.execute(
+            update(Order)
+            .where(Order.needs_repair == False, _needs_repair_condition())
+            .values(needs_repair=True)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        flagged = result.rowcount or 0
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Order repair scan failed: {e}")
+        return 0
+    finally:
+        db.close()
+    with _metrics_lock:
+        _metrics["flagged"] += flagged
+    if flagged:
+        logger.info(f"Flagged {flagged} order(s) for repair")
+    return flagged
+
+
+def _repair_order(db, order_id: int) -> bool:
+    """Repair one flagged order and clear its flag. Returns True if anything was changed."""
+    from .Order_crud import finalize_verified_processing_order, repair_confirmed_order_item_statuses
+
+    order = db.get(Order, order_id)
+    if order is None:
+        return False
+    changed = finalize_verified_processing_order(db, order)  # commits when it confirms
+    if changed:
+        db.refresh(order)
+    changed = repair_confirmed_order_item_statuses(db, order) or changed
+    order.needs_repair = False
+    db.commit()
+    return changed
+
+
+def repair_flagged_orders(batch_size: int = REPAIR_BATCH_SIZE) -> Dict[str, int]:
+    """Work through the needs_repair queue. Scheduler entry point."""
+    started = time.monotonic()
+    counts = {"repaired": 0, "cleared": 0, "failed": 0}
+    db = SessionLocal()
+    try:
+        last_id = 0
+        while True:
+            order_ids = db.execute(
+                select(Order.id)
+                .where(Order.needs_repair == True, Order.id > last_id)
+                .order_by(Order.id)
+                .limit(batch_size)
+            ).scalars().all()
+            db.rollback()  # End the read transaction; each order gets its own
+            if not order_ids:
+                break
+            for order_id in order_ids:
+                try:
+                    if _repair_order(db, order_id):
+                        counts["repaired"] += 1
+                    else:
+                        counts["cleared"] += 1
+                except Exception as e:
+                    db.rollback()
+                    counts["failed"] += 1
+                    logger.error(f"Order repair failed | Order ID: {order_id} | Error: {e}", exc_info=True)
+                finally:
+                    db.expunge_all()
+            last_id = order_ids[-1]
+    finally:
+        db.close()
+
+    duration = round(time.monotonic() - started, 3)
+    with _metrics_lock:
+        for name, count in counts.items():
+            _metrics[name] += count
+        _metrics["last_run_at"] = now_ist().isoformat()
+        _metrics["last_duration_seconds"] = duration
+    if counts["repaired"] or counts["failed"]:
+        logger.info(f"Order repair run completed in {duration}s | {counts}")
+    return counts
+
+
+def get_order_repair_metrics() -> dict:
+    with _metrics_lock:
+        return dict(_metrics)
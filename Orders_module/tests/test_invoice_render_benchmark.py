@@ -0,0 +1,105 @@
+"""
+Invoice rendering throughput benchmark.
+
+Renders distinct invoices through the process pool and reports invoices/second;
+re-rendering an unchanged invoice must come from the content-addressed store.
+
+Run with -s to see the numbers:
+    python -m pytest -s Orders_module/tests/test_invoice_render_benchmark.py
+"""
+import copy
+import sys
+import os
+import stat
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../..'))
+
+pytest.importorskip("reportlab")
+
+from config import settings
+from Orders_module import invoice_service
+
+BENCH_INVOICES = 24
+
+
+@pytest.fixture
+def invoice_env(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "INVOICE_PDF_CACHE_DIR", str(tmp_path))
+    invoice_service._ensure_invoice_path()
+    from nucleotide_invoice import SAMPLE_INVOICE
+    yield SAMPLE_INVOICE, invoice_service.resolve_logo_path()
+    invoice_service.shutdown_invoice_pool()
+
+
+def _invoice(sample, i):
+    data = copy.deepcopy(sample)
+    data["invoice_number"] = f"BENCH-{i:05d}"
+    data["order_number"] = f"ORD-BENCH-{i:05d}"
+    return data
+
+
+def test_invoice_render_throughput(invoice_env):
+    sample, logo_path = invoice_env
+    invoices = [_invoice(sample, i) for i in range(BENCH_INVOICES)]
+
+    # Warm the pool (worker start-up, font/style/logo preload) outside the timed section
+    invoice_service.render_invoice_pdf(_invoice(sample, -1), logo_path)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, settings.INVOICE_RENDER_WORKERS)) as executor:
+        pdfs = list(executor.map(lambda d: invoice_service.render_invoice_pdf(d, logo_path), invoices))
+    elapsed = time.perf_counter() - started
+
+    assert all(pdf.startswith(b"%PDF") for pdf in pdfs)
+    print(
+        f"\nInvoice render: {BENCH_INVOICES} invoices in {elapsed:.2f}s = "
+        f"{BENCH_INVOICES / elapsed:.1f} invoices/s ({settings.INVOICE_RENDER_WORKERS} workers)"
+    )
+
+    # Re-send path: same data -> served from the store, no re-render
+    rendered_before = invoice_service.get_invoice_render_metrics()["rendered"]
+    started = time.perf_counter()
+    again = [invoice_service.render_invoice_pdf(d, logo_path) for d in invoices]
+    cached_elapsed = time.perf_counter() - started
+
+    assert again == pdfs
+    assert invoice_service.get_invoice_render_metrics()["rendered"] == rendered_before
+    print(f"Cached re-send: {BENCH_INVOICES / cached_elapsed:.1f} invoices/s")
+
+
+def test_prune_evicts_old_and_least_recently_used(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "INVOICE_PDF_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "INVOICE_PDF_CACHE_MAX_AGE_SECONDS", 3600)
+    monkeypatch.setattr(settings, "INVOICE_PDF_CACHE_MAX_FILES", 2)
+    now = time.time()
+    keys = [f"{i:02x}" * 32 for i in range(4)]
+    for age, key in zip((7200, 30, 20, 10), keys):
+        invoice_service._store_pdf(key, b"%PDF")
+        os.utime(invoice_service._cache_path(key), (now - age, now - age))
+
+    # A cache hit counts as a use
+    assert invoice_service._read_cached_pdf(keys[1]) == b"%PDF"
+
+    assert invoice_service.prune_invoice_cache(now=time.time()) == 2
+    assert [invoice_service._read_cached_pdf(key) is not None for key in keys] == [False, True, False, True]
+
+
+@pytest.mark.skipif(not hasattr(os, "getuid"), reason="POSIX permissions")
+def test_store_is_private(tmp_path, monkeypatch):
+    store = tmp_path / "invoices"
+    monkeypatch.setattr(settings, "INVOICE_PDF_CACHE_DIR", str(store))
+    key = "ab" * 32
+    invoice_service._store_pdf(key, b"%PDF")
+    assert stat.S_IMODE(os.stat(store).st_mode) == 0o700
+    assert stat.S_IMODE(os.stat(invoice_service._cache_path(key)).st_mode) == 0o600
+
+    # A directory planted by another user is not used
+    if os.getuid() != 0:
+        pytest.skip("needs root to chown")
+    os.chown(store, os.getuid() + 1, -1)
+    assert invoice_service._read_cached_pdf(key) is None
+    assert invoice_service._cache_path(key) is None
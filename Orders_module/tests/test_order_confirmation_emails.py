@@ -0,0 +1,66 @@
+"""
+send_order_confirmation_emails must hand the invoice (with the order's payment)
+to send_invoice_email instead of failing silently inside its own try/except.
+"""
+import sys
+import os
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../..'))
+
+from database import Base
+from Login_module.User.user_model import User
+from Address_module.Address_model import Address
+import Member_module.Member_model  # noqa: F401  (FK targets for order items)
+from Product_module.Product_model import Product
+from Orders_module.Order_model import Order, OrderItem, OrderSnapshot, Payment, PaymentStatus
+from Orders_module import Order_crud, invoice_service
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'orders.db'}")
+    Base.metadata.create_all(engine, tables=[
+        User.__table__, Address.__table__, Product.__table__, Order.__table__, OrderSnapshot.__table__,
+        OrderItem.__table__, Payment.__table__,
+    ])
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def test_sends_invoice_with_latest_payment(db, monkeypatch):
+    user = User(name="Asha", email="asha@example.com", mobile="enc-mobile")
+    db.add(user)
+    db.flush()
+    order = Order(
+        order_number="100123", user_id=user.id, subtotal=1000.0, total_amount=900.0,
+        payment_status=PaymentStatus.COMPLETED,
+    )
+    db.add(order)
+    db.flush()
+    db.add(Payment(
+        order_id=order.id, razorpay_order_id="order_rzp", razorpay_payment_id="pay_rzp",
+        payment_method_details="upi", payment_status=PaymentStatus.COMPLETED, amount=900.0,
+    ))
+    db.commit()
+
+    sent = []
+    monkeypatch.setattr(invoice_service, "send_invoice_email", lambda **kwargs: sent.append(kwargs))
+    monkeypatch.setattr(invoice_service, "build_invoice_email_body", lambda data: ("plain", "<p>html</p>"))
+    monkeypatch.setattr(invoice_service, "resolve_logo_path", lambda: None)
+
+    Order_crud.send_order_confirmation_emails(db, order)
+
+    assert len(sent) == 1
+    assert sent[0]["to"] == "asha@example.com"
+    invoice_data = sent[0]["invoice_data"]
+    assert invoice_data["order_number"] == "100123"
+    assert invoice_data["payment_info"] == [
+        {"mode": "Razorpay (UPI)", "reference": "pay_rzp", "amount": 900.0}
+    ]
+    assert invoice_data["paid_amount"] == 900.0
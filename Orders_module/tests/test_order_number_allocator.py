@@ -0,0 +1,75 @@
+"""
+Concurrency test for the order number allocator.
+
+Hundreds of parallel allocations (each on its own session, as concurrent
+/orders/create requests would be) must produce unique, contiguous numbers
+continuing from the highest existing order number.
+"""
+import sys
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../..'))
+
+from database import Base
+import Login_module.User.user_model  # noqa: F401  (FK targets for orders)
+import Member_module.Member_model  # noqa: F401
+import Address_module.Address_model  # noqa: F401
+import Product_module.Product_model  # noqa: F401  (keeps Base.metadata complete for other tests' create_all)
+from Orders_module.Order_model import Order, OrderNumberSequence
+from Orders_module.order_number import allocate_order_number, ORDER_NUMBER_START
+
+PARALLEL_ALLOCATIONS = 300
+THREADS = 32
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    # File-backed SQLite so every thread gets a real, separate connection
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'orders.db'}",
+        connect_args={"check_same_thread": False, "timeout": 30},
+        pool_size=THREADS,
+        max_overflow=0,
+    )
+    Base.metadata.create_all(engine, tables=[Order.__table__, OrderNumberSequence.__table__])
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def _seed_existing_order(Session, order_number: str):
+    # Core insert: only order_number matters for seeding (FKs are not enforced by SQLite)
+    with Session() as db:
+        db.execute(
+            Order.__table__.insert().values(
+                order_number=order_number, user_id=1, subtotal=0.0, total_amount=0.0,
+                payment_status="PENDING", order_status="PENDING_PAYMENT",
+            )
+        )
+        db.commit()
+
+
+def _allocate(Session):
+    with Session() as db:
+        return int(allocate_order_number(db))
+
+
+def test_first_allocation_starts_after_start_number(session_factory):
+    assert _allocate(session_factory) == ORDER_NUMBER_START + 1
+    assert _allocate(session_factory) == ORDER_NUMBER_START + 2
+
+
+def test_parallel_allocations_are_unique_and_contiguous(session_factory):
+    existing_max = ORDER_NUMBER_START + 41
+    _seed_existing_order(session_factory, "ORD-LEGACY-1")  # non-numeric numbers are ignored
+    _seed_existing_order(session_factory, str(existing_max))
+
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        numbers = list(executor.map(lambda _: _allocate(session_factory), range(PARALLEL_ALLOCATIONS)))
+
+    assert len(set(numbers)) == PARALLEL_ALLOCATIONS
+    assert sorted(numbers) == list(range(existing_max + 1, existing_max + 1 + PARALLEL_ALLOCATIONS))
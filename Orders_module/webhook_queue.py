@@ -0,0 +1,420 @@
+"""
+Razorpay webhook work queue.
+
+The /orders/webhook endpoint only verifies the signature, stores the WebhookLog
+and acknowledges. Processing (order confirmation, cart clearing, coupon usage,
+invoice/email, notifications) happens here, off the request path.
+
+Durability: webhook_logs is the outbox. A row with signature_valid=True and
+processed=False is pending work. The endpoint pushes the row id onto an
+in-process queue for immediate pickup, and sweep_pending_webhooks() (scheduler)
+re-enqueues anything from the last WEBHOOK_SWEEP_MAX_AGE_HOURS left behind by a
+crash or a failed attempt.
+
+Idempotency:
+- One row per Razorpay event_id (unique column); redeliveries are ACKed, not re-inserted.
+- A worker claims a row with a conditional UPDATE (attempts += 1, lease in
+  next_attempt_at), so the same event is never processed by two workers at once.
+- confirm_order_payment / mark_payment_failed_or_cancelled are idempotent.
+- Slow side effects (invoice PDF and emails, notifications) run only after the
+  row is committed as processed, so they never outlive the claim lease and a
+  second worker can no longer pick the event up while they run.
+
+Retries: unexpected errors leave the row unprocessed with exponential backoff in
+next_attempt_at, up to WEBHOOK_MAX_ATTEMPTS.
+"""
+import logging
+import queue
+import threading
+from datetime import timedelta
+from typing import Optional
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from Login_module.Utils.datetime_utils import now_ist
+from Notification_module.Notification_crud import send_notification_to_user
+from .Order_model import OrderStatus, PaymentStatus, Order, Payment, WebhookLog
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_MAX_ATTEMPTS = 8
+WEBHOOK_LEASE_SECONDS = 300  # Claimed rows become eligible again if a worker dies mid-processing
+WEBHOOK_RETRY_BASE_SECONDS = 30  # 30s, 60s, 120s, ... capped at 1 hour
+WEBHOOK_RETRY_MAX_SECONDS = 3600
+WEBHOOK_WORKER_THREADS = 2
+WEBHOOK_SWEEP_MAX_AGE_HOURS = 24  # Older unprocessed events are left alone rather than replayed
+
+_queue: "queue.Queue[Optional[int]]" = queue.Queue()
+_workers: list = []
+_workers_lock = threading.Lock()
+
+_metrics_lock = threading.Lock()
+_metrics = {
+    "enqueued": 0,
+    "processed": 0,
+    "failed_attempts": 0,
+    "gave_up": 0,
+    "skipped_already_claimed": 0,
+}
+
+
+def _bump(name: str, amount: int = 1) -> None:
+    with _metrics_lock:
+        _metrics[name] += amount
+
+
+# ---------------------------------------------------------------------------
+# Event processing
+# ---------------------------------------------------------------------------
+
+def _find_payment_and_order(db: Session, webhook_log: WebhookLog, razorpay_order_id: str):
+    """Look up the payment/order for a Razorpay order id; marks the log processed if missing."""
+    payment = db.query(Payment).filter(
+        Payment.razorpay_order_id == razorpay_order_id
+    ).order_by(Payment.created_at.desc()).first()
+
+    if not payment:
+        logger.warning(f"Payment not found for Razorpay order ID: {razorpay_order_id}")
+        webhook_log.processing_error = f"Payment not found for Razorpay order ID: {razorpay_order_id}"
+        return None, None
+
+    webhook_log.payment_id = payment.id
+    webhook_log.order_id = payment.order_id
+    webhook_log.razorpay_order_id = razorpay_order_id
+
+    order = db.query(Order).filter(Order.id == payment.order_id).first()
+    if not order:
+        logger.warning(f"Order not found for payment ID: {payment.id}")
+        webhook_log.processing_error = f"Order not found for payment ID: {payment.id}"
+        return payment, None
+
+    return payment, order
+
+
+def _confirm(db: Session, webhook_log: WebhookLog, order: Order, razorpay_order_id: str,
+             razorpay_payment_id: str, payment_entity: dict, event_label: str) -> str:
+    from .Order_crud import confirm_order_payment, send_order_confirmation_emails, extract_payment_method_from_razorpay_payload
+
+    payment_method_details, payment_method_metadata = extract_payment_method_from_razorpay_payload(payment_entity)
+    # confirm_order_payment commits the confirmation itself; on an unexpected error
+    # process_webhook_log rolls back whatever it had not committed
+    try:
+        order, newly_confirmed = confirm_order_payment(
+            db=db,
+            order_id=order.id,
+            razorpay_order_id=razorpay_order_id,
+            razorpay_payment_id=razorpay_payment_id,
+            webhook_log_id=webhook_log.id,
+            payment_method_details=payment_method_details,
+            payment_method_metadata=payment_method_metadata
+        )
+    except ValueError as e:
+        # Order already confirmed or other validation error - nothing to retry
+        links = (webhook_log.payment_id, webhook_log.order_id, webhook_log.razorpay_order_id, webhook_log.razorpay_payment_id)
+        db.rollback()
+        webhook_log.payment_id, webhook_log.order_id, webhook_log.razorpay_order_id, webhook_log.razorpay_payment_id = links
+        logger.info(f"Webhook confirmation skipped: {str(e)}")
+        webhook_log.processing_error = str(e)
+        return str(e)
+
+    # Invoice and confirmation emails are slow (PDF render, SMTP): send them only
+    # after the event is marked processed, outside the claim lease
+    _mark_processed(db, webhook_log)
+    if newly_confirmed:
+        send_order_confirmation_emails(db, order)
+
+    logger.info(f"Order {order.order_number} confirmed by webhook ({event_label})")
+    return f"Order {order.order_number} confirmed successfully"
+
+
+def _mark_processed(db: Session, webhook_log: WebhookLog) -> None:
+    webhook_log.processed = True
+    webhook_log.processed_at = now_ist()
+    webhook_log.next_attempt_at = None
+    db.commit()
+
+
+def process_webhook_event(db: Session, webhook_log: WebhookLog) -> str:
+    """
+    Apply a verified webhook event. Sets processing_error for events that are
+    acknowledged but not acted on. Raises on errors that should be retried.
+    Returns a human-readable outcome message.
+    """
+    webhook_data = webhook_log.payload or {}
+    event_type = webhook_log.event_type
+    event_id = webhook_log.event_id
+    event_payload = webhook_data.get("payload", {}).get("payment", {})
+    entity = event_payload.get("entity", {})
+
+    if event_type in ("payment.captured", "payment.failed"):
+        razorpay_payment_id = entity.get("id") or event_payload.get("id")
+        razorpay_order_id = entity.get("order_id") or event_payload.get("order_id")
+
+        if not razorpay_payment_id or not razorpay_order_id:
+            logger.error(f"Missing payment_id or order_id in {event_type} webhook: {webhook_data}")
+            webhook_log.processing_error = "Missing payment_id or order_id in webhook payload"
+            return webhook_log.processing_error
+
+        payment, order = _find_payment_and_order(db, webhook_log, razorpay_order_id)
+        if not order:
+            return webhook_log.processing_error
+        webhook_log.razorpay_payment_id = razorpay_payment_id
+
+        if event_type == "payment.captured":
+            return _confirm(db, webhook_log, order, razorpay_order_id, razorpay_payment_id, entity, "payment.captured")
+
+        # payment.failed - never downgrade a confirmed order
+        if order.order_status == OrderStatus.CONFIRMED:
+            logger.warning(f"Received payment.failed webhook for confirmed order {order.order_number}. Ignoring (order already confirmed).")
+            webhook_log.processing_error = f"Order {order.order_number} already confirmed. Payment failure event ignored."
+            return webhook_log.processing_error
+
+        from .Order_crud import mark_payment_failed_or_cancelled, extract_payment_method_from_razorpay_payload
+        payment_method_details, payment_method_metadata = extract_payment_method_from_razorpay_payload(entity)
+        previous_status = order.order_status
+        # On error process_webhook_log rolls back the uncommitted status changes
+        order = mark_payment_failed_or_cancelled(
+            db=db,
+            order_id=order.id,
+            payment_status=PaymentStatus.FAILED,
+            reason=f"Payment failed (webhook event: payment.failed). Event ID: {event_id}",
+            payment_method_details=payment_method_details,
+            payment_method_metadata=payment_method_metadata
+        )
+        # Mark processed before notifying so a notification error can't cause a replay
+        _mark_processed(db, webhook_log)
+        if order.order_status == previous_status:
+            # Already failed (duplicate event) or payment completed meanwhile: nothing to tell the user
+            logger.info(f"Order {order.order_number} unchanged by payment.failed webhook")
+            return f"Order {order.order_number} payment status unchanged"
+
+        # Send notification only after commit (avoid race: FCM after DB committed)
+        try:
+            send_notification_to_user(
+                db,
+                order.user_id,
+                "Payment failed",
+                f"Payment for order {order.order_number} could not be completed. You can retry payment for this order.",
+                type="warning",
+            )
+        except Exception as notif_err:
+            logger.warning("Payment failed notification send error (order %s): %s", order.order_number, notif_err)
+
+        logger.info(f"Order {order.order_number} marked as failed by webhook")
+        return f"Order {order.order_number} payment marked as failed"
+
+    if event_type == "order.paid":
+        # Alternative event for successful payment (when order is paid)
+        order_entity = webhook_data.get("payload", {}).get("order", {}).get("entity", {})
+        razorpay_order_id = order_entity.get("id")
+
+        if not razorpay_order_id:
+            logger.error(f"Missing order_id in order.paid webhook: {webhook_data}")
+            webhook_log.processing_error = "Missing order_id in webhook payload"
+            return webhook_log.processing_error
+
+        payment, order = _find_payment_and_order(db, webhook_log, razorpay_order_id)
+        if not order:
+            return webhook_log.processing_error
+
+        # Use payment ID from database first (stored during frontend verification)
+        razorpay_payment_id = payment.razorpay_payment_id
+        if not razorpay_payment_id:
+            payments = order_entity.get("payments", [])
+            if payments:
+                razorpay_payment_id = payments[0]  # Use first payment
+                logger.info(f"Extracted razorpay_payment_id from webhook payload for order {order.order_number}")
+            else:
+                logger.warning(f"No payment ID found in database or webhook for order {order.order_number}")
+                webhook_log.processing_error = f"No payment ID found in database or webhook for order {order.order_number}"
+                return webhook_log.processing_error
+
+        webhook_log.razorpay_payment_id = razorpay_payment_id
+        return _confirm(db, webhook_log, order, razorpay_order_id, razorpay_payment_id, entity, "order.paid")
+
+    logger.info(f"Unhandled webhook event type: {event_type}")
+    webhook_log.processing_error = f"Event {event_type} received but not processed"
+    return webhook_log.processing_error
+
+
+# ---------------------------------------------------------------------------
+# Claiming and retries
+# ---------------------------------------------------------------------------
+
+def _claim(db: Session, webhook_log_id: int) -> bool:
+    """Atomically take a lease on a pending webhook row. Returns False if someone else holds it."""
+    now = now_ist()
+    claimed = (
+        db.query(WebhookLog)
+        .filter(
+            WebhookLog.id == webhook_log_id,
+            WebhookLog.processed == False,
+            WebhookLog.signature_valid == True,
+            WebhookLog.attempts < WEBHOOK_MAX_ATTEMPTS,
+            or_(WebhookLog.next_attempt_at.is_(None), WebhookLog.next_attempt_at <= now),
+        )
+        .update(
+            {
+                WebhookLog.attempts: WebhookLog.attempts + 1,
+                WebhookLog.next_attempt_at: now + timedelta(seconds=WEBHOOK_LEASE_SECONDS),
+            },
+            synchronize_session=False,
+        )
+    )
+    db.commit()
+    return claimed == 1
+
+
+def _retry_delay_seconds(attempts: int) -> int:
+    return min(WEBHOOK_RETRY_BASE_SECONDS * (2 ** max(0, attempts - 1)), WEBHOOK_RETRY_MAX_SECONDS)
+
+
+def process_webhook_log(webhook_log_id: int) -> bool:
+    """
+    Claim and process one webhook row. Returns True if the row ended up processed.
+    Safe to call for a row that is already processed or claimed elsewhere.
+    """
+    db = SessionLocal()
+    try:
+        if not _claim(db, webhook_log_id):
+            _bump("skipped_already_claimed")
+            return False
+
+        webhook_log = db.query(WebhookLog).filter(WebhookLog.id == webhook_log_id).first()
+        try:
+            message = process_webhook_event(db, webhook_log)
+        except Exception as e:
+            db.rollback()
+            webhook_log = db.query(WebhookLog).filter(WebhookLog.id == webhook_log_id).first()
+            webhook_log.processing_error = str(e)
+            if webhook_log.attempts >= WEBHOOK_MAX_ATTEMPTS:
+                webhook_log.next_attempt_at = None
+                _bump("gave_up")
+                logger.error(
+                    f"Giving up on webhook {webhook_log_id} (event_id: {webhook_log.event_id}) "
+                    f"after {webhook_log.attempts} attempts: {e}",
+                    exc_info=True
+                )
+            else:
+                delay = _retry_delay_seconds(webhook_log.attempts)
+                webhook_log.next_attempt_at = now_ist() + timedelta(seconds=delay)
+                logger.error(
+                    f"Error processing webhook {webhook_log_id} (event_id: {webhook_log.event_id}), "
+                    f"attempt {webhook_log.attempts}; retrying in {delay}s: {e}",
+                    exc_info=True
+                )
+            db.commit()
+            _bump("failed_attempts")
+            return False
+
+        if not webhook_log.processed:
+            _mark_processed(db, webhook_log)
+        _bump("processed")
+        logger.info(f"Webhook {webhook_log_id} ({webhook_log.event_type}) processed: {message}")
+        return True
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Unexpected error in webhook worker for log {webhook_log_id}: {e}", exc_info=True)
+        return False
+    finally:
+        db.close()
+
+
+# ---------------------------------------------------------------------------
+# In-process queue / workers
+# ---------------------------------------------------------------------------
+
+def _worker_loop():
+    while True:
+        webhook_log_id = _queue.get()
+        try:
+            if webhook_log_id is None:
+                return
+            process_webhook_log(webhook_log_id)
+        finally:
+            _queue.task_done()
+
+
+def start_webhook_workers(threads: int = WEBHOOK_WORKER_THREADS) -> None:
+    """Start the background worker threads (idempotent)."""
+    with _workers_lock:
+        _workers[:] = [t for t in _workers if t.is_alive()]
+        for i in range(len(_workers), threads):
+            t = threading.Thread(target=_worker_loop, name=f"webhook-worker-{i}", daemon=True)
+            t.start()
+            _workers.append(t)
+
+
+def stop_webhook_workers(timeout: float = 10.0) -> None:
+    """Ask workers to finish queued work and exit. Unfinished rows are picked up by the sweep."""
+    with _workers_lock:
+        workers = list(_workers)
+        for _ in workers:
+            _queue.put(None)
+        for t in workers:
+            t.join(timeout=timeout)
+        _workers.clear()
+
+
+def enqueue_webhook(webhook_log_id: int) -> None:
+    """Hand a stored webhook to the background workers."""
+    start_webhook_workers()
+    _queue.put(webhook_log_id)
+    _bump("enqueued")
+
+
+def drain_webhook_queue() -> int:
+    """Process everything queued on the calling thread (tests / no-worker mode)."""
+    count = 0
+    while True:
+        try:
+            webhook_log_id = _queue.get_nowait()
+        except queue.Empty:
+            return count
+        try:
+            if webhook_log_id is not None:
+                process_webhook_log(webhook_log_id)
+                count += 1
+        finally:
+            _queue.task_done()
+
+
+def sweep_pending_webhooks(limit: int = 100) -> int:
+    """Re-enqueue verified webhooks that are due for (re)processing. Scheduler entry point."""
+    db = SessionLocal()
+    try:
+        now = now_ist()
+        rows = (
+            db.query(WebhookLog.id)
+            .filter(
+                WebhookLog.processed == False,
+                WebhookLog.signature_valid == True,
+                WebhookLog.attempts < WEBHOOK_MAX_ATTEMPTS,
+                WebhookLog.created_at >= now - timedelta(hours=WEBHOOK_SWEEP_MAX_AGE_HOURS),
+                or_(WebhookLog.next_attempt_at.is_(None), WebhookLog.next_attempt_at <= now),
+            )
+            .order_by(WebhookLog.id.asc())
+            .limit(limit)
+            .all()
+        )
+    except Exception as e:
+        logger.error(f"Error sweeping pending webhooks: {e}")
+        return 0
+    finally:
+        db.close()
+
+    for (webhook_log_id,) in rows:
+        enqueue_webhook(webhook_log_id)
+    if rows:
+        logger.info(f"Re-enqueued {len(rows)} pending webhook(s)")
+    return len(rows)
+
+
+def get_webhook_queue_metrics() -> dict:
+    with _metrics_lock:
+        metrics = dict(_metrics)
+    metrics["queue_depth"] = _queue.qsize()
+    metrics["workers"] = sum(1 for t in _workers if t.is_alive())
+    return metrics
@@ -16,7 +16,9 @@ from Login_module.User.user_model import User
 from Login_module.User.user_session_crud import get_user_by_id
 from Member_module.Member_model import Member
 from Login_module.Utils.datetime_utils import now_ist, to_ist
+from Login_module.Utils.phone_encryption import phone_blind_index
 from Login_module.OTP import otp_manager
+from Login_module.Utils.rate_limiter import hit_rate_limit
 
 logger = logging.getLogger(__name__)
 
@@ -73,19 +75,23 @@ def create_audit_log(
     return log
 
 
-def check_rate_limit(db: Session, user_id: int) -> Tuple[bool, Optional[str]]:
+def _phone_change_rate_limit_key(user_id: int) -> str:
+    return f"phone_change_rate_limit:user:{user_id}"
+
+
+def check_rate_limit(user_id: int) -> Tuple[bool, Optional[str]]:
     """
     Check if user has exceeded daily rate limit (10 requests per day)
     Returns (is_allowed, error_message)
     """
-    # Check requests in last 24 hours
-    yesterday = now_ist() - timedelta(days=1)
-    recent_requests = db.query(PhoneChangeRequest).filter(
-        PhoneChangeRequest.user_id == user_id,
-        PhoneChangeRequest.created_at >= yesterday
-    ).count()
+    try:
+        result = hit_rate_limit(_phone_change_rate_limit_key(user_id), MAX_REQUESTS_PER_DAY, 24 * 3600)
+    except Exception as e:
+        logger.error(f"Redis error checking phone change rate limit: {e}")
+        # Fail closed - the OTP step needs Redis anyway
+        return False, "We couldn't start the phone number change right now. Please try again later."
     
-    if recent_requests >= MAX_REQUESTS_PER_DAY:
+    if not result.allowed:
         return False, "You've reached the daily limit for phone number changes. Please try again tomorrow."
     
     return True, None
@@ -227,7 +233,7 @@ def verify_old_number_initiate(
         return None, None, "The phone number you entered doesn't match your current number. Please check and try again."
     
     # Check rate limit
-    allowed, error = check_rate_limit(db, user_id)
+    allowed, error = check_rate_limit(user_id)
     if not allowed:
         return None, None, error
     
@@ -634,7 +640,7 @@ def verify_new_number_confirm(
         db.query(Member).filter(
             Member.user_id == user_id,
             Member.is_self_profile == True
-        ).update({Member.mobile: request.new_phone})
+        ).update({Member.mobile: request.new_phone, Member.mobile_hash: phone_blind_index(request.new_phone)})
         
         # Update request
         request.status = PhoneChangeStatus.COMPLETED.value
@@ -11,6 +11,7 @@ from .Product_schema import (
     ProductSingleResponse,
 )
 from .category_service import resolve_category
+from .catalog_cache import cached_response, invalidate_catalog, serialize, PRODUCTS
 
 logger = logging.getLogger(__name__)
 
@@ -36,6 +37,7 @@ def create_product(payload: ProductCreate, db: Session = Depends(get_db)):
     db.add(new_product)
     db.commit()
     db.refresh(new_product)
+    invalidate_catalog(PRODUCTS)
 
     return {
         "status": "success",
@@ -45,30 +47,35 @@ def create_product(payload: ProductCreate, db: Session = Depends(get_db)):
 
 
 @router.get("/viewProduct", response_model=ProductListResponse)
-def get_products(db: Session = Depends(get_db)):
-    products = db.query(Product).filter(Product.is_deleted == False).all()
+def get_products(request: Request, db: Session = Depends(get_db)):
+    def build() -> bytes:
+        products = db.query(Product).filter(Product.is_deleted == False).all()
+        return serialize(ProductListResponse, {
+            "status": "success",
+            "message": "Product list fetched successfully.",
+            "data": products,
+        })
 
-    return {
-        "status": "success",
-        "message": "Product list fetched successfully.",
-        "data": products,
-    }
+    return cached_response(request, PRODUCTS, "list", build)
 
 
 @router.get("/detail/{ProductId}", response_model=ProductSingleResponse)
 def get_product_detail(ProductId: int, request: Request, db: Session = Depends(get_db)):
-    client_ip = get_client_ip(request) if request else None
-    product = db.query(Product).filter(Product.ProductId == ProductId, Product.is_deleted == False).first()
+    def build() -> bytes:
+        product = db.query(Product).filter(Product.ProductId == ProductId, Product.is_deleted == False).first()
 
-    if not product:
-        logger.warning(
-            f"Product detail failed - Product not found | "
-            f"Product ID: {ProductId} | IP: {client_ip}"
-        )
-        raise HTTPException(status_code=404, detail="Product not found")
+        if not product:
+            client_ip = get_client_ip(request) if request else None
+            logger.warning(
+                f"Product detail failed - Product not found | "
+                f"Product ID: {ProductId} | IP: {client_ip}"
+            )
+            raise HTTPException(status_code=404, detail="Product not found")
 
-    return {
-        "status": "success",
-        "message": "Product fetched successfully.",
-        "data": product,
-    }
+        return serialize(ProductSingleResponse, {
+            "status": "success",
+            "message": "Product fetched successfully.",
+            "data": product,
+        })
+
+    return cached_response(request, PRODUCTS, f"detail:{ProductId}", build)
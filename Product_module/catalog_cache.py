@@ -0,0 +1,164 @@
+"""
+Read-through cache for catalog responses (products, categories, banners).
+
+The storefront endpoints store their serialized JSON body per namespace and
+variant (e.g. "banners" / "active_only=true"). A hit is served from process
+memory with no DB query and no Pydantic serialization, with an ETag so
+clients revalidating with If-None-Match get a 304.
+
+Invalidation: write endpoints call invalidate_catalog(namespace, ...), which
+drops local entries and bumps a Redis version counter for the namespace.
+Other workers compare their entry's version with Redis at most every
+VERSION_CHECK_SECONDS. Entries also expire after their TTL, which bounds
+staleness if Redis is unavailable and covers time-based data (banner
+start/end dates).
+
+Endpoints that fill this cache read from the primary (deps.get_db), not a
+replica: an entry built from a lagging replica right after invalidation
+would be served to everyone until its TTL.
+"""
+import hashlib
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Tuple
+
+from fastapi import Request, Response
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+PRODUCTS = "products"
+CATEGORIES = "categories"
+BANNERS = "banners"
+
+DEFAULT_TTL_SECONDS = 300
+VERSION_CHECK_SECONDS = 2
+VERSION_KEY_PREFIX = "catalog_cache:version:"
+
+
+@dataclass
+class _Entry:
+    body: bytes
+    etag: str
+    version: int
+    expires_at: float
+    checked_at: float
+
+
+_lock = threading.Lock()
+_entries: Dict[Tuple[str, str], _Entry] = {}
+_local_versions: Dict[str, int] = {}
+_metrics = {"hits": 0, "misses": 0, "not_modified": 0, "invalidations": 0}
+
+
+def _get_redis_client():
+    """Lazy import to avoid circular dependency (shares the OTP Redis client)."""
+    from Login_module.OTP import otp_manager
+    client = otp_manager._get_redis_client()
+    return client if otp_manager._redis_available else None
+
+
+def _current_version(namespace: str) -> int:
+    """Shared version from Redis, or the local counter when Redis is unavailable."""
+    try:
+        client = _get_redis_client()
+        if client is not None:
+            raw = client.get(f"{VERSION_KEY_PREFIX}{namespace}")
+            return int(raw) if raw else 0
+    except Exception as e:
+        logger.warning(f"Catalog cache version read failed | Namespace: {namespace} | Error: {e}")
+    return _local_versions.get(namespace, 0)
+
+
+def serialize(model_cls: type[BaseModel], payload) -> bytes:
+    """Validate a response payload against its response model and dump it to JSON bytes."""
+    return model_cls.model_validate(payload).model_dump_json().encode("utf-8")
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = {value.strip() for value in header.split(",")}
+    return etag in candidates or f"W/{etag}" in candidates or "*" in candidates
+
+
+def _respond(request: Request, entry: _Entry) -> Response:
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request, entry.etag):
+        with _lock:
+            _metrics["not_modified"] += 1
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
+def cached_response(
+    request: Request,
+    namespace: str,
+    variant: str,
+    build: Callable[[], bytes],
+    ttl_seconds: int = DEFAULT_TTL_SECONDS,
+) -> Response:
+    """
+    Serve (namespace, variant) from the cache, calling build() to produce the
+    JSON body on a miss. Exceptions from build() (e.g. 404) are not cached.
+    """
+    key = (namespace, variant)
+    now = time.monotonic()
+    entry = _entries.get(key)
+
+    if entry is not None and now < entry.expires_at:
+        if now - entry.checked_at < VERSION_CHECK_SECONDS:
+            with _lock:
+                _metrics["hits"] += 1
+            return _respond(request, entry)
+        if _current_version(namespace) == entry.version:
+            entry.checked_at = now
+            with _lock:
+                _metrics["hits"] += 1
+            return _respond(request, entry)
+
+    # Read the version before building so a concurrent invalidation is never masked
+    version = _current_version(namespace)
+    body = build()
+    entry = _Entry(
+        body=body,
+        etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"',
+        version=version,
+        expires_at=now + ttl_seconds,
+        checked_at=now,
+    )
+    with _lock:
+        _entries[key] = entry
+        _metrics["misses"] += 1
+    return _respond(request, entry)
+
+
+def invalidate_catalog(*namespaces: str) -> None:
+    """Drop cached responses for the namespaces in every worker. Call after commit."""
+    with _lock:
+        for key in [key for key in _entries if key[0] in namespaces]:
+            del _entries[key]
+        for namespace in namespaces:
+            _local_versions[namespace] = _local_versions.get(namespace, 0) + 1
+        _metrics["invalidations"] += 1
+    try:
+        client = _get_redis_client()
+        if client is not None:
+            pipe = client.pipeline()
+            for namespace in namespaces:
+                pipe.incr(f"{VERSION_KEY_PREFIX}{namespace}")
+            pipe.execute()
+    except Exception as e:
+        logger.warning(f"Catalog cache invalidation failed | Namespaces: {namespaces} | Error: {e}")
+
+
+def get_catalog_cache_metrics() -> dict:
+    with _lock:
+        metrics = dict(_metrics)
+        metrics["entries"] = len(_entries)
+    lookups = metrics["hits"] + metrics["misses"]
+    metrics["hit_rate"] = round(metrics["hits"] / lookups, 4) if lookups else 0.0
+    return metrics
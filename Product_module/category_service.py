@@ -4,6 +4,7 @@ from typing import Optional
 import logging
 
 from .Product_model import Category, DEFAULT_CATEGORY_NAME
+from .catalog_cache import invalidate_catalog, CATEGORIES
 
 logger = logging.getLogger(__name__)
 
@@ -25,6 +26,8 @@ def get_or_create_default_category(db: Session) -> Category:
     db.add(category)
     db.commit()
     db.refresh(category)
+    # Callers such as create_product only invalidate products; the category list changed too
+    invalidate_catalog(CATEGORIES)
     return category
 
 
@@ -6,7 +6,7 @@ from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 from typing import Optional
 from decimal import Decimal
 import logging
-import bcrypt
+import uuid
 
 from .Tracking_model import TrackingRecord
 from Login_module.Utils.datetime_utils import now_ist
@@ -14,22 +14,6 @@ from Login_module.Utils.datetime_utils import now_ist
 logger = logging.getLogger(__name__)
 
 
-def hash_user_id(user_id: str) -> str:
-    """
-    Hash user_id using bcrypt with 10 rounds.
-    
-    Args:
-        user_id: Plain text user ID from JWT token
-        
-    Returns:
-        Bcrypt hashed user ID string
-    """
-    # Generate salt and hash
-    salt = bcrypt.gensalt(rounds=10)
-    hashed = bcrypt.hashpw(user_id.encode('utf-8'), salt)
-    return hashed.decode('utf-8')
-
-
 def determine_record_type(
     ga_consent: bool,
     location_consent: bool,
@@ -50,8 +34,17 @@ def determine_record_type(
         return 'consent_update'
 
 
-def create_tracking_record(
-    db: Session,
+def _fit_columns(row: dict) -> dict:
+    """Truncate string values to their tracking_records column length (e.g. a long ip_address from a header)."""
+    for name, value in row.items():
+        if isinstance(value, str):
+            length = getattr(TrackingRecord.__table__.c[name].type, "length", None)
+            if length and len(value) > length:
+                row[name] = value[:length]
+    return row
+
+
+def build_tracking_row(
     ga_consent: bool,
     location_consent: bool,
     user_id: Optional[str] = None,
@@ -69,103 +62,58 @@ def create_tracking_record(
     language: Optional[str] = None,
     timezone: Optional[str] = None,
     ip_address: Optional[str] = None
-) -> TrackingRecord:
+) -> dict:
     """
-    Create a new tracking record with consent-based data storage.
-    
-    Args:
-        db: Database session
-        ga_consent: Google Analytics consent flag
-        location_consent: Location tracking consent flag
-        user_id: User ID from JWT token (stored as-is, not hashed)
-        ga_client_id: Google Analytics Client ID (stored only if ga_consent is True)
-        session_id: Session identifier
-        latitude: Latitude (stored only if location_consent is True)
-        longitude: Longitude (stored only if location_consent is True)
-        accuracy: Location accuracy (stored only if location_consent is True)
-        page_url: Page URL (stored only if ga_consent is True)
-        referrer: Referrer URL (stored only if ga_consent is True)
-        user_agent: User agent string (stored only if ga_consent is True)
-        device_type: Device type (stored only if ga_consent is True)
-        browser: Browser name (stored only if ga_consent is True)
-        operating_system: OS name (stored only if ga_consent is True)
-        language: Language code (stored only if ga_consent is True)
-        timezone: Timezone (stored only if ga_consent is True)
-        ip_address: IP address (stored only if ga_consent is True)
-        
-    Returns:
-        Created TrackingRecord object
+    Build a tracking_records row (column -> value) with the consent rules applied:
+    GA-related fields only with ga_consent, location fields only with location_consent.
+    record_id and timestamps are assigned here, so the row can be inserted later
+    (see tracking_ingest) or straight away (create_tracking_record). String values
+    are cut to their column length so one oversized value cannot fail a batch.
+    """
+    stored_latitude = Decimal(str(latitude)) if (location_consent and latitude is not None) else None
+    stored_longitude = Decimal(str(longitude)) if (location_consent and longitude is not None) else None
+    stored_page_url = page_url if ga_consent else None
+    stored_referrer = referrer if ga_consent else None
+
+    has_location = stored_latitude is not None and stored_longitude is not None
+    has_page_data = stored_page_url is not None or stored_referrer is not None
+    now = now_ist()
+    return _fit_columns({
+        "record_id": str(uuid.uuid4()),
+        "user_id": user_id,
+        "ga_client_id": ga_client_id if ga_consent else None,
+        "session_id": session_id,
+        "ga_consent": ga_consent,
+        "location_consent": location_consent,
+        "latitude": stored_latitude,
+        "longitude": stored_longitude,
+        "accuracy": accuracy if (location_consent and accuracy is not None) else None,
+        "page_url": stored_page_url,
+        "referrer": stored_referrer,
+        "user_agent": user_agent if ga_consent else None,
+        "device_type": device_type if ga_consent else None,
+        "browser": browser if ga_consent else None,
+        "operating_system": operating_system if ga_consent else None,
+        "language": language if ga_consent else None,
+        "timezone": timezone if ga_consent else None,
+        "ip_address": ip_address if ga_consent else None,
+        "record_type": determine_record_type(ga_consent, location_consent, has_location, has_page_data),
+        "created_at": now,
+        "consent_updated_at": now,
+    })
+
+
+def create_tracking_record(db: Session, **fields) -> TrackingRecord:
+    """
+    Create and commit one tracking record (same arguments as build_tracking_row).
+    The /tracking endpoints use the buffered path in tracking_ingest instead.
     """
     try:
-        
-        # Apply consent-based data storage rules
-        # GA consent: only store GA-related data if consent is True
-        stored_ga_client_id = ga_client_id if ga_consent else None
-        stored_page_url = page_url if ga_consent else None
-        stored_referrer = referrer if ga_consent else None
-        stored_user_agent = user_agent if ga_consent else None
-        stored_device_type = device_type if ga_consent else None
-        stored_browser = browser if ga_consent else None
-        stored_os = operating_system if ga_consent else None
-        stored_language = language if ga_consent else None
-        stored_timezone = timezone if ga_consent else None
-        stored_ip_address = ip_address if ga_consent else None
-        
-        # Location consent: only store location data if consent is True
-        stored_latitude = Decimal(str(latitude)) if (location_consent and latitude is not None) else None
-        stored_longitude = Decimal(str(longitude)) if (location_consent and longitude is not None) else None
-        stored_accuracy = accuracy if (location_consent and accuracy is not None) else None
-        
-        # Determine record type
-        has_location = stored_latitude is not None and stored_longitude is not None
-        has_page_data = stored_page_url is not None or stored_referrer is not None
-        record_type = determine_record_type(ga_consent, location_consent, has_location, has_page_data)
-        
-        # Log before creating record
-        logger.info(
-            f"Creating TrackingRecord object | "
-            f"user_id parameter: {user_id} | "
-            f"user_id type: {type(user_id)} | "
-            f"user_id is None: {user_id is None}"
-        )
-        
-        # Create tracking record
-        tracking_record = TrackingRecord(
-            user_id=user_id,
-            ga_client_id=stored_ga_client_id,
-            session_id=session_id,
-            ga_consent=ga_consent,
-            location_consent=location_consent,
-            latitude=stored_latitude,
-            longitude=stored_longitude,
-            accuracy=stored_accuracy,
-            page_url=stored_page_url,
-            referrer=stored_referrer,
-            user_agent=stored_user_agent,
-            device_type=stored_device_type,
-            browser=stored_browser,
-            operating_system=stored_os,
-            language=stored_language,
-            timezone=stored_timezone,
-            ip_address=stored_ip_address,
-            record_type=record_type,
-            consent_updated_at=now_ist()
-        )
-        
+        tracking_record = TrackingRecord(**build_tracking_row(**fields))
         db.add(tracking_record)
         db.commit()
         db.refresh(tracking_record)
-        
-        logger.info(
-            f"Tracking record created | Record ID: {tracking_record.record_id} | "
-            f"User ID parameter: {user_id if user_id else 'None (anonymous)'} | "
-            f"User ID stored in DB: {tracking_record.user_id if tracking_record.user_id else 'NULL'} | "
-            f"GA Consent: {ga_consent} | Location Consent: {location_consent} | "
-            f"Record Type: {record_type}"
-        )
-        
         return tracking_record
-        
     except IntegrityError as e:
         db.rollback()
         logger.error(
@@ -182,12 +130,3 @@ def create_tracking_record(
             exc_info=True
         )
         raise
-    except Exception as e:
-        db.rollback()
-        logger.error(
-            f"Failed to create tracking record - Unexpected error | "
-            f"Error: {str(e)} | Type: {type(e).__name__}",
-            exc_info=True
-        )
-        raise
-
@@ -1,7 +1,7 @@
 """
 Tracking Model - Database schema for tracking_records table
 """
-from sqlalchemy import Column, String, Boolean, DECIMAL, Float, Text, DateTime, func, Index
+from sqlalchemy import Column, Integer, String, Boolean, DECIMAL, Float, Text, DateTime, func, Index, UniqueConstraint
 from sqlalchemy.dialects.postgresql import UUID, INET
 from database import Base
 from Login_module.Utils.datetime_utils import now_ist
@@ -68,3 +68,48 @@ class TrackingRecord(Base):
         Index('idx_consent_flags', 'ga_consent', 'location_consent'),
     )
 
+
+
+class TrackingRollup(Base):
+    """
+    Hourly and daily aggregates of tracking_records, maintained incrementally by
+    Tracking_module.tracking_rollup. Dashboards read these instead of tracking_records.
+
+    One row per (granularity, bucket_start, dimension, value):
+    - dimension 'page': value is the page URL without query string
+    - dimension 'device': value is device_type ('unknown' when not sent)
+    - dimension 'consent': value is 'ga+location', 'ga', 'location' or 'none'
+    - dimension 'geo': value is 'lat,lon' rounded to TRACKING_ROLLUP_GEO_DECIMALS
+    """
+    __tablename__ = "tracking_rollups"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    granularity = Column(String(10), nullable=False)  # 'hour' or 'day'
+    bucket_start = Column(DateTime, nullable=False)  # IST, start of the hour/day
+    dimension = Column(String(20), nullable=False)
+    value = Column(String(255), nullable=False)
+
+    events = Column(Integer, nullable=False, default=0)
+    ga_consents = Column(Integer, nullable=False, default=0)
+    location_consents = Column(Integer, nullable=False, default=0)
+    authenticated = Column(Integer, nullable=False, default=0)
+
+    updated_at = Column(DateTime(timezone=True), default=now_ist, onupdate=now_ist, nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint('granularity', 'bucket_start', 'dimension', 'value', name='uq_tracking_rollups_bucket'),
+        Index('idx_tracking_rollups_lookup', 'dimension', 'granularity', 'bucket_start'),
+    )
+
+
+class TrackingRollupState(Base):
+    """
+    High-water marks of the tracking rollup ('rollup') and the raw export ('export'),
+    and the earliest created_at written late since each last ran ('rollup_late',
+    'export_late'; NULL when there is none).
+    """
+    __tablename__ = "tracking_rollup_state"
+
+    name = Column(String(50), primary_key=True)
+    high_water_mark = Column(DateTime, nullable=True)  # IST; everything before it is processed
+    updated_at = Column(DateTime(timezone=True), default=now_ist, onupdate=now_ist, nullable=True)
@@ -3,15 +3,15 @@ Tracking Router - API endpoints for location and analytics tracking
 """
 from fastapi import APIRouter, Depends, HTTPException, status, Request, Cookie
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
-from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 from typing import Optional
 import logging
 import uuid
 
-from deps import get_db
-from .Tracking_schema import TrackingEventRequest, TrackingEventResponse, DeviceInfo
-from .Tracking_crud import create_tracking_record
+from .Tracking_schema import (
+    TrackingEventRequest, TrackingEventResponse, TrackingBatchRequest, TrackingBatchResponse, DeviceInfo,
+)
+from .Tracking_crud import build_tracking_row
+from .tracking_ingest import enqueue_tracking_rows
 from Login_module.Utils.datetime_utils import now_ist, to_ist_isoformat
 from Login_module.Utils.rate_limiter import get_client_ip
 
@@ -49,19 +49,10 @@ def extract_user_id_from_token(
     if cookie_token:
         # Web: Token from cookie
         token = cookie_token
-        logger.info(f"Token found in cookie | Token length: {len(token)} | IP: {get_client_ip(request)}")
     # Check Authorization header: must be non-None and non-empty
     elif credentials and credentials.credentials and credentials.credentials.strip():
         # Mobile: Token from Authorization header
         token = credentials.credentials.strip()
-        logger.info(f"Token found in Authorization header | Token length: {len(token)} | IP: {get_client_ip(request)}")
-    else:
-        logger.warning(
-            f"No token found | "
-            f"Cookie present: {access_token_cookie is not None} | "
-            f"Credentials present: {credentials is not None} | "
-            f"IP: {get_client_ip(request)}"
-        )
     
     # No valid token found (neither cookie nor header)
     if not token:
@@ -73,44 +64,13 @@ def extract_user_id_from_token(
         # Decode token to get user_id
         payload, is_expired, is_invalid = security.decode_access_token_with_expiry_check(token)
         
-        # Log for debugging
-        logger.debug(
-            f"Token decode result | is_expired: {is_expired} | is_invalid: {is_invalid} | "
-            f"has_payload: {payload is not None} | payload_keys: {list(payload.keys()) if payload else None}"
-        )
-        
         # If token is valid (even if expired), extract user_id
-        if not is_invalid and payload:
-            user_id = payload.get("sub")
-            logger.info(
-                f"Token decoded successfully | "
-                f"is_expired: {is_expired} | "
-                f"user_id from payload: {user_id} | "
-                f"payload keys: {list(payload.keys())} | "
-                f"IP: {get_client_ip(request)}"
-            )
-            if user_id:
-                user_id_str = str(user_id)
-                logger.info(f"Returning user_id: {user_id_str} | IP: {get_client_ip(request)}")
-                return user_id_str
-            else:
-                logger.warning(
-                    f"Token payload exists but 'sub' field is missing | "
-                    f"payload keys: {list(payload.keys())} | "
-                    f"IP: {get_client_ip(request)}"
-                )
-        else:
-            logger.warning(
-                f"Token is invalid or missing payload | "
-                f"is_invalid: {is_invalid} | "
-                f"is_expired: {is_expired} | "
-                f"payload: {payload} | "
-                f"IP: {get_client_ip(request)}"
-            )
+        if not is_invalid and payload and payload.get("sub"):
+            return str(payload["sub"])
+        logger.debug(f"Tracking token invalid or without sub (anonymous) | IP: {get_client_ip(request)}")
     except Exception as e:
         # Token is invalid/expired - return None (anonymous user)
-        logger.warning(f"Token extraction failed (anonymous user): {str(e)}", exc_info=True)
-        pass
+        logger.debug(f"Token extraction failed (anonymous user): {str(e)}")
     
     return None
 
@@ -168,17 +128,51 @@ def get_fields_stored_and_null(
     return fields_stored, fields_null
 
 
+def _row_for_event(event: TrackingEventRequest, user_id: Optional[str], client_ip: Optional[str], user_agent_header: str) -> dict:
+    """tracking_records row for one event, consent rules applied."""
+    device_info = event.device_info
+    return build_tracking_row(
+        ga_consent=event.ga_consent,
+        location_consent=event.location_consent,
+        user_id=user_id,
+        ga_client_id=event.ga_client_id,
+        session_id=event.session_id,
+        latitude=event.latitude,
+        longitude=event.longitude,
+        accuracy=event.accuracy,
+        page_url=event.page_url,
+        referrer=event.referrer,
+        # Use device_info user_agent if provided, otherwise fall back to header
+        user_agent=(device_info.user_agent if device_info else None) or user_agent_header,
+        device_type=device_info.device_type if device_info else None,
+        browser=device_info.browser if device_info else None,
+        operating_system=device_info.os if device_info else None,
+        language=device_info.language if device_info else None,
+        timezone=device_info.timezone if device_info else None,
+        ip_address=client_ip
+    )
+
+
+def _consent_message(ga_consent: bool, location_consent: bool) -> str:
+    if ga_consent and location_consent:
+        return "Tracking data recorded successfully"
+    elif ga_consent and not location_consent:
+        return "Analytics tracking enabled, location tracking disabled"
+    elif not ga_consent and location_consent:
+        return "Location tracking enabled, analytics tracking disabled"
+    return "Consent preferences recorded"
+
+
 @router.post(
     "/event",
     response_model=TrackingEventResponse,
-    status_code=status.HTTP_201_CREATED,
+    status_code=status.HTTP_202_ACCEPTED,
     summary="Record tracking event with consent management",
-    description="Record location and analytics tracking data. Supports both anonymous and authenticated users. Data storage is conditional based on consent flags. NO CSRF token required."
+    description="Record location and analytics tracking data. Supports both anonymous and authenticated users. Data storage is conditional based on consent flags. The event is queued and written in the background. NO CSRF token required."
 )
 def track_event(
     request: TrackingEventRequest,
     http_request: Request,
-    db: Session = Depends(get_db),
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(security_scheme),
     access_token_cookie: Optional[str] = Cookie(None, alias="access_token")
 ):
@@ -188,7 +182,7 @@ def track_event(
     - **Authentication**: Optional (accepts both authenticated and anonymous requests)
     - **CSRF Protection**: NOT required for this endpoint
     - **Consent Management**: Data is stored conditionally based on consent flags
-    - **User ID**: Hashed with bcrypt for authenticated users
+    - **Delivery**: Returns 202 once queued; the row is written within about a second
     
     **Consent Behavior:**
     - If ga_consent=false: GA-related fields (ga_client_id, page_url, referrer, device_info, ip_address) are NOT stored
@@ -196,110 +190,45 @@ def track_event(
     - If location_consent=false: Location fields (latitude, longitude, accuracy) are NOT stored
     - If location_consent=true: Location fields ARE stored (if provided)
     """
-    request_id = str(uuid.uuid4())
     client_ip = get_client_ip(http_request)
-    user_agent_header = http_request.headers.get("user-agent", "unknown")
-    
-    try:
-        # Extract user_id from token if authenticated (checks both cookie and header)
-        logger.info(
-            f"Tracking event request | "
-            f"Has cookie: {access_token_cookie is not None} | "
-            f"Cookie length: {len(access_token_cookie) if access_token_cookie else 0} | "
-            f"Has credentials: {credentials is not None} | "
-            f"Credentials token: {credentials.credentials is not None if credentials else False} | "
-            f"IP: {client_ip}"
-        )
-        user_id = extract_user_id_from_token(
-            request=http_request,
-            credentials=credentials,
-            access_token_cookie=access_token_cookie
-        )
-        logger.info(
-            f"User ID extraction result | "
-            f"user_id: {user_id} | "
-            f"user_id type: {type(user_id)} | "
-            f"IP: {client_ip}"
-        )
-        user_type = "authenticated" if user_id else "anonymous"
-        
-        # Extract device info from request
-        device_info = request.device_info
-        device_user_agent = device_info.user_agent if device_info else None
-        device_type = device_info.device_type if device_info else None
-        browser = device_info.browser if device_info else None
-        operating_system = device_info.os if device_info else None
-        language = device_info.language if device_info else None
-        timezone = device_info.timezone if device_info else None
-        
-        # Use device_info user_agent if provided, otherwise fall back to header
-        final_user_agent = device_user_agent or user_agent_header
-        
-        # Determine what data we have
-        has_location = request.latitude is not None and request.longitude is not None
-        has_page_data = request.page_url is not None or request.referrer is not None
-        has_device_info = device_info is not None and (
-            device_user_agent or device_type or browser or operating_system or language or timezone
-        )
-        
-        # Log before creating tracking record
-        logger.info(
-            f"Creating tracking record | "
-            f"user_id: {user_id} | "
-            f"user_id type: {type(user_id)} | "
-            f"user_type: {user_type} | "
-            f"ga_consent: {request.ga_consent} | "
-            f"location_consent: {request.location_consent} | "
-            f"IP: {client_ip}"
-        )
-        
-        # Create tracking record
-        tracking_record = create_tracking_record(
-            db=db,
-            ga_consent=request.ga_consent,
-            location_consent=request.location_consent,
-            user_id=user_id,
-            ga_client_id=request.ga_client_id,
-            session_id=request.session_id,
-            latitude=request.latitude,
-            longitude=request.longitude,
-            accuracy=request.accuracy,
-            page_url=request.page_url,
-            referrer=request.referrer,
-            user_agent=final_user_agent if request.ga_consent else None,
-            device_type=device_type if request.ga_consent else None,
-            browser=browser if request.ga_consent else None,
-            operating_system=operating_system if request.ga_consent else None,
-            language=language if request.ga_consent else None,
-            timezone=timezone if request.ga_consent else None,
-            ip_address=client_ip if request.ga_consent else None
-        )
-        
-        # Determine fields stored and null
-        has_ga_client_id = tracking_record.ga_client_id is not None
-        fields_stored, fields_null = get_fields_stored_and_null(
-            ga_consent=request.ga_consent,
-            location_consent=request.location_consent,
-            has_user_id=user_id is not None,
-            has_ga_client_id=has_ga_client_id,
-            has_location=has_location,
-            has_page_data=has_page_data,
-            has_device_info=has_device_info
+    user_id = extract_user_id_from_token(
+        request=http_request,
+        credentials=credentials,
+        access_token_cookie=access_token_cookie
+    )
+    user_type = "authenticated" if user_id else "anonymous"
+    row = _row_for_event(request, user_id, client_ip, http_request.headers.get("user-agent", "unknown"))
+
+    if not enqueue_tracking_rows([row]):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail={
+                "error_code": "TRACKING_BUSY",
+                "message": "Tracking is temporarily unavailable. Please try again.",
+                "request_id": str(uuid.uuid4())
+            }
         )
-        
-        # Determine message based on consents
-        if request.ga_consent and request.location_consent:
-            message = "Tracking data recorded successfully"
-        elif request.ga_consent and not request.location_consent:
-            message = "Analytics tracking enabled, location tracking disabled"
-        elif not request.ga_consent and request.location_consent:
-            message = "Location tracking enabled, analytics tracking disabled"
-        else:
-            message = "Consent preferences recorded"
-        
-        # Build response data
-        response_data = {
-            "record_id": tracking_record.record_id,
+
+    device_info = request.device_info
+    has_device_info = device_info is not None and any(
+        (device_info.user_agent, device_info.device_type, device_info.browser,
+         device_info.os, device_info.language, device_info.timezone)
+    )
+    fields_stored, fields_null = get_fields_stored_and_null(
+        ga_consent=request.ga_consent,
+        location_consent=request.location_consent,
+        has_user_id=user_id is not None,
+        has_ga_client_id=row["ga_client_id"] is not None,
+        has_location=request.latitude is not None and request.longitude is not None,
+        has_page_data=request.page_url is not None or request.referrer is not None,
+        has_device_info=has_device_info
+    )
+
+    return TrackingEventResponse(
+        success=True,
+        message=_consent_message(request.ga_consent, request.location_consent),
+        data={
+            "record_id": row["record_id"],
             "user_type": user_type,
             "consents": {
                 "ga_consent": request.ga_consent,
@@ -309,87 +238,44 @@ def track_event(
             "fields_null": fields_null,
             "timestamp": to_ist_isoformat(now_ist())
         }
-        
-        
-        logger.info(
-            f"Tracking event recorded | Record ID: {tracking_record.record_id} | "
-            f"User Type: {user_type} | GA Consent: {request.ga_consent} | "
-            f"Location Consent: {request.location_consent} | Request ID: {request_id}"
-        )
-        
-        return TrackingEventResponse(
-            success=True,
-            message=message,
-            data=response_data
-        )
-    
-    except (ValueError, TypeError) as e:
-        # Validation error from Pydantic
-        logger.warning(
-            f"Tracking event failed - Validation error | "
-            f"Error: {str(e)} | IP: {client_ip} | Request ID: {request_id}"
-        )
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail={
-                "error_code": "VALIDATION_ERROR",
-                "message": str(e),
-                "request_id": request_id
-            }
-        )
-    except IntegrityError as e:
-        # Database constraint violation
-        db.rollback()
-        logger.error(
-            f"Tracking event failed - Database integrity error | "
-            f"Error: {str(e)} | IP: {client_ip} | Request ID: {request_id}",
-            exc_info=True
-        )
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail={
-                "error_code": "INTERNAL_SERVER_ERROR",
-                "message": "An error occurred while recording tracking data. Please try again.",
-                "request_id": request_id
-            }
-        )
-    except SQLAlchemyError as e:
-        # Database connection or query error
-        db.rollback()
-        logger.error(
-            f"Tracking event failed - Database error | "
-            f"Error: {str(e)} | IP: {client_ip} | Request ID: {request_id}",
-            exc_info=True
-        )
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail={
-                "error_code": "INTERNAL_SERVER_ERROR",
-                "message": "An error occurred while recording tracking data. Please try again.",
-                "request_id": request_id
-            }
-        )
-    except Exception as e:
-        # Unexpected error
-        import traceback
-        error_traceback = traceback.format_exc()
-        try:
-            db.rollback()
-        except Exception:
-            pass
-        logger.error(
-            f"Tracking event failed - Unexpected error | "
-            f"Error: {str(e)} | Type: {type(e).__name__} | "
-            f"IP: {client_ip} | Request ID: {request_id} | "
-            f"Traceback: {error_traceback}",
-            exc_info=True
-        )
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail={
-                "error_code": "INTERNAL_SERVER_ERROR",
-                "message": "An error occurred while recording tracking data. Please try again.",
-                "request_id": request_id
-            }
-        )
+    )
+
+
+@router.post(
+    "/events",
+    response_model=TrackingBatchResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Record a batch of tracking events",
+    description="Same as /event for up to 100 events in one request (e.g. events buffered by the client). NO CSRF token required."
+)
+def track_events(
+    request: TrackingBatchRequest,
+    http_request: Request,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security_scheme),
+    access_token_cookie: Optional[str] = Cookie(None, alias="access_token")
+):
+    """
+    Queue a batch of tracking events. Consent rules apply per event. Events that
+    do not fit in the ingestion buffer are dropped and counted in "dropped".
+    """
+    client_ip = get_client_ip(http_request)
+    user_agent_header = http_request.headers.get("user-agent", "unknown")
+    user_id = extract_user_id_from_token(
+        request=http_request,
+        credentials=credentials,
+        access_token_cookie=access_token_cookie
+    )
+    rows = [_row_for_event(event, user_id, client_ip, user_agent_header) for event in request.events]
+    accepted = enqueue_tracking_rows(rows)
 
+    return TrackingBatchResponse(
+        success=True,
+        message="Tracking events accepted" if accepted == len(rows) else "Some tracking events were dropped",
+        data={
+            "accepted": accepted,
+            "dropped": len(rows) - accepted,
+            "record_ids": [row["record_id"] for row in rows[:accepted]],
+            "user_type": "authenticated" if user_id else "anonymous",
+            "timestamp": to_ist_isoformat(now_ist())
+        }
+    )
@@ -13,11 +13,11 @@ logger = logging.getLogger(__name__)
 class DeviceInfo(BaseModel):
     """Device information schema"""
     user_agent: Optional[str] = Field(None, description="User agent string")
-    device_type: Optional[str] = Field(None, description="Device type: mobile, desktop, tablet")
-    browser: Optional[str] = Field(None, description="Browser name and version")
-    os: Optional[str] = Field(None, description="Operating system")
-    language: Optional[str] = Field(None, description="Language code (e.g., en-US)")
-    timezone: Optional[str] = Field(None, description="Timezone (e.g., America/Los_Angeles)")
+    device_type: Optional[str] = Field(None, max_length=50, description="Device type: mobile, desktop, tablet")
+    browser: Optional[str] = Field(None, max_length=100, description="Browser name and version")
+    os: Optional[str] = Field(None, max_length=100, description="Operating system")
+    language: Optional[str] = Field(None, max_length=20, description="Language code (e.g., en-US)")
+    timezone: Optional[str] = Field(None, max_length=100, description="Timezone (e.g., America/Los_Angeles)")
 
 
 class TrackingEventRequest(BaseModel):
@@ -103,3 +103,24 @@ class TrackingEventResponse(BaseModel):
         "timestamp": "2026-01-13T15:30:00.000Z"
     })
 
+
+
+TRACKING_BATCH_MAX_EVENTS = 100
+
+
+class TrackingBatchRequest(BaseModel):
+    """Request schema for a batch of tracking events (same consent rules per event)"""
+    events: List[TrackingEventRequest] = Field(..., min_length=1, max_length=TRACKING_BATCH_MAX_EVENTS)
+
+
+class TrackingBatchResponse(BaseModel):
+    """Response schema for a batch of tracking events"""
+    success: bool = Field(default=True, example=True)
+    message: str = Field(example="Tracking events accepted")
+    data: dict = Field(example={
+        "accepted": 20,
+        "dropped": 0,
+        "record_ids": ["550e8400-e29b-41d4-a716-446655440000"],
+        "user_type": "authenticated",
+        "timestamp": "2026-01-13T15:30:00.000Z"
+    })
@@ -0,0 +1,204 @@
+"""
+Tracking ingestion tests and load test (buffer, batched flush and the HTTP endpoints).
+
+Run with -s to see the throughput numbers:
+    python -m pytest -s Tracking_module/tests/test_tracking_ingest_benchmark.py
+"""
+import sys
+import os
+import time
+from datetime import timedelta
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../..'))
+
+from database import Base
+from Login_module.Utils.datetime_utils import now_ist
+from Tracking_module.Tracking_model import TrackingRecord, TrackingRollupState
+from Tracking_module.Tracking_crud import build_tracking_row
+from Tracking_module import tracking_ingest
+from Tracking_module.Tracking_router import router
+
+LOAD_EVENTS = 50000
+HTTP_REQUESTS = 1000
+HTTP_BATCHES = 100
+
+
+@pytest.fixture
+def tracking_db(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'tracking.db'}")
+    Base.metadata.create_all(engine, tables=[TrackingRecord.__table__, TrackingRollupState.__table__])
+    Session = sessionmaker(bind=engine)
+    monkeypatch.setattr(tracking_ingest, "SessionLocal", Session)
+    # Flush only when asked, so the tests control timing
+    monkeypatch.setattr(tracking_ingest, "start_tracking_flusher", lambda: None)
+    tracking_ingest._buffer.clear()
+    monkeypatch.setattr(tracking_ingest, "_consecutive_failures", 0)
+    yield Session
+    tracking_ingest._buffer.clear()
+    engine.dispose()
+
+
+def _count(Session) -> int:
+    with Session() as db:
+        return db.execute(select(func.count()).select_from(TrackingRecord)).scalar()
+
+
+def _row(i: int, ga_consent: bool = True) -> dict:
+    return build_tracking_row(
+        ga_consent=ga_consent,
+        location_consent=True,
+        user_id=str(i % 500),
+        ga_client_id=f"GA1.1.{i}",
+        session_id=f"s-{i // 20}",
+        latitude=12.97,
+        longitude=77.59,
+        accuracy=10.0,
+        page_url="https://example.com/products",
+        user_agent="Mozilla/5.0",
+        ip_address="10.0.0.1",
+    )
+
+
+def test_consent_rules_are_applied_before_buffering():
+    row = _row(1, ga_consent=False)
+    assert row["ga_client_id"] is None and row["page_url"] is None and row["ip_address"] is None
+    assert row["latitude"] is not None and row["user_id"] == "1"
+
+
+def test_oversized_values_are_cut_to_column_length():
+    row = build_tracking_row(ga_consent=True, location_consent=False, browser="b" * 300, ip_address="1" * 60)
+    assert len(row["browser"]) == 100 and len(row["ip_address"]) == 45
+
+
+def test_buffer_is_bounded(tracking_db, monkeypatch):
+    monkeypatch.setattr(tracking_ingest, "TRACKING_BUFFER_MAX_EVENTS", 10)
+    assert tracking_ingest.enqueue_tracking_rows([_row(i) for i in range(15)]) == 10
+    assert tracking_ingest.flush_tracking_buffer() == 10
+    assert _count(tracking_db) == 10
+
+
+def test_failed_batch_is_requeued(tracking_db):
+    tracking_ingest.enqueue_tracking_rows([_row(i) for i in range(5)])
+
+    class BrokenSession:
+        def execute(self, *args, **kwargs):
+            raise RuntimeError("db down")
+
+        def rollback(self):
+            pass
+
+    assert tracking_ingest.flush_tracking_buffer(db=BrokenSession()) == 0
+    assert len(tracking_ingest._buffer) == 5
+    assert tracking_ingest.flush_tracking_buffer() == 5
+
+
+def test_late_rows_are_reported_to_the_rollup(tracking_db):
+    late = now_ist() - timedelta(hours=2)
+    tracking_ingest.enqueue_tracking_rows([
+        dict(_row(1), created_at=late + timedelta(minutes=5)),
+        dict(_row(2), created_at=late),
+    ])
+    assert tracking_ingest.flush_tracking_buffer() == 2
+    tracking_ingest.enqueue_tracking_rows([_row(3)])  # Fresh rows leave the mark alone
+    assert tracking_ingest.flush_tracking_buffer() == 1
+    with tracking_db() as db:
+        for name in ("rollup_late", "export_late"):
+            assert db.get(TrackingRollupState, name).high_water_mark == late.replace(tzinfo=None)
+
+
+def test_bad_row_is_dead_lettered_and_does_not_block_the_batch(tracking_db):
+    rows = [_row(i) for i in range(6)]
+    tracking_ingest.enqueue_tracking_rows(rows[:1])
+    assert tracking_ingest.flush_tracking_buffer() == 1
+
+    # Same primary key as the row already written: rejected while the DB is up
+    poisoned = dict(_row(99), record_id=rows[0]["record_id"])
+    dead_before = tracking_ingest.get_tracking_ingest_metrics()["dead_lettered"]
+    tracking_ingest.enqueue_tracking_rows(rows[1:3] + [poisoned] + rows[3:])
+    assert tracking_ingest.flush_tracking_buffer() == 5
+    assert len(tracking_ingest._buffer) == 0
+    assert _count(tracking_db) == 6
+    assert tracking_ingest.get_tracking_ingest_metrics()["dead_lettered"] == dead_before + 1
+
+
+def test_retry_delay_grows_while_db_is_down(tracking_db):
+    tracking_ingest.enqueue_tracking_rows([_row(i) for i in range(3)])
+
+    class BrokenSession:
+        def execute(self, *args, **kwargs):
+            raise RuntimeError("db down")
+
+        def rollback(self):
+            pass
+
+    delays = []
+    for _ in range(3):
+        tracking_ingest.flush_tracking_buffer(db=BrokenSession())
+        with tracking_ingest._lock:
+            delays.append(tracking_ingest._retry_delay())
+    assert delays == [1.0, 2.0, 4.0]
+    assert tracking_ingest.flush_tracking_buffer() == 3
+    with tracking_ingest._lock:
+        assert tracking_ingest._retry_delay() == 0.0
+
+
+def test_ingest_load(tracking_db):
+    rows = [_row(i) for i in range(LOAD_EVENTS)]
+
+    started = time.perf_counter()
+    for row in rows:
+        tracking_ingest.enqueue_tracking_rows([row])
+    append_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    written = tracking_ingest.flush_tracking_buffer()
+    flush_seconds = time.perf_counter() - started
+
+    assert written == LOAD_EVENTS
+    assert _count(tracking_db) == LOAD_EVENTS
+    print(
+        f"\ntracking ingest: {LOAD_EVENTS} events | "
+        f"append {LOAD_EVENTS / append_seconds:,.0f} events/s | "
+        f"flush ({tracking_ingest.TRACKING_FLUSH_BATCH_SIZE}-row INSERTs) {LOAD_EVENTS / flush_seconds:,.0f} rows/s"
+    )
+
+
+def test_http_load(tracking_db):
+    app = FastAPI()
+    app.include_router(router)
+    client = TestClient(app)
+    event = {
+        "ga_consent": True,
+        "location_consent": True,
+        "ga_client_id": "GA1.1.123",
+        "session_id": "s-1",
+        "latitude": 12.97,
+        "longitude": 77.59,
+        "page_url": "https://example.com/products",
+    }
+
+    started = time.perf_counter()
+    for _ in range(HTTP_REQUESTS):
+        response = client.post("/api/tracking/event", json=event)
+        assert response.status_code == 202
+    single_seconds = time.perf_counter() - started
+
+    batch = {"events": [event] * 100}
+    started = time.perf_counter()
+    for _ in range(HTTP_BATCHES):
+        response = client.post("/api/tracking/events", json=batch)
+        assert response.status_code == 202
+        assert response.json()["data"]["accepted"] == 100
+    batch_seconds = time.perf_counter() - started
+
+    assert tracking_ingest.flush_tracking_buffer() == HTTP_REQUESTS + HTTP_BATCHES * 100
+    print(
+        f"\ntracking http: /event {HTTP_REQUESTS / single_seconds:,.0f} req/s | "
+        f"/events (100/batch) {HTTP_BATCHES * 100 / batch_seconds:,.0f} events/s"
+    )
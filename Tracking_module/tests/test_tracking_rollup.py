@@ -0,0 +1,142 @@
+"""
+Tracking rollup and export tests (SQLite file DB).
+"""
+import sys
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../..'))
+
+from database import Base
+from config import settings
+from Tracking_module.Tracking_model import TrackingRecord, TrackingRollup, TrackingRollupState
+from Tracking_module.Tracking_crud import build_tracking_row
+from Tracking_module import tracking_rollup
+from Tracking_module.tracking_rollup import (
+    get_tracking_rollups, note_late_tracking_rows, run_tracking_export, run_tracking_rollups,
+)
+
+DAY = datetime(2026, 10, 14)
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'tracking.db'}")
+    Base.metadata.create_all(
+        engine, tables=[TrackingRecord.__table__, TrackingRollup.__table__, TrackingRollupState.__table__]
+    )
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def _add(db, created_at, ga_consent=True, location_consent=True, user_id=None, page_url="https://x.com/a?utm=1",
+         device_type="mobile", latitude=12.9716, longitude=77.5946):
+    row = build_tracking_row(
+        ga_consent=ga_consent, location_consent=location_consent, user_id=user_id, page_url=page_url,
+        device_type=device_type, latitude=latitude, longitude=longitude,
+    )
+    row["created_at"] = created_at
+    db.execute(insert(TrackingRecord), [row])
+    db.commit()
+
+
+def _rows(db, dimension, granularity="hour"):
+    return {(r["bucket_start"], r["value"]): r["events"] for r in get_tracking_rollups(db, dimension, granularity)}
+
+
+def test_rollup_is_incremental_and_exactly_once(db):
+    _add(db, DAY.replace(hour=9, minute=5), user_id="1")
+    _add(db, DAY.replace(hour=9, minute=50), ga_consent=False)
+    _add(db, DAY.replace(hour=13, minute=10), device_type=None, page_url="https://x.com/a?utm=2")
+
+    result = run_tracking_rollups(db, now=DAY.replace(hour=14))
+    assert result["records"] == 3
+    assert _rows(db, "page") == {
+        (DAY.replace(hour=9).isoformat(), "https://x.com/a"): 1,
+        (DAY.replace(hour=13).isoformat(), "https://x.com/a"): 1,
+    }
+    # Device fields are only stored with GA consent
+    assert _rows(db, "device", "day") == {(DAY.isoformat(), "mobile"): 1, (DAY.isoformat(), "unknown"): 2}
+    assert _rows(db, "consent", "day") == {(DAY.isoformat(), "ga+location"): 2, (DAY.isoformat(), "location"): 1}
+    assert _rows(db, "geo", "day") == {(DAY.isoformat(), "13.0,77.6"): 3}
+
+    # Recounting the same hours changes nothing
+    before = _rows(db, "consent")
+    run_tracking_rollups(db, now=DAY.replace(hour=14))
+    assert _rows(db, "consent") == before
+
+    # A record in the already-aggregated (partial) 13:00 hour and one inside the lag
+    _add(db, DAY.replace(hour=13, minute=56))
+    _add(db, DAY.replace(hour=14, minute=58))
+    run_tracking_rollups(db, now=DAY.replace(hour=15))
+    assert _rows(db, "device")[(DAY.replace(hour=13).isoformat(), "mobile")] == 1
+    assert _rows(db, "device", "day")[(DAY.isoformat(), "mobile")] == 2
+    assert sum(row["events"] for row in get_tracking_rollups(db, "consent", "day")) == 4
+
+
+def test_late_rows_behind_the_mark_are_counted(db):
+    _add(db, DAY.replace(hour=9, minute=5))
+    _add(db, DAY.replace(hour=11, minute=5))
+    run_tracking_rollups(db, now=DAY.replace(hour=12))
+
+    # Without a late mark only records past the mark are read
+    _add(db, DAY.replace(hour=8, minute=30))
+    assert run_tracking_rollups(db, now=DAY.replace(hour=12, minute=10))["windows"] == 0
+
+    # Requeued by the ingest flusher and written after the mark passed its created_at
+    _add(db, DAY.replace(hour=9, minute=40))
+    note_late_tracking_rows(db, DAY.replace(hour=9, minute=40))
+    note_late_tracking_rows(db, DAY.replace(hour=10, minute=15))  # Never raises the mark
+    result = run_tracking_rollups(db, now=DAY.replace(hour=12, minute=10))
+    assert result["windows"] == 2  # 09:00 and 11:00, not 08:00
+    assert result["high_water_mark"] == DAY.replace(hour=12, minute=5)
+    assert _rows(db, "consent") == {
+        (DAY.replace(hour=9).isoformat(), "ga+location"): 2,
+        (DAY.replace(hour=11).isoformat(), "ga+location"): 1,
+    }
+    assert _rows(db, "consent", "day") == {(DAY.isoformat(), "ga+location"): 3}
+    assert db.get(TrackingRollupState, "rollup_late").high_water_mark is None
+    assert run_tracking_rollups(db, now=DAY.replace(hour=12, minute=10))["windows"] == 0
+
+
+def test_rollup_spreads_backlog_over_runs(db, monkeypatch):
+    monkeypatch.setattr(settings, "TRACKING_ROLLUP_MAX_HOURS_PER_RUN", 2)
+    for hour in range(6):
+        _add(db, DAY.replace(hour=hour, minute=30))
+
+    assert run_tracking_rollups(db, now=DAY.replace(hour=10))["high_water_mark"] == DAY.replace(hour=2)
+    assert run_tracking_rollups(db, now=DAY.replace(hour=10))["windows"] == 2
+    assert run_tracking_rollups(db, now=DAY.replace(hour=10))["high_water_mark"] == DAY.replace(hour=6)
+    assert _rows(db, "consent", "day") == {(DAY.isoformat(), "ga+location"): 6}
+
+
+def test_export_writes_closed_days(db, tmp_path, monkeypatch):
+    pq = pytest.importorskip("pyarrow.parquet")
+    monkeypatch.setattr(settings, "TRACKING_EXPORT_DIR", str(tmp_path / "exports"))
+    _add(db, DAY.replace(hour=10))
+    _add(db, DAY.replace(hour=23, minute=59), ga_consent=False)
+    _add(db, DAY + timedelta(days=2, hours=1))  # Not closed yet
+
+    exported = run_tracking_export(db, now=DAY + timedelta(days=2, hours=3))
+    assert exported == {"2026-10-14": 2}
+
+    table = pq.read_table(tmp_path / "exports" / "tracking_records" / "date=2026-10-14" / "part-00000.parquet")
+    assert table.num_rows == 2
+    assert table.column("latitude").to_pylist() == [12.9716, 12.9716]
+    assert table.column("ga_consent").to_pylist() == [True, False]
+    assert tracking_rollup.get_tracking_rollup_metrics()["export_high_water_mark"] == "2026-10-16T00:00:00"
+
+    assert run_tracking_export(db, now=DAY + timedelta(days=2, hours=3)) == {}
+    assert run_tracking_export(db, now=DAY + timedelta(days=3, hours=1)) == {"2026-10-16": 1}
+
+    # A late row for an exported day rewrites the days from that one on
+    _add(db, DAY.replace(hour=12))
+    note_late_tracking_rows(db, DAY.replace(hour=12))
+    assert run_tracking_export(db, now=DAY + timedelta(days=3, hours=2)) == {"2026-10-14": 3, "2026-10-16": 1}
+    assert tracking_rollup.get_tracking_rollup_metrics()["export_high_water_mark"] == "2026-10-17T00:00:00"
@@ -0,0 +1,494 @@
+"""
+Tracking rollups and raw export.
+
+Analytics used to be ad-hoc queries against tracking_records on the primary.
+Two leader-only scheduler jobs now take that work off the live table.
+
+run_tracking_rollups() aggregates records into tracking_rollups: hourly
+rows per dimension (page URL, device type, consent combination, geo bucket),
+each with event, GA consent, location consent and authenticated counts.
+Daily rows are rebuilt from the hourly rows of the touched day. The "rollup"
+high-water mark in tracking_rollup_state records how far tracking_records
+has been aggregated. It only moves up to now - TRACKING_ROLLUP_LAG_SECONDS,
+which leaves time for rows still in the ingestion buffer (see
+tracking_ingest).
+
+Rows can still land behind the mark: tracking_ingest keeps requeued rows
+(with their original created_at) while the database is down. After writing
+rows older than the lag, the flusher calls note_late_tracking_rows(), which
+lowers the "rollup_late" and "export_late" marks to the earliest such
+created_at. A run takes its late mark and moves its own mark back to that
+hour (or day), so the hours from there on are counted again; without late
+rows a run only reads records past its mark. Each window replaces
+the hour's rows instead of adding to them, so nothing is counted twice, and
+each hour is replaced and the mark advanced in the same transaction.
+
+run_tracking_export() writes each closed day of raw records to
+TRACKING_EXPORT_DIR/tracking_records/date=YYYY-MM-DD/ as a Parquet (or Arrow
+IPC) file. Rows are streamed in TRACKING_EXPORT_BATCH_ROWS batches, written
+to a temp file and renamed into place. The "export" mark records the next
+day to write; days from one that received late rows on are written again.
+pyarrow is optional; without it (or without TRACKING_EXPORT_DIR) the export
+is skipped.
+
+Both jobs jump over empty stretches, and a run processes at most
+TRACKING_ROLLUP_MAX_HOURS_PER_RUN hours / TRACKING_EXPORT_MAX_DAYS_PER_RUN
+days, so a backlog is spread over runs.
+"""
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit
+
+from sqlalchemy import case, delete, func, insert, literal_column, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from config import settings
+from database import SessionLocal
+from Login_module.Utils.datetime_utils import now_ist, to_ist
+from .Tracking_model import TrackingRecord, TrackingRollup, TrackingRollupState
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_STATE = "rollup"
+EXPORT_STATE = "export"
+ROLLUP_LATE_STATE = "rollup_late"
+EXPORT_LATE_STATE = "export_late"
+VALUE_MAX_LENGTH = 255
+
+EXPORT_COLUMNS = (
+    "record_id", "user_id", "ga_client_id", "session_id", "ga_consent", "location_consent",
+    "latitude", "longitude", "accuracy", "page_url", "referrer", "user_agent", "device_type",
+    "browser", "operating_system", "language", "timezone", "ip_address", "record_type",
+    "created_at", "consent_updated_at",
+)
+_BOOL_COLUMNS = {"ga_consent", "location_consent"}
+_FLOAT_COLUMNS = {"latitude", "longitude", "accuracy"}
+_TIMESTAMP_COLUMNS = {"created_at", "consent_updated_at"}
+
+_lock = threading.Lock()
+_metrics: Dict[str, Any] = {
+    "rollup_runs": 0,
+    "rollup_windows": 0,
+    "rollup_records": 0,
+    "rollup_high_water_mark": None,
+    "last_rollup_duration_seconds": None,
+    "export_runs": 0,
+    "export_days": 0,
+    "export_rows": 0,
+    "export_high_water_mark": None,
+    "last_export_duration_seconds": None,
+    "errors": 0,
+}
+
+
+@dataclass(frozen=True)
+class RollupDimension:
+    name: str
+    columns: Tuple[Any, ...]  # GROUP BY expressions
+    value: Callable[..., str]  # group values -> rollup value
+    condition: Any = None  # Records without the dimension are not counted in it
+
+
+def _page_value(page_url: str) -> str:
+    # Query strings (utm_*, ids) would split one page into many rows
+    parts = urlsplit(page_url)
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, "", "")) or page_url
+
+
+def _consent_value(ga_consent: bool, location_consent: bool) -> str:
+    if ga_consent and location_consent:
+        return "ga+location"
+    if ga_consent:
+        return "ga"
+    if location_consent:
+        return "location"
+    return "none"
+
+
+def rollup_dimensions() -> List[RollupDimension]:
+    decimals = int(settings.TRACKING_ROLLUP_GEO_DECIMALS)
+    places = literal_column(str(decimals))
+    return [
+        RollupDimension("page", (TrackingRecord.page_url,), _page_value, TrackingRecord.page_url.isnot(None)),
+        RollupDimension("device", (TrackingRecord.device_type,), lambda device_type: device_type or "unknown"),
+        RollupDimension("consent", (TrackingRecord.ga_consent, TrackingRecord.location_consent), _consent_value),
+        RollupDimension(
+            "geo",
+            (func.round(TrackingRecord.latitude, places), func.round(TrackingRecord.longitude, places)),
+            lambda lat, lon: f"{float(lat):.{decimals}f},{float(lon):.{decimals}f}",
+            TrackingRecord.latitude.isnot(None) & TrackingRecord.longitude.isnot(None),
+        ),
+    ]
+
+
+def _naive_ist(dt: Optional[datetime]) -> Optional[datetime]:
+    """IST wall-clock time without tzinfo, as tracking_records.created_at is stored."""
+    return to_ist(dt).replace(tzinfo=None) if dt is not None else None
+
+
+def _floor_hour(dt: datetime) -> datetime:
+    return dt.replace(minute=0, second=0, microsecond=0)
+
+
+def _floor_day(dt: datetime) -> datetime:
+    return dt.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _record(counters: Dict[str, int], **values) -> None:
+    with _lock:
+        for name, amount in counters.items():
+            _metrics[name] += amount
+        _metrics.update(values)
+
+
+def _window_counts(db: Session, start: datetime, end: datetime) -> Dict[Tuple[str, str], List[int]]:
+    """(dimension, value) -> [events, ga_consents, location_consents, authenticated] for created_at in [start, end)."""
+    counts = (
+        func.count(),
+        func.sum(case((TrackingRecord.ga_consent == True, 1), else_=0)),
+        func.sum(case((TrackingRecord.location_consent == True, 1), else_=0)),
+        func.sum(case((TrackingRecord.user_id.isnot(None), 1), else_=0)),
+    )
+    result: Dict[Tuple[str, str], List[int]] = {}
+    for dimension in rollup_dimensions():
+        conditions = [TrackingRecord.created_at >= start, TrackingRecord.created_at < end]
+        if dimension.condition is not None:
+            conditions.append(dimension.condition)
+        query = select(*dimension.columns, *counts).where(*conditions).group_by(*dimension.columns)
+        width = len(dimension.columns)
+        for row in db.execute(query):
+            key = (dimension.name, dimension.value(*row[:width])[:VALUE_MAX_LENGTH])
+            totals = result.setdefault(key, [0, 0, 0, 0])
+            for i, count in enumerate(row[width:]):
+                totals[i] += int(count or 0)
+    return result
+
+
+def _replace_bucket(db: Session, bucket: datetime, counts: Dict[Tuple[str, str], List[int]]) -> None:
+    """Swap the hour's rows for freshly counted ones (caller commits)."""
+    db.execute(delete(TrackingRollup).where(TrackingRollup.granularity == "hour", TrackingRollup.bucket_start == bucket))
+    if counts:
+        now = now_ist()
+        db.execute(insert(TrackingRollup), [
+            {
+                "granularity": "hour", "bucket_start": bucket, "dimension": dimension, "value": value,
+                "events": events, "ga_consents": ga_consents, "location_consents": location_consents,
+                "authenticated": authenticated, "updated_at": now,
+            }
+            for (dimension, value), (events, ga_consents, location_consents, authenticated) in counts.items()
+        ])
+
+
+def _rebuild_day(db: Session, day: datetime) -> None:
+    """Recompute the day's rows from its hourly rows."""
+    db.flush()
+    hours = db.execute(
+        select(
+            TrackingRollup.dimension,
+            TrackingRollup.value,
+            func.sum(TrackingRollup.events),
+            func.sum(TrackingRollup.ga_consents),
+            func.sum(TrackingRollup.location_consents),
+            func.sum(TrackingRollup.authenticated),
+        )
+        .where(
+            TrackingRollup.granularity == "hour",
+            TrackingRollup.bucket_start >= day,
+            TrackingRollup.bucket_start < day + timedelta(days=1),
+        )
+        .group_by(TrackingRollup.dimension, TrackingRollup.value)
+    ).all()
+    db.execute(delete(TrackingRollup).where(TrackingRollup.granularity == "day", TrackingRollup.bucket_start == day))
+    if hours:
+        now = now_ist()
+        db.execute(insert(TrackingRollup), [
+            {
+                "granularity": "day", "bucket_start": day, "dimension": dimension, "value": value,
+                "events": events, "ga_consents": ga_consents, "location_consents": location_consents,
+                "authenticated": authenticated, "updated_at": now,
+            }
+            for dimension, value, events, ga_consents, location_consents, authenticated in hours
+        ])
+
+
+def _get_mark(db: Session, name: str) -> Optional[datetime]:
+    state = db.get(TrackingRollupState, name)
+    return state.high_water_mark if state else None
+
+
+def _set_mark(db: Session, name: str, mark: datetime) -> None:
+    """Move the high-water mark in the current transaction (caller commits)."""
+    state = db.get(TrackingRollupState, name)
+    if state is None:
+        db.add(TrackingRollupState(name=name, high_water_mark=mark))
+    else:
+        state.high_water_mark = mark
+
+
+def note_late_tracking_rows(db: Session, earliest: datetime) -> None:
+    """Lower the late marks to `earliest` after rows created then were written late (commits)."""
+    earliest = _naive_ist(earliest)
+    mark = TrackingRollupState.high_water_mark
+    for attempt in range(2):
+        try:
+            for name in (ROLLUP_LATE_STATE, EXPORT_LATE_STATE):
+                # One UPDATE, so a job taking the mark concurrently never loses this value
+                result = db.execute(
+                    update(TrackingRollupState)
+                    .where(TrackingRollupState.name == name)
+                    .values(
+                        high_water_mark=case((mark.is_(None) | (mark > earliest), earliest), else_=mark),
+                        updated_at=now_ist(),
+                    )
+                )
+                if result.rowcount == 0:
+                    db.add(TrackingRollupState(name=name, high_water_mark=earliest))
+            db.commit()
+            return
+        except IntegrityError:
+            # Another flusher created the state row first
+            db.rollback()
+            if attempt:
+                raise
+
+
+def _take_late_mark(db: Session, late_name: str, mark_name: str, floor: Callable[[datetime], datetime]) -> None:
+    """Clear the late mark and move the job's mark back to its bucket (commits)."""
+    state = db.query(TrackingRollupState).filter(TrackingRollupState.name == late_name).with_for_update().first()
+    if state is None or state.high_water_mark is None:
+        db.rollback()
+        return
+    late = floor(state.high_water_mark)
+    state.high_water_mark = None
+    mark = _get_mark(db, mark_name)
+    if mark is not None and late < mark:
+        logger.info(f"Tracking {mark_name} mark moved back for late records | From: {mark} | To: {late}")
+        _set_mark(db, mark_name, late)
+    db.commit()
+
+
+def _next_record_at(db: Session, start: Optional[datetime], end: datetime) -> Optional[datetime]:
+    query = select(func.min(TrackingRecord.created_at)).where(TrackingRecord.created_at < end)
+    if start is not None:
+        query = query.where(TrackingRecord.created_at >= start)
+    return _naive_ist(db.execute(query).scalar())
+
+
+def run_tracking_rollups(db: Optional[Session] = None, now: Optional[datetime] = None) -> Dict[str, Any]:
+    """Recount hours with late records and aggregate records up to now - TRACKING_ROLLUP_LAG_SECONDS."""
+    own_session = db is None
+    db = db or SessionLocal()
+    started = time.monotonic()
+    cutoff = _naive_ist(now or now_ist()) - timedelta(seconds=settings.TRACKING_ROLLUP_LAG_SECONDS)
+    windows = records = 0
+    try:
+        _take_late_mark(db, ROLLUP_LATE_STATE, ROLLUP_STATE, _floor_hour)
+        mark = _get_mark(db, ROLLUP_STATE)
+
+        while windows < settings.TRACKING_ROLLUP_MAX_HOURS_PER_RUN:
+            # The hour holding the mark is counted again in full
+            next_at = _next_record_at(db, mark, cutoff)
+            if next_at is None:
+                if mark is not None and mark < cutoff:
+                    mark = cutoff
+                    _set_mark(db, ROLLUP_STATE, mark)
+                    db.commit()
+                break
+            bucket = _floor_hour(next_at)
+            end = min(bucket + timedelta(hours=1), cutoff)
+
+            counts = _window_counts(db, bucket, end)
+            _replace_bucket(db, bucket, counts)
+            _rebuild_day(db, _floor_day(bucket))
+            mark = end
+            _set_mark(db, ROLLUP_STATE, mark)
+            db.commit()
+
+            records += sum(totals[0] for (dimension, _), totals in counts.items() if dimension == "consent")
+            windows += 1
+    except Exception:
+        db.rollback()
+        _record({"errors": 1})
+        raise
+    finally:
+        if own_session:
+            db.close()
+
+    duration = round(time.monotonic() - started, 3)
+    _record(
+        {"rollup_runs": 1, "rollup_windows": windows, "rollup_records": records},
+        rollup_high_water_mark=mark.isoformat() if mark else None,
+        last_rollup_duration_seconds=duration,
+    )
+    if windows:
+        logger.info(f"Tracking rollup: {records} record(s) in {windows} window(s) in {duration}s | Up to: {mark}")
+    return {"windows": windows, "records": records, "high_water_mark": mark}
+
+
+def get_tracking_rollups(
+    db: Session,
+    dimension: str,
+    granularity: str = "day",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> List[dict]:
+    """Rollup rows for one dimension in [start, end), oldest bucket first, busiest value first."""
+    query = db.query(TrackingRollup).filter(
+        TrackingRollup.dimension == dimension, TrackingRollup.granularity == granularity
+    )
+    if start is not None:
+        query = query.filter(TrackingRollup.bucket_start >= _naive_ist(start))
+    if end is not None:
+        query = query.filter(TrackingRollup.bucket_start < _naive_ist(end))
+    return [
+        {
+            "bucket_start": row.bucket_start.isoformat(),
+            "value": row.value,
+            "events": row.events,
+            "ga_consent_rate": round(row.ga_consents / row.events, 4) if row.events else 0.0,
+            "location_consent_rate": round(row.location_consents / row.events, 4) if row.events else 0.0,
+            "authenticated": row.authenticated,
+        }
+        for row in query.order_by(TrackingRollup.bucket_start, TrackingRollup.events.desc())
+    ]
+
+
+def _load_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        logger.warning("pyarrow not installed; tracking export skipped.")
+        return None
+    return pyarrow
+
+
+def _export_schema(pa):
+    def column_type(name):
+        if name in _BOOL_COLUMNS:
+            return pa.bool_()
+        if name in _FLOAT_COLUMNS:
+            return pa.float64()
+        if name in _TIMESTAMP_COLUMNS:
+            return pa.timestamp("us")  # IST wall-clock time, like the table
+        return pa.string()
+
+    return pa.schema([(name, column_type(name)) for name in EXPORT_COLUMNS])
+
+
+def _export_value(name: str, value):
+    if value is None:
+        return None
+    if name in _FLOAT_COLUMNS:
+        return float(value) if isinstance(value, Decimal) else value
+    if name in _TIMESTAMP_COLUMNS:
+        return _naive_ist(value)
+    if name in _BOOL_COLUMNS:
+        return bool(value)
+    return str(value)
+
+
+def export_tracking_day(db: Session, day: datetime, directory: str, export_format: str = "parquet") -> int:
+    """Write one day of tracking_records to directory/tracking_records/date=YYYY-MM-DD/. Returns rows written."""
+    pa = _load_pyarrow()
+    if pa is None:
+        return 0
+    schema = _export_schema(pa)
+    extension = "arrow" if export_format == "arrow" else "parquet"
+    partition = os.path.join(directory, "tracking_records", f"date={day:%Y-%m-%d}")
+    path = os.path.join(partition, f"part-00000.{extension}")
+    tmp_path = f"{path}.tmp"
+    os.makedirs(partition, exist_ok=True)
+
+    query = (
+        select(*(getattr(TrackingRecord, name) for name in EXPORT_COLUMNS))
+        .where(TrackingRecord.created_at >= day, TrackingRecord.created_at < day + timedelta(days=1))
+        .order_by(TrackingRecord.created_at)
+        .execution_options(yield_per=settings.TRACKING_EXPORT_BATCH_ROWS)
+    )
+    if extension == "arrow":
+        writer = pa.ipc.new_file(tmp_path, schema)
+    else:
+        writer = pa.parquet.ParquetWriter(tmp_path, schema)
+    rows = 0
+    try:
+        for batch in db.execute(query).partitions():
+            columns = list(zip(*batch))
+            table = pa.Table.from_arrays(
+                [
+                    pa.array([_export_value(name, value) for value in columns[i]], type=schema.field(name).type)
+                    for i, name in enumerate(EXPORT_COLUMNS)
+                ],
+                schema=schema,
+            )
+            writer.write_table(table)
+            rows += len(batch)
+    except Exception:
+        writer.close()
+        os.remove(tmp_path)
+        raise
+    writer.close()
+    os.replace(tmp_path, path)
+    return rows
+
+
+def run_tracking_export(db: Optional[Session] = None, now: Optional[datetime] = None) -> Dict[str, int]:
+    """Export every closed day not yet exported. Returns rows written per day (YYYY-MM-DD)."""
+    directory = settings.TRACKING_EXPORT_DIR
+    if not directory or _load_pyarrow() is None:
+        return {}
+    own_session = db is None
+    db = db or SessionLocal()
+    started = time.monotonic()
+    cutoff = _naive_ist(now or now_ist()) - timedelta(seconds=settings.TRACKING_ROLLUP_LAG_SECONDS)
+    last_closed = _floor_day(cutoff)
+    exported: Dict[str, int] = {}
+    try:
+        _take_late_mark(db, EXPORT_LATE_STATE, EXPORT_STATE, _floor_day)
+        day = _get_mark(db, EXPORT_STATE)
+
+        while (day is None or day < last_closed) and len(exported) < settings.TRACKING_EXPORT_MAX_DAYS_PER_RUN:
+            next_at = _next_record_at(db, day, last_closed)
+            if next_at is None:
+                if day is not None:
+                    day = last_closed
+                    _set_mark(db, EXPORT_STATE, day)
+                    db.commit()
+                break
+            day = max(day, _floor_day(next_at)) if day is not None else _floor_day(next_at)
+            exported[f"{day:%Y-%m-%d}"] = export_tracking_day(
+                db, day, directory, settings.TRACKING_EXPORT_FORMAT
+            )
+            day = day + timedelta(days=1)
+            _set_mark(db, EXPORT_STATE, day)
+            db.commit()
+    except Exception:
+        db.rollback()
+        _record({"errors": 1})
+        raise
+    finally:
+        if own_session:
+            db.close()
+
+    duration = round(time.monotonic() - started, 3)
+    _record(
+        {"export_runs": 1, "export_days": len(exported), "export_rows": sum(exported.values())},
+        export_high_water_mark=day.isoformat() if day else None,
+        last_export_duration_seconds=duration,
+    )
+    if exported:
+        logger.info(f"Tracking export completed in {duration}s | Rows per day: {exported}")
+    return exported
+
+
+def get_tracking_rollup_metrics() -> dict:
+    with _lock:
+        return dict(_metrics)
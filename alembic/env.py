@@ -36,8 +36,8 @@ from Login_module.Device.Device_session_audit_model import SessionAuditLog
 from Login_module.OTP.OTP_Log_Model import OTPAuditLog
 from Login_module.Token.Refresh_token_model import RefreshToken  # Dual-token strategy
 from Consent_module.Consent_model import UserConsent, ConsentProduct, PartnerConsent
-from GeneticTest_module.GeneticTest_model import GeneticTestParticipant
-from Tracking_module.Tracking_model import TrackingRecord  # Location & Analytics Tracking
+from GeneticTest_module.GeneticTest_model import GeneticTestParticipant, MemberOrderSummary
+from Tracking_module.Tracking_model import TrackingRecord, TrackingRollup, TrackingRollupState  # Location & Analytics Tracking
 from Enquiry_module.Enquiry_model import EnquiryRequest
 
 # this is the Alembic Config object, which provides
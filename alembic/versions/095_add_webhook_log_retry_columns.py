@@ -0,0 +1,96 @@
+"""Add retry bookkeeping columns to webhook_logs
+
+webhook_logs doubles as the durable outbox for Razorpay webhook processing:
+attempts counts processing tries and next_attempt_at holds the lease/backoff
+deadline before the worker may pick the row up again.
+
+Rows left unprocessed by the old synchronous handler (failed deliveries whose
+Razorpay retries arrived as separate rows) are marked as out of attempts, so
+the new worker does not replay them after deploy.
+
+Revision ID: 095_webhook_log_retry_columns
+Revises: 094_drop_genetic_item_provider_cols
+Create Date: 2026-10-16
+"""
+
+from typing import Sequence, Set, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "095_webhook_log_retry_columns"
+down_revision: Union[str, None] = "094_drop_genetic_item_provider_cols"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+TABLE_NAME = "webhook_logs"
+MAX_ATTEMPTS = 8  # Orders_module.webhook_queue.WEBHOOK_MAX_ATTEMPTS
+
+
+def _columns(inspector: sa.Inspector, table_name: str) -> Set[str]:
+    if table_name not in inspector.get_table_names():
+        return set()
+    return {column["name"] for column in inspector.get_columns(table_name)}
+
+
+def _indexes(inspector: sa.Inspector, table_name: str) -> Set[str]:
+    if table_name not in inspector.get_table_names():
+        return set()
+    return {index["name"] for index in inspector.get_indexes(table_name)}
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if TABLE_NAME not in inspector.get_table_names():
+        return
+
+    columns = _columns(inspector, TABLE_NAME)
+    indexes = _indexes(inspector, TABLE_NAME)
+
+    if "attempts" not in columns:
+        op.add_column(
+            TABLE_NAME,
+            sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+        )
+        op.execute(
+            sa.text(f"UPDATE {TABLE_NAME} SET attempts = :attempts WHERE processed = :processed")
+            .bindparams(attempts=MAX_ATTEMPTS, processed=False)
+        )
+
+    if "next_attempt_at" not in columns:
+        op.add_column(
+            TABLE_NAME,
+            sa.Column("next_attempt_at", sa.DateTime(timezone=True), nullable=True),
+        )
+
+    if "ix_webhook_logs_next_attempt_at" not in indexes:
+        op.create_index(
+            "ix_webhook_logs_next_attempt_at",
+            TABLE_NAME,
+            ["next_attempt_at"],
+            unique=False,
+        )
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if TABLE_NAME not in inspector.get_table_names():
+        return
+
+    columns = _columns(inspector, TABLE_NAME)
+    indexes = _indexes(inspector, TABLE_NAME)
+
+    if "ix_webhook_logs_next_attempt_at" in indexes:
+        op.drop_index("ix_webhook_logs_next_attempt_at", table_name=TABLE_NAME)
+
+    if "next_attempt_at" in columns:
+        op.drop_column(TABLE_NAME, "next_attempt_at")
+
+    if "attempts" in columns:
+        op.drop_column(TABLE_NAME, "attempts")
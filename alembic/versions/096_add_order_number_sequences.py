@@ -0,0 +1,70 @@
+"""Add order_number_sequences counter table
+
+Order numbers were computed by scanning every numeric order_number and taking
+the max, which is O(orders) per checkout and races under concurrency. The
+counter row is seeded from the current highest numeric order number.
+
+Revision ID: 096_order_number_sequences
+Revises: 095_webhook_log_retry_columns
+Create Date: 2026-10-16
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "096_order_number_sequences"
+down_revision: Union[str, None] = "095_webhook_log_retry_columns"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+TABLE_NAME = "order_number_sequences"
+SEQUENCE_NAME = "order_number"
+ORDER_NUMBER_PREFIX = "262700"
+ORDER_NUMBER_START = 2627001000
+
+
+def _seed_value(bind, inspector: sa.Inspector) -> int:
+    if "orders" not in inspector.get_table_names():
+        return ORDER_NUMBER_START
+    rows = bind.execute(
+        sa.text("SELECT order_number FROM orders WHERE order_number LIKE :prefix"),
+        {"prefix": f"{ORDER_NUMBER_PREFIX}%"},
+    )
+    numbers = [int(n) for (n,) in rows if n and n.isdigit()]
+    return max(numbers) if numbers else ORDER_NUMBER_START
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if TABLE_NAME not in inspector.get_table_names():
+        op.create_table(
+            TABLE_NAME,
+            sa.Column("name", sa.String(length=50), nullable=False),
+            sa.Column("last_value", sa.BigInteger(), nullable=False),
+            sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+            sa.PrimaryKeyConstraint("name"),
+        )
+
+    exists = bind.execute(
+        sa.text(f"SELECT name FROM {TABLE_NAME} WHERE name = :name"),
+        {"name": SEQUENCE_NAME},
+    ).first()
+    if not exists:
+        bind.execute(
+            sa.text(f"INSERT INTO {TABLE_NAME} (name, last_value) VALUES (:name, :value)"),
+            {"name": SEQUENCE_NAME, "value": _seed_value(bind, inspector)},
+        )
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if TABLE_NAME in inspector.get_table_names():
+        op.drop_table(TABLE_NAME)
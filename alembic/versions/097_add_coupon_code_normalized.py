@@ -0,0 +1,87 @@
+"""Add coupons.coupon_code_normalized with a unique index
+
+Coupon lookups compared UPPER(coupon_code), which cannot use the coupon_code
+index, and fell back to loading every coupon. The normalized column holds
+UPPER(TRIM(coupon_code)) and is kept in sync by the ORM. If existing codes
+collide after normalization the index is created non-unique and the
+duplicates are logged so they can be cleaned up.
+
+Revision ID: 097_coupon_code_normalized
+Revises: 096_order_number_sequences
+Create Date: 2026-10-16
+"""
+
+import logging
+from typing import Sequence, Set, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "097_coupon_code_normalized"
+down_revision: Union[str, None] = "096_order_number_sequences"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+logger = logging.getLogger("alembic.runtime.migration")
+
+TABLE_NAME = "coupons"
+COLUMN_NAME = "coupon_code_normalized"
+INDEX_NAME = "ix_coupons_coupon_code_normalized"
+
+
+def _columns(inspector: sa.Inspector, table_name: str) -> Set[str]:
+    if table_name not in inspector.get_table_names():
+        return set()
+    return {column["name"] for column in inspector.get_columns(table_name)}
+
+
+def _indexes(inspector: sa.Inspector, table_name: str) -> Set[str]:
+    if table_name not in inspector.get_table_names():
+        return set()
+    return {index["name"] for index in inspector.get_indexes(table_name)}
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if TABLE_NAME not in inspector.get_table_names():
+        return
+
+    if COLUMN_NAME not in _columns(inspector, TABLE_NAME):
+        op.add_column(TABLE_NAME, sa.Column(COLUMN_NAME, sa.String(length=50), nullable=True))
+
+    bind.execute(sa.text(
+        f"UPDATE {TABLE_NAME} SET {COLUMN_NAME} = UPPER(TRIM(coupon_code)) "
+        f"WHERE {COLUMN_NAME} IS NULL OR {COLUMN_NAME} <> UPPER(TRIM(coupon_code))"
+    ))
+
+    with op.batch_alter_table(TABLE_NAME) as batch_op:
+        batch_op.alter_column(COLUMN_NAME, existing_type=sa.String(length=50), nullable=False)
+
+    if INDEX_NAME not in _indexes(inspector, TABLE_NAME):
+        duplicates = bind.execute(sa.text(
+            f"SELECT {COLUMN_NAME}, COUNT(*) FROM {TABLE_NAME} "
+            f"GROUP BY {COLUMN_NAME} HAVING COUNT(*) > 1"
+        )).all()
+        if duplicates:
+            logger.warning(
+                "Coupon codes collide after normalization, creating a non-unique index: %s",
+                [code for code, _ in duplicates],
+            )
+        op.create_index(INDEX_NAME, TABLE_NAME, [COLUMN_NAME], unique=not duplicates)
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if TABLE_NAME not in inspector.get_table_names():
+        return
+
+    if INDEX_NAME in _indexes(inspector, TABLE_NAME):
+        op.drop_index(INDEX_NAME, table_name=TABLE_NAME)
+
+    if COLUMN_NAME in _columns(inspector, TABLE_NAME):
+        op.drop_column(TABLE_NAME, COLUMN_NAME)
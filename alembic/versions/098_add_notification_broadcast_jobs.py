@@ -0,0 +1,63 @@
+"""Add notification_broadcast_jobs table
+
+Tracks admin broadcast/segment notification jobs: the segment filter, the
+message, progress counters and the keyset cursor (last_user_id) used to
+resume an interrupted job.
+
+Revision ID: 098_notification_broadcast_jobs
+Revises: 097_coupon_code_normalized
+Create Date: 2026-10-16
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "098_notification_broadcast_jobs"
+down_revision: Union[str, None] = "097_coupon_code_normalized"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+TABLE_NAME = "notification_broadcast_jobs"
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if TABLE_NAME in inspector.get_table_names():
+        return
+
+    op.create_table(
+        TABLE_NAME,
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("segment", sa.String(length=30), nullable=False),
+        sa.Column("segment_value", sa.String(length=255), nullable=True),
+        sa.Column("title", sa.String(length=255), nullable=False),
+        sa.Column("message", sa.Text(), nullable=False),
+        sa.Column("type", sa.String(length=50), nullable=True),
+        sa.Column("status", sa.String(length=20), nullable=False, server_default="pending"),
+        sa.Column("total_users", sa.Integer(), nullable=True),
+        sa.Column("processed_users", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("push_tokens", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("last_user_id", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("started_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("heartbeat_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_notification_broadcast_jobs_id", TABLE_NAME, ["id"], unique=False)
+    op.create_index("ix_notification_broadcast_jobs_status", TABLE_NAME, ["status"], unique=False)
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if TABLE_NAME in inspector.get_table_names():
+        op.drop_table(TABLE_NAME)
@@ -0,0 +1,57 @@
+"""Add composite indexes on notifications
+
+ix_notifications_user_read (user_id, is_read) serves unread counts and
+mark-all-read; ix_notifications_user_created_id (user_id, created_at, id)
+serves keyset-paginated listing, newest first.
+
+Revision ID: 099_notification_indexes
+Revises: 098_notification_broadcast_jobs
+Create Date: 2026-10-16
+"""
+
+from typing import Sequence, Set, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "099_notification_indexes"
+down_revision: Union[str, None] = "098_notification_broadcast_jobs"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+TABLE_NAME = "notifications"
+INDEXES = {
+    "ix_notifications_user_read": ["user_id", "is_read"],
+    "ix_notifications_user_created_id": ["user_id", "created_at", "id"],
+}
+
+
+def _indexes(inspector: sa.Inspector, table_name: str) -> Set[str]:
+    if table_name not in inspector.get_table_names():
+        return set()
+    return {index["name"] for index in inspector.get_indexes(table_name)}
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if TABLE_NAME not in inspector.get_table_names():
+        return
+
+    existing = _indexes(inspector, TABLE_NAME)
+    for name, columns in INDEXES.items():
+        if name not in existing:
+            op.create_index(name, TABLE_NAME, columns, unique=False)
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    existing = _indexes(inspector, TABLE_NAME)
+    for name in INDEXES:
+        if name in existing:
+            op.drop_index(name, table_name=TABLE_NAME)
@@ -0,0 +1,70 @@
+"""Add orders.needs_repair repair-queue flag
+
+Orders that may need repair (verified payment stuck in PROCESSING, items
+behind the order status) are flagged and fixed by the background order
+repair job instead of by GET endpoints. The index keeps the queue scan
+(WHERE needs_repair = true ORDER BY id) cheap.
+
+Revision ID: 100_order_needs_repair
+Revises: 099_notification_indexes
+Create Date: 2026-10-16
+"""
+
+from typing import Sequence, Set, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "100_order_needs_repair"
+down_revision: Union[str, None] = "099_notification_indexes"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+TABLE_NAME = "orders"
+COLUMN_NAME = "needs_repair"
+INDEX_NAME = "ix_orders_needs_repair"
+
+
+def _columns(inspector: sa.Inspector, table_name: str) -> Set[str]:
+    if table_name not in inspector.get_table_names():
+        return set()
+    return {column["name"] for column in inspector.get_columns(table_name)}
+
+
+def _indexes(inspector: sa.Inspector, table_name: str) -> Set[str]:
+    if table_name not in inspector.get_table_names():
+        return set()
+    return {index["name"] for index in inspector.get_indexes(table_name)}
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if TABLE_NAME not in inspector.get_table_names():
+        return
+
+    if COLUMN_NAME not in _columns(inspector, TABLE_NAME):
+        op.add_column(
+            TABLE_NAME,
+            sa.Column(COLUMN_NAME, sa.Boolean(), nullable=False, server_default=sa.text("0")),
+        )
+
+    if INDEX_NAME not in _indexes(inspector, TABLE_NAME):
+        op.create_index(INDEX_NAME, TABLE_NAME, [COLUMN_NAME], unique=False)
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if TABLE_NAME not in inspector.get_table_names():
+        return
+
+    if INDEX_NAME in _indexes(inspector, TABLE_NAME):
+        op.drop_index(INDEX_NAME, table_name=TABLE_NAME)
+
+    if COLUMN_NAME in _columns(inspector, TABLE_NAME):
+        op.drop_column(TABLE_NAME, COLUMN_NAME)
@@ -0,0 +1,80 @@
+"""Add member_order_summaries projection
+
+One row per member with order items: the member's latest order and latest
+report-ready order, read by the member list/switcher instead of three
+queries per member. Kept current by GeneticTest_module.member_order_summary
+on every commit that changes orders or order items; backfilled here.
+
+Revision ID: 101_member_order_summaries
+Revises: 100_order_needs_repair
+Create Date: 2026-10-16
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "101_member_order_summaries"
+down_revision: Union[str, None] = "100_order_needs_repair"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+TABLE_NAME = "member_order_summaries"
+
+RANKED_ORDERS = """
+    SELECT oi.member_id, o.user_id, o.id AS order_id, o.order_number, o.order_status,
+           ROW_NUMBER() OVER (PARTITION BY oi.member_id ORDER BY o.created_at DESC, o.id DESC) AS rn
+    FROM genetic_order_items oi
+    JOIN orders o ON o.id = oi.order_id
+    WHERE oi.member_id IS NOT NULL {extra}
+"""
+
+BACKFILL = f"""
+    INSERT INTO {TABLE_NAME} (member_id, user_id, latest_order_id, latest_order_number, latest_order_status,
+                              report_order_id, report_order_number, updated_at)
+    SELECT l.member_id, l.user_id, l.order_id, l.order_number, l.order_status,
+           r.order_id, r.order_number, CURRENT_TIMESTAMP
+    FROM ({RANKED_ORDERS.format(extra="")}) l
+    LEFT JOIN ({RANKED_ORDERS.format(extra="AND oi.order_status IN ('REPORT_READY', 'COMPLETED')")}) r
+        ON r.member_id = l.member_id AND r.rn = 1
+    WHERE l.rn = 1
+"""
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if TABLE_NAME in inspector.get_table_names():
+        return
+
+    op.create_table(
+        TABLE_NAME,
+        sa.Column("member_id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("latest_order_id", sa.Integer(), nullable=True),
+        sa.Column("latest_order_number", sa.String(length=50), nullable=True),
+        sa.Column("latest_order_status", sa.String(length=50), nullable=True),
+        sa.Column("report_order_id", sa.Integer(), nullable=True),
+        sa.Column("report_order_number", sa.String(length=50), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(["member_id"], ["members.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("member_id"),
+    )
+    op.create_index("ix_member_order_summaries_user_id", TABLE_NAME, ["user_id"], unique=False)
+
+    tables = set(inspector.get_table_names())
+    if {"orders", "genetic_order_items"} <= tables:
+        op.execute(sa.text(BACKFILL))
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if TABLE_NAME in inspector.get_table_names():
+        op.drop_table(TABLE_NAME)
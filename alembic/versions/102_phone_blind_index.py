@@ -0,0 +1,96 @@
+"""Add phone blind index columns to members and partner_consents
+
+members.mobile_hash and partner_consents.partner_mobile_hash hold a keyed
+HMAC-SHA256 of the normalized plain phone number (phone_blind_index), so
+phone equality searches (partner eligibility, partner consent revoke) are
+indexed lookups regardless of whether the phone column holds plain text or
+ciphertext. Existing rows are backfilled in id batches.
+
+Revision ID: 102_phone_blind_index
+Revises: 101_member_order_summaries
+Create Date: 2026-10-16
+"""
+
+from typing import Sequence, Set, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "102_phone_blind_index"
+down_revision: Union[str, None] = "101_member_order_summaries"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (table, phone column, hash column, index name)
+BLIND_INDEXES = [
+    ("members", "mobile", "mobile_hash", "ix_members_mobile_hash"),
+    ("partner_consents", "partner_mobile", "partner_mobile_hash", "ix_partner_consents_partner_mobile_hash"),
+]
+BATCH_SIZE = 1000
+
+
+def _columns(inspector: sa.Inspector, table_name: str) -> Set[str]:
+    if table_name not in inspector.get_table_names():
+        return set()
+    return {column["name"] for column in inspector.get_columns(table_name)}
+
+
+def _indexes(inspector: sa.Inspector, table_name: str) -> Set[str]:
+    if table_name not in inspector.get_table_names():
+        return set()
+    return {index["name"] for index in inspector.get_indexes(table_name)}
+
+
+def _backfill(bind, table_name: str, phone_column: str, hash_column: str) -> None:
+    from Login_module.Utils.phone_encryption import phone_blind_index
+
+    table = sa.table(table_name, sa.column("id"), sa.column(phone_column), sa.column(hash_column))
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(table.c.id, table.c[phone_column])
+            .where(table.c.id > last_id, table.c[hash_column].is_(None))
+            .order_by(table.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        bind.execute(
+            table.update().where(table.c.id == sa.bindparam("row_id")).values({hash_column: sa.bindparam("hash")}),
+            [{"row_id": row_id, "hash": phone_blind_index(phone)} for row_id, phone in rows],
+        )
+        last_id = rows[-1][0]
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    for table_name, phone_column, hash_column, index_name in BLIND_INDEXES:
+        if table_name not in inspector.get_table_names():
+            continue
+
+        if hash_column not in _columns(inspector, table_name):
+            op.add_column(table_name, sa.Column(hash_column, sa.String(length=64), nullable=True))
+
+        if index_name not in _indexes(inspector, table_name):
+            op.create_index(index_name, table_name, [hash_column], unique=False)
+
+        _backfill(bind, table_name, phone_column, hash_column)
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    for table_name, _phone_column, hash_column, index_name in BLIND_INDEXES:
+        if table_name not in inspector.get_table_names():
+            continue
+
+        if index_name in _indexes(inspector, table_name):
+            op.drop_index(index_name, table_name=table_name)
+
+        if hash_column in _columns(inspector, table_name):
+            op.drop_column(table_name, hash_column)
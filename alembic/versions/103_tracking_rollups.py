@@ -0,0 +1,72 @@
+"""Add tracking_rollups and tracking_rollup_state
+
+Hourly/daily aggregates of tracking_records (page, device, consent and geo
+dimensions) and the high-water marks of the rollup and raw export jobs in
+Tracking_module.tracking_rollup. The first run aggregates existing records
+from the oldest one onwards, so there is no backfill here.
+
+Revision ID: 103_tracking_rollups
+Revises: 102_phone_blind_index
+Create Date: 2026-10-16
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "103_tracking_rollups"
+down_revision: Union[str, None] = "102_phone_blind_index"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+ROLLUPS_TABLE = "tracking_rollups"
+STATE_TABLE = "tracking_rollup_state"
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    tables = set(inspector.get_table_names())
+
+    if ROLLUPS_TABLE not in tables:
+        op.create_table(
+            ROLLUPS_TABLE,
+            sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column("granularity", sa.String(length=10), nullable=False),
+            sa.Column("bucket_start", sa.DateTime(), nullable=False),
+            sa.Column("dimension", sa.String(length=20), nullable=False),
+            sa.Column("value", sa.String(length=255), nullable=False),
+            sa.Column("events", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("ga_consents", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("location_consents", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("authenticated", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+            sa.PrimaryKeyConstraint("id"),
+            sa.UniqueConstraint("granularity", "bucket_start", "dimension", "value", name="uq_tracking_rollups_bucket"),
+        )
+        op.create_index(
+            "idx_tracking_rollups_lookup", ROLLUPS_TABLE, ["dimension", "granularity", "bucket_start"], unique=False
+        )
+
+    if STATE_TABLE not in tables:
+        op.create_table(
+            STATE_TABLE,
+            sa.Column("name", sa.String(length=50), nullable=False),
+            sa.Column("high_water_mark", sa.DateTime(), nullable=True),
+            sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+            sa.PrimaryKeyConstraint("name"),
+        )
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    tables = set(inspector.get_table_names())
+
+    if STATE_TABLE in tables:
+        op.drop_table(STATE_TABLE)
+    if ROLLUPS_TABLE in tables:
+        op.drop_table(ROLLUPS_TABLE)
@@ -0,0 +1,43 @@
+"""
+Build the local pincode index used by Address_module.pincode_service.
+
+Run from project root:
+    python build_pincode_index.py path/to/all_india_pincode_directory.csv [output.sqlite]
+
+Accepts the India Post "All India Pincode Directory" as CSV or XLSX. Expects
+header columns for pincode, office name, district and state (officetype and
+delivery status are optional). The output defaults to PINCODE_INDEX_PATH
+(pincode_index.sqlite in the project root).
+"""
+import sys
+from pathlib import Path
+
+# Ensure project root is on path
+PROJECT_ROOT = Path(__file__).resolve().parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+
+def main() -> None:
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+
+    source = Path(sys.argv[1])
+    if not source.exists():
+        print(f"File not found: {source}")
+        sys.exit(1)
+
+    from Address_module.pincode_index import build_pincode_index, PINCODE_INDEX_PATH
+
+    output = sys.argv[2] if len(sys.argv) > 2 else PINCODE_INDEX_PATH
+    try:
+        count = build_pincode_index(source, output)
+    except ValueError as e:
+        print(str(e))
+        sys.exit(1)
+    print(f"Indexed {count} post offices into {output}.")
+
+
+if __name__ == "__main__":
+    main()
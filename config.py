@@ -47,6 +47,11 @@ class Settings(BaseSettings):
     
     # Session management
     MAX_ACTIVE_SESSIONS: int = 4  # Max 4 active sessions per user
+    # Redis session-validity cache used by get_current_user; also the max delay before
+    # a revocation made outside deactivate_session is seen. 0 disables the cache.
+    SESSION_CACHE_TTL_SECONDS: int = 60
+    # last_active updates are buffered in memory and written in one bulk UPDATE this often
+    SESSION_TOUCH_FLUSH_SECONDS: int = 30
     
     # Refresh token rate limiting - can be overridden via .env
     REFRESH_TOKEN_MAX_ATTEMPTS_PER_SESSION: int = 20  # 20 requests per hour per session
@@ -62,6 +67,36 @@ class Settings(BaseSettings):
     # Can be overridden via .env: MAX_SESSION_LIFETIME_DAYS=7 (7 days for production)
     MAX_SESSION_LIFETIME_DAYS: float = 7.0  # Default: 7 days
 
+    # Rendered /cart/view responses cached in Redis per cart version (Cart_module/cart_cache.py); 0 disables
+    CART_VIEW_CACHE_TTL_SECONDS: int = 300
+
+    # Tracking ingestion (Tracking_module/tracking_ingest.py): events are buffered in memory
+    # and written in multi-row INSERTs when a batch fills or the interval passes
+    TRACKING_BUFFER_MAX_EVENTS: int = 100000  # Per process; events beyond this are dropped
+    TRACKING_FLUSH_BATCH_SIZE: int = 1000
+    TRACKING_FLUSH_INTERVAL_SECONDS: float = 1.0
+
+    # Tracking rollups and raw export (Tracking_module/tracking_rollup.py)
+    TRACKING_ROLLUP_INTERVAL_SECONDS: int = 300
+    TRACKING_ROLLUP_LAG_SECONDS: int = 300  # Records younger than this wait for the next run
+    TRACKING_ROLLUP_MAX_HOURS_PER_RUN: int = 168  # Catch-up is spread over runs
+    TRACKING_ROLLUP_GEO_DECIMALS: int = 1  # ~11 km buckets
+    TRACKING_EXPORT_DIR: str = ""  # Daily Parquet/Arrow partitions are written here; empty disables export
+    TRACKING_EXPORT_FORMAT: str = "parquet"  # "parquet" or "arrow" (Arrow IPC file)
+    TRACKING_EXPORT_BATCH_ROWS: int = 50000
+    TRACKING_EXPORT_MAX_DAYS_PER_RUN: int = 7
+
+    # Data retention (Login_module/Device/retention.py) - rows deleted in primary-key batches
+    RETENTION_BATCH_SIZE: int = 1000
+    RETENTION_BATCH_SLEEP_SECONDS: float = 0.2  # Pause between batches so app traffic gets the locks
+    RETENTION_MAX_BATCHES_PER_TABLE: int = 200  # Per run; the remainder waits for the next run
+    RETENTION_SESSION_INACTIVE_HOURS: int = 24
+    RETENTION_REFRESH_TOKEN_DAYS: int = 7  # Days after expiry
+    RETENTION_OTP_AUDIT_DAYS: int = 90
+    RETENTION_SESSION_AUDIT_DAYS: int = 90
+    RETENTION_CART_AUDIT_DAYS: int = 90
+    RETENTION_WEBHOOK_LOG_DAYS: int = 180  # Processed webhooks only
+
     ENVIRONMENT: str = "development"
 
     # Razorpay — set RAZORPAY_MODE=test or live; keys resolved at startup (see resolve_razorpay_keys)
@@ -86,6 +121,12 @@ class Settings(BaseSettings):
     FIREBASE_SERVICE_ACCOUNT_PATH: str = ""
     # When True (default), invalid FCM tokens are removed after failed send. When False (e.g. dev/test with dummy token), tokens are kept so notification trigger keeps running for every event.
     REMOVE_INVALID_FCM_TOKENS: bool = True
+    # Push transport used by Notification_module.push_dispatcher: "firebase" or "fake" (offline load tests)
+    PUSH_TRANSPORT: str = "firebase"
+    # Admin key (X-Admin-Key header) for /api/admin/notifications/broadcast; empty = broadcasts disabled
+    NOTIFICATION_BROADCAST_KEY: str = ""
+    # Admin key (X-Admin-Key header) for /metrics; empty = metrics endpoint disabled
+    METRICS_ADMIN_KEY: str = ""
 
     # Invoice Generation & Sending
     INVOICE_SERVICE_ACCOUNT_PATH: str = "invoice generation/billing.json"
@@ -103,6 +144,12 @@ class Settings(BaseSettings):
     # Comma-separated BCC addresses for invoice emails, e.g. "a@x.com,b@x.com"
     INVOICE_BCC_EMAILS: str = ""
     ORDER_CONFIRMATION_GIF_URL: str = "https://nucleotide-email-template.s3.ap-south-1.amazonaws.com/Delivery+Boy.gif"
+    # Invoice PDFs are rendered in a process pool and stored content-addressed in a private (0700)
+    # directory (empty = a per-user directory under the system temp dir)
+    INVOICE_RENDER_WORKERS: int = 2
+    INVOICE_PDF_CACHE_DIR: str = ""
+    INVOICE_PDF_CACHE_MAX_AGE_SECONDS: int = 7 * 24 * 3600  # Stored PDFs unused for this long are deleted
+    INVOICE_PDF_CACHE_MAX_FILES: int = 5000  # Least recently used PDFs beyond this are deleted
 
     # Google Maps / reverse geocoding
     GOOGLE_MAPS_API_KEY: str = ""
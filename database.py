@@ -1,7 +1,10 @@
 import os
+import random
+import time
 from pathlib import Path
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from typing import Optional
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
 from sqlalchemy.pool import QueuePool
 from dotenv import load_dotenv
 import logging
@@ -47,26 +50,31 @@ MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))
 POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", 30))
 POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 3600))  # Recycle connections after 1 hour
 
-engine_kwargs = {
-    "echo": False,
-    "future": True,
-    "pool_pre_ping": True,
-}
 
-# SQLite has different pooling requirements
-if DATABASE_URL.startswith("sqlite"):
-    engine_kwargs["connect_args"] = {"check_same_thread": False}
-else:
-    engine_kwargs.update(
-        {
-            "poolclass": QueuePool,
-            "pool_size": POOL_SIZE,
-            "max_overflow": MAX_OVERFLOW,
-            "pool_timeout": POOL_TIMEOUT,
-            "pool_recycle": POOL_RECYCLE,
-        }
-    )
+def _engine_kwargs(url: str) -> dict:
+    kwargs = {
+        "echo": False,
+        "future": True,
+        "pool_pre_ping": True,
+    }
+
+    # SQLite has different pooling requirements
+    if url.startswith("sqlite"):
+        kwargs["connect_args"] = {"check_same_thread": False}
+    else:
+        kwargs.update(
+            {
+                "poolclass": QueuePool,
+                "pool_size": POOL_SIZE,
+                "max_overflow": MAX_OVERFLOW,
+                "pool_timeout": POOL_TIMEOUT,
+                "pool_recycle": POOL_RECYCLE,
+            }
+        )
+    return kwargs
+
 
+engine_kwargs = _engine_kwargs(DATABASE_URL)
 engine = create_engine(DATABASE_URL, **engine_kwargs)
 
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False, future=True)
@@ -78,3 +86,144 @@ if DATABASE_URL.startswith("sqlite"):
     logger.info("Database configured with SQLite at %s", DATABASE_URL)
 else:
     logger.info("Database connection pool configured: size=%s, max_overflow=%s", POOL_SIZE, MAX_OVERFLOW)
+
+
+# ---------------------------------------------------------------------------
+# Read replicas
+#
+# DATABASE_REPLICA_URL may hold one or more comma-separated URLs. Read-only
+# endpoints take their session from deps.get_read_db; that session picks its
+# engine on first use: a random replica, or the primary when there is none or
+# the requesting user committed a write in the last DB_REPLICA_STICKY_SECONDS
+# (so users read their own writes despite replication lag). Any flush from a
+# read session goes to the primary. Locally, two SQLite files can stand in.
+# ---------------------------------------------------------------------------
+
+REPLICA_URLS = [
+    url.strip() for url in os.getenv("DATABASE_REPLICA_URL", "").split(",") if url.strip()
+]
+REPLICA_STICKY_SECONDS = float(os.getenv("DB_REPLICA_STICKY_SECONDS", 10))
+STICKY_KEY_PREFIX = "db:primary_until:"
+
+replica_engines = [create_engine(url, **_engine_kwargs(url)) for url in REPLICA_URLS]
+if replica_engines:
+    logger.info("Database read replicas configured: %s", len(replica_engines))
+
+_recent_writers: dict = {}  # user_id -> monotonic deadline (this process)
+_router_metrics = {"replica_sessions": 0, "primary_sessions": 0, "sticky_primary": 0}
+
+
+def _sticky_redis():
+    """Lazy import to avoid circular dependency (shares the OTP Redis client)."""
+    try:
+        from Login_module.OTP import otp_manager
+        client = otp_manager._get_redis_client()
+        return client if otp_manager._redis_available else None
+    except Exception:
+        return None
+
+
+def mark_recent_writer(user_id: int) -> None:
+    """Route this user's reads to the primary for REPLICA_STICKY_SECONDS."""
+    if not replica_engines or REPLICA_STICKY_SECONDS <= 0:
+        return
+    _recent_writers[user_id] = time.monotonic() + REPLICA_STICKY_SECONDS
+    try:
+        client = _sticky_redis()
+        if client is not None:
+            client.set(f"{STICKY_KEY_PREFIX}{user_id}", 1, px=int(REPLICA_STICKY_SECONDS * 1000))
+    except Exception as e:
+        logger.warning("Replica stickiness write failed for user %s: %s", user_id, e)
+
+
+def is_recent_writer(user_id: int) -> bool:
+    deadline = _recent_writers.get(user_id)
+    if deadline is not None:
+        if deadline > time.monotonic():
+            return True
+        _recent_writers.pop(user_id, None)
+    try:
+        client = _sticky_redis()
+        return bool(client is not None and client.exists(f"{STICKY_KEY_PREFIX}{user_id}"))
+    except Exception:
+        return False
+
+
+def choose_read_engine(user_id: Optional[int] = None):
+    if not replica_engines:
+        _router_metrics["primary_sessions"] += 1
+        return engine
+    if user_id is not None and is_recent_writer(user_id):
+        _router_metrics["sticky_primary"] += 1
+        return engine
+    _router_metrics["replica_sessions"] += 1
+    return random.choice(replica_engines)
+
+
+class ReadSession(Session):
+    """
+    Session for read-only dependencies. The engine is chosen on first use, after
+    authentication has run, from info["request"].state.user_id.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self._flushing:
+            return engine
+        bind = self.info.get("bind")
+        if bind is None:
+            request = self.info.get("request")
+            user_id = getattr(getattr(request, "state", None), "user_id", None)
+            bind = self.info["bind"] = choose_read_engine(user_id)
+        return bind
+
+
+ReadSessionLocal = sessionmaker(class_=ReadSession, bind=engine, autocommit=False, autoflush=False, future=True)
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _note_write(session, flush_context):
+    session.info["wrote"] = True
+
+
+@event.listens_for(SessionLocal, "do_orm_execute")
+def _note_statement_write(orm_execute_state):
+    # Bulk update()/delete()/insert() statements bypass the flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["wrote"] = True
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _stick_writer_to_primary(session):
+    # info["user_id"] is set by get_current_user on the request's session
+    if session.info.pop("wrote", False) and session.info.get("user_id") is not None:
+        mark_recent_writer(session.info["user_id"])
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _forget_write(session):
+    session.info.pop("wrote", None)
+
+
+def _pool_stats(name: str, eng) -> dict:
+    pool = eng.pool
+    stats = {"name": name, "dialect": eng.dialect.name, "pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        capacity = pool.size() + max(pool._max_overflow, 0)
+        stats.update({
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": pool.overflow(),
+            "utilization": round(pool.checkedout() / capacity, 4) if capacity else None,
+        })
+    return stats
+
+
+def get_pool_metrics() -> dict:
+    """Connection pool utilization per engine plus read routing counts (this process)."""
+    return {
+        "engines": [_pool_stats("primary", engine)] + [
+            _pool_stats(f"replica_{i}", eng) for i, eng in enumerate(replica_engines)
+        ],
+        "read_routing": dict(_router_metrics),
+    }
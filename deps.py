@@ -1,5 +1,9 @@
+import hmac
+from typing import Optional
+
+from fastapi import HTTPException, Request, status
 from sqlalchemy.orm import Session
-from database import SessionLocal
+from database import SessionLocal, ReadSessionLocal
 
 
 def get_db():
@@ -9,3 +13,27 @@ def get_db():
     finally:
         db.close()
 
+
+def check_admin_key(provided: Optional[str], expected: Optional[str]) -> None:
+    """
+    Raise 401 unless the X-Admin-Key value matches the configured key (constant-time).
+    An empty configured key disables the endpoint.
+    """
+    expected = (expected or "").strip()
+    if not expected or not hmac.compare_digest((provided or "").encode(), expected.encode()):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or missing admin key. Send it in header: X-Admin-Key.",
+        )
+
+
+def get_read_db(request: Request):
+    """
+    Session for read-only endpoints: served by a read replica when one is
+    configured, or by the primary for users who wrote recently (see database.py).
+    """
+    db = ReadSessionLocal(info={"request": request})
+    try:
+        yield db
+    finally:
+        db.close()
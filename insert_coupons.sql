@@ -6,6 +6,7 @@
 -- ============================================
 INSERT INTO coupons (
     coupon_code,
+    coupon_code_normalized,
     description,
     discount_type,
     discount_value,
@@ -17,6 +18,7 @@ INSERT INTO coupons (
     status,
     created_at
 ) VALUES (
+    'SAVE10',
     'SAVE10',
     'Get 10% off on your order. Maximum discount ₹500.',
     'percentage',
@@ -35,6 +37,7 @@ INSERT INTO coupons (
 -- ============================================
 INSERT INTO coupons (
     coupon_code,
+    coupon_code_normalized,
     description,
     discount_type,
     discount_value,
@@ -46,6 +49,7 @@ INSERT INTO coupons (
     status,
     created_at
 ) VALUES (
+    'FLAT200',
     'FLAT200',
     'Get flat ₹200 off on orders above ₹1000',
     'fixed',
@@ -64,6 +68,7 @@ INSERT INTO coupons (
 -- ============================================
 INSERT INTO coupons (
     coupon_code,
+    coupon_code_normalized,
     description,
     discount_type,
     discount_value,
@@ -75,6 +80,7 @@ INSERT INTO coupons (
     status,
     created_at
 ) VALUES (
+    'SALE25',
     'SALE25',
     'Big Sale - 25% off on all orders above ₹2000',
     'percentage',
@@ -93,6 +99,7 @@ INSERT INTO coupons (
 -- ============================================
 INSERT INTO coupons (
     coupon_code,
+    coupon_code_normalized,
     description,
     discount_type,
     discount_value,
@@ -104,6 +111,7 @@ INSERT INTO coupons (
     status,
     created_at
 ) VALUES (
+    'FREESHIP',
     'FREESHIP',
     'Free shipping on all orders',
     'fixed',
@@ -122,6 +130,7 @@ INSERT INTO coupons (
 -- ============================================
 INSERT INTO coupons (
     coupon_code,
+    coupon_code_normalized,
     description,
     discount_type,
     discount_value,
@@ -133,6 +142,7 @@ INSERT INTO coupons (
     status,
     created_at
 ) VALUES (
+    'WELCOME50',
     'WELCOME50',
     'Welcome bonus - 50% off for new users',
     'percentage',
@@ -11,8 +11,10 @@ Usage:
 See `SAMPLE_INVOICE` at the bottom for a complete parameter reference.
 """
 
+import io
 import os
 from datetime import datetime
+from functools import lru_cache
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.units import mm, cm
 from reportlab.lib.colors import HexColor, Color, white, black
@@ -114,8 +116,9 @@ def fmt_currency(value, symbol="₹") -> str:
     return result
 
 
+@lru_cache(maxsize=1)
 def _get_styles():
-    """Build paragraph styles for the invoice."""
+    """Build paragraph styles for the invoice (built once per process, never mutated)."""
     base = getSampleStyleSheet()
     styles = {}
     
@@ -202,6 +205,13 @@ def _get_styles():
     return styles
 
 
+@lru_cache(maxsize=8)
+def _load_logo_bytes(logo_path: str) -> bytes:
+    """Read the logo once per process; each render gets its own BytesIO over the cached bytes."""
+    with open(logo_path, "rb") as f:
+        return f.read()
+
+
 # ──────────────────────────────────────────────────────────────
 # CUSTOM PAGE TEMPLATE (header/footer on every page)
 # ──────────────────────────────────────────────────────────────
@@ -316,7 +326,7 @@ def generate_invoice(data: dict, output_path: str = "invoice.pdf", logo_path: st
     logo_cell = ""
     if logo_path and os.path.exists(logo_path):
         try:
-            logo_cell = Image(logo_path, width=52 * mm, height=16 * mm, kind='proportional')
+            logo_cell = Image(io.BytesIO(_load_logo_bytes(logo_path)), width=52 * mm, height=16 * mm, kind='proportional')
         except Exception:
             logo_cell = Paragraph(
                 '<font color="#1A9E8F"><b>Nucleotide</b></font>',
@@ -6,11 +6,12 @@ import sys
 import time
 import logging
 import warnings
+from typing import Optional
 from contextlib import asynccontextmanager
 from pathlib import Path
 
 from dotenv import load_dotenv
-from fastapi import FastAPI, Request, HTTPException
+from fastapi import FastAPI, Request, HTTPException, Depends, Header
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
@@ -45,14 +46,14 @@ from Category_module.bootstrap import seed_default_categories
 from Banner_module.Banner_model import Banner
 from Consent_module.Consent_model import UserConsent, ConsentProduct, PartnerConsent
 from Orders_module.Order_model import Order, OrderItem, OrderSnapshot, OrderStatusHistory
-from GeneticTest_module.GeneticTest_model import GeneticTestParticipant
+from GeneticTest_module.GeneticTest_model import GeneticTestParticipant, MemberOrderSummary
 from PhoneChange_module.PhoneChange_model import PhoneChangeRequest, PhoneChangeAuditLog
 from Login_module.Token.Refresh_token_model import RefreshToken  # Dual-token strategy
 from Newsletter_module.Newsletter_model import NewsletterSubscription
-from Tracking_module.Tracking_model import TrackingRecord  # Location & Analytics Tracking
+from Tracking_module.Tracking_model import TrackingRecord, TrackingRollup, TrackingRollupState  # Location & Analytics Tracking
 from Account_module.Account_model import AccountFeedbackRequest
 from Enquiry_module.Enquiry_model import EnquiryRequest
-from Notification_module.Notification_model import Notification, UserDeviceToken
+from Notification_module.Notification_model import Notification, UserDeviceToken, NotificationBroadcastJob
 
 # Import Google Meet API models to register with SQLAlchemy Base
 try:
@@ -98,6 +99,7 @@ except ImportError:
 from Login_module.Device.scheduler import start_scheduler, shutdown_scheduler
 
 from config import settings
+from deps import check_admin_key
 
 
 class RequestLoggingMiddleware(BaseHTTPMiddleware):
@@ -251,6 +253,14 @@ async def lifespan(app: FastAPI):
         logger.info("Step 3: Starting scheduler...")
         start_scheduler()
         logger.info("Step 4: Scheduler started")
+        from Orders_module.webhook_queue import start_webhook_workers
+        start_webhook_workers()
+        from Notification_module.push_dispatcher import start_push_workers
+        start_push_workers()
+        from Tracking_module.tracking_ingest import start_tracking_flusher
+        start_tracking_flusher()
+        from Notification_module.broadcast_service import resume_broadcast_jobs
+        resume_broadcast_jobs()
         try:
             from Notification_module.firebase_service import init_firebase
             if init_firebase():
@@ -275,6 +285,18 @@ async def lifespan(app: FastAPI):
     try:
         logger.info("Shutting down application...")
         shutdown_scheduler()
+        from Orders_module.webhook_queue import stop_webhook_workers
+        stop_webhook_workers()
+        from Notification_module.broadcast_service import shutdown_broadcast_executor
+        shutdown_broadcast_executor()
+        from Notification_module.push_dispatcher import stop_push_workers
+        stop_push_workers()
+        from Tracking_module.tracking_ingest import stop_tracking_flusher
+        stop_tracking_flusher()
+        from Notification_module.event_stream import stop_event_listener
+        stop_event_listener()
+        from Orders_module.invoice_service import shutdown_invoice_pool
+        shutdown_invoice_pool()
         logger.info("Application shutdown complete")
     except Exception as e:
         logger.error(f"Error during application shutdown: {e}", exc_info=True)
@@ -354,6 +376,7 @@ def custom_openapi():
         "/auth/verify-otp",
         "/newsletter/subscribe",
         "/api/tracking/event",  # Tracking endpoint - no CSRF required
+        "/api/tracking/events",  # Batch tracking endpoint - no CSRF required
         "/config/payment",
         "/config/reverse-geocode",
     }
@@ -659,7 +682,7 @@ app.include_router(session_router)
 app.include_router(phone_change_router)
 app.include_router(newsletter_router)  # /newsletter/subscribe
 app.include_router(notification_router)  # /api/notifications
-app.include_router(tracking_router)  # /api/tracking/event
+app.include_router(tracking_router)  # /api/tracking/event, /api/tracking/events
 app.include_router(account_router)  # /account/feedback
 app.include_router(enquiry_router)  # /enquiry (form + POST)
 
@@ -708,6 +731,56 @@ def health_check():
     }
 
 
+def verify_metrics_admin_key(
+    x_admin_key: Optional[str] = Header(None, alias="X-Admin-Key")
+) -> None:
+    """Require settings.METRICS_ADMIN_KEY in X-Admin-Key; /metrics is disabled while it is empty."""
+    check_admin_key(x_admin_key, settings.METRICS_ADMIN_KEY)
+
+
+@app.get("/metrics", dependencies=[Depends(verify_metrics_admin_key)])
+def runtime_metrics():
+    """In-process runtime metrics (per worker) for scraping."""
+    from Login_module.Device.session_activity import get_session_touch_metrics
+    from Orders_module.webhook_queue import get_webhook_queue_metrics
+    from Orders_module.order_repair import get_order_repair_metrics
+    from Orders_module.invoice_service import get_invoice_render_metrics
+    from Address_module.pincode_service import get_pincode_metrics
+    from Product_module.catalog_cache import get_catalog_cache_metrics
+    from Cart_module.coupon_service import get_coupon_metrics
+    from Cart_module.cart_pricing import get_pricing_metrics
+    from Cart_module.cart_cache import get_cart_view_cache_metrics
+    from Notification_module.push_dispatcher import get_push_dispatch_metrics
+    from Notification_module.unread_counter import get_unread_counter_metrics
+    from Notification_module.event_stream import get_event_stream_metrics
+    from Consent_module.consent_cache import get_consent_cache_metrics
+    from Tracking_module.tracking_ingest import get_tracking_ingest_metrics
+    from Tracking_module.tracking_rollup import get_tracking_rollup_metrics
+    from Login_module.Device.retention import get_retention_metrics
+    from Login_module.Device.scheduler import get_scheduler_metrics
+    from database import get_pool_metrics
+    return {
+        "session_last_active": get_session_touch_metrics(),
+        "webhook_queue": get_webhook_queue_metrics(),
+        "order_repair": get_order_repair_metrics(),
+        "invoice_render": get_invoice_render_metrics(),
+        "pincode_lookup": get_pincode_metrics(),
+        "catalog_cache": get_catalog_cache_metrics(),
+        "coupon_definitions": get_coupon_metrics(),
+        "cart_pricing": get_pricing_metrics(),
+        "cart_view_cache": get_cart_view_cache_metrics(),
+        "push_dispatch": get_push_dispatch_metrics(),
+        "unread_counters": get_unread_counter_metrics(),
+        "event_stream": get_event_stream_metrics(),
+        "consent_cache": get_consent_cache_metrics(),
+        "tracking_ingest": get_tracking_ingest_metrics(),
+        "tracking_rollup": get_tracking_rollup_metrics(),
+        "retention": get_retention_metrics(),
+        "scheduler": get_scheduler_metrics(),
+        "db_pools": get_pool_metrics(),
+    }
+
+
 # Run application
 if __name__ == "__main__":
     import uvicorn
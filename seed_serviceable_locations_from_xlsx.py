@@ -66,6 +66,9 @@ def main() -> None:
         for loc in to_add:
             db.add(ServiceableLocation(location=loc))
         db.commit()
+        # Running workers reload their cached city set on their next version check
+        from Address_module.location_validator import invalidate_serviceable_locations
+        invalidate_serviceable_locations()
         print(f"Inserted {len(to_add)} locations. Skipped {len(allowed) - len(to_add)} already present. Total rows in table: {len(existing) + len(to_add)}.")
     finally:
         db.close()